@@ -0,0 +1,80 @@
+"""
+Vercel Serverless Function - Cancel Translation Job
+Marks a pending or processing job as cancelled (see job_cancel.py). A
+pending job never starts; a processing job stops before its next cell, once
+its worker notices, and cleans up its own files. Jobs coalesced with it
+(identical submissions waiting on its result) fail with it.
+
+POST /api/cancel with {"job_id": "xxx"} (or ?job_id=xxx)
+  -> 202 {"job_id": ..., "status": "cancelled"}
+  -> 409 if the job already finished, 404 if it does not exist
+"""
+from http.server import BaseHTTPRequestHandler
+import json
+from urllib.parse import urlparse, parse_qs
+from job_cancel import cancel_job, fail_followers
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length:
+                try:
+                    data = json.loads(self.rfile.read(content_length))
+                except ValueError:
+                    self.send_error_response(400, "Invalid request format. Expected JSON.")
+                    return
+                if isinstance(data, dict) and data.get('job_id'):
+                    params['job_id'] = data['job_id']
+
+            job_id = params.get('job_id')
+            if not job_id:
+                self.send_error_response(400, "Missing job_id")
+                return
+
+            job, cancelled = cancel_job(job_id)
+
+            if not job:
+                self.send_error_response(404, "Job not found")
+                return
+
+            if not cancelled:
+                self.send_error_response(409, f"Job already finished. Current status: {job['status']}")
+                return
+
+            # Identical submissions waiting on this job fail with it
+            try:
+                fail_followers(job_id)
+            except Exception as e:
+                print(f"Failed to release jobs waiting on cancelled job {job_id}: {e}")
+
+            self.send_response(202)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                "job_id": job_id,
+                "status": "cancelled",
+                "message": "Translation cancelled"
+            }).encode())
+
+        except Exception as e:
+            self.send_error_response(500, str(e))
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight requests"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def send_error_response(self, code, message):
+        """Helper to send error responses"""
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": message}).encode())
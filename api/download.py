@@ -1,17 +1,17 @@
 """
 Vercel Serverless Function - Download Translated File
-Returns the translated file from Supabase Storage
+Hands out a short-lived signed Supabase Storage URL for the translated file,
+so the bytes go straight from storage to the client. Only the lightweight
+REST helpers are imported, keeping cold starts short.
+
+GET /api/download?job_id=xxx              -> 302 redirect to the signed URL
+GET /api/download?job_id=xxx&format=json  -> {"url": ..., "filename": ..., "expires_in": ...}
 """
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from urllib.parse import urlparse
-from supabase import create_client, Client
-
-# Initialize Supabase client (strip any whitespace/newlines)
-SUPABASE_URL = os.environ.get("SUPABASE_URL", "").strip()
-SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from urllib.parse import urlparse, parse_qs
+from supabase_rest import get_job, create_signed_download_url, SIGNED_URL_TTL
 
 
 class handler(BaseHTTPRequestHandler):
@@ -19,8 +19,7 @@ class handler(BaseHTTPRequestHandler):
         try:
             # Extract job_id from path: /api/download?job_id=xxx
             parsed_path = urlparse(self.path)
-            query = parsed_path.query
-            params = dict(qc.split("=") for qc in query.split("&")) if query else {}
+            params = {key: values[0] for key, values in parse_qs(parsed_path.query).items()}
 
             job_id = params.get('job_id')
             if not job_id:
@@ -28,8 +27,7 @@ class handler(BaseHTTPRequestHandler):
                 return
 
             # Fetch job details from database
-            result = supabase.table("translation_jobs").select("*").eq("id", job_id).single().execute()
-            job = result.data
+            job = get_job(job_id, "status, output_file_path, original_filename")
 
             if not job:
                 self.send_error_response(404, "Job not found")
@@ -44,28 +42,33 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response(404, "Output file not found")
                 return
 
-            # Download file from Supabase Storage
+            # Sign a download URL instead of proxying the file
+            output_filename = f"translated_{os.path.splitext(job['original_filename'])[0]}.xlsx"
             try:
-                file_data = supabase.storage.from_("excel-files").download(output_path)
+                signed_url = create_signed_download_url(output_path, download_name=output_filename)
             except Exception as e:
                 self.send_error_response(500, f"Failed to download file: {str(e)}")
                 return
 
-            # Send file response
-            output_filename = f"translated_{job['original_filename'].replace('.xls', '.xlsx')}"
+            if params.get('format') == 'json':
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(json.dumps({
+                    "url": signed_url,
+                    "filename": output_filename,
+                    "expires_in": SIGNED_URL_TTL
+                }).encode())
+                return
 
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            self.send_header('Content-Disposition', f'attachment; filename="{output_filename}"')
-            self.send_header('Content-Length', str(len(file_data)))
+            self.send_response(302)
+            self.send_header('Location', signed_url)
             self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Cache-Control', 'no-store')
             self.end_headers()
 
-            self.wfile.write(file_data)
-
-            # Optional: Schedule cleanup of files after successful download
-            # This could be done via a separate cleanup function
-
         except Exception as e:
             self.send_error_response(500, str(e))
 
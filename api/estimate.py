@@ -0,0 +1,110 @@
+"""
+Vercel Serverless Function - Estimate Translation
+Pre-flight estimate of a translation job (see workbook_estimate.py): unique
+strings, characters, formula literals, expected cache hits and projected
+duration. Nothing is translated, stored or recorded.
+
+Supported request bodies:
+- Raw file bytes with filename, source_lang and target_lang in the query string
+- JSON with the job_id and filename of a file already uploaded through a
+  signed URL from /api/upload_url (before /api/translate creates its job)
+"""
+from http.server import BaseHTTPRequestHandler
+import io
+import json
+import uuid
+import shutil
+import hashlib
+import tempfile
+from urllib.parse import urlparse, parse_qs
+from supabase_rest import storage_download
+from upload_stream import BodyReader, UploadError, validate_filename
+from result_cache import compute_content_hash, find_reusable_job
+from workbook_estimate import estimate_workload
+
+# Uploads larger than this are spooled to disk while being estimated
+SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length == 0:
+                self.send_error_response(400, "No file provided")
+                return
+
+            body = BodyReader(self.rfile, content_length)
+            params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                try:
+                    data = json.loads(body.read())
+                    job_id = str(uuid.UUID(str(data.get('job_id'))))
+                except (ValueError, TypeError, AttributeError):
+                    raise UploadError(400, "Expected JSON with the job_id of a signed upload")
+                filename = validate_filename(data.get('filename'))
+                try:
+                    content = storage_download(f"input/{job_id}/{filename}")
+                except Exception:
+                    raise UploadError(400, "Uploaded file not found. Upload it to the signed URL first.")
+                workbook = io.BytesIO(content)
+                file_size = len(content)
+                file_digest = hashlib.sha256(content).hexdigest()
+                params.update(data)
+            else:
+                filename = validate_filename(params.get('filename') or self.headers.get('X-Filename'))
+                workbook = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+                shutil.copyfileobj(body, workbook)
+                workbook.seek(0)
+                file_size = len(body)
+                file_digest = body.sha256.hexdigest()
+
+            content_hash = compute_content_hash(
+                file_digest, params.get('source_lang', 'fr'), params.get('target_lang', 'en'))
+            cached = self.has_cached_result(content_hash)
+
+            with workbook:
+                workload = estimate_workload(filename, workbook, cached=cached)
+            if workload is None:
+                self.send_error_response(422, "Could not read the workbook")
+                return
+
+            workload.update({"filename": filename, "file_size": file_size, "cached_result": cached})
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(workload).encode())
+
+        except UploadError as e:
+            self.send_error_response(e.code, e.message)
+
+        except Exception as e:
+            self.send_error_response(500, str(e))
+
+    def has_cached_result(self, content_hash):
+        """Whether an identical completed translation exists; lookup errors mean no"""
+        try:
+            existing = find_reusable_job(content_hash)
+        except Exception as e:
+            print(f"Result cache lookup failed: {e}")
+            return False
+        return bool(existing) and existing["status"] == "complete"
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight requests"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Filename')
+        self.end_headers()
+
+    def send_error_response(self, code, message):
+        """Helper to send error responses"""
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": message}).encode())
@@ -1,160 +1,358 @@
 """
 Vercel Serverless Function - Process Translation Job
 This function actually performs the translation work
-Can be triggered via webhook or direct call
+Triggered server-side (see job_dispatch.py): by api/translate.py right after
+a job is created, or by a Supabase Database Webhook on INSERT. It answers
+202 as soon as the job is claimed (pending -> processing) and translates it
+in the same invocation. Should the invocation die before the job finishes,
+recover_stalled_jobs() (api/recover_jobs.py) fails the job once it has been
+processing for JOB_STALLED_TIMEOUT.
+The job can be cancelled meanwhile (api/cancel.py): the translation checks
+the job row every few seconds and stops between cells.
+
+The Excel/translation libraries are imported only once a job really needs
+translating, so jobs served from the result cache start as fast as status polls.
+
+Each stage's duration is recorded in the job's `timings` column and logged
+as a JSON line (see stage_timing.py), and its provider calls, characters and
+skipped strings in `translation_stats` (see translation_stats.py). Jobs
+created with `profile` set (or all jobs, with JOB_PROFILING=1) are translated
+under the profiler and store output/<job id>/profile.zip (see job_profiler.py).
 """
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import hashlib
 import tempfile
-from supabase import create_client, Client
-from excel_translator_optimized import convert_xls_to_xlsx, translate_excel_with_format
-
-# Initialize Supabase client (strip any whitespace/newlines)
-SUPABASE_URL = os.environ.get("SUPABASE_URL", "").strip()
-SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from supabase_rest import (
+    broadcast_job_progress, get_job, update_jobs, storage_download, storage_upload, storage_delete
+)
+from result_cache import (
+    compute_content_hash, find_reusable_job, cached_result_fields, keep_result_alive, release_followers
+)
+from job_dispatch import is_authorized, job_id_from_payload
+from job_cancel import job_cancelled
+from cancellation import CancellationToken, TranslationCancelled
+from stage_timing import StageTimer, log_timings
+from translation_stats import TranslationStats, reused_stats, summarize_stats
+from job_profiler import JobProfiler, profiling_requested, profile_storage_path
 
 
 def update_job_progress(job_id: str, current: int, total: int, message: str):
-    """Update job progress in database"""
+    """Publish job progress over Realtime broadcast (not persisted)
+
+    Only state transitions are written to translation_jobs, so progress
+    ticks cost no row UPDATEs, trigger runs or WAL.
+    """
     try:
-        supabase.table("translation_jobs").update({
-            "current_cell": current,
-            "total_cells": total,
-            "progress_message": message,
-            "status": "processing"
-        }).eq("id", job_id).execute()
+        broadcast_job_progress(job_id, current, total, message)
     except Exception as e:
-        print(f"Failed to update progress: {e}")
+        print(f"Failed to broadcast progress: {e}")
+
+
+def follow_leader(job: dict):
+    """
+    Handle a job coalesced with an identical in-flight job
+
+    Returns True if nothing needs translating: the leader already finished
+    (its result is copied) or is still running (it will release this job).
+    """
+    leader = get_job(job['coalesced_with'], "id, status, output_file_path, translation_stats")
+
+    if leader and leader['status'] == 'complete' and leader['output_file_path']:
+        update_jobs(cached_result_fields(leader, "coalesced"), id=f"eq.{job['id']}")
+        return True
+
+    if leader and leader['status'] in ('pending', 'processing'):
+        return True
+
+    # Leader failed or disappeared - translate this job on its own, if it
+    # has an input (app_supabase.py stores none for coalesced jobs)
+    if not job.get('input_file_path'):
+        update_jobs({
+            "status": "error",
+            "error_message": "The identical translation this job was waiting on did not finish. Please submit the file again.",
+            "progress_message": "Error: identical translation did not finish"
+        }, id=f"eq.{job['id']}", status="eq.pending")
+        return True
+
+    update_jobs({"coalesced_with": None}, id=f"eq.{job['id']}")
+    return False
+
 
+def reuse_identical_job(job: dict, file_data: bytes):
+    """
+    Check the result cache once the input bytes are known
 
-def process_translation_job(job_id: str):
-    """Process a translation job"""
+    Direct uploads get their content_hash here. Returns True if the job was
+    completed from a cached result or attached to an identical job in flight.
+    """
+    content_hash = job.get('content_hash')
+    if not content_hash:
+        content_hash = compute_content_hash(
+            hashlib.sha256(file_data).hexdigest(), job['source_lang'], job['target_lang'])
+        update_jobs({"content_hash": content_hash}, id=f"eq.{job['id']}")
+
+    # Only jobs already processing can lead; the oldest one wins races
+    existing = find_reusable_job(content_hash, inflight_statuses=("processing",))
+    if not existing or existing['id'] == job['id']:
+        return False
+
+    if existing['status'] == 'complete':
+        update_jobs(cached_result_fields(existing), id=f"eq.{job['id']}")
+        release_followers(job['id'], cached_result_fields(existing, "coalesced"))
+        keep_result_alive(existing)
+        return True
+
+    update_jobs({
+        "status": "pending",
+        "coalesced_with": existing['id'],
+        "progress_message": "Waiting for an identical translation in progress..."
+    }, id=f"eq.{job['id']}")
+    # Jobs that were waiting on this one now wait on the new leader
+    update_jobs({"coalesced_with": existing['id']}, coalesced_with=f"eq.{job['id']}")
+    return True
+
+
+def store_profile(job_id: str, profiler):
+    """Upload a profiled job's artifact next to its output; returns the job fields to set"""
+    artifact = profiler.artifact() if profiler else None
+    if not artifact:
+        return {}
+    profile_path = profile_storage_path(job_id)
+    try:
+        storage_upload(profile_path, artifact, "application/zip", len(artifact))
+    except Exception as e:
+        print(f"Failed to store profile of job {job_id}: {e}")
+        return {}
+    return {"profile_path": profile_path}
+
+
+def process_translation_job(job_id: str, on_claimed=None):
+    """
+    Process a translation job
+
+    on_claimed() is called once this invocation owns the job, before any
+    translation work (process_job answers its caller there).
+    """
+    temp_paths = []
+    input_path = None
+    timer = StageTimer()
+    stats = TranslationStats()
+    profiler = None
     try:
         # Fetch job details from database
-        result = supabase.table("translation_jobs").select("*").eq("id", job_id).single().execute()
-        job = result.data
+        job = get_job(job_id)
 
         if not job:
             raise Exception(f"Job {job_id} not found")
 
         if job['status'] != 'pending':
-            raise Exception(f"Job {job_id} is not in pending state")
+            # Already claimed by another dispatch - leave it alone
+            print(f"Job {job_id} is not in pending state")
+            return False
 
-        # Update status to processing
-        supabase.table("translation_jobs").update({
+        if job.get('coalesced_with') and follow_leader(job):
+            return True
+
+        if not job.get('input_file_path'):
+            # app_supabase.py sets it once the input is stored, and translates the job itself
+            print(f"Job {job_id} has no stored input yet")
+            return False
+
+        # Claim the job: only one dispatch can move it from pending to processing
+        claimed = update_jobs({
             "status": "processing",
             "progress_message": "Starting translation..."
-        }).eq("id", job_id).execute()
+        }, returning=True, id=f"eq.{job_id}", status="eq.pending")
+        if not claimed:
+            print(f"Job {job_id} was claimed by another dispatch")
+            return False
+        if on_claimed:
+            on_claimed()
 
         # Download input file from Supabase Storage
         input_path = job['input_file_path']
-        file_data = supabase.storage.from_("excel-files").download(input_path)
+        with timer.stage("download"):
+            file_data = storage_download(input_path)
+
+        # A profiled job must really translate, so it never reuses a result
+        profiler = JobProfiler(enabled=profiling_requested(job.get('profile')))
+        if not profiler.enabled:
+            try:
+                with timer.stage("cache_check"):
+                    if reuse_identical_job(job, file_data):
+                        return True
+            except Exception as e:
+                print(f"Result cache check failed: {e}")
+
+        # Heavy imports (openpyxl, xlrd, deep_translator) only on this path
+        from excel_translator_optimized import convert_xls_to_xlsx, translate_excel_with_format
 
         # Save to temporary file
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(job['original_filename'])[1]) as temp_input:
             temp_input.write(file_data)
             temp_input_path = temp_input.name
+        temp_paths.append(temp_input_path)
+        # Don't hold a second copy of the input while the workbook is in memory
+        del file_data
 
         # Convert .xls to .xlsx if needed
         converted_path = temp_input_path
         if temp_input_path.endswith('.xls'):
-            converted_path = convert_xls_to_xlsx(temp_input_path)
+            with timer.stage("convert_xls"):
+                converted_path = convert_xls_to_xlsx(temp_input_path)
+            temp_paths.append(converted_path)
 
         # Prepare output file path
         output_filename = f"translated_{os.path.splitext(job['original_filename'])[0]}.xlsx"
         temp_output_path = tempfile.mktemp(suffix='.xlsx')
+        temp_paths.append(temp_output_path)
 
         # Define progress callback
         def progress_callback(current, total, message):
             update_job_progress(job_id, current, total, message)
 
+        # Cancels arrive through the job row (api/cancel.py)
+        cancel_token = CancellationToken(poll=lambda: job_cancelled(job_id))
+
         # Perform translation
-        translate_excel_with_format(
-            converted_path,
-            temp_output_path,
-            job['source_lang'],
-            job['target_lang'],
-            progress_callback
-        )
+        with profiler:
+            translate_excel_with_format(
+                converted_path,
+                temp_output_path,
+                job['source_lang'],
+                job['target_lang'],
+                progress_callback,
+                cancel_token=cancel_token,
+                timings=timer,
+                stats=stats
+            )
 
         # Upload translated file to Supabase Storage
         output_path = f"output/{job_id}/{output_filename}"
-        with open(temp_output_path, 'rb') as f:
-            supabase.storage.from_("excel-files").upload(
+        with timer.stage("upload"), open(temp_output_path, 'rb') as f:
+            storage_upload(
                 output_path,
-                f.read(),
-                file_options={
-                    "content-type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                }
+                f,
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                os.path.getsize(temp_output_path)
             )
 
-        # Update job as complete
-        supabase.table("translation_jobs").update({
+        # Update job as complete, along with any identical jobs waiting on it
+        translation_stats = stats.as_dict()
+        complete_fields = {
             "status": "complete",
             "output_file_path": output_path,
-            "progress_message": "Translation complete!",
+            "progress_message": f"Translation complete! ({summarize_stats(translation_stats)})",
             "current_cell": 100,
             "total_cells": 100
-        }).eq("id", job_id).execute()
-
-        # Clean up temporary files
-        try:
-            os.unlink(temp_input_path)
-            if converted_path != temp_input_path:
-                os.unlink(converted_path)
-            os.unlink(temp_output_path)
-        except:
-            pass
+        }
+        timings = timer.as_dict()
+        job_fields = dict(complete_fields, timings=timings, translation_stats=translation_stats,
+                          **store_profile(job_id, profiler))
+        if not update_jobs(job_fields, returning=True, id=f"eq.{job_id}", status="eq.processing"):
+            # Cancelled while the output was being uploaded
+            storage_delete(output_path)
+            if job_fields.get("profile_path"):
+                storage_delete(job_fields["profile_path"])
+            raise TranslationCancelled("Translation cancelled")
+        release_followers(job_id, dict(complete_fields, translation_stats=reused_stats(translation_stats, "coalesced")))
+        log_timings(job_id, "complete", timings)
 
         return True
 
+    except TranslationCancelled:
+        # The job row already says cancelled; drop what it left in storage
+        print(f"Translation job {job_id} was cancelled")
+        log_timings(job_id, "cancelled", timer.as_dict())
+        try:
+            storage_delete(input_path)
+        except Exception as e:
+            print(f"Failed to delete input of cancelled job {job_id}: {e}")
+        return False
+
     except Exception as e:
-        # Update job as error
+        # Update job as error, along with any identical jobs waiting on it
+        # (unless it was cancelled meanwhile)
+        timings = timer.as_dict()
+        log_timings(job_id, "error", timings)
         try:
-            supabase.table("translation_jobs").update({
+            error_fields = {
                 "status": "error",
                 "error_message": str(e),
                 "progress_message": f"Error: {str(e)}"
-            }).eq("id", job_id).execute()
+            }
+            job_fields = dict(error_fields, timings=timings, translation_stats=stats.as_dict(),
+                              **store_profile(job_id, profiler))
+            update_jobs(job_fields, id=f"eq.{job_id}", status="in.(pending,processing)")
+            release_followers(job_id, error_fields)
         except:
             pass
 
         raise e
 
+    finally:
+        # Clean up temporary files
+        for path in temp_paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         try:
+            if not is_authorized(self.headers):
+                self.send_error_response(401, "Unauthorized")
+                return
+
             # Read request body
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length)
             data = json.loads(body)
 
-            job_id = data.get('job_id')
+            job_id = job_id_from_payload(data)
             if not job_id:
                 self.send_error_response(400, "Missing job_id")
                 return
 
-            # Process the translation job
-            process_translation_job(job_id)
+        except Exception as e:
+            self.send_error_response(500, str(e))
+            return
 
-            # Send success response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+        # Answer as soon as the job is claimed; the translation carries on
+        # here (failures are recorded on the job)
+        answered = []
 
-            response = {
-                "success": True,
-                "job_id": job_id,
-                "message": "Translation completed successfully"
-            }
-            self.wfile.write(json.dumps(response).encode())
+        def answer_claimed():
+            self.send_processed(202, job_id, True)
+            answered.append(True)
 
+        try:
+            processed = process_translation_job(job_id, on_claimed=answer_claimed)
         except Exception as e:
-            self.send_error_response(500, str(e))
+            print(f"Translation job {job_id} failed: {e}")
+            processed = True
+
+        if not answered:
+            self.send_processed(200, job_id, processed)
+
+    def send_processed(self, code, job_id, processed):
+        """Tell the dispatcher whether this invocation took the job"""
+        body = json.dumps({"success": True, "job_id": job_id, "processed": bool(processed)}).encode()
+        try:
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body)
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
 
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
@@ -0,0 +1,50 @@
+"""
+Vercel Serverless Function - Recover Stalled Jobs
+Run by Vercel Cron (see vercel.json): dispatches again the pending jobs no
+process_job invocation claimed, and fails the jobs whose invocation died
+while they were pending or processing (see recover_stalled_jobs() in
+job_dispatch.py).
+
+Vercel Cron calls it with `Authorization: Bearer <CRON_SECRET>`; without a
+CRON_SECRET the dispatch secret (X-Dispatch-Secret) is required instead,
+when one is configured.
+"""
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import hmac
+from job_dispatch import is_authorized, recover_stalled_jobs
+
+
+def is_cron_authorized(headers):
+    """Whether the request comes from Vercel Cron (or carries the dispatch secret)"""
+    cron_secret = os.environ.get("CRON_SECRET", "").strip()
+    if not cron_secret:
+        return is_authorized(headers)
+    return hmac.compare_digest(headers.get("Authorization", ""), f"Bearer {cron_secret}")
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not is_cron_authorized(self.headers):
+            self.send_error_response(401, "Unauthorized")
+            return
+
+        try:
+            recovered = recover_stalled_jobs()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(json.dumps(recovered).encode())
+
+        except Exception as e:
+            self.send_error_response(500, str(e))
+
+    def send_error_response(self, code, message):
+        """Helper to send error responses"""
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": message}).encode())
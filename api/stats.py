@@ -0,0 +1,44 @@
+"""
+Vercel Serverless Function - Translation Provider Usage
+Aggregates the translation_stats of the last STATS_WINDOW finished jobs:
+totals and per-job percentiles of provider calls, characters sent, failed
+calls and skipped strings, result cache outcomes and the calls saved by
+reusing results (see translation_stats.py).
+
+Only imports the lightweight REST helpers, like api/status.py.
+"""
+from http.server import BaseHTTPRequestHandler
+import json
+from translation_stats import aggregate_stats, stored_job_stats
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            summary = aggregate_stats(stored_job_stats())
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(summary).encode())
+
+        except Exception as e:
+            self.send_error_response(500, str(e))
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight requests"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def send_error_response(self, code, message):
+        """Helper to send error responses"""
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": message}).encode())
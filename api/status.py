@@ -1,59 +1,151 @@
 """
 Vercel Serverless Function - Get Job Status
 Returns current status and progress of a translation job
+
+Responses carry an ETag derived from updated_at; a request whose
+If-None-Match still matches gets 304 Not Modified without a body. With
+?wait=<seconds> such a request is held (long-poll) until the job changes
+or the wait runs out, so clients can poll far less often. While held, the
+request only re-reads the version columns (id, status, updated_at) of the job
+and the job reporting its progress, in one select; the full row is fetched
+again only once one of them changed.
+
+Polled constantly, so it only imports the lightweight REST helpers
+(no supabase-py, no Excel libraries) to keep cold starts short.
 """
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from urllib.parse import urlparse
-from supabase import create_client, Client
+import time
+import hashlib
+from urllib.parse import urlparse, parse_qs
+from supabase_rest import get_job, select_jobs
+
+# Longest a ?wait= long-poll may hold the request open (seconds); keep it
+# below the platform's function timeout
+MAX_WAIT_SECONDS = float(os.environ.get("STATUS_MAX_WAIT", 8))
+
+# How often a held request checks whether the job changed (seconds)
+WAIT_POLL_INTERVAL = float(os.environ.get("STATUS_WAIT_INTERVAL", 2))
+
+COLUMNS = "id, status, current_cell, total_cells, progress_percentage, progress_message, error_message, created_at, updated_at, coalesced_with, timings, profile_path, translation_stats"
+
+
+def load_status(job_id):
+    """
+    Fetch a job and the job whose progress it reports
+
+    Returns (job, progress) or (None, None); progress is the job itself unless
+    it is attached to an identical in-flight job.
+    """
+    job = get_job(job_id, COLUMNS)
+    if not job:
+        return None, None
+
+    progress = job
+    if job['status'] == 'pending' and job.get('coalesced_with'):
+        progress = get_job(job['coalesced_with'], COLUMNS) or job
+    return job, progress
+
+
+def status_version(job, progress):
+    """updated_at of the job and of the job reporting its progress"""
+    return {(job['id'], job['updated_at']), (progress['id'], progress['updated_at'])}
+
 
-# Initialize Supabase client (strip any whitespace/newlines)
-SUPABASE_URL = os.environ.get("SUPABASE_URL", "").strip()
-SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def load_version(job, progress):
+    """Current status_version of the same jobs, reading only id and updated_at"""
+    ids = ",".join(sorted({job['id'], progress['id']}))
+    return {(row['id'], row['updated_at']) for row in select_jobs("id, updated_at", id=f"in.({ids})")}
+
+
+def status_etag(job, progress):
+    """ETag derived from updated_at - changes whenever the response would"""
+    version = f"{job['updated_at']}|{progress['id']}|{progress['updated_at']}"
+    return '"' + hashlib.sha1(version.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value covers the given ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
 
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         try:
-            # Extract job_id from path: /api/status?job_id=xxx
+            # Extract job_id from path: /api/status?job_id=xxx[&wait=seconds]
             parsed_path = urlparse(self.path)
-            query = parsed_path.query
-            params = dict(qc.split("=") for qc in query.split("&")) if query else {}
+            params = {key: values[0] for key, values in parse_qs(parsed_path.query).items()}
 
             job_id = params.get('job_id')
             if not job_id:
                 self.send_error_response(400, "Missing job_id parameter")
                 return
 
-            # Fetch job details from database
-            result = supabase.table("translation_jobs").select(
-                "id, status, current_cell, total_cells, progress_percentage, progress_message, error_message, created_at, updated_at"
-            ).eq("id", job_id).single().execute()
-
-            job = result.data
+            try:
+                wait = min(max(float(params.get('wait', 0)), 0), MAX_WAIT_SECONDS)
+            except ValueError:
+                self.send_error_response(400, "Invalid wait parameter")
+                return
 
+            # Fetch job details from database
+            job, progress = load_status(job_id)
             if not job:
                 self.send_error_response(404, "Job not found")
                 return
 
+            # Long-poll: hold the request while the client's copy is current
+            if_none_match = self.headers.get('If-None-Match')
+            deadline = time.monotonic() + wait
+            version = status_version(job, progress)
+            while (etag_matches(if_none_match, status_etag(job, progress))
+                   and job['status'] in ('pending', 'processing')
+                   and time.monotonic() + WAIT_POLL_INTERVAL <= deadline):
+                time.sleep(WAIT_POLL_INTERVAL)
+                if load_version(job, progress) == version:
+                    continue
+                job, progress = load_status(job_id)
+                if not job:
+                    self.send_error_response(404, "Job not found")
+                    return
+                version = status_version(job, progress)
+
+            etag = status_etag(job, progress)
+            if etag_matches(if_none_match, etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Expose-Headers', 'ETag')
+                self.end_headers()
+                return
+
             # Send response
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
             self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Expose-Headers', 'ETag')
             self.end_headers()
 
             response = {
                 "job_id": job['id'],
-                "status": job['status'],
-                "current": job['current_cell'],
-                "total": job['total_cells'],
-                "percentage": job['progress_percentage'],
-                "message": job['progress_message'],
+                "status": progress['status'] if progress['status'] == 'processing' else job['status'],
+                "current": progress['current_cell'],
+                "total": progress['total_cells'],
+                "percentage": progress['progress_percentage'],
+                "message": progress['progress_message'],
                 "error": job['error_message'],
                 "created_at": job['created_at'],
-                "updated_at": job['updated_at']
+                "updated_at": job['updated_at'],
+                "progress_job_id": progress['id'],
+                "timings": job.get('timings'),
+                "profile_path": job.get('profile_path'),
+                "translation_stats": job.get('translation_stats')
             }
 
             self.wfile.write(json.dumps(response).encode())
@@ -66,7 +158,7 @@ class handler(BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
         self.end_headers()
 
     def send_error_response(self, code, message):
@@ -1,17 +1,48 @@
 """
 Vercel Serverless Function - Start Translation
 Accepts file upload and initiates translation job
+
+Supported request bodies:
+- Raw file bytes (Content-Type: application/octet-stream or an Excel MIME type)
+  with filename, source_lang and target_lang in the query string
+- multipart/form-data with a `file` part and source_lang/target_lang fields
+- JSON with the job_id of a file already uploaded through a signed URL
+  from /api/upload_url (file bytes never pass through this function)
+- JSON with a base64 encoded file (legacy clients)
+
+Raw and multipart uploads are piped to Supabase Storage in chunks, so memory
+use stays bounded regardless of file size; form fields and JSON bodies are
+capped (MAX_FIELD_BYTES, MAX_JSON_BYTES in upload_stream.py). Uploaded bytes
+are hashed on the way through: a submission identical to a completed job
+reuses its output, and one identical to an in-flight job attaches to it
+(see result_cache.py).
+
+New jobs are dispatched to process_job server-side (see job_dispatch.py);
+clients only create the job and watch its progress. A `profile` field (1/true)
+in any of these bodies has the job profiled (see job_profiler.py).
+
+Raw uploads sent with ?inline=1 skip all of that when the workbook is tiny
+(see workbook_estimate.py): the file is translated within the request and
+the translated workbook is the response body, with no storage or job record.
 """
 from http.server import BaseHTTPRequestHandler
-import json
+import io
 import os
+import json
 import uuid
-import requests
 import base64
-
-# Initialize Supabase connection (strip any whitespace/newlines)
-SUPABASE_URL = os.environ.get("SUPABASE_URL", "").strip()
-SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
+import hashlib
+from urllib.parse import urlparse, parse_qs, quote
+from supabase_rest import storage_upload, storage_delete, storage_object_size, insert_job
+from upload_stream import (
+    MAX_JSON_BYTES, MAX_UPLOAD_BYTES, BodyReader, MultipartReader, UploadError, content_type_for, validate_filename
+)
+from result_cache import (
+    compute_content_hash, find_reusable_job, cached_result_fields, keep_result_alive
+)
+from job_dispatch import dispatch_job
+from workbook_estimate import INLINE_MAX_BYTES, is_inline_candidate
+from job_profiler import profiling_requested
 
 
 class handler(BaseHTTPRequestHandler):
@@ -23,105 +54,285 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response(400, "No file provided")
                 return
 
-            # Read the body
-            body = self.rfile.read(content_length)
+            body = BodyReader(self.rfile, content_length)
+            content_type = self.headers.get('Content-Type', '')
+            params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
 
-            # Parse multipart form data (simplified - in production use a library)
-            # For now, we'll expect JSON with base64 encoded file
-            try:
-                data = json.loads(body)
-                filename = data.get('filename')
-                file_content = base64.b64decode(data.get('file'))
-                source_lang = data.get('source_lang', 'fr')
-                target_lang = data.get('target_lang', 'en')
-            except:
-                self.send_error_response(400, "Invalid request format. Expected JSON with base64 file.")
-                return
+            # Generate unique job ID
+            job_id = str(uuid.uuid4())
 
-            if not filename or not file_content:
-                self.send_error_response(400, "Missing filename or file content")
-                return
+            if content_type.startswith('multipart/form-data'):
+                upload = self.upload_multipart(job_id, body, content_type, params)
+            elif content_type.startswith('application/json'):
+                data = self.read_json(body)
+                if 'file' in data:
+                    upload = self.upload_base64_json(job_id, data)
+                else:
+                    job_id, upload = self.completed_upload(data)
+            else:
+                if params.get('inline') == '1' and len(body) <= INLINE_MAX_BYTES:
+                    content = body.read()
+                    if self.translate_inline(content, params):
+                        return
+                    # Too much work for one request - queue it as usual
+                    body = BodyReader(io.BytesIO(content), len(content))
+                upload = self.upload_raw(job_id, body, params)
 
-            # Validate file extension
-            if not (filename.endswith('.xls') or filename.endswith('.xlsx')):
-                self.send_error_response(400, "Only .xls and .xlsx files are supported")
-                return
+            self.create_job(job_id, upload)
 
-            # Generate unique job ID
-            job_id = str(uuid.uuid4())
+        except UploadError as e:
+            self.send_error_response(e.code, e.message)
+
+        except Exception as e:
+            self.send_error_response(500, str(e))
+
+    def upload_raw(self, job_id, body, params):
+        """Stream a raw request body straight to storage"""
+        filename = validate_filename(params.get('filename') or self.headers.get('X-Filename'))
+        input_path = f"input/{job_id}/{filename}"
+        self.store_upload(input_path, body, content_type_for(filename), len(body))
+
+        return {
+            "filename": filename,
+            "input_path": input_path,
+            "file_size": len(body),
+            "file_digest": body.sha256.hexdigest(),
+            "source_lang": params.get('source_lang', 'fr'),
+            "target_lang": params.get('target_lang', 'en'),
+            "profile": params.get('profile')
+        }
+
+    def translate_inline(self, content, params):
+        """
+        Translate a tiny workbook within the request and send it back
+
+        Returns False (nothing sent) when the estimated workload is above
+        the inline threshold or inline translation fails.
+        """
+        filename = validate_filename(params.get('filename') or self.headers.get('X-Filename'))
+        eligible, strings = is_inline_candidate(filename, len(content), io.BytesIO(content))
+        if not eligible:
+            return False
+
+        # Only the inline path needs the translation engine
+        from excel_translator_optimized import translate_excel_bytes
+        try:
+            translated = translate_excel_bytes(
+                content, params.get('source_lang', 'fr'), params.get('target_lang', 'en'))
+        except Exception as e:
+            print(f"Inline translation failed, queueing instead: {e}")
+            return False
+
+        output_filename = f"translated_{os.path.splitext(filename)[0]}.xlsx"
+        self.send_response(200)
+        self.send_header('Content-Type', content_type_for(output_filename))
+        self.send_header('Content-Length', str(len(translated)))
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(output_filename)}")
+        self.send_header('X-Estimated-Strings', str(strings))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'Content-Disposition, X-Estimated-Strings')
+        self.end_headers()
+        self.wfile.write(translated)
+        return True
+
+    def upload_multipart(self, job_id, body, content_type, params):
+        """Stream the `file` part of a multipart body to storage"""
+        fields = dict(params)
+        upload = None
+
+        for part in MultipartReader(body, content_type).parts():
+            if part.filename is None:
+                # Small form field (source_lang, target_lang, ...)
+                fields[part.name] = part.read_value()
+                continue
+
+            if part.name != 'file' or upload is not None:
+                continue
+
+            filename = validate_filename(part.filename)
             input_path = f"input/{job_id}/{filename}"
+            self.store_upload(input_path, part, content_type_for(filename))
+            if part.size == 0:
+                storage_delete(input_path)
+                raise UploadError(400, "Missing filename or file content")
+            upload = {
+                "filename": filename,
+                "input_path": input_path,
+                "file_size": part.size,
+                "file_digest": part.sha256.hexdigest()
+            }
 
-            # Upload file to Supabase Storage using REST API
-            try:
-                storage_url = f"{SUPABASE_URL}/storage/v1/object/excel-files/{input_path}"
-                headers = {
-                    "Authorization": f"Bearer {SUPABASE_KEY}",
-                    "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                }
+        if upload is None:
+            raise UploadError(400, "No file provided")
 
-                upload_response = requests.post(storage_url, data=file_content, headers=headers)
+        upload["source_lang"] = fields.get('source_lang', 'fr')
+        upload["target_lang"] = fields.get('target_lang', 'en')
+        upload["profile"] = fields.get('profile')
+        return upload
 
-                if upload_response.status_code not in [200, 201]:
-                    raise Exception(f"Storage upload failed: {upload_response.text}")
+    def read_json(self, body):
+        """Parse a JSON request body (at most MAX_JSON_BYTES)"""
+        if len(body) > MAX_JSON_BYTES:
+            raise UploadError(413, f"JSON body too large (limit is {MAX_JSON_BYTES // (1024 * 1024)}MB)")
+        try:
+            data = json.loads(body.read())
+        except:
+            raise UploadError(400, "Invalid request format. Expected JSON.")
+        if not isinstance(data, dict):
+            raise UploadError(400, "Invalid request format. Expected JSON.")
+        return data
 
-            except Exception as e:
-                self.send_error_response(500, f"Failed to upload file: {str(e)}")
-                return
+    def completed_upload(self, data):
+        """Describe a file the client already uploaded via a signed URL"""
+        try:
+            job_id = str(uuid.UUID(str(data.get('job_id'))))
+        except ValueError:
+            raise UploadError(400, "Missing or invalid job_id")
 
-            # Create translation job record in database using REST API
-            try:
-                job_data = {
-                    "id": job_id,
-                    "original_filename": filename,
-                    "input_file_path": input_path,
-                    "source_lang": source_lang,
-                    "target_lang": target_lang,
-                    "status": "pending",
-                    "file_size": len(file_content),
-                    "progress_message": "Queued for translation..."
-                }
-
-                db_url = f"{SUPABASE_URL}/rest/v1/translation_jobs"
-                headers = {
-                    "Authorization": f"Bearer {SUPABASE_KEY}",
-                    "apikey": SUPABASE_KEY,
-                    "Content-Type": "application/json",
-                    "Prefer": "return=minimal"
-                }
-
-                db_response = requests.post(db_url, json=job_data, headers=headers)
-
-                if db_response.status_code not in [200, 201]:
-                    # Clean up uploaded file if DB insert fails
-                    requests.delete(storage_url, headers={"Authorization": f"Bearer {SUPABASE_KEY}"})
-                    raise Exception(f"Database insert failed: {db_response.text}")
+        # The object path is derived, never taken from the client, so a job can
+        # only point at the upload slot issued for its own job_id
+        filename = validate_filename(data.get('filename'))
+        input_path = f"input/{job_id}/{filename}"
+        file_size = storage_object_size(input_path)
+        if not file_size:
+            raise UploadError(400, "Uploaded file not found. Upload it to the signed URL first.")
+        if file_size > MAX_UPLOAD_BYTES:
+            # The signed URL does not bound what the client actually PUT
+            storage_delete(input_path)
+            raise UploadError(413, f"File too large (limit is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB)")
 
-            except Exception as e:
-                self.send_error_response(500, f"Failed to create job: {str(e)}")
-                return
+        return job_id, {
+            "filename": filename,
+            "input_path": input_path,
+            "file_size": file_size,
+            "source_lang": data.get('source_lang', 'fr'),
+            "target_lang": data.get('target_lang', 'en'),
+            "profile": data.get('profile'),
+            "direct_upload": True
+        }
 
-            # Send success response
-            self.send_response(202)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+    def upload_base64_json(self, job_id, data):
+        """Legacy path: JSON body with the whole file base64 encoded"""
+        try:
+            filename = data.get('filename')
+            file_content = base64.b64decode(data.get('file'))
+            source_lang = data.get('source_lang', 'fr')
+            target_lang = data.get('target_lang', 'en')
+        except:
+            raise UploadError(400, "Invalid request format. Expected JSON with base64 file.")
+
+        if not file_content:
+            raise UploadError(400, "Missing filename or file content")
+        filename = validate_filename(filename)
+
+        input_path = f"input/{job_id}/{filename}"
+        self.store_upload(input_path, file_content, content_type_for(filename))
+
+        return {
+            "filename": filename,
+            "input_path": input_path,
+            "file_size": len(file_content),
+            "file_digest": hashlib.sha256(file_content).hexdigest(),
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "profile": data.get('profile')
+        }
 
-            response = {
-                "task_id": job_id,
-                "status": "queued",
-                "message": "Translation job created successfully"
+    def store_upload(self, input_path, data, content_type, content_length=None):
+        """Upload file content to Supabase Storage"""
+        try:
+            storage_upload(input_path, data, content_type, content_length)
+        except UploadError:
+            raise
+        except Exception as e:
+            raise UploadError(500, f"Failed to upload file: {str(e)}")
+
+    def find_existing_job(self, content_hash):
+        """Look up a reusable job; a failed lookup must never block the upload"""
+        try:
+            return find_reusable_job(content_hash)
+        except Exception as e:
+            print(f"Result cache lookup failed: {e}")
+            return None
+
+    def create_job(self, job_id, upload):
+        """Create the translation job record and send the 202 response"""
+        existing = None
+        try:
+            job_data = {
+                "id": job_id,
+                "original_filename": upload["filename"],
+                "input_file_path": upload["input_path"],
+                "source_lang": upload["source_lang"],
+                "target_lang": upload["target_lang"],
+                "status": "pending",
+                "file_size": upload["file_size"],
+                "progress_message": "Queued for translation..."
             }
-            self.wfile.write(json.dumps(response).encode())
+
+            # A profiled job is translated even if an identical result exists
+            if profiling_requested(upload.get("profile")):
+                job_data["profile"] = True
+
+            # Direct uploads are hashed by process_job, which downloads them anyway
+            if upload.get("file_digest"):
+                job_data["content_hash"] = compute_content_hash(
+                    upload["file_digest"], upload["source_lang"], upload["target_lang"])
+                if not job_data.get("profile"):
+                    existing = self.find_existing_job(job_data["content_hash"])
+
+            if existing and existing["status"] == "complete":
+                job_data.update(cached_result_fields(existing))
+            elif existing:
+                job_data["coalesced_with"] = existing["id"]
+                job_data["progress_message"] = "Waiting for an identical translation in progress..."
+
+            insert_job(job_data)
 
         except Exception as e:
-            self.send_error_response(500, str(e))
+            # Clean up uploaded file if DB insert fails (direct uploads are left
+            # alone: the insert may have failed because the job already exists)
+            if not upload.get("direct_upload"):
+                storage_delete(upload["input_path"])
+            self.send_error_response(500, f"Failed to create job: {str(e)}")
+            return
+
+        response = {
+            "task_id": job_id,
+            "status": "queued",
+            "message": "Translation job created successfully"
+        }
+
+        if existing and existing["status"] == "complete":
+            # The identical upload is not needed; the job points at the old output
+            try:
+                keep_result_alive(existing)
+                storage_delete(upload["input_path"])
+            except Exception as e:
+                print(f"Failed to tidy up cached result: {e}")
+            response["status"] = "complete"
+            response["message"] = "Identical translation already available"
+        elif existing:
+            # Live progress is broadcast under the leader's id
+            response["progress_job_id"] = existing["id"]
+            response["message"] = "Attached to an identical translation in progress"
+        else:
+            # Start processing server-side; a failed dispatch leaves the job pending
+            dispatch_job(job_id)
+
+        # Send success response
+        self.send_response(202)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
 
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Filename')
         self.end_headers()
 
     def send_error_response(self, code, message):
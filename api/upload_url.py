@@ -0,0 +1,80 @@
+"""
+Vercel Serverless Function - Signed Upload URL
+Issues a signed Supabase Storage URL so the browser can upload the file
+directly to storage. Once the upload completes, the client calls
+/api/translate with the returned job_id to create the translation job.
+
+The client declares the file's `size`; files over MAX_UPLOAD_BYTES get no
+URL. /api/translate checks the stored object's real size again.
+"""
+from http.server import BaseHTTPRequestHandler
+import json
+import uuid
+from supabase_rest import create_signed_upload_url
+from upload_stream import MAX_UPLOAD_BYTES, UploadError, content_type_for, validate_filename
+
+
+def check_declared_size(size):
+    """Reject a declared file size that is invalid or over MAX_UPLOAD_BYTES"""
+    if size is None:
+        return
+    if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+        raise UploadError(400, "Invalid size")
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadError(413, f"File too large (limit is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB)")
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            # Read request body
+            content_length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(content_length)
+            try:
+                data = json.loads(body)
+            except:
+                self.send_error_response(400, "Invalid request format. Expected JSON.")
+                return
+
+            filename = validate_filename(data.get('filename'))
+            check_declared_size(data.get('size'))
+
+            # Reserve a job ID; the job record is created from the completed upload
+            job_id = str(uuid.uuid4())
+            input_path = f"input/{job_id}/{filename}"
+            upload_url = create_signed_upload_url(input_path)
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+
+            response = {
+                "job_id": job_id,
+                "filename": filename,
+                "upload_url": upload_url,
+                "content_type": content_type_for(filename)
+            }
+            self.wfile.write(json.dumps(response).encode())
+
+        except UploadError as e:
+            self.send_error_response(e.code, e.message)
+
+        except Exception as e:
+            self.send_error_response(500, str(e))
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight requests"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def send_error_response(self, code, message):
+        """Helper to send error responses"""
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": message}).encode())
@@ -4,12 +4,22 @@ Flask API for Excel Translator
 from flask import Flask, request, send_file, jsonify, render_template, Response, stream_with_context
 from flask_cors import CORS
 from excel_translator import convert_xls_to_xlsx, translate_excel_with_format
+from job_store import create_job_store
+from job_reaper import JobReaper, job_temp_prefix
+from cancellation import CancellationToken, TranslationCancelled
+from job_scheduler import JobScheduler
+from workbook_estimate import estimate_job_cost, estimate_workload
+from stage_timing import StageTimer, log_timings
+from translation_stats import TranslationStats, summarize_stats, record_job_stats, recent_job_stats, aggregate_stats
+from job_profiler import JobProfiler, profiling_requested, save_local_profile
+import metrics
+import io
 import os
 import tempfile
 import shutil
 import json
+import time
 import uuid
-from threading import Thread
 from queue import Queue
 
 app = Flask(__name__)
@@ -20,9 +30,26 @@ CORS(app)
 # Configure upload settings
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Store progress for active translations
-translation_progress = {}  # {task_id: {"current": 0, "total": 0, "message": "", "status": "processing"}}
-translation_results = {}  # {task_id: output_path}
+# Progress and results of translations, kept in the store selected by
+# JOB_STORE_URL (see job_store.py) so any worker can serve any job
+job_store = create_job_store()
+
+# Evicts undownloaded results, abandoned jobs and leftover temp dirs, never
+# those of jobs running here (TTLs and the retained-bytes cap are configured
+# in job_reaper.py)
+job_reaper = JobReaper(job_store, active_jobs=lambda: list(cancel_tokens)).start()
+
+# Translations run on a bounded worker pool, smallest expected job first
+# (JOB_WORKERS, JOB_SCHEDULER_POLICY; see job_scheduler.py)
+job_scheduler = JobScheduler()
+metrics.track_scheduler(job_scheduler)
+
+# Cancellation tokens of the jobs running in this process; jobs running in
+# other workers notice a cancel through the store (job_store.request_cancel)
+cancel_tokens = {}  # {task_id: CancellationToken}
+
+# Minimum seconds between progress writes to the store (status changes are always written)
+PROGRESS_WRITE_INTERVAL = float(os.environ.get("PROGRESS_WRITE_INTERVAL", 0.25))
 
 
 @app.route('/')
@@ -37,6 +64,45 @@ def health_check():
     return jsonify({"status": "healthy", "service": "Excel Translator"}), 200
 
 
+@app.route('/jobs/metrics', methods=['GET'])
+def job_metrics():
+    """Retained jobs and disk usage, as of the reaper's last sweep"""
+    return jsonify(job_reaper.metrics()), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics of this process (see metrics.py)"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/stats', methods=['GET'])
+def provider_stats():
+    """Provider usage of the last STATS_WINDOW jobs of this process (see translation_stats.py)"""
+    return jsonify(aggregate_stats(recent_job_stats())), 200
+
+
+@app.route('/estimate', methods=['POST'])
+def estimate():
+    """
+    Estimate a translation before starting it (nothing is translated or stored)
+    Expected parameters:
+    - file: Excel file (.xls or .xlsx)
+    """
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({"error": "No file provided"}), 400
+
+    file = request.files['file']
+    content = file.read()
+    workload = estimate_workload(file.filename, io.BytesIO(content))
+    if workload is None:
+        return jsonify({"error": "Could not read the workbook"}), 422
+
+    workload["filename"] = file.filename
+    workload["file_size"] = len(content)
+    return jsonify(workload), 200
+
+
 @app.route('/translate', methods=['POST'])
 def translate():
     """
@@ -45,6 +111,7 @@ def translate():
     - file: Excel file (.xls or .xlsx)
     - source_lang: source language code (default: 'fr')
     - target_lang: target language code (default: 'en')
+    - profile: 1 to profile the translation (see job_profiler.py)
     """
     try:
         # Check if file is present
@@ -59,80 +126,154 @@ def translate():
         # Get language parameters
         source_lang = request.form.get('source_lang', 'fr')
         target_lang = request.form.get('target_lang', 'en')
+        profile = profiling_requested(request.values.get('profile'))
 
         # Generate unique task ID
         task_id = str(uuid.uuid4())
 
         # Initialize progress tracking
-        translation_progress[task_id] = {
+        job_store.set_progress(task_id, {
             "current": 0,
             "total": 0,
-            "message": "Starting translation...",
+            "message": "Queued for translation...",
             "status": "processing"
-        }
+        })
 
         # Create temporary directory for processing
-        temp_dir = tempfile.mkdtemp()
+        temp_dir = tempfile.mkdtemp(prefix=job_temp_prefix(task_id))
         input_path = os.path.join(temp_dir, file.filename)
         file.save(input_path)
 
-        # Start translation in background thread
+        cancel_token = CancellationToken(poll=lambda: job_store.cancel_requested(task_id))
+        cancel_tokens[task_id] = cancel_token
+
+        def finish_cancelled():
+            job_store.set_progress(task_id, {
+                "current": 0,
+                "total": 0,
+                "message": "Translation cancelled",
+                "status": "cancelled"
+            })
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            cancel_tokens.pop(task_id, None)
+
+        def store_profile(profiler):
+            """Keep a profiled job's artifact in JOB_PROFILE_DIR; returns the progress fields to set"""
+            artifact = profiler.artifact()
+            if not artifact:
+                return {}
+            try:
+                return {"profile_path": save_local_profile(task_id, artifact)}
+            except OSError as e:
+                print(f"Failed to store profile of job {task_id}: {e}")
+                return {}
+
+        # Translation job, run by the scheduler
         def translate_task():
+            timer = StageTimer()
+            stats = TranslationStats()
+            profiler = JobProfiler(enabled=profile)
             try:
+                cancel_token.raise_if_cancelled()
+                job_store.set_progress(task_id, {
+                    "current": 0,
+                    "total": 0,
+                    "message": "Starting translation...",
+                    "status": "processing"
+                })
+
                 # Convert .xls to .xlsx if needed
                 converted_path = input_path
                 if input_path.endswith('.xls'):
-                    converted_path = convert_xls_to_xlsx(input_path)
+                    with timer.stage("convert_xls"):
+                        converted_path = convert_xls_to_xlsx(input_path)
 
                 if not converted_path.endswith('.xlsx'):
-                    translation_progress[task_id] = {
+                    job_store.set_progress(task_id, {
                         "current": 0,
                         "total": 0,
                         "message": "Unsupported file format",
                         "status": "error"
-                    }
+                    })
                     return
 
                 # Translate the file with progress callback
                 output_path = os.path.join(temp_dir, f"translated_{os.path.basename(converted_path)}")
 
+                last_write = [0.0]
+
                 def progress_callback(current, total, message):
-                    translation_progress[task_id] = {
+                    # Progress arrives per cell; a shared store only needs a few writes per second
+                    now = time.monotonic()
+                    if now - last_write[0] < PROGRESS_WRITE_INTERVAL and current < total:
+                        return
+                    last_write[0] = now
+                    job_store.set_progress(task_id, {
                         "current": current,
                         "total": total,
                         "message": message,
                         "status": "processing"
-                    }
+                    })
 
-                translate_excel_with_format(converted_path, output_path, source_lang, target_lang, progress_callback)
+                with profiler:
+                    translate_excel_with_format(
+                        converted_path, output_path, source_lang, target_lang, progress_callback,
+                        cancel_token=cancel_token,
+                        timings=timer,
+                        stats=stats
+                    )
 
                 # Store result
-                translation_results[task_id] = {
-                    "output_path": output_path,
-                    "temp_dir": temp_dir,
-                    "filename": file.filename
-                }
+                with timer.stage("store_result"):
+                    job_store.put_result(task_id, file.filename, output_path)
 
-                translation_progress[task_id] = {
+                timings = timer.as_dict()
+                translation_stats = stats.as_dict()
+                job_store.set_progress(task_id, {
                     "current": 100,
                     "total": 100,
-                    "message": "Translation complete!",
-                    "status": "complete"
-                }
+                    "message": f"Translation complete! ({summarize_stats(translation_stats)})",
+                    "status": "complete",
+                    "timings": timings,
+                    "translation_stats": translation_stats,
+                    **store_profile(profiler)
+                })
+                log_timings(task_id, "complete", timings)
+                record_job_stats("complete", translation_stats)
+
+            except TranslationCancelled:
+                finish_cancelled()
+                log_timings(task_id, "cancelled", timer.as_dict())
+                record_job_stats("cancelled", stats.as_dict())
 
             except Exception as e:
-                translation_progress[task_id] = {
+                timings = timer.as_dict()
+                translation_stats = stats.as_dict()
+                job_store.set_progress(task_id, {
                     "current": 0,
                     "total": 0,
                     "message": f"Error: {str(e)}",
-                    "status": "error"
-                }
-                # Clean up on error
+                    "status": "error",
+                    "timings": timings,
+                    "translation_stats": translation_stats,
+                    **store_profile(profiler)
+                })
+                log_timings(task_id, "error", timings)
+                record_job_stats("error", translation_stats)
+
+            finally:
+                # The store keeps its own copy of the result
                 shutil.rmtree(temp_dir, ignore_errors=True)
-
-        thread = Thread(target=translate_task)
-        thread.daemon = True
-        thread.start()
+                cancel_tokens.pop(task_id, None)
+
+        # Smaller workbooks go first; see job_scheduler.py
+        job_scheduler.submit(
+            translate_task,
+            cost=estimate_job_cost(file.filename, os.path.getsize(input_path), input_path),
+            client=request.headers.get('X-Client-Id') or request.remote_addr,
+            job_id=task_id,
+            on_cancel=finish_cancelled
+        )
 
         return jsonify({"task_id": task_id}), 202
 
@@ -144,60 +285,82 @@ def translate():
 def get_progress_stream(task_id):
     """Stream progress updates using Server-Sent Events"""
     def generate():
+        metrics.SSE_STREAMS.inc()
         try:
             while True:
-                if task_id not in translation_progress:
+                progress_data = job_store.get_progress(task_id)
+                if progress_data is None:
                     yield f"data: {json.dumps({'error': 'Task not found'})}\n\n"
                     break
 
-                progress_data = translation_progress[task_id]
                 yield f"data: {json.dumps(progress_data)}\n\n"
 
-                # Stop streaming if complete or error
-                if progress_data["status"] in ["complete", "error"]:
+                # Stop streaming once the job finished
+                if progress_data["status"] in ["complete", "error", "cancelled"]:
                     break
 
                 # Small delay to avoid overwhelming the client
-                import time
                 time.sleep(0.5)
 
         except GeneratorExit:
             pass
+        finally:
+            metrics.SSE_STREAMS.dec()
 
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
 
+@app.route('/cancel/<task_id>', methods=['POST'])
+def cancel_translation(task_id):
+    """Cancel a running translation; it stops before its next cell"""
+    progress = job_store.get_progress(task_id)
+    if progress is None:
+        return jsonify({"error": "Translation not found"}), 404
+
+    if progress["status"] != "processing":
+        return jsonify({"error": f"Translation already finished. Current status: {progress['status']}"}), 409
+
+    job_store.request_cancel(task_id)
+    cancel_token = cancel_tokens.get(task_id)
+    if cancel_token is not None:
+        cancel_token.cancel()
+
+    # A job still waiting for a worker is dropped right away
+    if job_scheduler.cancel(task_id):
+        return jsonify({"task_id": task_id, "status": "cancelled"}), 202
+
+    return jsonify({"task_id": task_id, "status": "cancelling"}), 202
+
+
 @app.route('/download/<task_id>', methods=['GET'])
 def download_result(task_id):
     """Download the translated file"""
     try:
-        if task_id not in translation_results:
+        result = job_store.open_result(task_id)
+        if result is None:
             return jsonify({"error": "Translation not found or not complete"}), 404
 
-        result = translation_results[task_id]
-        output_path = result["output_path"]
-        temp_dir = result["temp_dir"]
-        filename = result["filename"]
+        filename, result_file = result
 
         # Remove any existing extension and ensure .xlsx
         base_name = os.path.splitext(filename)[0]
 
         response = send_file(
-            output_path,
+            result_file,
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             as_attachment=True,
             download_name=f"translated_{base_name}.xlsx"
         )
+        # Werkzeug skips call_on_close hooks for passthrough responses
+        response.direct_passthrough = False
 
         # Clean up after sending
         @response.call_on_close
         def cleanup():
             try:
-                shutil.rmtree(temp_dir, ignore_errors=True)
+                result_file.close()
                 # Clean up tracking data
-                if task_id in translation_progress:
-                    del translation_progress[task_id]
-                if task_id in translation_results:
-                    del translation_results[task_id]
+                job_store.delete(task_id)
             except:
                 pass
 
@@ -3,15 +3,27 @@ Flask API for Excel Translator with Supabase Backend
 This version uses Supabase for storage and database while keeping Flask for the API
 Perfect for local testing before deploying to Vercel
 """
-from flask import Flask, request, send_file, jsonify, render_template, Response, stream_with_context
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, redirect, send_file
 from flask_cors import CORS
-from excel_translator_optimized import convert_xls_to_xlsx, translate_excel_with_format
-from supabase import create_client, Client
+from excel_translator_optimized import convert_xls_to_xlsx, translate_excel_with_format, translate_excel_bytes
+from supabase_rest import get_supabase_client, broadcast_job_progress, create_signed_download_url
+from result_cache import compute_content_hash, find_reusable_job, cached_result_fields, keep_result_alive, release_followers
+from workbook_estimate import estimate_job_cost, estimate_workload, is_inline_candidate
+from upload_stream import content_type_for
+from job_cancel import cancel_job, fail_followers, job_cancelled
+from cancellation import CancellationToken, TranslationCancelled
+from job_scheduler import JobScheduler
+from stage_timing import StageTimer, log_timings
+from translation_stats import TranslationStats, reused_stats, summarize_stats, stored_job_stats, aggregate_stats
+from job_profiler import JobProfiler, profiling_requested, profile_storage_path
+import metrics
 from dotenv import load_dotenv
+import io
 import os
 import tempfile
 import json
 import uuid
+import hashlib
 from threading import Thread
 import time
 
@@ -35,9 +47,35 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     print("Please ensure SUPABASE_URL and SUPABASE_SERVICE_KEY are set.")
     exit(1)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = get_supabase_client()
 print(f"Connected to Supabase: {SUPABASE_URL}")
 
+# Latest progress of jobs running in this process
+# Progress ticks are ephemeral: they are broadcast over Realtime and kept here
+# for the SSE stream, while translation_jobs only records state transitions
+live_progress = {}  # {job_id: {"current": 0, "total": 0, "message": "", "status": "processing"}}
+coalesced_jobs = {}  # {job_id: leader_job_id} for jobs attached to an identical job in flight
+cancel_tokens = {}  # {job_id: CancellationToken} of the jobs translating in this process
+
+# Translations run on a bounded worker pool, smallest expected job first
+# (JOB_WORKERS, JOB_SCHEDULER_POLICY; see job_scheduler.py)
+job_scheduler = JobScheduler()
+metrics.track_scheduler(job_scheduler)
+
+
+def publish_progress(job_id, current, total, message):
+    """Record progress in-process and broadcast it over Supabase Realtime"""
+    live_progress[job_id] = {
+        "current": current,
+        "total": total,
+        "message": message,
+        "status": "processing"
+    }
+    try:
+        broadcast_job_progress(job_id, current, total, message)
+    except Exception as e:
+        print(f"Failed to broadcast progress: {e}")
+
 
 @app.route('/')
 def index():
@@ -64,6 +102,54 @@ def health_check():
         }), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics of this process (see metrics.py)"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/stats', methods=['GET'])
+def provider_stats():
+    """Provider usage of the last STATS_WINDOW finished jobs (see translation_stats.py)"""
+    try:
+        return jsonify(aggregate_stats(stored_job_stats())), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/estimate', methods=['POST'])
+def estimate():
+    """
+    Estimate a translation before starting it (nothing is translated or stored)
+    Expected parameters:
+    - file: Excel file (.xls or .xlsx)
+    - source_lang / target_lang: used to look for a reusable identical translation
+    """
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({"error": "No file provided"}), 400
+
+    file = request.files['file']
+    content = file.read()
+    content_hash = compute_content_hash(
+        hashlib.sha256(content).hexdigest(),
+        request.form.get('source_lang', 'fr'), request.form.get('target_lang', 'en'))
+    try:
+        existing = find_reusable_job(content_hash)
+    except Exception as e:
+        print(f"Result cache lookup failed: {e}")
+        existing = None
+    cached = bool(existing) and existing["status"] == "complete"
+
+    workload = estimate_workload(file.filename, io.BytesIO(content), cached=cached)
+    if workload is None:
+        return jsonify({"error": "Could not read the workbook"}), 422
+
+    workload["filename"] = file.filename
+    workload["file_size"] = len(content)
+    workload["cached_result"] = cached
+    return jsonify(workload), 200
+
+
 @app.route('/translate', methods=['POST'])
 def translate():
     """
@@ -72,6 +158,7 @@ def translate():
     - file: Excel file (.xls or .xlsx)
     - source_lang: source language code (default: 'fr')
     - target_lang: target language code (default: 'en')
+    - profile: 1 to profile the translation (see job_profiler.py)
     """
     try:
         # Check if file is present
@@ -86,6 +173,7 @@ def translate():
         # Get language parameters
         source_lang = request.form.get('source_lang', 'fr')
         target_lang = request.form.get('target_lang', 'en')
+        profile = profiling_requested(request.values.get('profile'))
 
         # Generate unique job ID
         job_id = str(uuid.uuid4())
@@ -94,100 +182,199 @@ def translate():
         file_content = file.read()
         file_size = len(file_content)
 
-        # Upload file to Supabase Storage
-        input_path = f"input/{job_id}/{file.filename}"
+        # Tiny workbook: translate it now and send it back, skipping storage and the job table
+        if request.values.get('inline') == '1':
+            eligible, _ = is_inline_candidate(file.filename, file_size, io.BytesIO(file_content))
+            if eligible:
+                try:
+                    translated = translate_excel_bytes(file_content, source_lang, target_lang)
+                    return send_file(
+                        io.BytesIO(translated),
+                        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        as_attachment=True,
+                        download_name=f"translated_{os.path.splitext(file.filename)[0]}.xlsx"
+                    )
+                except Exception as e:
+                    print(f"Inline translation failed, queueing instead: {e}")
+
+        # Identical file + language pair: reuse the result or attach to the job in flight
+        # (a profiled job is translated regardless)
+        content_hash = compute_content_hash(hashlib.sha256(file_content).hexdigest(), source_lang, target_lang)
         try:
-            supabase.storage.from_("excel-files").upload(
-                input_path,
-                file_content,
-                file_options={
-                    "content-type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                }
-            )
+            existing = None if profile else find_reusable_job(content_hash)
         except Exception as e:
-            return jsonify({"error": f"Failed to upload file: {str(e)}"}), 500
+            print(f"Result cache lookup failed: {e}")
+            existing = None
+
+        if not existing:
+            metrics.CACHE_MISSES.inc()
+        elif existing['status'] == 'complete':
+            metrics.CACHE_HITS.inc()
+        else:
+            metrics.CACHE_COALESCED.inc()
+
+        if existing:
+            job_data = {
+                "id": job_id,
+                "original_filename": file.filename,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "status": "pending",
+                "file_size": file_size,
+                "content_hash": content_hash
+            }
+            if existing['status'] == 'complete':
+                job_data.update(cached_result_fields(existing))
+            else:
+                job_data["coalesced_with"] = existing['id']
+                job_data["progress_message"] = "Waiting for an identical translation in progress..."
+                coalesced_jobs[job_id] = existing['id']
+
+            try:
+                supabase.table("translation_jobs").insert(job_data).execute()
+                if existing['status'] == 'complete':
+                    keep_result_alive(existing)
+            except Exception as e:
+                coalesced_jobs.pop(job_id, None)
+                return jsonify({"error": f"Failed to create job: {str(e)}"}), 500
+
+            return jsonify({"task_id": job_id}), 202
 
-        # Create job record in Supabase database
+        # The input is stored for durability/audit only: the worker below
+        # translates the bytes already in memory
+        input_path = f"input/{job_id}/{file.filename}"
+
+        # Create job record in Supabase database. input_file_path is only set
+        # once the upload below has finished, so a dispatch to process_job (or
+        # the INSERT webhook) never tries to download an object not there yet
         job_data = {
             "id": job_id,
             "original_filename": file.filename,
-            "input_file_path": input_path,
             "source_lang": source_lang,
             "target_lang": target_lang,
             "status": "pending",
             "file_size": file_size,
+            "content_hash": content_hash,
             "progress_message": "Starting translation..."
         }
+        if profile:
+            job_data["profile"] = True
 
         try:
             supabase.table("translation_jobs").insert(job_data).execute()
         except Exception as e:
-            # Clean up uploaded file if DB insert fails
-            supabase.storage.from_("excel-files").remove([input_path])
             return jsonify({"error": f"Failed to create job: {str(e)}"}), 500
 
-        # Start translation in background thread
+        # Store the input in the background; nothing waits for it
+        def upload_input():
+            try:
+                supabase.storage.from_("excel-files").upload(
+                    input_path,
+                    file_content,
+                    file_options={"content-type": content_type_for(file.filename)}
+                )
+                supabase.table("translation_jobs").update({"input_file_path": input_path}).eq("id", job_id).execute()
+            except Exception as e:
+                print(f"Failed to store input file for job {job_id}: {e}")
+
+        upload_thread = Thread(target=upload_input, daemon=True)
+        upload_thread.start()
+
+        # Cancels from other processes arrive through the job row
+        cancel_token = CancellationToken(poll=lambda: job_cancelled(job_id))
+        cancel_tokens[job_id] = cancel_token
+
+        def discard_files(*paths):
+            """Remove the storage objects of a cancelled job"""
+            upload_thread.join(timeout=30)
+            try:
+                supabase.storage.from_("excel-files").remove([path for path in paths if path])
+            except Exception as e:
+                print(f"Failed to delete files of cancelled job {job_id}: {e}")
+            cancel_tokens.pop(job_id, None)
+
+        def store_profile(profiler):
+            """Upload a profiled job's artifact next to its output; returns the job fields to set"""
+            artifact = profiler.artifact()
+            if not artifact:
+                return {}
+            profile_path = profile_storage_path(job_id)
+            try:
+                supabase.storage.from_("excel-files").upload(
+                    profile_path, artifact, file_options={"content-type": "application/zip"})
+            except Exception as e:
+                print(f"Failed to store profile of job {job_id}: {e}")
+                return {}
+            return {"profile_path": profile_path}
+
+        # Translation job, run by the scheduler
         def translate_task():
+            temp_paths = []
+            output_path = None
+            timer = StageTimer()
+            stats = TranslationStats()
+            profiler = JobProfiler(enabled=profile)
+            profile_fields = {}
             try:
-                # Update status to processing
-                supabase.table("translation_jobs").update({
+                # Update status to processing (unless it was cancelled while pending)
+                claimed = supabase.table("translation_jobs").update({
                     "status": "processing",
-                    "progress_message": "Downloading file..."
-                }).eq("id", job_id).execute()
+                    "progress_message": "Starting translation..."
+                }).eq("id", job_id).eq("status", "pending").execute()
+                if not claimed.data:
+                    raise TranslationCancelled("Translation cancelled")
 
-                # Download file from Supabase Storage
-                file_data = supabase.storage.from_("excel-files").download(input_path)
-
-                # Save to temporary file
+                # Translate the uploaded bytes directly - no storage round trip
                 with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_input:
-                    temp_input.write(file_data)
+                    temp_input.write(file_content)
                     temp_input_path = temp_input.name
+                temp_paths.append(temp_input_path)
 
                 # Convert .xls to .xlsx if needed
                 converted_path = temp_input_path
                 if temp_input_path.endswith('.xls'):
-                    supabase.table("translation_jobs").update({
-                        "progress_message": "Converting .xls to .xlsx..."
-                    }).eq("id", job_id).execute()
-                    converted_path = convert_xls_to_xlsx(temp_input_path)
+                    publish_progress(job_id, 0, 0, "Converting .xls to .xlsx...")
+                    with timer.stage("convert_xls"):
+                        converted_path = convert_xls_to_xlsx(temp_input_path)
+                    temp_paths.append(converted_path)
 
                 if not converted_path.endswith('.xlsx'):
                     supabase.table("translation_jobs").update({
                         "status": "error",
                         "error_message": "Unsupported file format"
                     }).eq("id", job_id).execute()
-                    os.unlink(temp_input_path)
                     return
 
                 # Prepare output file path
                 output_filename = f"translated_{os.path.splitext(file.filename)[0]}.xlsx"
                 temp_output_path = tempfile.mktemp(suffix='.xlsx')
+                temp_paths.append(temp_output_path)
 
                 # Define progress callback
                 def progress_callback(current, total, message):
-                    supabase.table("translation_jobs").update({
-                        "current_cell": current,
-                        "total_cells": total,
-                        "progress_message": message,
-                        "status": "processing"
-                    }).eq("id", job_id).execute()
+                    publish_progress(job_id, current, total, message)
 
                 # Perform translation WITH OPTIMIZATIONS
-                # batch_size=10 means update database every 10 cells (not every cell!)
+                # batch_size=10 means broadcast progress every 10 cells (not every cell!)
                 # parallel=True enables parallel translation (not yet implemented fully)
-                translate_excel_with_format(
-                    converted_path,
-                    temp_output_path,
-                    source_lang,
-                    target_lang,
-                    progress_callback,
-                    batch_size=10,
-                    parallel=False  # Keep False for now (single-threaded is safer)
-                )
+                with profiler:
+                    translate_excel_with_format(
+                        converted_path,
+                        temp_output_path,
+                        source_lang,
+                        target_lang,
+                        progress_callback,
+                        batch_size=10,
+                        parallel=False,  # Keep False for now (single-threaded is safer)
+                        cancel_token=cancel_token,
+                        timings=timer,
+                        stats=stats
+                    )
+                profile_fields = store_profile(profiler)
 
                 # Upload translated file to Supabase Storage
                 output_path = f"output/{job_id}/{output_filename}"
-                with open(temp_output_path, 'rb') as f:
+                with timer.stage("upload"), open(temp_output_path, 'rb') as f:
                     supabase.storage.from_("excel-files").upload(
                         output_path,
                         f.read(),
@@ -196,39 +383,70 @@ def translate():
                         }
                     )
 
-                # Update job as complete
-                supabase.table("translation_jobs").update({
+                # Update job as complete, along with any identical jobs waiting on it
+                translation_stats = stats.as_dict()
+                complete_fields = {
                     "status": "complete",
                     "output_file_path": output_path,
-                    "progress_message": "Translation complete!",
+                    "progress_message": f"Translation complete! ({summarize_stats(translation_stats)})",
                     "current_cell": 100,
                     "total_cells": 100
-                }).eq("id", job_id).execute()
-
-                # Clean up temporary files
-                try:
-                    os.unlink(temp_input_path)
-                    if converted_path != temp_input_path:
-                        os.unlink(converted_path)
-                    os.unlink(temp_output_path)
-                except:
-                    pass
+                }
+                timings = timer.as_dict()
+                completed = supabase.table("translation_jobs").update(
+                    dict(complete_fields, timings=timings, translation_stats=translation_stats, **profile_fields)
+                ).eq("id", job_id).eq("status", "processing").execute()
+                if not completed.data:
+                    # Cancelled while the output was being uploaded
+                    raise TranslationCancelled("Translation cancelled")
+                release_followers(job_id, dict(complete_fields, translation_stats=reused_stats(translation_stats, "coalesced")))
+                log_timings(job_id, "complete", timings)
+
+            except TranslationCancelled:
+                # The job row already says cancelled; drop what it left in storage
+                discard_files(input_path, output_path, profile_fields.get("profile_path"))
+                print(f"Translation cancelled: {job_id}")
+                log_timings(job_id, "cancelled", timer.as_dict())
 
             except Exception as e:
-                # Update job as error
+                # Update job as error, along with any identical jobs waiting on it
+                # (unless it was cancelled meanwhile)
+                timings = timer.as_dict()
                 try:
-                    supabase.table("translation_jobs").update({
+                    error_fields = {
                         "status": "error",
                         "error_message": str(e),
                         "progress_message": f"Error: {str(e)}"
-                    }).eq("id", job_id).execute()
+                    }
+                    supabase.table("translation_jobs").update(
+                        dict(error_fields, timings=timings, translation_stats=stats.as_dict(),
+                             **(profile_fields or store_profile(profiler)))
+                    ).eq("id", job_id).in_("status", ["pending", "processing"]).execute()
+                    release_followers(job_id, error_fields)
                 except:
                     pass
                 print(f"Translation error: {e}")
+                log_timings(job_id, "error", timings)
 
-        thread = Thread(target=translate_task)
-        thread.daemon = True
-        thread.start()
+            finally:
+                live_progress.pop(job_id, None)
+                cancel_tokens.pop(job_id, None)
+
+                # Clean up temporary files
+                for path in temp_paths:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+
+        # Smaller workbooks go first; the job stays pending until a worker is free
+        job_scheduler.submit(
+            translate_task,
+            cost=estimate_job_cost(file.filename, file_size, io.BytesIO(file_content)),
+            client=request.headers.get('X-Client-Id') or request.remote_addr,
+            job_id=job_id,
+            on_cancel=lambda: discard_files(input_path)
+        )
 
         return jsonify({"task_id": job_id}), 202
 
@@ -240,13 +458,23 @@ def translate():
 def get_progress_stream(task_id):
     """Stream progress updates using Server-Sent Events from Supabase"""
     def generate():
+        metrics.SSE_STREAMS.inc()
         try:
             max_iterations = 240  # 2 minutes max (240 * 0.5s)
             iterations = 0
 
             while iterations < max_iterations:
+                # Jobs running in this process report progress in memory
+                # (attached jobs report the progress of the job they wait on)
+                progress_data = live_progress.get(coalesced_jobs.get(task_id, task_id))
+                if progress_data:
+                    yield f"data: {json.dumps(progress_data)}\n\n"
+                    time.sleep(0.5)
+                    iterations += 1
+                    continue
+
                 try:
-                    # Fetch job status from Supabase
+                    # Fetch job state transitions from Supabase
                     result = supabase.table("translation_jobs").select(
                         "status, current_cell, total_cells, progress_message, error_message"
                     ).eq("id", task_id).single().execute()
@@ -268,8 +496,9 @@ def get_progress_stream(task_id):
 
                     yield f"data: {json.dumps(progress_data)}\n\n"
 
-                    # Stop streaming if complete or error
-                    if job['status'] in ['complete', 'error']:
+                    # Stop streaming once the job finished
+                    if job['status'] in ['complete', 'error', 'cancelled']:
+                        coalesced_jobs.pop(task_id, None)
                         break
 
                 except Exception as e:
@@ -282,13 +511,42 @@ def get_progress_stream(task_id):
 
         except GeneratorExit:
             pass
+        finally:
+            metrics.SSE_STREAMS.dec()
 
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
 
+@app.route('/cancel/<task_id>', methods=['POST'])
+def cancel_translation(task_id):
+    """Cancel a pending or running translation"""
+    try:
+        job, cancelled = cancel_job(task_id)
+        if not job:
+            return jsonify({"error": "Translation not found"}), 404
+        if not cancelled:
+            return jsonify({"error": f"Translation already finished. Current status: {job['status']}"}), 409
+
+        # Identical submissions waiting on this job fail with it
+        fail_followers(task_id)
+
+        cancel_token = cancel_tokens.get(task_id)
+        if cancel_token is not None:
+            cancel_token.cancel()
+        live_progress.pop(task_id, None)
+
+        # A job still waiting for a worker is dropped right away
+        job_scheduler.cancel(task_id)
+
+        return jsonify({"task_id": task_id, "status": "cancelled"}), 202
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/download/<task_id>', methods=['GET'])
 def download_result(task_id):
-    """Download the translated file from Supabase Storage"""
+    """Redirect to a short-lived signed Supabase Storage URL for the translated file"""
     try:
         # Fetch job details from database
         result = supabase.table("translation_jobs").select("*").eq("id", task_id).single().execute()
@@ -305,36 +563,15 @@ def download_result(task_id):
         if not output_path:
             return jsonify({"error": "Output file not found"}), 404
 
-        # Download file from Supabase Storage
+        # The client fetches the bytes straight from storage
+        output_filename = f"translated_{os.path.splitext(job['original_filename'])[0]}.xlsx"
         try:
-            file_data = supabase.storage.from_("excel-files").download(output_path)
+            signed_url = create_signed_download_url(output_path, download_name=output_filename)
         except Exception as e:
             return jsonify({"error": f"Failed to download file: {str(e)}"}), 500
 
-        # Save to temporary file and send
-        output_filename = f"translated_{job['original_filename'].replace('.xls', '.xlsx')}"
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            temp_file.write(file_data)
-            temp_file_path = temp_file.name
-
-        response = send_file(
-            temp_file_path,
-            as_attachment=True,
-            download_name=output_filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-
-        # Clean up after sending
-        @response.call_on_close
-        def cleanup():
-            try:
-                os.unlink(temp_file_path)
-                # Optional: Clean up Supabase files (commented out to keep for 24 hours)
-                # supabase.storage.from_("excel-files").remove([job['input_file_path'], output_path])
-            except:
-                pass
-
+        response = redirect(signed_url, code=302)
+        response.headers['Cache-Control'] = 'no-store'
         return response
 
     except Exception as e:
@@ -0,0 +1,60 @@
+"""
+Cooperative Job Cancellation
+A CancellationToken is handed to translate_excel_with_format, which checks it
+between cells and stops with TranslationCancelled once it is set.
+
+The request that cancels a job usually runs in another thread, process or
+serverless invocation than the translation, so a token can also `poll` the
+shared job state (job store, translation_jobs row); polls are throttled to
+one per `poll_interval` seconds so checking per cell stays cheap.
+"""
+import os
+import time
+import threading
+
+# Seconds between checks of the shared job state for a cancel request
+CANCEL_POLL_INTERVAL = float(os.environ.get("CANCEL_POLL_INTERVAL", 2))
+
+
+class TranslationCancelled(Exception):
+    """Raised inside a translation whose job was cancelled"""
+    pass
+
+
+class CancellationToken:
+    """
+    Cancellation flag for one job
+
+    Args:
+        poll: Optional callable returning True once the job was cancelled
+            elsewhere
+        poll_interval: Minimum seconds between two calls of `poll`
+            (default: CANCEL_POLL_INTERVAL)
+    """
+
+    def __init__(self, poll=None, poll_interval=None):
+        self.event = threading.Event()
+        self.poll = poll
+        self.poll_interval = CANCEL_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.last_poll = time.monotonic()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        if self.event.is_set():
+            return True
+        if self.poll is not None and time.monotonic() - self.last_poll >= self.poll_interval:
+            self.last_poll = time.monotonic()
+            try:
+                if self.poll():
+                    self.event.set()
+            except Exception as e:
+                # A failed check must not fail the translation; try again later
+                print(f"Cancellation check failed: {e}")
+        return self.event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise TranslationCancelled("Translation cancelled")
@@ -10,11 +10,19 @@ import os
 import logging
 import re
 import time
+import tempfile
 from copy import copy
 from openpyxl import load_workbook, Workbook
 from deep_translator import GoogleTranslator
 import xlrd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from translation_executor import (
+    TRANSLATE_BATCH_CELLS, TRANSLATE_BATCH_WORKERS, JobTranslator, translate_texts_batch
+)
+from stage_timing import StageTimer
+from translation_stats import TranslationStats, summarize_stats
+from metrics import CELLS_PROCESSED
+from memory_guard import MEMORY_CHECK_INTERVAL, check_memory, check_workbook_fits
 
 # Configure logging
 logging.basicConfig(
@@ -33,6 +41,7 @@ def convert_xls_to_xlsx(xls_file):
     if not xls_file.endswith('.xls'):
         raise ValueError("Input file must be .xls format")
 
+    check_workbook_fits(xls_file)
     wb_xls = xlrd.open_workbook(xls_file)
     wb_xlsx = Workbook()
     sheet_names = wb_xls.sheet_names()
@@ -95,7 +104,7 @@ def should_translate_string(text, formula):
     return True
 
 
-def translate_formula_strings(formula, translator):
+def translate_formula_strings(formula, translator, stats=None):
     """
     Translate string literals inside Excel formulas while preserving formula structure.
 
@@ -106,6 +115,7 @@ def translate_formula_strings(formula, translator):
     Args:
         formula: Excel formula string starting with =
         translator: GoogleTranslator instance
+        stats: Optional TranslationStats counting the literals left untranslated
 
     Returns:
         Formula with translated string literals
@@ -123,6 +133,8 @@ def translate_formula_strings(formula, translator):
 
         # Use smart filtering to determine if this string should be translated
         if not should_translate_string(original_text, formula):
+            if stats is not None:
+                stats.add("strings_skipped")
             return match.group(0)
 
         try:
@@ -180,48 +192,7 @@ class BatchedProgressCallback:
         self.last_update_time = time.time()
 
 
-def translate_texts_batch(texts, translator, max_workers=5):
-    """
-    Translate multiple texts in parallel
-
-    Args:
-        texts: List of text strings to translate
-        translator: GoogleTranslator instance
-        max_workers: Number of parallel translation threads
-
-    Returns:
-        List of translated texts in same order
-    """
-    if not texts:
-        return []
-
-    # For small batches, just do sequential
-    if len(texts) <= 3:
-        return [translator.translate(text) for text in texts]
-
-    # For larger batches, use parallel translation
-    results = [None] * len(texts)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all translation tasks
-        future_to_index = {
-            executor.submit(translator.translate, text): i
-            for i, text in enumerate(texts)
-        }
-
-        # Collect results as they complete
-        for future in as_completed(future_to_index):
-            index = future_to_index[future]
-            try:
-                results[index] = future.result()
-            except Exception as e:
-                logger.warning(f"Translation failed for text {index}: {e}")
-                results[index] = texts[index]  # Keep original on error
-
-    return results
-
-
-def translate_excel_with_format(input_file, output_file, source_lang="fr", target_lang="en", progress_callback=None, batch_size=10, parallel=True):
+def translate_excel_with_format(input_file, output_file, source_lang="fr", target_lang="en", progress_callback=None, batch_size=10, parallel=True, cancel_token=None, timings=None, stats=None):
     """Translate text in an Excel file, preserving formatting.
 
     OPTIMIZED VERSION with:
@@ -236,6 +207,16 @@ def translate_excel_with_format(input_file, output_file, source_lang="fr", targe
         progress_callback: Optional callback function(current, total, message) for progress updates
         batch_size: Number of cells between progress updates (default: 10)
         parallel: Use parallel translation for speed (default: True)
+        cancel_token: Optional CancellationToken (see cancellation.py), checked between
+            cells; TranslationCancelled is raised once it is cancelled
+        timings: Optional StageTimer (see stage_timing.py) that receives the seconds
+            spent loading, counting, translating, writing back and saving
+        stats: Optional TranslationStats (see translation_stats.py) that counts the
+            provider calls, characters and skipped strings; summarised in the
+            final progress message
+
+    Raises MemoryLimitExceeded (see memory_guard.py) when the workbook would not
+    fit in the worker's memory limit, or once memory use crosses it.
     """
     # Check format FIRST before checking file existence
     if not input_file.endswith('.xlsx'):
@@ -254,9 +235,17 @@ def translate_excel_with_format(input_file, output_file, source_lang="fr", targe
     if progress_callback:
         batched_callback(0, 0, f"Starting translation: {source_lang} -> {target_lang}")
 
+    timer = timings if timings is not None else StageTimer()
+    stats = stats if stats is not None else TranslationStats()
+
+    # Refuse a workbook this worker cannot hold rather than be OOM-killed loading it
+    check_workbook_fits(input_file)
+
     # Load workbook
-    wb = load_workbook(input_file)
-    translator = GoogleTranslator(source=source_lang, target=target_lang)
+    with timer.stage("load_workbook"):
+        wb = load_workbook(input_file)
+    # Calls go through the process-wide executor, sharing its cap with other jobs
+    translator = JobTranslator(GoogleTranslator(source=source_lang, target=target_lang), stats=stats)
 
     total_sheets = len(wb.sheetnames)
     logger.info(f"Found {total_sheets} sheet(s) to process")
@@ -264,14 +253,15 @@ def translate_excel_with_format(input_file, output_file, source_lang="fr", targe
     # Count total text cells and formulas separately
     total_text_cells = 0
     total_formula_cells = 0
-    for sheet_name in wb.sheetnames:
-        for row in wb[sheet_name].iter_rows():
-            for cell in row:
-                if cell.value and isinstance(cell.value, str):
-                    if cell.value.startswith('='):
-                        total_formula_cells += 1
-                    else:
-                        total_text_cells += 1
+    with timer.stage("count_cells"):
+        for sheet_name in wb.sheetnames:
+            for row in wb[sheet_name].iter_rows():
+                for cell in row:
+                    if cell.value and isinstance(cell.value, str):
+                        if cell.value.startswith('='):
+                            total_formula_cells += 1
+                        else:
+                            total_text_cells += 1
 
     total_cells = total_text_cells + total_formula_cells
     logger.info(f"Found {total_text_cells} text cells and {total_formula_cells} formulas to translate")
@@ -280,6 +270,7 @@ def translate_excel_with_format(input_file, output_file, source_lang="fr", targe
         batched_callback.flush(0, total_cells, f"Found {total_cells} cells to translate ({total_text_cells} text + {total_formula_cells} formulas)")
 
     global_cell_count = 0
+    workers = TRANSLATE_BATCH_WORKERS if parallel else 1
 
     for sheet_idx, sheet_name in enumerate(wb.sheetnames, 1):
         ws = wb[sheet_name]
@@ -288,13 +279,14 @@ def translate_excel_with_format(input_file, output_file, source_lang="fr", targe
         # Count text cells and formulas separately for this sheet
         sheet_text_cells = 0
         sheet_formulas = 0
-        for row in ws.iter_rows():
-            for cell in row:
-                if cell.value and isinstance(cell.value, str):
-                    if cell.value.startswith('='):
-                        sheet_formulas += 1
-                    else:
-                        sheet_text_cells += 1
+        with timer.stage("count_cells"):
+            for row in ws.iter_rows():
+                for cell in row:
+                    if cell.value and isinstance(cell.value, str):
+                        if cell.value.startswith('='):
+                            sheet_formulas += 1
+                        else:
+                            sheet_text_cells += 1
 
         sheet_total = sheet_text_cells + sheet_formulas
         logger.info(f"Sheet '{sheet_name}': {sheet_text_cells} text cells, {sheet_formulas} formulas")
@@ -304,78 +296,103 @@ def translate_excel_with_format(input_file, output_file, source_lang="fr", targe
         formula_count = 0
         error_count = 0
 
-        for row_idx, row in enumerate(ws.iter_rows(), 1):
-            for col_idx, cell in enumerate(row, 1):
-                if cell.value and isinstance(cell.value, str):  # Check if cell contains text
-                    global_cell_count += 1
+        # Time in the cell loop that is not translation calls is write-back
+        # (formatting copies, assignments, progress)
+        loop_started = time.perf_counter()
+        translate_before = timer.seconds("translate")
+
+        # String cells are translated a batch at a time: the batch's plain
+        # texts go to the shared executor together, then each cell is written back
+        string_cells = (cell for row in ws.iter_rows() for cell in row
+                        if cell.value and isinstance(cell.value, str))
+        for batch in iter(lambda: list(islice(string_cells, TRANSLATE_BATCH_CELLS)), []):
+            texts = [cell.value for cell in batch if not cell.value.startswith('=')]
+            with timer.stage("translate"):
+                translations = iter(translate_texts_batch(texts, translator, max_workers=workers,
+                                                          cancel_token=cancel_token))
+
+            for cell in batch:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+
+                global_cell_count += 1
+                CELLS_PROCESSED.inc()
+                if global_cell_count % MEMORY_CHECK_INTERVAL == 0:
+                    check_memory()
+
+                try:
+                    # Preserve cell formatting
+                    old_alignment = copy(cell.alignment)
+                    old_font = copy(cell.font)
+                    old_fill = copy(cell.fill)
+                    old_border = copy(cell.border)
+                    old_number_format = cell.number_format
 
-                    try:
-                        # Preserve cell formatting
-                        old_alignment = copy(cell.alignment)
-                        old_font = copy(cell.font)
-                        old_fill = copy(cell.fill)
-                        old_border = copy(cell.border)
-                        old_number_format = cell.number_format
-
-                        if cell.value.startswith('='):
-                            # This is a formula - translate only string literals inside it
-                            original_formula = cell.value
-                            translated_formula = translate_formula_strings(cell.value, translator)
-                            cell.value = translated_formula
-                            formula_count += 1
+                    if cell.value.startswith('='):
+                        # This is a formula - translate only string literals inside it
+                        original_formula = cell.value
+                        with timer.stage("translate"):
+                            translated_formula = translate_formula_strings(cell.value, translator, stats)
+                        cell.value = translated_formula
+                        formula_count += 1
 
-                            # Log if formula strings were translated
-                            if original_formula != translated_formula:
-                                logger.debug(f"Formula translated at {cell.coordinate}")
+                        # Log if formula strings were translated
+                        if original_formula != translated_formula:
+                            logger.debug(f"Formula translated at {cell.coordinate}")
 
-                        else:
-                            # This is plain text - translate it fully
-                            original_value = cell.value
-                            translated = translator.translate(cell.value)
-                            cell.value = translated
-                            translated_count += 1
-
-                        # Restore cell formatting
-                        cell.alignment = old_alignment
-                        cell.font = old_font
-                        cell.fill = old_fill
-                        cell.border = old_border
-                        cell.number_format = old_number_format
-
-                        # Send batched progress update
-                        progress_pct = int(global_cell_count/total_cells*100) if total_cells > 0 else 0
-                        batched_callback(global_cell_count, total_cells,
-                                        f"Translating '{sheet_name}': {global_cell_count}/{total_cells} cells ({progress_pct}%)")
-
-                        # Log progress every 10 cells
-                        if (translated_count + formula_count) % 10 == 0:
-                            progress_pct = int((translated_count + formula_count)/sheet_total*100) if sheet_total > 0 else 0
-                            logger.info(f"Sheet '{sheet_name}': {translated_count + formula_count}/{sheet_total} cells processed ({progress_pct}%)")
-
-                    except Exception as e:
-                        # Keep original value if translation fails
-                        error_count += 1
-                        cell_preview = str(cell.value)[:50] if cell.value else ""
-                        logger.warning(f"Translation failed for cell ({row_idx},{col_idx}): '{cell_preview}...' - Error: {e}")
-                        pass
+                    else:
+                        # This is plain text - translate it fully
+                        cell.value = next(translations)
+                        translated_count += 1
+
+                    # Restore cell formatting
+                    cell.alignment = old_alignment
+                    cell.font = old_font
+                    cell.fill = old_fill
+                    cell.border = old_border
+                    cell.number_format = old_number_format
+
+                    # Send batched progress update
+                    progress_pct = int(global_cell_count/total_cells*100) if total_cells > 0 else 0
+                    batched_callback(global_cell_count, total_cells,
+                                    f"Translating '{sheet_name}': {global_cell_count}/{total_cells} cells ({progress_pct}%)")
+
+                    # Log progress every 10 cells
+                    if (translated_count + formula_count) % 10 == 0:
+                        progress_pct = int((translated_count + formula_count)/sheet_total*100) if sheet_total > 0 else 0
+                        logger.info(f"Sheet '{sheet_name}': {translated_count + formula_count}/{sheet_total} cells processed ({progress_pct}%)")
+
+                except Exception as e:
+                    # Keep original value if translation fails
+                    error_count += 1
+                    cell_preview = str(cell.value)[:50] if cell.value else ""
+                    logger.warning(f"Translation failed for cell {cell.coordinate}: '{cell_preview}...' - Error: {e}")
+                    pass
+
+        timer.add("write_back", time.perf_counter() - loop_started - (timer.seconds("translate") - translate_before))
 
         logger.info(f"Sheet '{sheet_name}' complete: {translated_count} text cells, {formula_count} formulas processed, {error_count} errors")
 
         # FORCE FLUSH after each sheet
         batched_callback.flush(global_cell_count, total_cells, f"Completed sheet '{sheet_name}' ({sheet_idx}/{total_sheets})")
 
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
     logger.info(f"Saving translated workbook to: {output_file}")
 
     # FORCE FLUSH before saving
     batched_callback.flush(total_cells, total_cells, "Saving translated file...")
 
     # Save the translated workbook
-    wb.save(output_file)
+    with timer.stage("save"):
+        wb.save(output_file)
     logger.info(f"Translation complete! File saved: {output_file}")
     logger.info(f"Summary: {total_text_cells} text cells translated, {total_formula_cells} formulas processed")
+    logger.info(f"Provider usage: {summarize_stats(stats.as_dict())}")
 
     # FORCE FLUSH at end
-    batched_callback.flush(total_cells, total_cells, "Translation complete!")
+    batched_callback.flush(total_cells, total_cells, f"Translation complete! ({summarize_stats(stats.as_dict())})")
 
     return output_file
 
@@ -394,3 +411,18 @@ def process_file(input_filename, source_lang="fr", target_lang="en"):
         return output_filename
     else:
         raise ValueError(f"Unsupported file format: {input_filename}")
+
+
+def translate_excel_bytes(content, source_lang="fr", target_lang="en"):
+    """Translate an in-memory .xlsx workbook and return the translated bytes.
+
+    Used for small workbooks translated inline, within the request.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "input.xlsx")
+        output_path = os.path.join(temp_dir, "output.xlsx")
+        with open(input_path, 'wb') as f:
+            f.write(content)
+        translate_excel_with_format(input_path, output_path, source_lang, target_lang)
+        with open(output_path, 'rb') as f:
+            return f.read()
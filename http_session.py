@@ -0,0 +1,77 @@
+"""
+Shared HTTP transport
+One pooled keep-alive requests.Session per process, used for every call to
+Supabase. Module state survives between warm invocations of a serverless
+function and is shared by all request threads of the Flask apps, so the
+TCP/TLS handshake to a host is paid once instead of on every call.
+"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Number of hosts to keep connection pools for (Supabase REST/storage/realtime
+# share one host; the rest is headroom)
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))
+
+# Keep-alive connections kept per host; app_supabase.py runs one translation
+# thread per job next to its request threads, all sharing the pool
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 16))
+
+# Seconds to wait for a connection / for the response once the request is sent
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 60))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests made without one"""
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(pool_connections=None, pool_maxsize=None, timeout=None):
+    """
+    Build a requests.Session with tuned connection pools and timeouts
+
+    Only connection failures are retried: nothing was sent yet, so retrying
+    is safe even for uploads whose body is a one-shot stream.
+    """
+    adapter = TimeoutHTTPAdapter(
+        pool_connections=pool_connections or POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize or POOL_MAXSIZE,
+        max_retries=Retry(total=2, connect=2, read=0, status=0, redirect=0, backoff_factor=0.1),
+        timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """The process-wide pooled session (created on first use)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def reset_session():
+    """Close the shared session's connections; the next call opens new ones"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
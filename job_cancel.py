@@ -0,0 +1,72 @@
+"""
+Cancellation of Supabase-backed Translation Jobs
+Shared by api/cancel.py, api/process_job.py and app_supabase.py.
+
+Cancelling only flips the job row to 'cancelled' (a compare-and-set on its
+status, so a job that just finished is never marked cancelled). A pending
+job's input is deleted right away; a processing job is stopped by its worker,
+whose CancellationToken polls the row (see job_cancelled) and which then
+removes the job's storage objects itself.
+
+Jobs coalesced with a cancelled job (see result_cache.py) fail with it on
+every backend: followers created by app_supabase.py have no input of their
+own, so they could not be translated separately.
+"""
+from supabase_rest import get_job, update_jobs, storage_delete
+
+CANCELLED_FIELDS = {
+    "status": "cancelled",
+    "progress_message": "Translation cancelled"
+}
+
+FOLLOWER_FAILED_FIELDS = {
+    "status": "error",
+    "error_message": "The identical translation this job was waiting on was cancelled. Please submit the file again.",
+    "progress_message": "Error: identical translation cancelled"
+}
+
+
+def cancel_job(job_id):
+    """
+    Cancel a pending or processing job
+
+    Returns (job, cancelled): the job row (None if unknown) and whether this
+    call cancelled it. A job that already finished is returned unchanged.
+    """
+    rows = update_jobs(CANCELLED_FIELDS, returning=True, id=f"eq.{job_id}", status="eq.pending")
+    if rows:
+        # No worker has claimed it: nothing else will clean up its input
+        if rows[0].get("input_file_path"):
+            try:
+                storage_delete(rows[0]["input_file_path"])
+            except Exception as e:
+                print(f"Failed to delete input of cancelled job {job_id}: {e}")
+        return rows[0], True
+
+    rows = update_jobs(CANCELLED_FIELDS, returning=True, id=f"eq.{job_id}", status="eq.processing")
+    if rows:
+        return rows[0], True
+
+    return get_job(job_id, "id, status"), False
+
+
+def fail_followers(job_id):
+    """
+    Fail the jobs waiting on a cancelled job, and delete any input they stored
+
+    Returns the ids of the failed jobs.
+    """
+    rows = update_jobs(FOLLOWER_FAILED_FIELDS, returning=True, coalesced_with=f"eq.{job_id}", status="eq.pending")
+    for row in rows or []:
+        if row.get("input_file_path"):
+            try:
+                storage_delete(row["input_file_path"])
+            except Exception as e:
+                print(f"Failed to delete input of job {row['id']}: {e}")
+    return [row["id"] for row in rows or []]
+
+
+def job_cancelled(job_id):
+    """Whether a job was cancelled (or deleted) - the poll of a worker's CancellationToken"""
+    job = get_job(job_id, "status")
+    return job is None or job["status"] == "cancelled"
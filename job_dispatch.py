@@ -0,0 +1,197 @@
+"""
+Server-side Job Dispatch
+Starts processing of a newly created translation job without depending on
+the browser to call /api/process_job and keep that connection open.
+
+Modes (JOB_DISPATCH_MODE):
+- invoke  (default) api/translate.py POSTs the job_id to the process_job
+          function itself. process_job answers 202 as soon as it has
+          claimed the job (pending -> processing) and translates it in that
+          invocation. A call that fails or times out is retried up to
+          JOB_DISPATCH_ATTEMPTS times, unless the job row shows it was claimed.
+- webhook A Supabase Database Webhook on INSERT into translation_jobs calls
+          /api/process_job (see supabase-schema.sql); nothing is sent here.
+- none    Dispatch is disabled (the caller starts processing itself).
+
+When JOB_DISPATCH_SECRET is set, process_job only accepts calls carrying it
+in the X-Dispatch-Secret header, so browsers can no longer trigger work.
+
+Jobs whose dispatch was lost, or whose process_job invocation died, are
+picked up by recover_stalled_jobs() (run by api/recover_jobs.py from Vercel
+Cron): pending jobs untouched for JOB_DISPATCH_RETRY_AFTER seconds are
+dispatched again, and jobs still pending or processing after
+JOB_STALLED_TIMEOUT seconds are failed, along with the jobs waiting on them.
+"""
+import os
+import hmac
+from datetime import datetime, timedelta, timezone
+from http_session import get_session, CONNECT_TIMEOUT
+from supabase_rest import get_job, select_jobs, update_jobs
+from result_cache import release_followers
+
+DISPATCH_SECRET_HEADER = "X-Dispatch-Secret"
+
+# Seconds to wait for process_job to claim the job and answer
+DISPATCH_TIMEOUT = float(os.environ.get("JOB_DISPATCH_TIMEOUT", 10))
+
+# Calls to process_job before a dispatch is given up (the job stays pending)
+DISPATCH_ATTEMPTS = int(os.environ.get("JOB_DISPATCH_ATTEMPTS", 2))
+
+# Seconds a pending job may go unclaimed before it is dispatched again
+DISPATCH_RETRY_AFTER = float(os.environ.get("JOB_DISPATCH_RETRY_AFTER", 60))
+
+# Seconds after which a job still pending or processing is considered lost.
+# Must exceed the longest process_job invocation (maxDuration on Vercel) and
+# any job a long-running app_supabase.py sharing the table may translate.
+STALLED_TIMEOUT = float(os.environ.get("JOB_STALLED_TIMEOUT", 15 * 60))
+
+# Most jobs each recovery pass looks at, per kind
+RECOVERY_BATCH = 100
+
+STALLED_FIELDS = {
+    "status": "error",
+    "error_message": "The translation stopped unexpectedly. Please submit the file again.",
+    "progress_message": "Error: translation stopped unexpectedly"
+}
+
+
+def get_dispatch_mode():
+    """Configured dispatch mode: invoke, webhook or none"""
+    return os.environ.get("JOB_DISPATCH_MODE", "invoke").strip().lower()
+
+
+def get_dispatch_secret():
+    """Shared secret process_job requires, if any"""
+    return os.environ.get("JOB_DISPATCH_SECRET", "").strip()
+
+
+def get_process_job_url():
+    """
+    URL of the process_job function
+
+    JOB_DISPATCH_URL wins; on Vercel the deployment's own URL is used.
+    """
+    url = os.environ.get("JOB_DISPATCH_URL", "").strip()
+    if url:
+        return url
+    vercel_url = os.environ.get("VERCEL_URL", "").strip()
+    if vercel_url:
+        return f"https://{vercel_url}/api/process_job"
+    return None
+
+
+def is_authorized(headers):
+    """Whether a process_job request carries the dispatch secret (if one is configured)"""
+    secret = get_dispatch_secret()
+    if not secret:
+        return True
+    return hmac.compare_digest(headers.get(DISPATCH_SECRET_HEADER, ""), secret)
+
+
+def job_id_from_payload(data):
+    """
+    Job id from a process_job request body
+
+    Accepts {"job_id": ...} from the invoke dispatcher and the
+    {"type": "INSERT", "record": {...}} payload of a Supabase Database Webhook.
+    """
+    if not isinstance(data, dict):
+        return None
+    if data.get("job_id"):
+        return data["job_id"]
+    record = data.get("record")
+    if data.get("type") == "INSERT" and isinstance(record, dict):
+        return record.get("id")
+    return None
+
+
+def dispatch_job(job_id):
+    """
+    Hand a pending job to process_job
+
+    Returns True once processing was started (or will be started by the
+    database webhook). Failures are reported, not raised: the job stays
+    pending and recover_stalled_jobs() dispatches it again.
+    """
+    mode = get_dispatch_mode()
+    if mode != "invoke":
+        return mode == "webhook"
+    return invoke_process_job(job_id)
+
+
+def job_claimed(job_id):
+    """Whether a job has left pending, i.e. some process_job invocation took it"""
+    try:
+        job = get_job(job_id, "status")
+    except Exception as e:
+        print(f"Failed to check job {job_id}: {e}")
+        return False
+    return bool(job) and job["status"] != "pending"
+
+
+def invoke_process_job(job_id):
+    """
+    POST a job to process_job until it answers or the job is seen claimed
+
+    No answer is not success: the call may never have reached process_job,
+    or the invocation may have died before claiming the job.
+    """
+    url = get_process_job_url()
+    if not url:
+        print(f"Job dispatch failed for {job_id}: JOB_DISPATCH_URL is not configured")
+        return False
+
+    headers = {"Content-Type": "application/json"}
+    secret = get_dispatch_secret()
+    if secret:
+        headers[DISPATCH_SECRET_HEADER] = secret
+
+    for attempt in range(1, DISPATCH_ATTEMPTS + 1):
+        try:
+            response = get_session().post(
+                url, json={"job_id": job_id}, headers=headers,
+                timeout=(CONNECT_TIMEOUT, DISPATCH_TIMEOUT)
+            )
+            if response.status_code in [200, 202]:
+                return True
+            print(f"Job dispatch failed for {job_id} (attempt {attempt}): {response.status_code} {response.text}")
+        except Exception as e:
+            print(f"Job dispatch failed for {job_id} (attempt {attempt}): {e}")
+
+        # The call may have reached process_job even though no answer came back
+        if job_claimed(job_id):
+            return True
+    return False
+
+
+def recover_stalled_jobs(now=None):
+    """
+    Fail jobs that stalled and dispatch again pending jobs nobody claimed
+
+    A job is stalled once it has been pending or processing, untouched, for
+    STALLED_TIMEOUT: its process_job invocation is gone. Jobs coalesced with
+    it fail along with it. Returns {"failed": [ids], "redispatched": [ids]}.
+    """
+    now = now or datetime.now(timezone.utc)
+    stalled_before = (now - timedelta(seconds=STALLED_TIMEOUT)).isoformat()
+    retry_before = (now - timedelta(seconds=DISPATCH_RETRY_AFTER)).isoformat()
+    recovered = {"failed": [], "redispatched": []}
+
+    stalled = select_jobs("id", limit=RECOVERY_BATCH, status="in.(pending,processing)",
+                          coalesced_with="is.null", updated_at=f"lt.{stalled_before}")
+    for job in stalled:
+        # Compare-and-set: a job that moved on meanwhile is left alone
+        if update_jobs(STALLED_FIELDS, returning=True, id=f"eq.{job['id']}",
+                       status="in.(pending,processing)", updated_at=f"lt.{stalled_before}"):
+            release_followers(job['id'], STALLED_FIELDS)
+            recovered["failed"].append(job['id'])
+
+    if get_dispatch_mode() == "none":
+        return recovered
+
+    unclaimed = select_jobs("id", limit=RECOVERY_BATCH, status="eq.pending", coalesced_with="is.null",
+                            input_file_path="not.is.null", updated_at=f"lt.{retry_before}")
+    for job in unclaimed:
+        if invoke_process_job(job['id']):
+            recovered["redispatched"].append(job['id'])
+    return recovered
@@ -0,0 +1,167 @@
+"""
+On-demand Job Profiling
+Runs one job's translation under cProfile and tracemalloc, for the rare
+customer file that is pathologically slow or memory hungry.
+
+Opt in per job with `profile=1` on /translate, or for every job with
+JOB_PROFILING=1. The artifact is a zip stored next to the job's output
+(output/<job id>/profile.zip, or JOB_PROFILE_DIR for app.py) holding:
+- translate.prof  cProfile stats; open with pstats or snakeviz
+- report.txt      top functions by cumulative time, tracemalloc peak and the
+                  top allocation sites at (close to) the peak
+
+cProfile sees the job's own thread; translation calls run on the shared
+executor's threads (translation_executor.py) and show up as time spent
+waiting on their futures. tracemalloc is process-wide, so only one job is
+profiled at a time; a second request runs unprofiled.
+"""
+import io
+import os
+import time
+import pstats
+import cProfile
+import tempfile
+import threading
+import tracemalloc
+import zipfile
+
+# Profile every job, not only those that ask for it
+PROFILE_ALL_JOBS = os.environ.get("JOB_PROFILING", "") == "1"
+
+# Rows of the report's function and allocation tables
+PROFILE_TOP = int(os.environ.get("JOB_PROFILE_TOP", 40))
+
+# Where app.py (which has no object storage) keeps profile artifacts
+PROFILE_DIR = os.environ.get("JOB_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "excel-translator-profiles")
+
+# Seconds between checks for a new memory high-water mark
+SNAPSHOT_INTERVAL = 0.5
+
+# A new allocation snapshot is taken once traced memory grows this much past the last one
+SNAPSHOT_GROWTH = 1.1
+
+PROFILE_FILENAME = "profile.zip"
+
+_profile_lock = threading.Lock()
+
+
+def profiling_requested(flag=None):
+    """Whether a job should be profiled: JOB_PROFILING=1, or its own flag (1/true)"""
+    return PROFILE_ALL_JOBS or str(flag).strip().lower() in ("1", "true")
+
+
+class JobProfiler:
+    """
+    Context manager profiling the code run inside it
+
+        with JobProfiler(enabled=profiling_requested(flag)) as profiler:
+            translate_excel_with_format(...)
+        artifact = profiler.artifact()  # None unless this run was profiled
+
+    A disabled profiler does nothing, so call sites need no branches.
+    """
+
+    def __init__(self, enabled=True, top=None):
+        self.enabled = enabled
+        self.top = top if top is not None else PROFILE_TOP
+        self.active = False
+        self.profile = None
+        self.peak = 0
+        self.snapshot = None
+        self.snapshot_size = 0
+        self.seconds = 0.0
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        if not _profile_lock.acquire(blocking=False):
+            print("Another job is being profiled; running this one unprofiled")
+            return self
+        self.active = True
+        # Leave tracing that was already on (PYTHONTRACEMALLOC) running afterwards
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        self.sampler = threading.Thread(target=self._sample, daemon=True)
+        self.sampler.start()
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.active:
+            return False
+        try:
+            self.profile.disable()
+            self.seconds = time.perf_counter() - self.started
+            self.stopped.set()
+            self.sampler.join()
+            self._take_snapshot()
+            self.peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if self.started_tracing:
+                tracemalloc.stop()
+            _profile_lock.release()
+        return False
+
+    def _sample(self):
+        """Snapshot allocations whenever traced memory reaches a new high"""
+        while not self.stopped.wait(SNAPSHOT_INTERVAL):
+            self._take_snapshot()
+
+    def _take_snapshot(self):
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.snapshot_size * SNAPSHOT_GROWTH:
+            self.snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ])
+            self.snapshot_size = current
+
+    def report(self):
+        """Human-readable summary: hot functions and memory"""
+        out = io.StringIO()
+        out.write(f"Profiled seconds: {self.seconds:.3f}\n")
+        out.write(f"tracemalloc peak: {self.peak / 1024 / 1024:.1f} MB\n\n")
+
+        out.write(f"Top {self.top} functions by cumulative time\n")
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+
+        if self.snapshot is not None:
+            out.write(f"\nTop {self.top} allocation sites "
+                      f"(snapshot at {self.snapshot_size / 1024 / 1024:.1f} MB traced)\n")
+            for stat in self.snapshot.statistics("lineno")[:self.top]:
+                out.write(f"{stat.size / 1024:10.1f} KB {stat.count:8d} blocks  {stat.traceback}\n")
+        return out.getvalue()
+
+    def artifact(self):
+        """The profile as zip bytes (translate.prof + report.txt), or None if not profiled"""
+        if not self.active:
+            return None
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_path = os.path.join(temp_dir, "translate.prof")
+            self.profile.dump_stats(stats_path)
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.write(stats_path, "translate.prof")
+                archive.writestr("report.txt", self.report())
+        return buffer.getvalue()
+
+
+def profile_storage_path(job_id):
+    """Storage path of a job's profile, next to its output"""
+    return f"output/{job_id}/{PROFILE_FILENAME}"
+
+
+def save_local_profile(job_id, artifact):
+    """Write a profile artifact under PROFILE_DIR (app.py); returns its path"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{job_id}-{PROFILE_FILENAME}")
+    with open(path, "wb") as f:
+        f.write(artifact)
+    return path
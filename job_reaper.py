@@ -0,0 +1,206 @@
+"""
+Job State Reaper for app.py
+Bounds what the job store (job_store.py) and the per-job temp dirs retain.
+Results are normally deleted once downloaded, but a client that never
+downloads, a worker that dies mid-job or a crashed process would otherwise
+leave progress entries, result files and temp dirs behind for good.
+
+Each sweep:
+- deletes finished jobs (complete/error/cancelled) idle for JOB_RESULT_TTL
+- deletes any job, even one still "processing", idle for JOB_STALE_TTL
+- deletes the oldest results while the retained result bytes exceed
+  JOB_MAX_RETAINED_BYTES
+- removes job temp dirs (JOB_TEMP_PREFIX) untouched for JOB_STALE_TTL, unless
+  their job is still processing or running in this process
+and records metrics for retained jobs and disk usage (see metrics()).
+"""
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+# Seconds a finished job (and its result) is kept without being downloaded
+RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", 60 * 60))
+
+# Seconds without a progress update after which any job is considered abandoned
+STALE_TTL = float(os.environ.get("JOB_STALE_TTL", 6 * 60 * 60))
+
+# Upper bound on the bytes of translated results kept in the store (0 = no cap)
+MAX_RETAINED_BYTES = int(os.environ.get("JOB_MAX_RETAINED_BYTES", 512 * 1024 * 1024))
+
+# Seconds between sweeps of the background reaper
+REAP_INTERVAL = float(os.environ.get("JOB_REAP_INTERVAL", 60))
+
+# Prefix of the per-job working directories app.py creates under the temp dir
+# (job_temp_prefix() adds the job's id)
+JOB_TEMP_PREFIX = "excel-translator-job-"
+
+FINISHED_STATUSES = ("complete", "error", "cancelled")
+
+
+def job_temp_prefix(task_id, prefix=JOB_TEMP_PREFIX):
+    """mkdtemp prefix of a job's working directory, naming the job it belongs to"""
+    return f"{prefix}{task_id}-"
+
+
+def _dir_size(path):
+    """Bytes of all files below a directory"""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class JobReaper:
+    """
+    Periodically evicts expired job state from a JobStore and its temp dirs
+
+    sweep() can be called directly (tests, cron); start() runs it every
+    `interval` seconds on a daemon thread. active_jobs, if given, returns
+    the ids of the jobs running in this process; their temp dirs are kept
+    however long they run.
+    """
+
+    def __init__(self, store, result_ttl=RESULT_TTL, stale_ttl=STALE_TTL,
+                 max_retained_bytes=MAX_RETAINED_BYTES, interval=REAP_INTERVAL,
+                 temp_root=None, temp_prefix=JOB_TEMP_PREFIX, active_jobs=None):
+        self.store = store
+        self.result_ttl = result_ttl
+        self.stale_ttl = stale_ttl
+        self.max_retained_bytes = max_retained_bytes
+        self.interval = interval
+        self.temp_root = temp_root or tempfile.gettempdir()
+        self.temp_prefix = temp_prefix
+        self.active_jobs = active_jobs
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.totals = {"reaped_jobs": 0, "reaped_result_bytes": 0, "reaped_temp_dirs": 0}
+        self.last_metrics = {}
+
+    def start(self):
+        """Sweep every `interval` seconds on a daemon thread"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="job-reaper", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Job reaper sweep failed: {e}")
+
+    def sweep(self, now=None):
+        """
+        Evict expired jobs and temp dirs once
+
+        Returns the metrics after the sweep (see metrics()).
+        """
+        started = time.time()
+        now = now if now is not None else started
+        with self.lock:
+            kept = []
+            for entry in self.store.entries():
+                last_seen = max(entry["updated_at"] or 0, entry["result_created_at"] or 0)
+                idle = now - last_seen
+                finished = entry["status"] in FINISHED_STATUSES or entry["status"] is None
+                if (finished and idle > self.result_ttl) or idle > self.stale_ttl:
+                    self._evict(entry)
+                else:
+                    kept.append(entry)
+
+            # Oldest results go first until the retained bytes fit the cap
+            results = sorted(
+                (entry for entry in kept if entry["result_size"] is not None),
+                key=lambda entry: entry["result_created_at"]
+            )
+            retained_bytes = sum(entry["result_size"] for entry in results)
+            if self.max_retained_bytes:
+                for entry in results:
+                    if retained_bytes <= self.max_retained_bytes:
+                        break
+                    self._evict(entry)
+                    kept.remove(entry)
+                    retained_bytes -= entry["result_size"]
+
+            in_use = {entry["task_id"] for entry in kept if entry["status"] == "processing"}
+            if self.active_jobs is not None:
+                in_use.update(self.active_jobs())
+            temp_dirs, temp_bytes = self._reap_temp_dirs(now, in_use)
+
+            by_status = {}
+            for entry in kept:
+                status = entry["status"] or "unknown"
+                by_status[status] = by_status.get(status, 0) + 1
+
+            self.last_metrics = {
+                "retained_jobs": len(kept),
+                "retained_jobs_by_status": by_status,
+                "retained_result_bytes": retained_bytes,
+                "max_retained_bytes": self.max_retained_bytes,
+                "temp_dirs": temp_dirs,
+                "temp_dir_bytes": temp_bytes,
+                "reaped_jobs_total": self.totals["reaped_jobs"],
+                "reaped_result_bytes_total": self.totals["reaped_result_bytes"],
+                "reaped_temp_dirs_total": self.totals["reaped_temp_dirs"],
+                "last_sweep_at": now,
+                "last_sweep_seconds": round(time.time() - started, 6)
+            }
+            return dict(self.last_metrics)
+
+    def _evict(self, entry):
+        self.store.delete(entry["task_id"])
+        self.totals["reaped_jobs"] += 1
+        self.totals["reaped_result_bytes"] += entry["result_size"] or 0
+
+    def _reap_temp_dirs(self, now, in_use=()):
+        """Remove stale job temp dirs not in use; returns (count, bytes) of those left"""
+        count = 0
+        total = 0
+        try:
+            names = os.listdir(self.temp_root)
+        except OSError:
+            return 0, 0
+        for name in names:
+            if not name.startswith(self.temp_prefix):
+                continue
+            path = os.path.join(self.temp_root, name)
+            try:
+                if not os.path.isdir(path):
+                    continue
+                idle = now - os.path.getmtime(path)
+            except OSError:
+                continue
+            # <prefix><job id>-<random suffix>, see job_temp_prefix()
+            task_id = name[len(self.temp_prefix):].rsplit("-", 1)[0]
+            if idle > self.stale_ttl and task_id not in in_use:
+                shutil.rmtree(path, ignore_errors=True)
+                self.totals["reaped_temp_dirs"] += 1
+            else:
+                count += 1
+                total += _dir_size(path)
+        return count, total
+
+    def metrics(self):
+        """
+        Metrics of the last sweep
+
+        retained_jobs, retained_jobs_by_status, retained_result_bytes,
+        max_retained_bytes, temp_dirs, temp_dir_bytes, the reaped_*_total
+        counters, last_sweep_at and last_sweep_seconds. Sweeps first if none
+        has run yet.
+        """
+        if not self.last_metrics:
+            return self.sweep()
+        with self.lock:
+            return dict(self.last_metrics)
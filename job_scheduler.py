@@ -0,0 +1,169 @@
+"""
+Size-aware Job Scheduler
+Runs translation jobs on a bounded pool of worker threads and picks the next
+job by its expected size instead of its arrival time, so a single huge
+workbook cannot hold up the dozens of small ones queued behind it.
+
+Policies (JOB_SCHEDULER_POLICY):
+- sjf   (default) shortest expected job first, with aging: a job's cost is
+        divided by (1 + seconds waited / JOB_AGING_SECONDS), so a large job
+        that keeps being passed over still gets its turn
+- wfq   weighted fair queueing per client (start-time fair queueing): each
+        client gets its share of worker time however many jobs it submits;
+        a client's own jobs run in arrival order
+- fifo  arrival order
+
+A job's cost is the pre-scan estimate of its strings
+(workbook_estimate.estimate_job_cost). Queues hold at most a few hundred
+jobs, so the next job is found with a linear scan; aging changes the order
+over time anyway, which a heap could not track.
+"""
+import os
+import time
+import itertools
+import threading
+
+# Jobs translated at the same time
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+
+# Scheduling policy: sjf, wfq or fifo
+SCHEDULER_POLICY = os.environ.get("JOB_SCHEDULER_POLICY", "sjf").strip().lower()
+
+# Seconds of waiting that halve a job's effective cost under sjf
+AGING_SECONDS = float(os.environ.get("JOB_AGING_SECONDS", 30))
+
+POLICIES = ("sjf", "wfq", "fifo")
+
+
+class _QueuedJob:
+    __slots__ = ("fn", "cost", "client", "job_id", "sequence", "submitted", "start_tag", "on_cancel")
+
+    def __init__(self, fn, cost, client, job_id, sequence, submitted, on_cancel):
+        self.fn = fn
+        self.cost = cost
+        self.client = client
+        self.job_id = job_id
+        self.sequence = sequence
+        self.submitted = submitted
+        self.start_tag = 0.0
+        self.on_cancel = on_cancel
+
+
+class JobScheduler:
+    """
+    Bounded worker pool with a size-aware queue
+
+    Args:
+        workers: Number of jobs run at the same time
+        policy: sjf, wfq or fifo (default: JOB_SCHEDULER_POLICY)
+        aging_seconds: Aging rate of the sjf policy
+        weights: Optional {client: weight} for the wfq policy (default 1)
+    """
+
+    def __init__(self, workers=None, policy=None, aging_seconds=None, weights=None):
+        self.workers = workers or JOB_WORKERS
+        self.policy = (policy or SCHEDULER_POLICY).lower()
+        if self.policy not in POLICIES:
+            raise ValueError(f"Unsupported scheduling policy: {self.policy}")
+        self.aging_seconds = aging_seconds or AGING_SECONDS
+        self.weights = weights or {}
+        self.condition = threading.Condition()
+        self.queue = []
+        self.threads = []
+        self.running = 0
+        self.stopped = False
+        self.sequence = itertools.count()
+        # Start-time fair queueing state
+        self.virtual_time = 0.0
+        self.client_finish = {}
+
+    def submit(self, fn, cost=1, client=None, job_id=None, on_cancel=None):
+        """
+        Queue fn() to run on a worker
+
+        Args:
+            fn: Callable running the whole job
+            cost: Expected size of the job (estimated strings)
+            client: Key the wfq policy shares worker time by (IP, user id...)
+            job_id: Id for cancel()
+            on_cancel: Called instead of fn if the job is cancelled while queued
+        """
+        job = _QueuedJob(fn, max(float(cost or 1), 1.0), client, job_id,
+                         next(self.sequence), time.monotonic(), on_cancel)
+        with self.condition:
+            if self.policy == "wfq":
+                job.start_tag = max(self.virtual_time, self.client_finish.get(client, 0.0))
+                self.client_finish[client] = job.start_tag + job.cost / self.weights.get(client, 1.0)
+            self.queue.append(job)
+            if len(self.threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self.threads)}", daemon=True)
+                self.threads.append(thread)
+                thread.start()
+            self.condition.notify()
+        return job
+
+    def cancel(self, job_id):
+        """
+        Drop a job that has not started yet
+
+        Returns True if it was still queued (its on_cancel has then been called).
+        """
+        with self.condition:
+            job = next((job for job in self.queue if job.job_id == job_id), None)
+            if job is None:
+                return False
+            self.queue.remove(job)
+        if job.on_cancel is not None:
+            job.on_cancel()
+        return True
+
+    def _priority(self, job, now):
+        if self.policy == "sjf":
+            return (job.cost / (1.0 + (now - job.submitted) / self.aging_seconds), job.sequence)
+        if self.policy == "wfq":
+            return (job.start_tag, job.sequence)
+        return (job.sequence,)
+
+    def _next_job(self):
+        now = time.monotonic()
+        job = min(self.queue, key=lambda queued: self._priority(queued, now))
+        self.queue.remove(job)
+        if self.policy == "wfq":
+            self.virtual_time = job.start_tag
+        return job
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopped:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                job = self._next_job()
+                self.running += 1
+            try:
+                job.fn()
+            except Exception as e:
+                print(f"Scheduled job {job.job_id} failed: {e}")
+            finally:
+                with self.condition:
+                    self.running -= 1
+
+    def stats(self):
+        """Policy, pool size and the number of queued and running jobs"""
+        with self.condition:
+            return {
+                "policy": self.policy,
+                "workers": self.workers,
+                "queued": len(self.queue),
+                "running": self.running
+            }
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the queue is drained"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if wait:
+            for thread in list(self.threads):
+                thread.join()
@@ -0,0 +1,362 @@
+"""
+Job State Store for app.py
+Progress and translated results of app.py jobs live behind this interface,
+so any worker process (or node) can serve any job's /progress and /download.
+
+Backends are chosen with JOB_STORE_URL:
+- memory://                 (default) dicts and a temp dir in this process;
+                            only correct with a single worker process
+- sqlite:///jobs.db         SQLite database plus a result directory next to
+  sqlite:////abs/jobs.db    it; shared by all workers on one machine (or any
+                            machines sharing the filesystem)
+- redis://host:6379/0       Redis or any Redis-compatible server (Valkey,
+                            KeyDB, ...); needs the `redis` package
+"""
+import os
+import io
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+
+# Seconds a job's state is kept by backends that expire keys themselves (Redis)
+DEFAULT_TTL = int(os.environ.get("JOB_STORE_TTL", 24 * 60 * 60))
+
+
+class JobStore(ABC):
+    """
+    Storage interface for job progress and translated results
+
+    Progress is a small dict ({"current", "total", "message", "status"}).
+    A result is the translated workbook plus the original filename; it is
+    copied into the store, so the caller may delete its own files afterwards.
+    Backends implement every method; a missing one fails at instantiation.
+    """
+
+    @abstractmethod
+    def set_progress(self, task_id, progress):
+        """Record a job's latest progress dict"""
+
+    @abstractmethod
+    def get_progress(self, task_id):
+        """Latest progress dict, or None for unknown jobs"""
+
+    @abstractmethod
+    def put_result(self, task_id, filename, output_path):
+        """Copy a translated workbook into the store"""
+
+    @abstractmethod
+    def open_result(self, task_id):
+        """(filename, binary file object) of a stored result, or None"""
+
+    @abstractmethod
+    def delete(self, task_id):
+        """Forget a job: its progress and its result"""
+
+    @abstractmethod
+    def request_cancel(self, task_id):
+        """Flag a job for cancellation; its worker stops at its next check"""
+
+    @abstractmethod
+    def cancel_requested(self, task_id):
+        """Whether request_cancel was called for a job"""
+
+    @abstractmethod
+    def entries(self):
+        """
+        Metadata of every stored job, for the reaper (job_reaper.py)
+
+        A list of dicts with task_id, status, updated_at (epoch seconds of the
+        last progress write), result_size and result_created_at (None when the
+        job has no result).
+        """
+
+
+def _entry(task_id, status=None, updated_at=None, result_size=None, result_created_at=None):
+    return {
+        "task_id": task_id,
+        "status": status,
+        "updated_at": updated_at,
+        "result_size": result_size,
+        "result_created_at": result_created_at
+    }
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store: dicts plus result files in a private temp dir"""
+
+    def __init__(self, result_dir=None):
+        self.lock = threading.Lock()
+        self.progress = {}  # {task_id: progress dict}
+        self.updated_at = {}  # {task_id: time of the last progress write}
+        self.results = {}  # {task_id: {"filename", "path", "size", "created_at"}}
+        self.cancelled = set()  # task_ids with a pending cancel request
+        self.result_dir = result_dir  # created on first use
+
+    def set_progress(self, task_id, progress):
+        with self.lock:
+            self.progress[task_id] = dict(progress)
+            self.updated_at[task_id] = time.time()
+
+    def get_progress(self, task_id):
+        with self.lock:
+            progress = self.progress.get(task_id)
+            return dict(progress) if progress is not None else None
+
+    def put_result(self, task_id, filename, output_path):
+        with self.lock:
+            if self.result_dir is None:
+                self.result_dir = tempfile.mkdtemp(prefix="excel-translator-results-")
+        path = os.path.join(self.result_dir, f"{task_id}.xlsx")
+        shutil.copyfile(output_path, path)
+        with self.lock:
+            self.results[task_id] = {
+                "filename": filename,
+                "path": path,
+                "size": os.path.getsize(path),
+                "created_at": time.time()
+            }
+
+    def open_result(self, task_id):
+        with self.lock:
+            result = self.results.get(task_id)
+        if result is None:
+            return None
+        try:
+            return result["filename"], open(result["path"], "rb")
+        except FileNotFoundError:
+            return None
+
+    def delete(self, task_id):
+        with self.lock:
+            self.progress.pop(task_id, None)
+            self.updated_at.pop(task_id, None)
+            self.cancelled.discard(task_id)
+            result = self.results.pop(task_id, None)
+        if result is not None:
+            try:
+                os.unlink(result["path"])
+            except OSError:
+                pass
+
+    def request_cancel(self, task_id):
+        with self.lock:
+            self.cancelled.add(task_id)
+
+    def cancel_requested(self, task_id):
+        with self.lock:
+            return task_id in self.cancelled
+
+    def entries(self):
+        with self.lock:
+            entries = {
+                task_id: _entry(task_id, progress.get("status"), self.updated_at.get(task_id))
+                for task_id, progress in self.progress.items()
+            }
+            for task_id, result in self.results.items():
+                entry = entries.setdefault(task_id, _entry(task_id))
+                entry["result_size"] = result["size"]
+                entry["result_created_at"] = result["created_at"]
+        return list(entries.values())
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Store shared by every process that can open the same database file
+
+    Progress and result metadata live in SQLite (WAL mode, so readers never
+    block the writer); result files live in `result_dir`.
+    """
+
+    def __init__(self, db_path, result_dir=None):
+        self.db_path = db_path
+        self.result_dir = result_dir or f"{os.path.splitext(db_path)[0]}-results"
+        os.makedirs(self.result_dir, exist_ok=True)
+        self.local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_progress (
+                    task_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_results (
+                    task_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_cancellations (
+                    task_id TEXT PRIMARY KEY,
+                    requested_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self.local.conn = conn
+        return conn
+
+    def set_progress(self, task_id, progress):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_progress (task_id, data, updated_at) VALUES (?, ?, ?)",
+            (task_id, json.dumps(progress), time.time())
+        )
+
+    def get_progress(self, task_id):
+        row = self._connect().execute(
+            "SELECT data FROM job_progress WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_result(self, task_id, filename, output_path):
+        path = os.path.join(self.result_dir, f"{task_id}.xlsx")
+        # Copy under a temporary name and rename, so readers never see a partial file
+        partial = f"{path}.partial"
+        shutil.copyfile(output_path, partial)
+        os.replace(partial, path)
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_results (task_id, filename, path, size, created_at) VALUES (?, ?, ?, ?, ?)",
+            (task_id, filename, path, os.path.getsize(path), time.time())
+        )
+
+    def open_result(self, task_id):
+        row = self._connect().execute(
+            "SELECT filename, path FROM job_results WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return row[0], open(row[1], "rb")
+        except FileNotFoundError:
+            return None
+
+    def delete(self, task_id):
+        conn = self._connect()
+        row = conn.execute("SELECT path FROM job_results WHERE task_id = ?", (task_id,)).fetchone()
+        conn.execute("DELETE FROM job_progress WHERE task_id = ?", (task_id,))
+        conn.execute("DELETE FROM job_results WHERE task_id = ?", (task_id,))
+        conn.execute("DELETE FROM job_cancellations WHERE task_id = ?", (task_id,))
+        if row is not None:
+            try:
+                os.unlink(row[0])
+            except OSError:
+                pass
+
+    def request_cancel(self, task_id):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_cancellations (task_id, requested_at) VALUES (?, ?)",
+            (task_id, time.time())
+        )
+
+    def cancel_requested(self, task_id):
+        return self._connect().execute(
+            "SELECT 1 FROM job_cancellations WHERE task_id = ?", (task_id,)
+        ).fetchone() is not None
+
+    def entries(self):
+        conn = self._connect()
+        entries = {
+            task_id: _entry(task_id, json.loads(data).get("status"), updated_at)
+            for task_id, data, updated_at in conn.execute("SELECT task_id, data, updated_at FROM job_progress")
+        }
+        for task_id, size, created_at in conn.execute("SELECT task_id, size, created_at FROM job_results"):
+            entry = entries.setdefault(task_id, _entry(task_id))
+            entry["result_size"] = size
+            entry["result_created_at"] = created_at
+        return list(entries.values())
+
+
+class RedisJobStore(JobStore):
+    """
+    Store on a Redis-compatible server, shared by every worker and node
+
+    Keys expire after `ttl` seconds, so abandoned jobs never accumulate even
+    without the reaper.
+    """
+
+    def __init__(self, url, ttl=DEFAULT_TTL, prefix="excel-translator:job:"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("JOB_STORE_URL=redis://... requires the redis package (pip install redis)")
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, task_id, kind):
+        return f"{self.prefix}{task_id}:{kind}"
+
+    def set_progress(self, task_id, progress):
+        data = json.dumps({"progress": progress, "updated_at": time.time()})
+        self.redis.set(self._key(task_id, "progress"), data, ex=self.ttl)
+
+    def get_progress(self, task_id):
+        data = self.redis.get(self._key(task_id, "progress"))
+        return json.loads(data)["progress"] if data is not None else None
+
+    def put_result(self, task_id, filename, output_path):
+        with open(output_path, "rb") as f:
+            data = f.read()
+        self.redis.hset(self._key(task_id, "result"), mapping={
+            "filename": filename, "data": data, "size": len(data), "created_at": time.time()
+        })
+        self.redis.expire(self._key(task_id, "result"), self.ttl)
+
+    def open_result(self, task_id):
+        result = self.redis.hgetall(self._key(task_id, "result"))
+        if not result:
+            return None
+        return result[b"filename"].decode("utf-8"), io.BytesIO(result[b"data"])
+
+    def delete(self, task_id):
+        self.redis.delete(
+            self._key(task_id, "progress"), self._key(task_id, "result"), self._key(task_id, "cancel")
+        )
+
+    def request_cancel(self, task_id):
+        self.redis.set(self._key(task_id, "cancel"), 1, ex=self.ttl)
+
+    def cancel_requested(self, task_id):
+        return bool(self.redis.exists(self._key(task_id, "cancel")))
+
+    def entries(self):
+        entries = {}
+        for key in self.redis.scan_iter(match=f"{self.prefix}*:progress"):
+            task_id = key.decode("utf-8")[len(self.prefix):-len(":progress")]
+            data = self.redis.get(key)
+            if data is not None:
+                data = json.loads(data)
+                entries[task_id] = _entry(task_id, data["progress"].get("status"), data["updated_at"])
+        for key in self.redis.scan_iter(match=f"{self.prefix}*:result"):
+            task_id = key.decode("utf-8")[len(self.prefix):-len(":result")]
+            size, created_at = self.redis.hmget(key, "size", "created_at")
+            if size is not None:
+                entry = entries.setdefault(task_id, _entry(task_id))
+                entry["result_size"] = int(size)
+                entry["result_created_at"] = float(created_at)
+        return list(entries.values())
+
+
+def create_job_store(url=None):
+    """Build the store configured by JOB_STORE_URL (default: memory://)"""
+    url = (url or os.environ.get("JOB_STORE_URL", "") or "memory://").strip()
+    if url.startswith("memory://"):
+        return MemoryJobStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobStore(url)
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
@@ -0,0 +1,487 @@
+"""
+Local Load Test
+Drives concurrent upload -> progress -> download sessions against app.py,
+app_supabase.py or the api/ handlers, all running in this process against
+the local Supabase stand-in (supabase_standin.py) and an offline translator,
+so no Supabase project or Google quota is involved. Reports throughput,
+latency percentiles and error rates per operation.
+
+Targets:
+- app           app.py (local job store, SSE progress, file download)
+- app_supabase  app_supabase.py (SSE progress, redirect to a signed URL)
+- api           api/translate.py raw uploads, dispatched to api/process_job.py,
+                /api/status long-polls and /api/download redirects
+
+Scenarios:
+- full      upload, follow progress to the end, download the result
+- submit    upload and follow progress (no download)
+- upload    upload only; jobs keep running in the background
+
+Each simulated user runs one session at a time; --concurrency users share
+--jobs sessions. Workbooks are generated (workbook_generator.py), one distinct
+file per job unless --files is smaller, in which case repeated files exercise
+the result cache. The offline translator upper-cases text after sleeping
+--translate-latency seconds, standing in for the provider's response time.
+
+Settings read at import (JOB_WORKERS, TRANSLATION_CONCURRENCY, rate limits...)
+can be given with --env, since the apps are imported after it is applied.
+
+Usage:
+    python load_test.py --target app --jobs 50 --concurrency 8
+    python load_test.py --target api --scenario submit --cells 200 2000 --json
+    python load_test.py --target app_supabase --files 5 --env JOB_WORKERS=2
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import contextlib
+import importlib
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from scheduler_benchmark import percentile
+from supabase_standin import SupabaseStandIn
+from workbook_generator import generate_workbook
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = ("app", "app_supabase", "api")
+
+SCENARIOS = {
+    "full": ("upload", "progress", "download"),
+    "submit": ("upload", "progress"),
+    "upload": ("upload",),
+}
+
+TERMINAL_STATUSES = ("complete", "error", "cancelled")
+
+# Seconds a single /api/status request may hold a long-poll
+STATUS_WAIT = 5
+
+
+class OfflineTranslator:
+    """Deterministic stand-in for GoogleTranslator with a fixed response time"""
+
+    latency = 0.0
+
+    def __init__(self, source="auto", target="en"):
+        pass
+
+    def translate(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return text.upper()
+
+
+def load_api_module(name):
+    """Import api/<name>.py the way Vercel does (as a standalone module)"""
+    spec = importlib.util.spec_from_file_location(f"api_{name}", os.path.join(ROOT, "api", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def serve_thread(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+class LocalStack:
+    """
+    The target app served on local ports, with its Supabase stand-in and the offline translator
+
+        with LocalStack("api", translate_latency=0.02) as stack:
+            stack.client.upload(session, "a.xlsx", content)
+
+    Environment variables and translator patches are restored on exit.
+    """
+
+    def __init__(self, target, translate_latency=0.0, env=None):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target: {target}")
+        self.target = target
+        self.translate_latency = translate_latency
+        self.env = dict(env or {})
+        self.standin = None
+        self.servers = []
+        self.saved_env = {}
+        self.saved_translators = []
+        self.client = None
+
+    def __enter__(self):
+        try:
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def set_env(self, name, value):
+        self.saved_env.setdefault(name, os.environ.get(name))
+        os.environ[name] = value
+
+    def start(self):
+        for name, value in self.env.items():
+            self.set_env(name, value)
+
+        if self.target != "app":
+            self.standin = SupabaseStandIn().start()
+            self.set_env("SUPABASE_URL", self.standin.url)
+            self.set_env("SUPABASE_SERVICE_KEY", "service-key")
+
+        self.install_translator()
+
+        if self.target == "api":
+            process_job = self.serve_api("process_job")
+            self.set_env("JOB_DISPATCH_MODE", "invoke")
+            self.set_env("JOB_DISPATCH_URL", process_job)
+            self.client = ApiClient({name: self.serve_api(name) for name in ("translate", "status", "download")})
+        else:
+            from werkzeug.serving import make_server
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+            # A fresh import binds app_supabase's client to this stand-in
+            sys.modules.pop("app_supabase", None)
+            module = importlib.import_module(self.target)
+            server = make_server("127.0.0.1", 0, module.app, threaded=True)
+            self.servers.append(server)
+            self.client = FlaskClient(serve_thread(server))
+
+    def serve_api(self, name):
+        from http.server import ThreadingHTTPServer
+        # Without a line on stderr per request
+        handler = type("handler", (load_api_module(name).handler,), {"log_message": lambda self, *args: None})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        self.servers.append(server)
+        return serve_thread(server)
+
+    def install_translator(self):
+        import excel_translator
+        import excel_translator_optimized
+        translator = type("OfflineTranslator", (OfflineTranslator,), {"latency": self.translate_latency})
+        for module in (excel_translator, excel_translator_optimized):
+            self.saved_translators.append((module, module.GoogleTranslator))
+            module.GoogleTranslator = translator
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+        if self.standin:
+            self.standin.stop()
+            self.standin = None
+        for module, translator in self.saved_translators:
+            module.GoogleTranslator = translator
+        self.saved_translators = []
+        for name, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        self.saved_env = {}
+        if self.target == "app_supabase":
+            sys.modules.pop("app_supabase", None)
+
+
+class LoadTestError(Exception):
+    """An operation of a session failed"""
+
+
+def check(response, *codes):
+    if response.status_code not in codes:
+        raise LoadTestError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+class FlaskClient:
+    """Sessions against app.py / app_supabase.py"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def upload(self, session, filename, content):
+        response = check(session.post(
+            f"{self.url}/translate", files={"file": (filename, content)},
+            data={"source_lang": "fr", "target_lang": "en"}), 202)
+        return response.json()["task_id"]
+
+    def wait(self, session, task_id, deadline):
+        """Follow the SSE progress stream (reconnecting if it ends early) until the job finishes"""
+        requests_made = 0
+        while time.monotonic() < deadline:
+            requests_made += 1
+            with session.get(f"{self.url}/progress/{task_id}", stream=True,
+                             timeout=max(deadline - time.monotonic(), 1)) as response:
+                check(response, 200)
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    progress = json.loads(line[len("data: "):])
+                    if "error" in progress and "status" not in progress:
+                        raise LoadTestError(progress["error"])
+                    if progress["status"] in TERMINAL_STATUSES:
+                        return progress["status"], progress.get("message"), requests_made
+        raise LoadTestError("Timed out waiting for the job")
+
+    def download(self, session, task_id):
+        return check(session.get(f"{self.url}/download/{task_id}"), 200).content
+
+
+class ApiClient:
+    """Sessions against the api/ handlers"""
+
+    def __init__(self, urls):
+        self.urls = urls
+
+    def upload(self, session, filename, content):
+        response = check(session.post(
+            f"{self.urls['translate']}?filename={filename}&source_lang=fr&target_lang=en", data=content,
+            headers={"Content-Type": "application/octet-stream"}), 200, 202)
+        return response.json()["task_id"]
+
+    def wait(self, session, task_id, deadline):
+        """Long-poll /api/status until the job finishes"""
+        etag = None
+        requests_made = 0
+        while time.monotonic() < deadline:
+            requests_made += 1
+            headers = {"If-None-Match": etag} if etag else {}
+            response = check(session.get(
+                f"{self.urls['status']}?job_id={task_id}&wait={STATUS_WAIT}", headers=headers), 200, 304)
+            if response.status_code == 304:
+                continue
+            etag = response.headers.get("ETag")
+            job = response.json()
+            if job["status"] in TERMINAL_STATUSES:
+                return job["status"], job.get("error") or job.get("message"), requests_made
+        raise LoadTestError("Timed out waiting for the job")
+
+    def download(self, session, task_id):
+        # Redirected to a signed storage URL, which requests follows
+        return check(session.get(f"{self.urls['download']}?job_id={task_id}"), 200).content
+
+
+class Recorder:
+    """Latencies, errors and request counts of every operation, from all users"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}  # {operation: [seconds of successful runs]}
+        self.errors = {}  # {operation: count}
+        self.error_samples = []
+        self.requests = 0
+
+    def record(self, operation, seconds=None, error=None, requests_made=1):
+        with self.lock:
+            self.requests += requests_made
+            self.latencies.setdefault(operation, [])
+            self.errors.setdefault(operation, 0)
+            if error is None:
+                self.latencies[operation].append(seconds)
+            else:
+                self.errors[operation] += 1
+                if len(self.error_samples) < 10:
+                    self.error_samples.append(f"{operation}: {error}")
+
+    def summary(self, operation):
+        latencies = self.latencies.get(operation, [])
+        errors = self.errors.get(operation, 0)
+        count = len(latencies) + errors
+        return {
+            "count": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "max": max(latencies) if latencies else None,
+        }
+
+
+def make_workbooks(directory, count, cells=(200,), seed=0):
+    """`count` distinct workbooks as (filename, bytes), sizes cycling through `cells`"""
+    rng = random.Random(seed)
+    workbooks = []
+    for index in range(count):
+        size = cells[index % len(cells)]
+        path = os.path.join(directory, f"load-{index}-{size}.xlsx")
+        generate_workbook(path, rows=max(size // 10, 1), cols=min(size, 10), formula_density=0.1,
+                          seed=rng.randrange(2 ** 31))
+        with open(path, "rb") as f:
+            workbooks.append((os.path.basename(path), f.read()))
+    return workbooks
+
+
+def run_session(client, recorder, steps, filename, content, timeout):
+    """One user session: the scenario's steps for one workbook; returns the job's id once uploaded"""
+    session = requests.Session()
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    task_id = None
+    try:
+        step_started = time.perf_counter()
+        try:
+            task_id = client.upload(session, filename, content)
+        except Exception as e:
+            recorder.record("upload", error=e)
+            raise
+        recorder.record("upload", time.perf_counter() - step_started)
+
+        if "progress" in steps:
+            step_started = time.perf_counter()
+            try:
+                status, message, requests_made = client.wait(session, task_id, deadline)
+                if status != "complete":
+                    raise LoadTestError(f"job {status}: {message}")
+            except Exception as e:
+                recorder.record("progress", error=e)
+                raise
+            recorder.record("progress", time.perf_counter() - step_started, requests_made=requests_made)
+
+        if "download" in steps:
+            step_started = time.perf_counter()
+            try:
+                output = client.download(session, task_id)
+                if not output.startswith(b"PK"):
+                    raise LoadTestError("download is not an .xlsx file")
+            except Exception as e:
+                recorder.record("download", error=e)
+                raise
+            recorder.record("download", time.perf_counter() - step_started)
+
+    except Exception as e:
+        recorder.record("session", error=e, requests_made=0)
+    else:
+        recorder.record("session", time.perf_counter() - started, requests_made=0)
+    finally:
+        session.close()
+    return task_id
+
+
+def drain(client, task_ids, timeout):
+    """Wait, unmeasured, for jobs nobody followed, so none is cut off when the stack stops"""
+    deadline = time.monotonic() + timeout
+    with requests.Session() as session:
+        for task_id in task_ids:
+            try:
+                client.wait(session, task_id, deadline)
+            except Exception as e:
+                print(f"Job {task_id} did not finish: {e}")
+
+
+def run_load_test(target="app", scenario="full", jobs=20, concurrency=4, cells=(200,), files=None,
+                  translate_latency=0.02, timeout=300, seed=0, env=None):
+    """
+    Run one load test
+
+    Returns a report: the settings, wall seconds, sessions and requests per
+    second, and per operation (upload, progress, download and whole session)
+    its count, errors, error rate and p50/p95/p99/mean/max seconds.
+    """
+    steps = SCENARIOS[scenario]
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory(prefix="load-test-") as directory:
+        workbooks = make_workbooks(directory, min(files or jobs, jobs), cells, seed)
+        with LocalStack(target, translate_latency, env) as stack:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                futures = [
+                    pool.submit(run_session, stack.client, recorder, steps, *workbooks[index % len(workbooks)], timeout)
+                    for index in range(jobs)
+                ]
+            seconds = time.perf_counter() - started
+            if "progress" not in steps:
+                drain(stack.client, [future.result() for future in futures if future.result()], timeout)
+
+    sessions = recorder.summary("session")
+    return {
+        "target": target,
+        "scenario": scenario,
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "cells": list(cells),
+        "translate_latency": translate_latency,
+        "seconds": seconds,
+        "sessions_per_second": (sessions["count"] - sessions["errors"]) / seconds,
+        "requests_per_second": recorder.requests / seconds,
+        "operations": {operation: recorder.summary(operation) for operation in steps + ("session",)},
+        "error_samples": recorder.error_samples,
+    }
+
+
+def print_report(report):
+    print(f"{report['target']} / {report['scenario']}: {report['jobs']} sessions, "
+          f"{report['concurrency']} concurrent, cells {report['cells']}, "
+          f"translate latency {report['translate_latency']}s")
+    print(f"{report['seconds']:.1f}s wall, {report['sessions_per_second']:.2f} sessions/s, "
+          f"{report['requests_per_second']:.2f} requests/s\n")
+    print(f"{'operation':<10} {'count':>6} {'errors':>7} {'error%':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for operation, summary in report["operations"].items():
+        timings = " ".join(
+            f"{summary[key]:>8.3f}s" if summary[key] is not None else f"{'-':>9}"
+            for key in ("p50", "p95", "p99", "max"))
+        print(f"{operation:<10} {summary['count']:>6} {summary['errors']:>7} "
+              f"{summary['error_rate'] * 100:>6.1f}% {timings}")
+    if report["error_samples"]:
+        print("\nFirst errors:")
+        for sample in report["error_samples"]:
+            print(f"  {sample}")
+
+
+def parse_env(pairs):
+    env = {}
+    for pair in pairs:
+        name, separator, value = pair.partition("=")
+        if not separator:
+            raise argparse.ArgumentTypeError(f"--env expects NAME=VALUE, got {pair!r}")
+        env[name] = value
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the apps locally against a Supabase stand-in")
+    parser.add_argument("--target", choices=TARGETS, default="app")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="full")
+    parser.add_argument("--jobs", type=int, default=20, help="Sessions to run in total")
+    parser.add_argument("--concurrency", type=int, default=4, help="Simulated users running sessions at once")
+    parser.add_argument("--cells", type=int, nargs="+", default=[200], help="Workbook sizes, cycled through")
+    parser.add_argument("--files", type=int, help="Distinct workbooks (default: one per session)")
+    parser.add_argument("--translate-latency", type=float, default=0.02,
+                        help="Seconds the offline translator takes per call")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds a session may take")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", nargs="*", default=[], metavar="NAME=VALUE",
+                        help="Environment for the apps, e.g. JOB_WORKERS=8")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    # What the apps print goes to stderr, leaving stdout to the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_load_test(
+            target=args.target, scenario=args.scenario, jobs=args.jobs, concurrency=args.concurrency,
+            cells=args.cells, files=args.files, translate_latency=args.translate_latency,
+            timeout=args.timeout, seed=args.seed, env=parse_env(args.env))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    failed = report["operations"]["session"]["errors"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
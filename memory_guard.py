@@ -0,0 +1,135 @@
+"""
+Worker Memory Guard
+openpyxl holds a whole workbook in memory, so a big enough upload gets the
+worker SIGKILLed by the OOM killer mid-job, leaving the job stuck in
+"processing". The guard turns that into an ordinary job error:
+
+- before a workbook is loaded, its memory is projected from the uncompressed
+  size of its sheet XML (or the .xls file size) and the job is refused if
+  the projection does not fit in what the worker has left
+- while cells are translated, resident memory is checked every
+  MEMORY_CHECK_INTERVAL cells and the job stops once it crosses the limit
+
+Settings:
+- WORKER_MEMORY_LIMIT_MB      memory a worker may use. Default: the cgroup
+                              limit (containers) or AWS_LAMBDA_FUNCTION_MEMORY_SIZE
+                              (Vercel); no limit when neither is known
+- MEMORY_GUARD_HEADROOM       fraction of the limit jobs may use (default 0.9)
+- MEMORY_PER_XML_BYTE         resident bytes per byte of sheet XML (default 10)
+- MEMORY_PER_XLS_BYTE         resident bytes per byte of .xls file (default 6)
+
+The ratio defaults are the highest measured by the memory benchmarks
+(tests/test_memory_benchmarks.py) on generated workbooks of 20k-300k cells:
+7-10x the sheet XML for short strings (long strings come lower), and 4-6x
+the .xls file beyond a few MB.
+"""
+import os
+import zipfile
+from functools import lru_cache
+
+# Memory a worker may use, in MB (0 = detect)
+WORKER_MEMORY_LIMIT_MB = float(os.environ.get("WORKER_MEMORY_LIMIT_MB", 0))
+
+# Fraction of the limit jobs may use; the rest is left for the interpreter's own growth
+MEMORY_GUARD_HEADROOM = float(os.environ.get("MEMORY_GUARD_HEADROOM", 0.9))
+
+# Projected resident bytes per byte of uncompressed worksheet/shared string XML
+MEMORY_PER_XML_BYTE = float(os.environ.get("MEMORY_PER_XML_BYTE", 10))
+
+# Projected resident bytes per byte of a legacy .xls file (xlrd + the converted copy)
+MEMORY_PER_XLS_BYTE = float(os.environ.get("MEMORY_PER_XLS_BYTE", 6))
+
+# Cells between resident memory checks in the translation loop
+MEMORY_CHECK_INTERVAL = 500
+
+CGROUP_LIMIT_FILES = (
+    "/sys/fs/cgroup/memory.max",                     # cgroup v2
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",   # cgroup v1
+)
+
+# cgroup v1 reports "no limit" as a number close to 2**63
+UNLIMITED = 2 ** 60
+
+
+class MemoryLimitExceeded(Exception):
+    """A job would not fit, or no longer fits, in the worker's memory"""
+
+
+def worker_memory_limit():
+    """Bytes this worker may use, or None when there is no known limit"""
+    if WORKER_MEMORY_LIMIT_MB > 0:
+        return int(WORKER_MEMORY_LIMIT_MB * 1024 * 1024)
+    return _detected_memory_limit()
+
+
+@lru_cache(maxsize=None)
+def _detected_memory_limit():
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < UNLIMITED:
+            return int(value)
+    lambda_mb = os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "")
+    if lambda_mb.isdigit():
+        return int(lambda_mb) * 1024 * 1024
+    return None
+
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def project_workbook_memory(path):
+    """Projected resident bytes to load and translate a workbook, or None if unknown"""
+    try:
+        if path.lower().endswith(".xls"):
+            return int(os.path.getsize(path) * MEMORY_PER_XLS_BYTE)
+        with zipfile.ZipFile(path) as archive:
+            xml_bytes = sum(
+                info.file_size for info in archive.infolist()
+                if info.filename.startswith("xl/worksheets/") or info.filename == "xl/sharedStrings.xml"
+            )
+        return int(xml_bytes * MEMORY_PER_XML_BYTE)
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+def _mb(value):
+    return f"{value / 1024 / 1024:.0f} MB"
+
+
+def check_workbook_fits(path):
+    """Raise MemoryLimitExceeded if loading the workbook would exceed the worker's limit"""
+    limit = worker_memory_limit()
+    projected = project_workbook_memory(path)
+    rss = current_rss()
+    if limit is None or projected is None or rss is None:
+        return
+    budget = limit * MEMORY_GUARD_HEADROOM
+    if rss + projected > budget:
+        raise MemoryLimitExceeded(
+            f"Workbook too large for this worker: translating it needs about {_mb(projected)} "
+            f"of memory, but only {_mb(max(budget - rss, 0))} of the {_mb(limit)} limit is available. "
+            f"Split the workbook into smaller files and try again."
+        )
+
+
+def check_memory():
+    """Raise MemoryLimitExceeded once resident memory passes the worker's limit"""
+    limit = worker_memory_limit()
+    rss = current_rss()
+    if limit is None or rss is None:
+        return
+    if rss > limit * MEMORY_GUARD_HEADROOM:
+        raise MemoryLimitExceeded(
+            f"Translation stopped: the worker is using {_mb(rss)} of its {_mb(limit)} memory limit. "
+            f"Split the workbook into smaller files and try again."
+        )
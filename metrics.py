@@ -0,0 +1,224 @@
+"""
+Prometheus Metrics
+Counters, gauges and histograms of the translation service, exposed by the
+Flask apps at GET /metrics in the Prometheus text format (version 0.0.4).
+
+Instrumentation is meant to stay on in the cell loop: label values are bound
+once (the children below are created at import), so an increment is a single
+locked add with no label lookup. Gauges that mirror existing state (queue
+depth, running jobs) read it when scraped instead of being kept in step.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+import threading
+from bisect import bisect_left
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets (seconds) for stage and job latencies
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def get(self):
+        return self.value
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+
+class _GaugeChild(_CounterChild):
+    def __init__(self):
+        super().__init__()
+        self.function = None
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time"""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+    def samples(self, name, labels):
+        return [(name, labels, self.get())]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name, labels):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            samples.append((f"{name}_bucket", labels + [("le", _format_value(bound))], cumulative))
+        samples.append((f"{name}_sum", labels, total))
+        samples.append((f"{name}_count", labels, cumulative))
+        return samples
+
+
+class _Metric:
+    """A metric family; labels() (no values if it has no label names) gives the child to update"""
+    type = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self._new_child()
+        registry.append(self)
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values):
+        """The child for these label values; bind it once and keep it"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type}"]
+        for key, child in sorted(self.children.items()):
+            labels = list(zip(self.labelnames, key))
+            for name, sample_labels, value in child.samples(self.name, labels):
+                lines.append(f"{name}{_format_labels(sample_labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+    child_class = _CounterChild
+
+
+class Gauge(_Metric):
+    type = "gauge"
+    child_class = _GaugeChild
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+def render(registry=REGISTRY):
+    """All metrics in the Prometheus text format"""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+JOBS = Counter("excel_translator_jobs_total", "Translation jobs finished, by status", ["status"])
+JOBS_QUEUED = Gauge("excel_translator_jobs_queued", "Jobs waiting for a scheduler worker").labels()
+JOBS_RUNNING = Gauge("excel_translator_jobs_running", "Jobs being translated").labels()
+JOB_SECONDS = Histogram("excel_translator_job_seconds", "Wall-clock seconds of finished jobs").labels()
+STAGE_SECONDS = Histogram("excel_translator_stage_seconds",
+                          "Seconds finished jobs spent per stage (see stage_timing.py)", ["stage"])
+
+CELLS_PROCESSED = Counter("excel_translator_cells_processed_total",
+                          "Text and formula cells processed; rate() gives cells per second").labels()
+
+TRANSLATION_CALLS = Counter("excel_translator_translation_calls_total",
+                            "Calls to the translation provider, by result", ["result"])
+TRANSLATION_CALLS_OK = TRANSLATION_CALLS.labels("ok")
+TRANSLATION_CALLS_FAILED = TRANSLATION_CALLS.labels("error")
+TRANSLATION_CHARS = Counter("excel_translator_translation_chars_total",
+                            "Characters sent to the translation provider").labels()
+TRANSLATION_CALLS_QUEUED = Gauge("excel_translator_translation_calls_queued",
+                                 "Translation calls waiting for the shared executor").labels()
+
+CACHE_LOOKUPS = Counter("excel_translator_result_cache_lookups_total",
+                        "Identical-translation lookups: hit (reused), coalesced (joined one in flight) or miss",
+                        ["result"])
+CACHE_HITS = CACHE_LOOKUPS.labels("hit")
+CACHE_COALESCED = CACHE_LOOKUPS.labels("coalesced")
+CACHE_MISSES = CACHE_LOOKUPS.labels("miss")
+
+THROTTLE_EVENTS = Counter("excel_translator_throttle_events_total",
+                          "Translation calls delayed by the node-wide rate limit").labels()
+THROTTLE_SECONDS = Counter("excel_translator_throttle_seconds_total",
+                           "Seconds translation calls waited on the rate limit").labels()
+
+SSE_STREAMS = Gauge("excel_translator_sse_streams", "Progress streams (Server-Sent Events) open").labels()
+
+
+def observe_job(status, timings):
+    """Count a finished job and its per-stage timings (stage_timing.StageTimer.as_dict())"""
+    JOBS.labels(status).inc()
+    for stage, seconds in timings.items():
+        if stage == "total":
+            JOB_SECONDS.observe(seconds)
+        else:
+            STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def track_scheduler(scheduler):
+    """Report a job scheduler's queue and the shared translation executor's queue"""
+    from translation_executor import get_translation_executor
+    JOBS_QUEUED.set_function(lambda: scheduler.stats()["queued"])
+    JOBS_RUNNING.set_function(lambda: scheduler.stats()["running"])
+    TRANSLATION_CALLS_QUEUED.set_function(lambda: get_translation_executor().stats()["queued"])
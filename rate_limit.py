@@ -0,0 +1,151 @@
+"""
+Node-wide Translation Rate Limit
+The provider's quota applies per egress IP, so every process on a machine
+(Flask workers, Vercel function instances sharing /tmp, local scripts) draws
+from the same token buckets: one for requests and one for characters.
+
+The buckets live in a small SQLite database (TRANSLATION_RATE_LIMIT_PATH);
+each take is one short BEGIN IMMEDIATE transaction, so concurrent processes
+are serialized by SQLite's file lock.
+
+Settings (0 disables a limit; both 0 - the default - disables rate limiting):
+- TRANSLATION_RATE_LIMIT_RPS     translation requests per second
+- TRANSLATION_RATE_LIMIT_CPS     characters sent per second
+- TRANSLATION_RATE_LIMIT_BURST   seconds of budget a bucket holds when idle
+"""
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from metrics import THROTTLE_EVENTS, THROTTLE_SECONDS
+
+# Translation requests per second, summed over all processes (0 = unlimited)
+RATE_LIMIT_RPS = float(os.environ.get("TRANSLATION_RATE_LIMIT_RPS", 0))
+
+# Characters per second, summed over all processes (0 = unlimited)
+RATE_LIMIT_CPS = float(os.environ.get("TRANSLATION_RATE_LIMIT_CPS", 0))
+
+# Burst size, in seconds of the configured rates
+RATE_LIMIT_BURST = float(os.environ.get("TRANSLATION_RATE_LIMIT_BURST", 1))
+
+# Bucket database; every process using the same file shares the limit
+RATE_LIMIT_PATH = os.environ.get("TRANSLATION_RATE_LIMIT_PATH") or os.path.join(
+    tempfile.gettempdir(), "excel-translator-rate-limit.db")
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Token buckets for requests and characters, shared through SQLite
+
+    Args:
+        requests_per_second: Request rate (default: TRANSLATION_RATE_LIMIT_RPS)
+        chars_per_second: Character rate (default: TRANSLATION_RATE_LIMIT_CPS)
+        burst_seconds: Bucket capacity in seconds of rate (default: TRANSLATION_RATE_LIMIT_BURST)
+        path: SQLite database file (default: TRANSLATION_RATE_LIMIT_PATH)
+    """
+
+    def __init__(self, requests_per_second=None, chars_per_second=None, burst_seconds=None, path=None):
+        self.requests_per_second = RATE_LIMIT_RPS if requests_per_second is None else requests_per_second
+        self.chars_per_second = RATE_LIMIT_CPS if chars_per_second is None else chars_per_second
+        self.burst_seconds = burst_seconds or RATE_LIMIT_BURST
+        self.path = path or RATE_LIMIT_PATH
+        self.local = threading.local()
+        self.waited = 0.0  # seconds this process spent waiting for tokens
+        self.buckets = [
+            (name, rate, max(rate * self.burst_seconds, 1.0))
+            for name, rate in (("requests", self.requests_per_second), ("chars", self.chars_per_second))
+            if rate > 0
+        ]
+        if self.buckets:
+            self._connect().execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    @property
+    def enabled(self):
+        return bool(self.buckets)
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self.local.conn = conn
+        return conn
+
+    def _take(self, costs):
+        """
+        Take the costs from every bucket, or nothing
+
+        Returns 0 on success, otherwise the seconds until the emptiest bucket
+        has refilled enough.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            wait = 0.0
+            for name, rate, capacity in self.buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE name = ?", (name,)
+                ).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(now - row[1], 0.0) * rate)
+                # A single call larger than the bucket waits for a full bucket
+                cost = min(costs[name], capacity)
+                levels.append((name, tokens - cost))
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            if wait == 0.0:
+                for name, tokens in levels:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rate_limit_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                        (name, tokens, now)
+                    )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, chars=0, requests=1):
+        """
+        Block until one request of `chars` characters fits within the limits
+
+        Returns the seconds spent waiting.
+        """
+        if not self.buckets:
+            return 0.0
+        costs = {"requests": requests, "chars": chars}
+        started = time.monotonic()
+        throttled = False
+        while True:
+            wait = self._take(costs)
+            if wait == 0.0:
+                break
+            throttled = True
+            time.sleep(wait)
+        waited = time.monotonic() - started
+        self.waited += waited
+        if throttled:
+            THROTTLE_EVENTS.inc()
+            THROTTLE_SECONDS.inc(waited)
+        return waited
+
+
+def get_rate_limiter():
+    """The process-wide rate limiter (created on first use)"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
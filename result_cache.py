@@ -0,0 +1,81 @@
+"""
+Content-addressed Result Cache
+Identical submissions (same file bytes, same language pair, same engine)
+reuse a completed translation, or attach to the job already translating them,
+instead of being translated again from scratch.
+
+Jobs are keyed by translation_jobs.content_hash. A job that attaches to an
+in-flight one records it in coalesced_with and stays pending until that
+leader finishes; the leader then copies its outcome to all of its followers.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from supabase_rest import select_jobs, update_jobs
+from translation_stats import reused_stats
+
+# Part of every content hash - bump it when a change to the translation engine
+# should stop old results from being reused
+TRANSLATION_ENGINE = "google-translate:1"
+
+
+def compute_content_hash(file_digest, source_lang, target_lang, engine=TRANSLATION_ENGINE):
+    """
+    Cache key for a translation request
+
+    Args:
+        file_digest: SHA-256 hex digest of the uploaded file bytes
+        source_lang: Source language code
+        target_lang: Target language code
+        engine: Identifier of the translation engine and its options
+    """
+    key = "\n".join([file_digest, source_lang, target_lang, engine])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def find_reusable_job(content_hash, inflight_statuses=("pending", "processing")):
+    """
+    Find an existing job for the same content
+
+    Returns the newest complete job if there is one, otherwise the oldest
+    in-flight job (the leader new submissions attach to), otherwise None.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    statuses = ",".join(("complete",) + tuple(inflight_statuses))
+    jobs = select_jobs(
+        "id, status, output_file_path, expires_at, created_at, translation_stats",
+        order="created_at.asc,id.asc",
+        content_hash=f"eq.{content_hash}",
+        status=f"in.({statuses})",
+        coalesced_with="is.null",
+        expires_at=f"gt.{now}",
+    )
+
+    complete = [job for job in jobs if job["status"] == "complete" and job["output_file_path"]]
+    if complete:
+        return complete[-1]
+
+    inflight = [job for job in jobs if job["status"] in inflight_statuses]
+    return inflight[0] if inflight else None
+
+
+def cached_result_fields(source_job, result_cache="hit"):
+    """Columns that make a job point at another job's completed output"""
+    return {
+        "status": "complete",
+        "output_file_path": source_job["output_file_path"],
+        "progress_message": "Translation complete! (reused identical result)",
+        "current_cell": 100,
+        "total_cells": 100,
+        "translation_stats": reused_stats(source_job.get("translation_stats"), result_cache)
+    }
+
+
+def keep_result_alive(source_job, lifetime=timedelta(hours=24)):
+    """Extend a reused job's expiry so its output outlives the jobs pointing at it"""
+    expires_at = (datetime.now(timezone.utc) + lifetime).isoformat()
+    update_jobs({"expires_at": expires_at}, id=f"eq.{source_job['id']}")
+
+
+def release_followers(leader_id, changes):
+    """Copy a leader's final state to every job coalesced with it"""
+    update_jobs(changes, coalesced_with=f"eq.{leader_id}", status="eq.pending")
@@ -5,6 +5,15 @@ import subprocess
 import sys
 import os
 
+# pytest-benchmark JSON baselines of tests/test_benchmarks.py
+BENCHMARK_STORAGE = "file://tests/benchmarks"
+
+# Where --memory writes the memory benchmark results
+MEMORY_REPORT = "memory_benchmarks.json"
+
+# Median slowdown against the baseline that fails --performance (percent)
+BENCHMARK_MAX_REGRESSION = float(os.environ.get("BENCHMARK_MAX_REGRESSION", 25))
+
 
 def run_command(cmd, description):
     """Run a command and print results"""
@@ -76,28 +85,71 @@ def run_with_coverage():
 
 
 def run_performance_only():
-    """Run only performance benchmarks"""
+    """Run the offline benchmarks and compare them with the latest baseline"""
     print("\n" + "="*70)
     print("  PERFORMANCE BENCHMARKS")
     print("="*70)
 
-    cmd = "pytest tests/test_performance.py --benchmark-only -v"
-    result = subprocess.run(cmd, shell=True)
+    cmd = (f"pytest tests/test_benchmarks.py --benchmark-only --benchmark-disable-gc --benchmark-storage={BENCHMARK_STORAGE} "
+           f"--benchmark-compare --benchmark-compare-fail=min:{BENCHMARK_MAX_REGRESSION:g}%")
+    result = subprocess.run(cmd, shell=True, env={**os.environ, "BENCHMARK_SIZES": "small,medium,large"})
 
     return result.returncode
 
 
+def save_benchmark_baseline():
+    """Run the offline benchmarks and save the results as the new baseline"""
+    print("\n" + "="*70)
+    print("  SAVING BENCHMARK BASELINE")
+    print("="*70)
+
+    cmd = f"pytest tests/test_benchmarks.py --benchmark-only --benchmark-disable-gc --benchmark-storage={BENCHMARK_STORAGE} --benchmark-save=baseline"
+    result = subprocess.run(cmd, shell=True, env={**os.environ, "BENCHMARK_SIZES": "small,medium,large"})
+
+    return result.returncode
+
+
+def run_memory_benchmarks():
+    """Measure the memory of the engine and storage handlers at every workbook size"""
+    print("\n" + "="*70)
+    print("  MEMORY BENCHMARKS")
+    print("="*70)
+
+    cmd = f"pytest tests/test_memory_benchmarks.py --benchmark-only --benchmark-json={MEMORY_REPORT}"
+    result = subprocess.run(cmd, shell=True, env={**os.environ, "BENCHMARK_SIZES": "small,medium,large"})
+    if result.returncode != 0:
+        return result.returncode
+
+    import json
+    with open(MEMORY_REPORT) as f:
+        benchmarks = json.load(f)["benchmarks"]
+    print(f"\n{'Benchmark':<40} {'tracemalloc peak':>17} {'RSS high-water':>15} {'RSS growth':>11} {'projected':>10}")
+    for bench in benchmarks:
+        info = bench["extra_info"]
+        projected = f"{info['projected_mb']:.1f}" if "projected_mb" in info else "-"
+        print(f"{bench['name']:<40} {info['tracemalloc_peak_mb']:>17.1f} {info['rss_high_water_mb']:>15.1f} "
+              f"{info['rss_growth_mb']:>11.1f} {projected:>10}")
+    print(f"\nMB; full results in {MEMORY_REPORT}")
+    return 0
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         if sys.argv[1] == "--coverage":
             sys.exit(run_with_coverage())
         elif sys.argv[1] == "--performance":
             sys.exit(run_performance_only())
+        elif sys.argv[1] == "--save-baseline":
+            sys.exit(save_benchmark_baseline())
+        elif sys.argv[1] == "--memory":
+            sys.exit(run_memory_benchmarks())
         elif sys.argv[1] == "--help":
             print("Usage:")
             print("  python run_tests.py              # Run all tests")
             print("  python run_tests.py --coverage   # Run with coverage report")
-            print("  python run_tests.py --performance # Run performance benchmarks only")
+            print("  python run_tests.py --performance # Run offline benchmarks against the baseline")
+            print("  python run_tests.py --save-baseline # Save offline benchmark results as the baseline")
+            print("  python run_tests.py --memory     # Measure memory use at every workbook size")
             sys.exit(0)
 
     sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Scheduler Benchmark
+Replays a job arrival trace through JobScheduler (job_scheduler.py) and
+reports completion latency - arrival to finish - at p50/p95/p99 for each
+scheduling policy, so policies are compared on the same mixed-size workload.
+
+Jobs are simulated: each one sleeps for cost / --strings-per-second seconds.
+Time runs --speedup times faster than the trace; latencies are reported in
+trace seconds.
+
+Usage:
+    python scheduler_benchmark.py
+    python scheduler_benchmark.py --policies sjf fifo --workers 4 --json
+    python scheduler_benchmark.py --trace trace.json
+
+A trace file is a JSON list of {"arrival": seconds, "cost": strings, "client": "..."}.
+"""
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from job_scheduler import JobScheduler, POLICIES, AGING_SECONDS
+
+
+def generate_trace(jobs=300, seed=1, mean_interarrival=1.0, clients=10):
+    """
+    Seeded mixed-size arrival trace
+
+    Mostly small workbooks (tens to hundreds of strings), some medium ones
+    (thousands) and a few monsters (hundreds of thousands), arriving as a
+    Poisson process from `clients` interactive users plus one batch client.
+    """
+    rng = random.Random(seed)
+    trace = []
+    arrival = 0.0
+    for _ in range(jobs):
+        arrival += rng.expovariate(1.0 / mean_interarrival)
+        kind = rng.random()
+        if kind < 0.85:
+            cost = int(rng.lognormvariate(math.log(80), 0.6))
+            client = f"user-{rng.randrange(clients)}"
+        elif kind < 0.98:
+            cost = rng.randint(1_000, 10_000)
+            client = f"user-{rng.randrange(clients)}"
+        else:
+            cost = rng.randint(100_000, 500_000)
+            client = "batch"
+        trace.append({"arrival": round(arrival, 3), "cost": max(cost, 1), "client": client})
+    return trace
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(math.ceil(pct / 100.0 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies):
+    """p50/p95/p99, mean and max of completion latencies"""
+    return {
+        "jobs": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "max": max(latencies) if latencies else None
+    }
+
+
+def replay(trace, policy, workers=4, strings_per_second=1000.0, speedup=400.0):
+    """
+    Run a trace through a JobScheduler
+
+    Returns the completion latency of every job, in trace seconds, in trace order.
+    """
+    scheduler = JobScheduler(workers=workers, policy=policy, aging_seconds=AGING_SECONDS / speedup)
+    finished = [None] * len(trace)
+    done = threading.Semaphore(0)
+    started = time.monotonic()
+
+    def make_job(index, duration):
+        def job():
+            time.sleep(duration)
+            finished[index] = time.monotonic()
+            done.release()
+        return job
+
+    for index, entry in enumerate(trace):
+        delay = started + entry["arrival"] / speedup - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        duration = entry["cost"] / strings_per_second / speedup
+        scheduler.submit(make_job(index, duration), cost=entry["cost"], client=entry.get("client"))
+
+    for _ in trace:
+        done.acquire()
+    scheduler.shutdown()
+
+    return [
+        (finished[index] - started) * speedup - entry["arrival"]
+        for index, entry in enumerate(trace)
+    ]
+
+
+def run_benchmark(trace, policies=POLICIES, **options):
+    """Replay the trace once per policy; returns {policy: summary}"""
+    return {policy: summarize(replay(trace, policy, **options)) for policy in policies}
+
+
+def print_report(results):
+    print(f"{'policy':<8} {'jobs':>6} {'p50':>10} {'p95':>10} {'p99':>10} {'mean':>10} {'max':>10}")
+    for policy, summary in results.items():
+        print(f"{policy:<8} {summary['jobs']:>6} " + " ".join(
+            f"{summary[key]:>9.1f}s" for key in ("p50", "p95", "p99", "mean", "max")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a job arrival trace through the job scheduler")
+    parser.add_argument("--trace", help="JSON trace file (default: synthetic trace)")
+    parser.add_argument("--jobs", type=int, default=300, help="Jobs in the synthetic trace")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic trace")
+    parser.add_argument("--policies", nargs="+", choices=POLICIES, default=list(POLICIES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--strings-per-second", type=float, default=1000.0,
+                        help="Simulated translation throughput of one worker")
+    parser.add_argument("--speedup", type=float, default=400.0, help="Replay this many times faster than real time")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        with open(args.trace) as f:
+            trace = json.load(f)
+    else:
+        trace = generate_trace(jobs=args.jobs, seed=args.seed)
+
+    results = run_benchmark(
+        trace, args.policies, workers=args.workers,
+        strings_per_second=args.strings_per_second, speedup=args.speedup)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Per-stage Job Timings
+Wall-clock seconds a job spent in each stage - storage download, .xls
+conversion, load_workbook, counting passes, translation calls, write-back,
+save, upload - so a slow job shows where its time went.
+
+Timings are stored with the job (translation_jobs.timings, or the job's final
+progress in app.py) and logged once per job as a single JSON line:
+    {"event": "job_timings", "job_id": "...", "status": "complete", "timings": {...}}
+and observed by the stage latency histograms of metrics.py.
+"""
+import json
+import time
+from contextlib import contextmanager
+from metrics import observe_job
+
+
+class StageTimer:
+    """Accumulates seconds per named stage; a stage may run many times"""
+
+    def __init__(self):
+        self.timings = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def seconds(self, name):
+        return self.timings.get(name, 0.0)
+
+    def as_dict(self):
+        """Seconds per stage in the order they first ran, plus the total so far"""
+        timings = {name: round(seconds, 3) for name, seconds in self.timings.items()}
+        timings["total"] = round(time.perf_counter() - self.started, 3)
+        return timings
+
+
+def log_timings(job_id, status, timings):
+    """Log a job's stage timings as one machine-parsable JSON line (and count them in metrics.py)"""
+    observe_job(status, timings)
+    print(json.dumps({"event": "job_timings", "job_id": job_id, "status": status, "timings": timings}))
@@ -7,6 +7,10 @@ const SUPABASE_ANON_KEY = 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBh
 
 const supabase = window.supabase.createClient(SUPABASE_URL, SUPABASE_ANON_KEY);
 
+// Files up to this size are offered to the server for inline translation
+// (matches INLINE_MAX_BYTES in workbook_estimate.py)
+const INLINE_MAX_BYTES = 512 * 1024;
+
 class ExcelTranslatorCloud {
     constructor() {
         this.uploadArea = document.getElementById('upload-area');
@@ -26,10 +30,13 @@ class ExcelTranslatorCloud {
         this.sourceLang = document.getElementById('source-lang');
         this.targetLang = document.getElementById('target-lang');
         this.swapBtn = document.getElementById('swap-languages');
+        this.cancelBtn = document.getElementById('cancel-btn');
 
         this.selectedFile = null;
         this.currentJobId = null;
+        this.inlineResult = null;
         this.realtimeChannel = null;
+        this.progressChannel = null;
 
         this.init();
     }
@@ -53,6 +60,9 @@ class ExcelTranslatorCloud {
         // Download button
         this.downloadBtn.addEventListener('click', () => this.downloadFile());
 
+        // Cancel button
+        this.cancelBtn.addEventListener('click', () => this.cancelTranslation());
+
         // Swap languages button
         this.swapBtn.addEventListener('click', () => this.swapLanguages());
 
@@ -105,11 +115,12 @@ class ExcelTranslatorCloud {
             return;
         }
 
-        // Validate file size (4.5MB max for free tier)
-        // Vercel free tier has 4.5MB request body limit
-        const maxSize = 4.5 * 1024 * 1024;
+        // Validate file size (50MB storage bucket limit)
+        // Files are uploaded straight to storage, so Vercel's request body
+        // limit no longer applies
+        const maxSize = 50 * 1024 * 1024;
         if (file.size > maxSize) {
-            this.showError('File size must be less than 4.5MB (Upgrade for larger files)');
+            this.showError('File size must be less than 50MB');
             return;
         }
 
@@ -172,42 +183,32 @@ class ExcelTranslatorCloud {
         this.hideResult();
 
         try {
-            // Convert file to base64
-            const fileBase64 = await this.fileToBase64(this.selectedFile);
-
-            // Create translation job via API
-            const response = await fetch('/api/translate', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    filename: this.selectedFile.name,
-                    file: fileBase64,
-                    source_lang: sourceLang === 'auto' ? 'fr' : sourceLang,
-                    target_lang: targetLang
-                })
-            });
-
-            if (!response.ok) {
-                const error = await response.json();
-                throw new Error(error.error || 'Translation failed');
+            const apiSourceLang = sourceLang === 'auto' ? 'fr' : sourceLang;
+            let job;
+            if (this.selectedFile.name.toLowerCase().endsWith('.xlsx') && this.selectedFile.size <= INLINE_MAX_BYTES) {
+                // Tiny workbooks may come back translated in the same response
+                job = await this.translateInline(apiSourceLang, targetLang);
+                if (!job) {
+                    this.handleProgressUpdate({ status: 'complete' });
+                    return;
+                }
+            } else {
+                job = await this.uploadAndCreateJob(apiSourceLang, targetLang);
             }
 
-            const { task_id } = await response.json();
+            const { task_id, status, progress_job_id } = job;
             this.currentJobId = task_id;
 
-            // Subscribe to realtime updates
-            this.subscribeToProgress(task_id);
+            // An identical file was already translated - nothing to wait for
+            if (status === 'complete') {
+                this.handleProgressUpdate({ status: 'complete' });
+                return;
+            }
 
-            // Trigger background processing
-            await fetch('/api/process_job', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ job_id: task_id })
-            });
+            // Processing is dispatched server-side when the job is created.
+            // Subscribe to realtime updates (jobs attached to an identical
+            // translation in progress follow that job's progress broadcasts)
+            this.subscribeToProgress(task_id, progress_job_id || task_id);
 
         } catch (error) {
             this.hideProgress();
@@ -216,23 +217,105 @@ class ExcelTranslatorCloud {
         }
     }
 
-    fileToBase64(file) {
-        return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-            reader.readAsDataURL(file);
-            reader.onload = () => {
-                // Remove data URL prefix (data:*/*;base64,)
-                const base64 = reader.result.split(',')[1];
-                resolve(base64);
-            };
-            reader.onerror = error => reject(error);
+    async translateInline(sourceLang, targetLang) {
+        // Raw upload; the server translates it right away if the estimated
+        // workload is small, otherwise it queues a job as usual
+        const params = new URLSearchParams({
+            filename: this.selectedFile.name,
+            source_lang: sourceLang,
+            target_lang: targetLang,
+            inline: '1'
+        });
+        const response = await fetch(`/api/translate?${params}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/octet-stream',
+            },
+            body: this.selectedFile
         });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Translation failed');
+        }
+
+        if (response.status === 202) {
+            return await response.json();
+        }
+
+        const blob = await response.blob();
+        const baseName = this.selectedFile.name.replace(/\.[^.]+$/, '');
+        this.inlineResult = {
+            url: URL.createObjectURL(blob),
+            filename: `translated_${baseName}.xlsx`
+        };
+        return null;
     }
 
-    subscribeToProgress(jobId) {
+    async uploadAndCreateJob(sourceLang, targetLang) {
+        // Get a signed URL and upload the file straight to storage
+        const uploadResponse = await fetch('/api/upload_url', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ filename: this.selectedFile.name, size: this.selectedFile.size })
+        });
+
+        if (!uploadResponse.ok) {
+            const error = await uploadResponse.json();
+            throw new Error(error.error || 'Upload failed');
+        }
+
+        const upload = await uploadResponse.json();
+
+        const storageResponse = await fetch(upload.upload_url, {
+            method: 'PUT',
+            headers: {
+                'Content-Type': upload.content_type,
+            },
+            body: this.selectedFile
+        });
+
+        if (!storageResponse.ok) {
+            throw new Error('Failed to upload file');
+        }
+
+        // Create translation job from the completed upload
+        const response = await fetch('/api/translate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                job_id: upload.job_id,
+                filename: upload.filename,
+                source_lang: sourceLang,
+                target_lang: targetLang
+            })
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Translation failed');
+        }
+
+        return await response.json();
+    }
+
+    subscribeToProgress(jobId, progressJobId = jobId) {
         // Unsubscribe from any existing channel
         this.unsubscribeRealtime();
 
+        // Progress ticks arrive as ephemeral broadcast messages, while
+        // state transitions (complete/error) are row updates on translation_jobs
+        this.progressChannel = supabase
+            .channel(`translation-progress:${progressJobId}`)
+            .on('broadcast', { event: 'progress' }, ({ payload }) => {
+                this.handleProgressUpdate(payload);
+            })
+            .subscribe();
+
         // Subscribe to translation_jobs table changes for this specific job
         this.realtimeChannel = supabase
             .channel(`translation_job_${jobId}`)
@@ -255,11 +338,11 @@ class ExcelTranslatorCloud {
     }
 
     async pollStatus(jobId) {
-        const maxAttempts = 120; // 2 minutes max polling
-        let attempts = 0;
+        const deadline = Date.now() + 120000; // 2 minutes max polling
+        let etag = null;
 
         const poll = async () => {
-            if (attempts >= maxAttempts) {
+            if (Date.now() >= deadline) {
                 this.showError('Translation timed out. Please try again.');
                 this.hideProgress();
                 this.translateBtn.disabled = false;
@@ -267,19 +350,29 @@ class ExcelTranslatorCloud {
             }
 
             try {
-                const response = await fetch(`/api/status?job_id=${jobId}`);
+                // Long-poll: the server holds the request until the job
+                // changes (200) or the wait runs out (304 Not Modified)
+                const response = await fetch(`/api/status?job_id=${jobId}&wait=8`, {
+                    headers: etag ? { 'If-None-Match': etag } : {},
+                    cache: 'no-store'
+                });
+
+                if (response.status === 304) {
+                    poll();
+                    return;
+                }
+
+                etag = response.headers.get('ETag');
                 const data = await response.json();
 
                 this.handleProgressUpdate(data);
 
                 // Continue polling if still processing
                 if (data.status === 'processing' || data.status === 'pending') {
-                    attempts++;
-                    setTimeout(poll, 1000);
+                    poll();
                 }
             } catch (error) {
                 console.error('Polling error:', error);
-                attempts++;
                 setTimeout(poll, 1000);
             }
         };
@@ -289,7 +382,7 @@ class ExcelTranslatorCloud {
 
     handleProgressUpdate(data) {
         // Update progress bar
-        const percentage = data.progress_percentage || 0;
+        const percentage = data.progress_percentage || data.percentage || 0;
         this.progressFill.style.width = percentage + '%';
         this.progressText.textContent = data.progress_message || data.message || 'Processing...';
 
@@ -303,6 +396,33 @@ class ExcelTranslatorCloud {
             this.showError(data.error_message || data.error || 'Translation failed');
             this.translateBtn.disabled = false;
             this.unsubscribeRealtime();
+        } else if (data.status === 'cancelled') {
+            this.hideProgress();
+            this.showError('Translation cancelled');
+            this.translateBtn.disabled = false;
+            this.unsubscribeRealtime();
+        }
+    }
+
+    async cancelTranslation() {
+        if (!this.currentJobId) {
+            return;
+        }
+
+        this.cancelBtn.disabled = true;
+        try {
+            const response = await fetch('/api/cancel', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ job_id: this.currentJobId })
+            });
+            if (response.ok) {
+                this.handleProgressUpdate({ status: 'cancelled' });
+            }
+        } catch (error) {
+            console.error('Cancel error:', error);
         }
     }
 
@@ -311,30 +431,50 @@ class ExcelTranslatorCloud {
             supabase.removeChannel(this.realtimeChannel);
             this.realtimeChannel = null;
         }
+        if (this.progressChannel) {
+            supabase.removeChannel(this.progressChannel);
+            this.progressChannel = null;
+        }
     }
 
     async downloadFile() {
+        if (this.inlineResult) {
+            // Translated inline: the file is already in the browser
+            const a = document.createElement('a');
+            a.href = this.inlineResult.url;
+            a.download = this.inlineResult.filename;
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
+
+            setTimeout(() => {
+                URL.revokeObjectURL(this.inlineResult.url);
+                this.inlineResult = null;
+                this.removeFile();
+                this.hideResult();
+            }, 1000);
+            return;
+        }
+
         if (!this.currentJobId) {
             this.showError('No translated file available');
             return;
         }
 
         try {
-            const response = await fetch(`/api/download?job_id=${this.currentJobId}`);
+            // Ask for a signed URL and let the browser download from storage
+            const response = await fetch(`/api/download?job_id=${this.currentJobId}&format=json`);
 
             if (!response.ok) {
                 throw new Error('Failed to download translated file');
             }
 
-            const blob = await response.blob();
-            const url = window.URL.createObjectURL(blob);
+            const { url, filename } = await response.json();
             const a = document.createElement('a');
-            const baseName = this.selectedFile.name.replace(/\.[^/.]+$/, '');
             a.href = url;
-            a.download = `translated_${baseName}.xlsx`;
+            a.download = filename;
             document.body.appendChild(a);
             a.click();
-            window.URL.revokeObjectURL(url);
             document.body.removeChild(a);
 
             // Reset for next translation
@@ -349,6 +489,7 @@ class ExcelTranslatorCloud {
     }
 
     showProgress() {
+        this.cancelBtn.disabled = false;
         this.progressContainer.style.display = 'block';
         this.progressFill.style.width = '0%';
         this.progressText.textContent = 'Starting translation...';
@@ -19,9 +19,11 @@ class ExcelTranslator {
         this.sourceLang = document.getElementById('source-lang');
         this.targetLang = document.getElementById('target-lang');
         this.swapBtn = document.getElementById('swap-languages');
+        this.cancelBtn = document.getElementById('cancel-btn');
 
         this.selectedFile = null;
         this.translatedBlob = null;
+        this.currentTaskId = null;
 
         this.init();
     }
@@ -48,6 +50,9 @@ class ExcelTranslator {
         // Swap languages button
         this.swapBtn.addEventListener('click', () => this.swapLanguages());
 
+        // Cancel button
+        this.cancelBtn.addEventListener('click', () => this.cancelTranslation());
+
         // Smooth scroll for navigation
         document.querySelectorAll('a[href^="#"]').forEach(anchor => {
             anchor.addEventListener('click', (e) => {
@@ -184,6 +189,7 @@ class ExcelTranslator {
             }
 
             const { task_id } = await response.json();
+            this.currentTaskId = task_id;
 
             // Connect to progress stream
             await this.watchProgress(task_id);
@@ -222,6 +228,9 @@ class ExcelTranslator {
                     } else if (data.status === 'error') {
                         eventSource.close();
                         reject(new Error(data.message));
+                    } else if (data.status === 'cancelled') {
+                        eventSource.close();
+                        reject(new Error('Translation cancelled'));
                     }
                 } catch (error) {
                     eventSource.close();
@@ -236,6 +245,21 @@ class ExcelTranslator {
         });
     }
 
+    async cancelTranslation() {
+        if (!this.currentTaskId) {
+            return;
+        }
+
+        this.cancelBtn.disabled = true;
+        this.progressText.textContent = 'Cancelling...';
+        try {
+            // The progress stream reports the cancelled status once the worker stops
+            await fetch(`/cancel/${this.currentTaskId}`, { method: 'POST' });
+        } catch (error) {
+            console.error('Cancel error:', error);
+        }
+    }
+
     async downloadTranslatedFile(taskId) {
         try {
             const response = await fetch(`/download/${taskId}`);
@@ -258,6 +282,7 @@ class ExcelTranslator {
     }
 
     showProgress() {
+        this.cancelBtn.disabled = false;
         this.progressContainer.style.display = 'block';
         this.progressFill.style.width = '0%';
         this.progressText.textContent = 'Starting translation...';
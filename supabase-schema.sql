@@ -7,7 +7,7 @@ CREATE TABLE IF NOT EXISTS translation_jobs (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
 
     -- Job metadata
-    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'complete', 'error')),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'complete', 'error', 'cancelled')),
 
     -- File information
     original_filename VARCHAR(255) NOT NULL,
@@ -20,6 +20,9 @@ CREATE TABLE IF NOT EXISTS translation_jobs (
     target_lang VARCHAR(10) NOT NULL DEFAULT 'en',
 
     -- Progress tracking
+    -- Only written on state transitions (start/complete/error). Per-batch progress
+    -- is sent over the Realtime broadcast channel 'translation-progress:<job id>'
+    -- so it never fires the triggers below or writes WAL.
     current_cell INTEGER DEFAULT 0,
     total_cells INTEGER DEFAULT 0,
     progress_message TEXT DEFAULT 'Starting translation...',
@@ -28,6 +31,21 @@ CREATE TABLE IF NOT EXISTS translation_jobs (
     -- Error handling
     error_message TEXT,
 
+    -- Result cache: SHA-256 of (file bytes, source_lang, target_lang, engine)
+    content_hash VARCHAR(64),
+    -- Identical in-flight job this one is waiting on (see result_cache.py)
+    coalesced_with UUID REFERENCES translation_jobs(id) ON DELETE SET NULL,
+
+    -- Seconds spent per stage of the translation (see stage_timing.py)
+    timings JSONB,
+
+    -- On-demand profiling (see job_profiler.py): requested, and where the artifact is stored
+    profile BOOLEAN DEFAULT FALSE,
+    profile_path VARCHAR(500),
+
+    -- Provider calls, characters, failures and skipped strings (see translation_stats.py)
+    translation_stats JSONB,
+
     -- Cleanup tracking
     expires_at TIMESTAMP WITH TIME ZONE DEFAULT (NOW() + INTERVAL '24 hours')
 );
@@ -37,6 +55,21 @@ CREATE INDEX IF NOT EXISTS idx_translation_jobs_status ON translation_jobs(statu
 CREATE INDEX IF NOT EXISTS idx_translation_jobs_created_at ON translation_jobs(created_at);
 CREATE INDEX IF NOT EXISTS idx_translation_jobs_expires_at ON translation_jobs(expires_at);
 
+-- Upgrade existing installs (no-ops on a fresh database)
+ALTER TABLE translation_jobs ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE translation_jobs ADD COLUMN IF NOT EXISTS coalesced_with UUID REFERENCES translation_jobs(id) ON DELETE SET NULL;
+ALTER TABLE translation_jobs ADD COLUMN IF NOT EXISTS timings JSONB;
+ALTER TABLE translation_jobs ADD COLUMN IF NOT EXISTS profile BOOLEAN DEFAULT FALSE;
+ALTER TABLE translation_jobs ADD COLUMN IF NOT EXISTS profile_path VARCHAR(500);
+ALTER TABLE translation_jobs ADD COLUMN IF NOT EXISTS translation_stats JSONB;
+ALTER TABLE translation_jobs DROP CONSTRAINT IF EXISTS translation_jobs_status_check;
+ALTER TABLE translation_jobs ADD CONSTRAINT translation_jobs_status_check
+    CHECK (status IN ('pending', 'processing', 'complete', 'error', 'cancelled'));
+
+-- Result cache lookups and releasing coalesced jobs
+CREATE INDEX IF NOT EXISTS idx_translation_jobs_content_hash ON translation_jobs(content_hash, status) WHERE content_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_translation_jobs_coalesced_with ON translation_jobs(coalesced_with) WHERE coalesced_with IS NOT NULL;
+
 -- Create function to automatically update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -128,10 +161,33 @@ ORDER BY created_at DESC;
 GRANT ALL ON translation_jobs TO authenticated, anon;
 GRANT ALL ON active_translation_jobs TO authenticated, anon;
 
+-- Optional: dispatch jobs from the database instead of from /api/translate
+-- (set JOB_DISPATCH_MODE=webhook). Equivalent to a Database Webhook created in
+-- the dashboard; replace the URL and secret with your deployment's values.
+-- Jobs created by app_supabase.py are inserted without input_file_path (it is
+-- set once their input is stored) and translated by that app, so they are skipped.
+-- DROP TRIGGER IF EXISTS dispatch_translation_job ON translation_jobs;
+-- CREATE TRIGGER dispatch_translation_job
+--     AFTER INSERT ON translation_jobs
+--     FOR EACH ROW
+--     WHEN (NEW.status = 'pending' AND NEW.coalesced_with IS NULL AND NEW.input_file_path IS NOT NULL)
+--     EXECUTE FUNCTION supabase_functions.http_request(
+--         'https://your-app.vercel.app/api/process_job',
+--         'POST',
+--         '{"Content-Type": "application/json", "X-Dispatch-Secret": "your-dispatch-secret"}',
+--         '{}',
+--         '5000'
+--     );
+
 -- Insert a test record (optional - you can delete this)
 -- INSERT INTO translation_jobs (original_filename, source_lang, target_lang, status, progress_message)
 -- VALUES ('test.xlsx', 'fr', 'en', 'pending', 'Test job created');
 
 COMMENT ON TABLE translation_jobs IS 'Stores translation job metadata and progress tracking';
 COMMENT ON COLUMN translation_jobs.expires_at IS 'Jobs expire after 24 hours and should be cleaned up';
+COMMENT ON COLUMN translation_jobs.current_cell IS 'Persisted on state transitions only; live progress is broadcast over Realtime';
+COMMENT ON COLUMN translation_jobs.content_hash IS 'Identical submissions reuse the newest complete job with the same hash';
+COMMENT ON COLUMN translation_jobs.timings IS 'Seconds per stage (download, load_workbook, translate, save, upload...) plus total';
+COMMENT ON COLUMN translation_jobs.profile_path IS 'cProfile + tracemalloc zip of a profiled job, stored next to its output';
+COMMENT ON COLUMN translation_jobs.translation_stats IS 'Provider calls, characters sent, failed calls, skipped strings and result cache outcome';
 COMMENT ON FUNCTION cleanup_expired_jobs() IS 'Call this function periodically to remove old jobs and their files';
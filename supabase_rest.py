@@ -0,0 +1,252 @@
+"""
+Supabase REST helpers
+Thin wrappers around the Supabase HTTP APIs shared by the Flask apps and
+the Vercel serverless functions. All calls go through the pooled session in
+http_session.py, so connections are reused across calls and warm invocations.
+"""
+import os
+import threading
+from urllib.parse import quote
+from http_session import get_session, READ_TIMEOUT
+
+
+def get_supabase_url():
+    """Supabase project URL from the environment (whitespace stripped)"""
+    return os.environ.get("SUPABASE_URL", "").strip().rstrip("/")
+
+
+def get_service_key():
+    """Supabase service role key from the environment (whitespace stripped)"""
+    return os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
+
+
+def auth_headers(extra=None):
+    """Headers that authenticate a request with the service role key"""
+    key = get_service_key()
+    headers = {
+        "Authorization": f"Bearer {key}",
+        "apikey": key,
+    }
+    if extra:
+        headers.update(extra)
+    return headers
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_supabase_client():
+    """
+    Shared supabase-py client for the configured project
+
+    Created once per process (per URL/key pair) instead of once per module,
+    so its HTTP connections are reused by every caller.
+    """
+    key = (get_supabase_url(), get_service_key())
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                from supabase import create_client, ClientOptions
+                client = create_client(key[0], key[1], options=ClientOptions(
+                    postgrest_client_timeout=READ_TIMEOUT,
+                    storage_client_timeout=int(READ_TIMEOUT)
+                ))
+                _clients[key] = client
+    return client
+
+
+def job_progress_topic(job_id):
+    """Realtime broadcast topic carrying ephemeral progress for one job"""
+    return f"translation-progress:{job_id}"
+
+
+def broadcast(topic, event, payload):
+    """
+    Send a message to a Realtime broadcast channel via the REST endpoint
+
+    Broadcast messages are not persisted, so they cost no table writes,
+    triggers or WAL - use them for data that is only interesting live.
+    """
+    response = get_session().post(
+        f"{get_supabase_url()}/realtime/v1/api/broadcast",
+        json={"messages": [{"topic": topic, "event": event, "payload": payload}]},
+        headers=auth_headers({"Content-Type": "application/json"}),
+        timeout=5,
+    )
+    if response.status_code not in [200, 202]:
+        raise Exception(f"Broadcast failed: {response.text}")
+
+
+def broadcast_job_progress(job_id, current, total, message, status="processing"):
+    """Publish a progress tick for a job on its Realtime broadcast channel"""
+    percentage = round(current / total * 100) if total > 0 else 0
+    broadcast(job_progress_topic(job_id), "progress", {
+        "job_id": job_id,
+        "status": status,
+        "current": current,
+        "total": total,
+        "percentage": percentage,
+        "message": message,
+    })
+
+
+# Storage bucket holding uploaded and translated workbooks
+STORAGE_BUCKET = "excel-files"
+
+
+def quote_object_path(path):
+    """
+    Object path as it goes into a storage URL
+
+    Paths carry the user's original filename; characters such as #, ? or %
+    would otherwise cut the URL short or change the object key.
+    """
+    return quote(path, safe="/")
+
+
+def storage_object_url(path):
+    """REST URL of an object in the excel-files bucket"""
+    return f"{get_supabase_url()}/storage/v1/object/{STORAGE_BUCKET}/{quote_object_path(path)}"
+
+
+def storage_upload(path, data, content_type, content_length=None):
+    """
+    Upload an object to Supabase Storage
+
+    `data` may be bytes, a file-like object or an iterator of chunks; the
+    latter two are streamed upstream without being read into memory.
+    """
+    headers = auth_headers({"Content-Type": content_type})
+    if content_length is not None:
+        headers["Content-Length"] = str(content_length)
+    response = get_session().post(storage_object_url(path), data=data, headers=headers)
+    if response.status_code not in [200, 201]:
+        raise Exception(f"Storage upload failed: {response.text}")
+
+
+def storage_download(path):
+    """Download an object from Supabase Storage"""
+    response = get_session().get(storage_object_url(path), headers=auth_headers())
+    if response.status_code != 200:
+        raise Exception(f"Storage download failed: {response.text}")
+    return response.content
+
+
+def storage_delete(path):
+    """Delete an object from Supabase Storage"""
+    get_session().delete(storage_object_url(path), headers=auth_headers())
+
+
+def select_jobs(columns="*", order=None, limit=None, **filters):
+    """
+    Select translation_jobs rows through PostgREST
+
+    Filters use PostgREST syntax, e.g. select_jobs("id", status="eq.pending")
+    """
+    params = {"select": columns}
+    params.update(filters)
+    if order:
+        params["order"] = order
+    if limit is not None:
+        params["limit"] = limit
+    response = get_session().get(
+        f"{get_supabase_url()}/rest/v1/translation_jobs",
+        params=params,
+        headers=auth_headers(),
+    )
+    if response.status_code != 200:
+        raise Exception(f"Database select failed: {response.text}")
+    return response.json()
+
+
+def get_job(job_id, columns="*"):
+    """A single translation_jobs row by id, or None if it does not exist"""
+    rows = select_jobs(columns, limit=1, id=f"eq.{job_id}")
+    return rows[0] if rows else None
+
+
+def update_jobs(changes, returning=False, **filters):
+    """
+    Update the translation_jobs rows matching PostgREST filters
+
+    With returning=True the updated rows are returned, which makes a
+    filtered update usable as an atomic compare-and-set.
+    """
+    prefer = "return=representation" if returning else "return=minimal"
+    response = get_session().patch(
+        f"{get_supabase_url()}/rest/v1/translation_jobs",
+        params=filters,
+        json=changes,
+        headers=auth_headers({"Content-Type": "application/json", "Prefer": prefer}),
+    )
+    if response.status_code not in [200, 204]:
+        raise Exception(f"Database update failed: {response.text}")
+    if returning:
+        return response.json()
+
+
+def insert_job(job_data):
+    """Insert a translation_jobs row through PostgREST"""
+    response = get_session().post(
+        f"{get_supabase_url()}/rest/v1/translation_jobs",
+        json=job_data,
+        headers=auth_headers({"Content-Type": "application/json", "Prefer": "return=minimal"}),
+    )
+    if response.status_code not in [200, 201]:
+        raise Exception(f"Database insert failed: {response.text}")
+
+
+# Lifetime of signed download URLs handed to clients (seconds)
+SIGNED_URL_TTL = int(os.environ.get("SIGNED_URL_TTL", 60))
+
+
+def create_signed_upload_url(path):
+    """
+    Signed URL a client can PUT a file to directly, bypassing our functions
+
+    Returns an absolute URL; the upload token it carries only allows writing
+    this one object path.
+    """
+    response = get_session().post(
+        f"{get_supabase_url()}/storage/v1/object/upload/sign/{STORAGE_BUCKET}/{quote_object_path(path)}",
+        headers=auth_headers(),
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to sign upload URL: {response.text}")
+    return f"{get_supabase_url()}/storage/v1{response.json()['url']}"
+
+
+def create_signed_download_url(path, expires_in=None, download_name=None):
+    """Short-lived signed URL a client can GET an object from directly"""
+    response = get_session().post(
+        f"{get_supabase_url()}/storage/v1/object/sign/{STORAGE_BUCKET}/{quote_object_path(path)}",
+        json={"expiresIn": expires_in or SIGNED_URL_TTL},
+        headers=auth_headers({"Content-Type": "application/json"}),
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to sign download URL: {response.text}")
+    url = f"{get_supabase_url()}/storage/v1{response.json()['signedURL']}"
+    if download_name:
+        # Makes storage send Content-Disposition: attachment with this name
+        url += f"&download={quote(download_name)}"
+    return url
+
+
+def storage_object_size(path):
+    """Size in bytes of a stored object, or None if it does not exist"""
+    response = get_session().get(
+        f"{get_supabase_url()}/storage/v1/object/info/{STORAGE_BUCKET}/{quote_object_path(path)}",
+        headers=auth_headers(),
+    )
+    if response.status_code in [400, 404]:
+        return None
+    if response.status_code != 200:
+        raise Exception(f"Failed to read object info: {response.text}")
+    info = response.json()
+    size = info.get("size")
+    if size is None:
+        size = (info.get("metadata") or {}).get("size")
+    return size
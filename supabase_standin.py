@@ -0,0 +1,420 @@
+"""
+Local Supabase Stand-in
+In-process HTTP server emulating the parts of Supabase this project uses:
+- PostgREST:  /rest/v1/translation_jobs (select/insert/update/delete with filters)
+- Storage:    /storage/v1/object/excel-files/<path>, object info and
+              signed upload/download URLs
+- Realtime:   /realtime/v1/api/broadcast (messages are recorded)
+
+Used by the tests so the API handlers can run without a real project.
+
+Usage:
+    standin = SupabaseStandIn().start()
+    os.environ["SUPABASE_URL"] = standin.url
+    ...
+    standin.stop()
+"""
+import io
+import json
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl, quote, unquote
+
+from upload_stream import BodyReader, MultipartReader
+
+# Column defaults applied on insert (mirrors supabase-schema.sql)
+JOB_DEFAULTS = {
+    "status": "pending",
+    "input_file_path": None,
+    "output_file_path": None,
+    "file_size": None,
+    "source_lang": "fr",
+    "target_lang": "en",
+    "current_cell": 0,
+    "total_cells": 0,
+    "progress_message": "Starting translation...",
+    "progress_percentage": 0,
+    "error_message": None,
+    "content_hash": None,
+    "coalesced_with": None,
+    "timings": None,
+    "profile": False,
+    "profile_path": None,
+    "translation_stats": None,
+}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _matches(row, column, expression):
+    """Evaluate a single PostgREST filter such as eq.x, in.(a,b) or is.null"""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, operand = expression.partition(".")
+    value = row.get(column)
+    text = None if value is None else str(value)
+
+    if operator == "eq":
+        result = text == operand
+    elif operator == "neq":
+        result = text != operand
+    elif operator == "in":
+        options = [option.strip().strip('"') for option in operand.strip("()").split(",")]
+        result = text in options
+    elif operator == "is":
+        result = value is None if operand == "null" else str(value).lower() == operand
+    elif operator in ("gt", "gte", "lt", "lte"):
+        if value is None:
+            result = False
+        else:
+            try:
+                left, right = float(value), float(operand)
+            except ValueError:
+                left, right = text, operand
+            result = {
+                "gt": left > right, "gte": left >= right,
+                "lt": left < right, "lte": left <= right,
+            }[operator]
+    else:
+        raise ValueError(f"Unsupported filter operator: {operator}")
+    return not result if negate else result
+
+
+class SupabaseStandIn:
+    """Threaded local server holding tables, storage objects and broadcasts in memory"""
+
+    def __init__(self, host="127.0.0.1", port=0, connect_delay=0):
+        self.host = host
+        self.port = port
+        # Seconds added to every new connection, standing in for the TCP/TLS
+        # handshake to a remote project (see tests/test_http_session.py)
+        self.connect_delay = connect_delay
+        self.lock = threading.RLock()
+        self.tables = {"translation_jobs": {}}
+        self.objects = {}  # {"bucket/path": (content_type, bytes)}
+        self.signed_tokens = {}  # {token: (kind, "bucket/path", expires_at)}
+        self.broadcasts = []
+        self.request_log = []
+        self.connections = 0  # TCP connections accepted (keep-alive reuse shows up here)
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.server.server_port}"
+
+    @property
+    def jobs(self):
+        return self.tables["translation_jobs"]
+
+    def start(self):
+        standin = self
+
+        class Handler(StandInRequestHandler):
+            pass
+        Handler.standin = standin
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # Table operations
+
+    def select(self, table, filters, order=None, limit=None):
+        with self.lock:
+            rows = [dict(row) for row in self.tables[table].values()
+                    if all(_matches(row, column, expr) for column, expr in filters)]
+        if order:
+            for term in reversed(order.split(",")):
+                column, _, direction = term.partition(".")
+                rows.sort(key=lambda row: (row.get(column) is None, str(row.get(column))),
+                          reverse=direction.startswith("desc"))
+        if limit is not None:
+            rows = rows[:limit]
+        return rows
+
+    def insert(self, table, record):
+        with self.lock:
+            row = dict(JOB_DEFAULTS) if table == "translation_jobs" else {}
+            row.update(record)
+            row.setdefault("id", str(uuid.uuid4()))
+            row.setdefault("created_at", _now())
+            if table == "translation_jobs":
+                row.setdefault("expires_at", (datetime.now(timezone.utc) + timedelta(hours=24)).isoformat())
+            row["updated_at"] = row["created_at"]
+            self._apply_triggers(row)
+            if row["id"] in self.tables[table]:
+                raise KeyError("duplicate key value violates unique constraint")
+            self.tables[table][row["id"]] = row
+            return dict(row)
+
+    def update(self, table, filters, changes):
+        with self.lock:
+            updated = []
+            for row in self.tables[table].values():
+                if all(_matches(row, column, expr) for column, expr in filters):
+                    row.update(changes)
+                    row["updated_at"] = _now()
+                    self._apply_triggers(row)
+                    updated.append(dict(row))
+            return updated
+
+    def delete(self, table, filters):
+        with self.lock:
+            doomed = [key for key, row in self.tables[table].items()
+                      if all(_matches(row, column, expr) for column, expr in filters)]
+            return [self.tables[table].pop(key) for key in doomed]
+
+    def _apply_triggers(self, row):
+        # Same as the calculate_progress_percentage trigger
+        if "total_cells" in row:
+            total = row.get("total_cells") or 0
+            current = row.get("current_cell") or 0
+            row["progress_percentage"] = round(current / total * 100) if total > 0 else 0
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    """Routes requests to the REST, storage and realtime emulations"""
+    standin = None
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY a reused
+    # keep-alive connection stalls on delayed ACKs (~40ms per response)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.standin.lock:
+            self.standin.connections += 1
+        if self.standin.connect_delay:
+            time.sleep(self.standin.connect_delay)
+
+    def _route(self, method):
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        self.standin.request_log.append((method, path))
+        query = parse_qsl(parsed.query, keep_blank_values=True)
+        try:
+            if path.startswith("/rest/v1/"):
+                return self._rest(method, path[len("/rest/v1/"):], query)
+            if path.startswith("/storage/v1/object/"):
+                return self._storage(method, path[len("/storage/v1/object/"):], dict(query))
+            if path == "/realtime/v1/api/broadcast" and method == "POST":
+                payload = json.loads(self._body() or b"{}")
+                self.standin.broadcasts.extend(payload.get("messages", []))
+                return self._send(202, b"")
+            return self._json(404, {"message": f"No route for {method} {path}"})
+        except Exception as e:
+            return self._json(500, {"message": str(e)})
+
+    do_GET = lambda self: self._route("GET")
+    do_POST = lambda self: self._route("POST")
+    do_PUT = lambda self: self._route("PUT")
+    do_PATCH = lambda self: self._route("PATCH")
+    do_DELETE = lambda self: self._route("DELETE")
+    do_HEAD = lambda self: self._route("HEAD")
+
+    # Helpers
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        if length:
+            return self.rfile.read(length)
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        return b""
+
+    def _send(self, code, body, content_type="application/json", headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _json(self, code, data):
+        return self._send(code, json.dumps(data).encode())
+
+    # PostgREST
+
+    def _rest(self, method, table, query):
+        standin = self.standin
+        if table not in standin.tables:
+            return self._json(404, {"message": f"relation {table} does not exist"})
+
+        select = "*"
+        order = None
+        limit = None
+        filters = []
+        for key, value in query:
+            if key == "select":
+                select = value
+            elif key == "order":
+                order = value
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                continue
+            else:
+                filters.append((key, value))
+
+        prefer = self.headers.get("Prefer", "")
+        single = "vnd.pgrst.object" in self.headers.get("Accept", "")
+
+        if method == "GET" or method == "HEAD":
+            rows = standin.select(table, filters, order, limit)
+        elif method == "POST":
+            payload = json.loads(self._body() or b"{}")
+            records = payload if isinstance(payload, list) else [payload]
+            try:
+                rows = [standin.insert(table, record) for record in records]
+            except KeyError as e:
+                return self._json(409, {"message": str(e)})
+            if "return=representation" not in prefer:
+                return self._send(201, b"")
+            return self._respond_rows(rows, select, single, 201)
+        elif method == "PATCH":
+            rows = standin.update(table, filters, json.loads(self._body() or b"{}"))
+            if "return=representation" not in prefer:
+                return self._send(204, b"")
+        elif method == "DELETE":
+            rows = standin.delete(table, filters)
+            if "return=representation" not in prefer:
+                return self._send(204, b"")
+        else:
+            return self._json(405, {"message": "Method not allowed"})
+
+        return self._respond_rows(rows, select, single, 200)
+
+    def _respond_rows(self, rows, select, single, code):
+        if select.strip() != "*":
+            columns = [column.strip() for column in select.split(",")]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        if single:
+            if len(rows) != 1:
+                return self._json(406, {
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"The result contains {len(rows)} rows",
+                })
+            return self._json(code, rows[0])
+        return self._json(code, rows)
+
+    # Storage
+
+    def _storage(self, method, key, query):
+        standin = self.standin
+        if key.startswith("authenticated/"):
+            key = key[len("authenticated/"):]
+
+        if key.startswith("upload/sign/"):
+            key = key[len("upload/sign/"):]
+            if method == "POST":
+                token = self._issue_token("upload", key, 2 * 60 * 60)
+                return self._json(200, {"url": f"/object/upload/sign/{quote(key)}?token={token}", "token": token})
+            if method == "PUT":
+                if not self._check_token(query.get("token"), "upload", key):
+                    return self._json(400, {"statusCode": "403", "error": "InvalidSignature",
+                                            "message": "invalid signature"})
+                with standin.lock:
+                    standin.objects[key] = (self.headers.get("Content-Type", "application/octet-stream"),
+                                            self._body())
+                return self._json(200, {"Key": key})
+            return self._json(405, {"message": "Method not allowed"})
+
+        if key.startswith("sign/"):
+            key = key[len("sign/"):]
+            if method == "POST":
+                if key not in standin.objects:
+                    return self._json(400, {"statusCode": "404", "error": "not_found",
+                                            "message": "Object not found"})
+                expires_in = json.loads(self._body() or b"{}").get("expiresIn", 60)
+                token = self._issue_token("download", key, expires_in)
+                return self._json(200, {"signedURL": f"/object/sign/{quote(key)}?token={token}"})
+            if method in ("GET", "HEAD"):
+                if not self._check_token(query.get("token"), "download", key) or key not in standin.objects:
+                    return self._json(400, {"statusCode": "403", "error": "InvalidSignature",
+                                            "message": "invalid signature"})
+                content_type, data = standin.objects[key]
+                headers = {}
+                if "download" in query:
+                    headers["Content-Disposition"] = f'attachment; filename="{query["download"]}"'
+                return self._send(200, data, content_type, headers)
+            return self._json(405, {"message": "Method not allowed"})
+
+        if key.startswith("info/"):
+            key = key[len("info/"):]
+            if key not in standin.objects:
+                return self._json(404, {"statusCode": "404", "error": "not_found",
+                                        "message": "Object not found"})
+            content_type, data = standin.objects[key]
+            return self._json(200, {"name": key.split("/", 1)[1], "size": len(data),
+                                    "content_type": content_type})
+
+        if method in ("POST", "PUT"):
+            content_type = self.headers.get("Content-Type", "application/octet-stream")
+            data = self._body()
+            if content_type.startswith("multipart/form-data"):
+                # supabase-py sends uploads as a multipart form
+                form = BodyReader(io.BytesIO(data), len(data))
+                for part in MultipartReader(form, content_type).parts():
+                    if part.filename is not None:
+                        content_type = part.content_type
+                        data = b"".join(part)
+            with standin.lock:
+                if key in standin.objects and method == "POST" and self.headers.get("x-upsert") != "true":
+                    return self._json(409, {"statusCode": "409", "error": "Duplicate",
+                                            "message": "The resource already exists"})
+                standin.objects[key] = (content_type, data)
+            return self._json(200, {"Key": key})
+
+        if method in ("GET", "HEAD"):
+            if key not in standin.objects:
+                return self._json(404, {"statusCode": "404", "error": "not_found",
+                                        "message": "Object not found"})
+            content_type, data = standin.objects[key]
+            return self._send(200, data, content_type)
+
+        if method == "DELETE":
+            if standin.objects.pop(key, None) is None:
+                return self._json(404, {"statusCode": "404", "error": "not_found",
+                                        "message": "Object not found"})
+            return self._json(200, {"message": "Successfully deleted"})
+
+        return self._json(405, {"message": "Method not allowed"})
+
+    def _issue_token(self, kind, key, expires_in):
+        token = secrets.token_urlsafe(16)
+        self.standin.signed_tokens[token] = (kind, key, time.time() + expires_in)
+        return token
+
+    def _check_token(self, token, kind, key):
+        issued = self.standin.signed_tokens.get(token)
+        return bool(issued) and issued[0] == kind and issued[1] == key and issued[2] > time.time()
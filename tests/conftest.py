@@ -0,0 +1,116 @@
+"""
+Shared fixtures: local Supabase stand-in, helpers to serve the api/ handlers,
+an offline translator and an in-memory workbook factory
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import threading
+import importlib.util
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from supabase_standin import SupabaseStandIn
+
+
+def load_api_module(name):
+    """Import api/<name>.py the way Vercel does (as a standalone module)"""
+    spec = importlib.util.spec_from_file_location(f"api_{name}", os.path.join(ROOT, "api", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class OfflineTranslator:
+    """
+    Offline stand-in for GoogleTranslator: returns the text upper-cased
+
+    Classes made by make_translator() sleep `delay` seconds per call, raise
+    on the texts in `fail_on` and count their calls in `calls`.
+    """
+    delay = 0.0
+    fail_on = ()
+    calls = 0
+
+    def __init__(self, source="auto", target="en"):
+        pass
+
+    def translate(self, text):
+        type(self).calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if text in self.fail_on:
+            raise RuntimeError("provider error")
+        return text.upper()
+
+
+def make_translator(delay=0.0, fail_on=()):
+    """A new OfflineTranslator class, with its own call counter"""
+    return type("OfflineTranslator", (OfflineTranslator,), {"delay": delay, "fail_on": tuple(fail_on), "calls": 0})
+
+
+def make_workbook(values, sheets=1):
+    """In-memory .xlsx with the given values in column A of every sheet"""
+    from openpyxl import Workbook
+    wb = Workbook()
+    for index in range(sheets):
+        ws = wb.active if index == 0 else wb.create_sheet(f"Sheet{index + 1}")
+        for row, value in enumerate(values, 1):
+            ws.cell(row=row, column=1, value=value)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def offline_translator(monkeypatch):
+    """
+    Install an OfflineTranslator as GoogleTranslator in both translation engines
+
+    offline_translator() or offline_translator(delay=0.01, fail_on=["boom"]);
+    returns the installed class
+    """
+    import excel_translator
+    import excel_translator_optimized
+
+    def install(delay=0.0, fail_on=()):
+        translator = make_translator(delay, fail_on)
+        for module in (excel_translator, excel_translator_optimized):
+            monkeypatch.setattr(module, "GoogleTranslator", translator)
+        return translator
+
+    return install
+
+
+@pytest.fixture
+def supabase_standin(monkeypatch):
+    """Running Supabase stand-in with SUPABASE_URL/SUPABASE_SERVICE_KEY pointed at it"""
+    standin = SupabaseStandIn().start()
+    monkeypatch.setenv("SUPABASE_URL", standin.url)
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "service-key")
+    yield standin
+    standin.stop()
+
+
+@pytest.fixture
+def api_server():
+    """Factory serving an api/ handler on a local port; returns its base URL"""
+    servers = []
+
+    def serve(name):
+        module = load_api_module(name)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), module.handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield serve
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
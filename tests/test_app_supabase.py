@@ -0,0 +1,110 @@
+"""
+Tests for the Supabase-backed Flask app (app_supabase.py) against the local
+Supabase stand-in
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import threading
+import importlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from openpyxl import load_workbook
+from conftest import load_api_module, make_workbook
+
+
+@pytest.fixture
+def app_module(supabase_standin, offline_translator):
+    """app_supabase imported against the stand-in with an offline translator"""
+    offline_translator()
+    sys.modules.pop("app_supabase", None)
+    module = importlib.import_module("app_supabase")
+    yield module
+    sys.modules.pop("app_supabase", None)
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestTranslateJob:
+    """Test the background job started by /translate"""
+
+    def test_worker_uses_uploaded_bytes(self, app_module, supabase_standin):
+        """The worker translates the bytes it holds instead of downloading them again"""
+        content = make_workbook(["Bonjour", "Merci"])
+        response = app_module.app.test_client().post("/translate", data={
+            "file": (io.BytesIO(content), "report.xlsx"),
+            "source_lang": "fr",
+            "target_lang": "en"
+        }, content_type="multipart/form-data")
+
+        assert response.status_code == 202
+        job_id = response.get_json()["task_id"]
+        assert wait_for(lambda: supabase_standin.jobs[job_id]["status"] == "complete")
+
+        job = supabase_standin.jobs[job_id]
+        # The input is still stored, in the background, for audit
+        assert wait_for(lambda: job["input_file_path"] is not None)
+        assert f"excel-files/{job['input_file_path']}" in supabase_standin.objects
+        assert supabase_standin.objects[f"excel-files/{job['input_file_path']}"][1] == content
+        # ...but never read back
+        downloads = [path for method, path in supabase_standin.request_log
+                     if method == "GET" and path.startswith("/storage/v1/object/")]
+        assert downloads == []
+
+        output = supabase_standin.objects[f"excel-files/{job['output_file_path']}"][1]
+        assert load_workbook(io.BytesIO(output)).active["A1"].value == "BONJOUR"
+
+    def test_job_points_at_input_once_stored(self, app_module, supabase_standin, monkeypatch):
+        """Until the background upload finishes the job has no input_file_path, so process_job leaves it alone"""
+        release = threading.Event()
+        client = app_module.supabase
+
+        class HeldBucket:
+            def __init__(self, bucket):
+                self.bucket = bucket
+
+            def __getattr__(self, name):
+                return getattr(self.bucket, name)
+
+            def upload(self, *args, **kwargs):
+                release.wait(10)
+                return self.bucket.upload(*args, **kwargs)
+
+        class HeldUploads:
+            """Client whose storage uploads wait for `release`"""
+            def __getattr__(self, name):
+                return getattr(client, name)
+
+            @property
+            def storage(self):
+                return type("Storage", (), {"from_": lambda _, bucket: HeldBucket(client.storage.from_(bucket))})()
+
+        monkeypatch.setattr(app_module, "supabase", HeldUploads())
+        monkeypatch.setattr(app_module.job_scheduler, "submit", lambda *args, **kwargs: None)
+
+        response = app_module.app.test_client().post("/translate", data={
+            "file": (io.BytesIO(make_workbook(["Bonjour"])), "report.xlsx")
+        }, content_type="multipart/form-data")
+        job_id = response.get_json()["task_id"]
+
+        assert supabase_standin.jobs[job_id]["input_file_path"] is None
+        assert load_api_module("process_job").process_translation_job(job_id) is False
+        assert supabase_standin.jobs[job_id]["status"] == "pending"
+
+        release.set()
+        assert wait_for(lambda: supabase_standin.jobs[job_id]["input_file_path"] == f"input/{job_id}/report.xlsx")
+        assert f"excel-files/input/{job_id}/report.xlsx" in supabase_standin.objects
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
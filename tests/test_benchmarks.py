@@ -0,0 +1,185 @@
+"""
+Offline, deterministic benchmarks of the translation pipeline
+
+Every stage runs against seeded synthetic workbooks and a stub translator
+(no network), at several workbook sizes:
+scan, estimate, extraction, dedup, translate-dispatch, formula processing,
+write-back, save, .xls conversion and the whole translation.
+
+The regular test run covers the small and medium sizes; BENCHMARK_SIZES
+selects others (run_tests.py --performance runs all of them).
+
+Baselines are pytest-benchmark JSON files in tests/benchmarks/. Save one with
+    python run_tests.py --save-baseline
+and compare a run against the latest one, failing when a benchmark's fastest
+round is more than BENCHMARK_MAX_REGRESSION percent (default 25) slower, with
+    python run_tests.py --performance
+"""
+import pytest
+import io
+import os
+import sys
+from copy import copy
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from excel_translator_optimized import (
+    convert_xls_to_xlsx, translate_formula_strings, translate_texts_batch, translate_excel_with_format
+)
+from workbook_estimate import estimate_string_count, estimate_workload
+from workbook_generator import generate_workbook
+from conftest import OfflineTranslator
+
+pytestmark = pytest.mark.performance
+
+# Cells of each benchmarked workbook size
+SIZES = {"small": 200, "medium": 2000, "large": 10000}
+
+# Sizes benchmarked in this run
+SELECTED_SIZES = [
+    size.strip() for size in os.environ.get("BENCHMARK_SIZES", "small,medium").split(",") if size.strip() in SIZES
+]
+
+# Rounds per benchmark; more rounds give steadier medians
+ROUNDS = int(os.environ.get("BENCHMARK_ROUNDS", 5))
+
+
+def generate(path, cells):
+    """Seeded workbook of about `cells` cells, 10 columns wide (see workbook_generator.py)"""
+    return generate_workbook(path, rows=cells // 10, cols=10, formula_density=0.1, styles=4, merges=5, seed=0)
+
+
+def text_values(wb):
+    """String cell values in sheet order - what the translation loop visits"""
+    return [
+        cell.value
+        for ws in wb.worksheets
+        for row in ws.iter_rows()
+        for cell in row
+        if cell.value and isinstance(cell.value, str)
+    ]
+
+
+@pytest.fixture(scope="module", params=SELECTED_SIZES, ids=SELECTED_SIZES)
+def workbook(request, tmp_path_factory):
+    """(size name, .xlsx bytes, .xlsx path) of a seeded workbook"""
+    path = tmp_path_factory.mktemp("bench") / f"{request.param}.xlsx"
+    generate(str(path), SIZES[request.param])
+    return request.param, path.read_bytes(), str(path)
+
+
+def run(benchmark, fn, setup=None):
+    return benchmark.pedantic(fn, setup=setup, rounds=ROUNDS, iterations=1, warmup_rounds=1)
+
+
+class TestReadBenchmarks:
+    """Reading and sizing a workbook"""
+
+    @pytest.mark.benchmark(group="scan")
+    def test_scan(self, benchmark, workbook):
+        """Shared-string count straight from the zip container"""
+        _, content, _ = workbook
+        assert run(benchmark, lambda: estimate_string_count(io.BytesIO(content))) > 0
+
+    @pytest.mark.benchmark(group="estimate")
+    def test_estimate(self, benchmark, workbook):
+        """Read-only pre-flight estimate"""
+        _, content, _ = workbook
+        assert run(benchmark, lambda: estimate_workload("a.xlsx", io.BytesIO(content)))["translation_calls"] > 0
+
+    @pytest.mark.benchmark(group="extraction")
+    def test_extraction(self, benchmark, workbook):
+        """Full load and collection of the string cells"""
+        _, content, _ = workbook
+        assert run(benchmark, lambda: text_values(load_workbook(io.BytesIO(content))))
+
+    @pytest.mark.benchmark(group="dedup")
+    def test_dedup(self, benchmark, workbook):
+        """Distinct strings, in first-seen order"""
+        _, content, _ = workbook
+        strings = text_values(load_workbook(io.BytesIO(content)))
+        unique = run(benchmark, lambda: list(dict.fromkeys(strings)))
+        assert len(unique) < len(strings)
+
+
+class TestTranslateBenchmarks:
+    """Dispatching translations and rewriting formulas"""
+
+    @pytest.mark.benchmark(group="translate-dispatch")
+    def test_translate_dispatch(self, benchmark, workbook):
+        """Plain strings through the shared translation executor"""
+        _, content, _ = workbook
+        strings = [text for text in text_values(load_workbook(io.BytesIO(content))) if not text.startswith("=")]
+        results = run(benchmark, lambda: translate_texts_batch(strings, OfflineTranslator(), max_workers=8))
+        assert results == [text.upper() for text in strings]
+
+    @pytest.mark.benchmark(group="formula-processing")
+    def test_formula_processing(self, benchmark, workbook):
+        """String literals of formulas translated in place"""
+        _, content, _ = workbook
+        formulas = [text for text in text_values(load_workbook(io.BytesIO(content))) if text.startswith("=")]
+        translator = OfflineTranslator()
+        results = run(benchmark, lambda: [translate_formula_strings(formula, translator) for formula in formulas])
+        assert results != formulas
+
+
+class TestWriteBenchmarks:
+    """Writing translations back and saving"""
+
+    @pytest.mark.benchmark(group="write-back")
+    def test_write_back(self, benchmark, workbook):
+        """Translated values assigned with the cell formatting preserved"""
+        _, content, _ = workbook
+
+        def setup():
+            return (load_workbook(io.BytesIO(content)),), {}
+
+        def write_back(wb):
+            for ws in wb.worksheets:
+                for row in ws.iter_rows():
+                    for cell in row:
+                        if cell.value and isinstance(cell.value, str):
+                            alignment, font = copy(cell.alignment), copy(cell.font)
+                            fill, border = copy(cell.fill), copy(cell.border)
+                            cell.value = cell.value.upper()
+                            cell.alignment, cell.font, cell.fill, cell.border = alignment, font, fill, border
+
+        run(benchmark, write_back, setup=setup)
+
+    @pytest.mark.benchmark(group="save")
+    def test_save(self, benchmark, workbook):
+        """Serializing the workbook"""
+        _, content, _ = workbook
+
+        def setup():
+            return (load_workbook(io.BytesIO(content)),), {}
+
+        run(benchmark, lambda wb: wb.save(io.BytesIO()), setup=setup)
+
+    @pytest.mark.benchmark(group="xls-conversion")
+    def test_xls_conversion(self, benchmark, workbook, tmp_path):
+        """.xls converted to .xlsx before translation"""
+        pytest.importorskip("xlwt")
+        name, _, _ = workbook
+        path = str(tmp_path / f"{name}.xls")
+        generate(path, SIZES[name])
+
+        assert run(benchmark, lambda: convert_xls_to_xlsx(path)).endswith(".xlsx")
+
+
+class TestPipelineBenchmarks:
+    """The whole translation"""
+
+    @pytest.mark.benchmark(group="translate-workbook")
+    def test_translate_workbook(self, benchmark, workbook, tmp_path, offline_translator):
+        """translate_excel_with_format end to end with the offline translator"""
+        offline_translator()
+        _, _, path = workbook
+        output = str(tmp_path / "out.xlsx")
+        run(benchmark, lambda: translate_excel_with_format(path, output, "fr", "en"))
+        assert os.path.exists(output)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
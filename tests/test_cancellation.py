@@ -0,0 +1,292 @@
+"""
+Tests for job cancellation: the cooperative token, the translation loop and
+the cancel paths of app.py, job_cancel.py and api/
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import uuid
+import tempfile
+import threading
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cancellation
+import excel_translator
+import excel_translator_optimized
+from cancellation import CancellationToken, TranslationCancelled
+from job_store import MemoryJobStore, SQLiteJobStore
+from conftest import load_api_module, make_workbook
+
+
+# 200 text cells, each a separate translation call
+TEXTS = [f"Bonjour {i}" for i in range(1, 201)]
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    """Poll for cancel requests often, so tests notice them quickly"""
+    monkeypatch.setattr(cancellation, "CANCEL_POLL_INTERVAL", 0.05)
+
+
+@pytest.fixture
+def slow_translator(offline_translator):
+    """Offline translator that takes a while per call, installed in both engines"""
+    return offline_translator(delay=0.01)
+
+
+class TestCancellationToken:
+    """Test the cooperative token"""
+
+    def test_cancel(self):
+        """A cancelled token raises on the next check"""
+        token = CancellationToken()
+        token.raise_if_cancelled()
+        token.cancel()
+        assert token.cancelled
+        with pytest.raises(TranslationCancelled):
+            token.raise_if_cancelled()
+
+    def test_poll_is_throttled(self):
+        """The shared state is checked at most once per poll interval"""
+        polls = []
+        token = CancellationToken(poll=lambda: polls.append(1) or len(polls) >= 2, poll_interval=0.05)
+        for _ in range(100):
+            assert not token.cancelled
+        assert polls == []
+        time.sleep(0.06)
+        assert not token.cancelled
+        time.sleep(0.06)
+        assert token.cancelled
+        assert len(polls) == 2
+
+    def test_failing_poll_does_not_cancel(self):
+        """An error while checking is not a cancel request"""
+        def poll():
+            raise ConnectionError("database unreachable")
+        token = CancellationToken(poll=poll, poll_interval=0)
+        assert not token.cancelled
+
+
+class TestTranslationLoop:
+    """Test translate_excel_with_format stopping between cells"""
+
+    @pytest.mark.parametrize("module", [excel_translator, excel_translator_optimized])
+    def test_cancel_stops_translation(self, module, tmp_path, slow_translator):
+        """No further cells are translated and no output is written"""
+        input_path = tmp_path / "input.xlsx"
+        input_path.write_bytes(make_workbook(TEXTS[:100]))
+        output_path = tmp_path / "output.xlsx"
+
+        token = CancellationToken()
+
+        def progress_callback(current, total, message):
+            if current >= 10:
+                token.cancel()
+
+        with pytest.raises(TranslationCancelled):
+            module.translate_excel_with_format(
+                str(input_path), str(output_path), "fr", "en", progress_callback, cancel_token=token)
+
+        assert slow_translator.calls < 30
+        assert not output_path.exists()
+
+    def test_batch_abandons_queued_translations(self, slow_translator):
+        """Cancelling a parallel batch drops the translations not yet started"""
+        token = CancellationToken()
+        timer = threading.Timer(0.05, token.cancel)
+        timer.start()
+
+        started = time.monotonic()
+        with pytest.raises(TranslationCancelled):
+            excel_translator_optimized.translate_texts_batch(
+                [f"text {i}" for i in range(500)], slow_translator(), max_workers=2, cancel_token=token)
+
+        assert time.monotonic() - started < 1
+        time.sleep(0.05)
+        assert slow_translator.calls < 100
+
+
+class TestAppCancel:
+    """Test the /cancel endpoint of app.py"""
+
+    @pytest.fixture
+    def app_module(self, tmp_path, monkeypatch, slow_translator):
+        import app as app_module
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+        os.makedirs(tmp_path / "tmp")
+        monkeypatch.setattr(app_module, "job_store", MemoryJobStore(result_dir=str(tmp_path / "results")))
+        return app_module
+
+    def start_job(self, client):
+        response = client.post("/translate", data={"file": (io.BytesIO(make_workbook(TEXTS)), "report.xlsx")},
+                               content_type="multipart/form-data")
+        return response.get_json()["task_id"]
+
+    def test_cancel_running_job(self, app_module, tmp_path, slow_translator):
+        """The job ends cancelled, without a result, and its temp dir is removed"""
+        client = app_module.app.test_client()
+        task_id = self.start_job(client)
+        assert wait_for(lambda: slow_translator.calls > 0)
+
+        response = client.post(f"/cancel/{task_id}")
+        assert response.status_code == 202
+        assert response.get_json()["status"] == "cancelling"
+
+        assert wait_for(lambda: app_module.job_store.get_progress(task_id)["status"] == "cancelled")
+        assert slow_translator.calls < 200
+        assert app_module.job_store.open_result(task_id) is None
+        assert wait_for(lambda: os.listdir(tmp_path / "tmp") == [])
+        assert task_id not in app_module.cancel_tokens
+
+        # Already finished
+        assert client.post(f"/cancel/{task_id}").status_code == 409
+
+    def test_cancel_queued_job(self, app_module, tmp_path, monkeypatch, slow_translator):
+        """A job still waiting for a worker is cancelled without ever running"""
+        from job_scheduler import JobScheduler
+        scheduler = JobScheduler(workers=1)
+        release = threading.Event()
+        scheduler.submit(release.wait)
+        monkeypatch.setattr(app_module, "job_scheduler", scheduler)
+        client = app_module.app.test_client()
+        task_id = self.start_job(client)
+
+        response = client.post(f"/cancel/{task_id}")
+        assert response.get_json()["status"] == "cancelled"
+        assert app_module.job_store.get_progress(task_id)["status"] == "cancelled"
+        assert os.listdir(tmp_path / "tmp") == []
+
+        release.set()
+        scheduler.shutdown()
+        assert slow_translator.calls == 0
+
+    def test_cancel_unknown_job(self, app_module):
+        """Unknown jobs are 404"""
+        assert app_module.app.test_client().post("/cancel/nope").status_code == 404
+
+    def test_cancel_from_another_worker(self, app_module, tmp_path, monkeypatch, slow_translator):
+        """A cancel recorded in a shared store reaches the worker running the job"""
+        db_path = str(tmp_path / "jobs.db")
+        monkeypatch.setattr(app_module, "job_store", SQLiteJobStore(db_path))
+        client = app_module.app.test_client()
+        task_id = self.start_job(client)
+        assert wait_for(lambda: slow_translator.calls > 0)
+
+        SQLiteJobStore(db_path).request_cancel(task_id)
+
+        assert wait_for(lambda: app_module.job_store.get_progress(task_id)["status"] == "cancelled")
+
+
+class TestApiCancel:
+    """Test api/cancel.py and process_job honouring it"""
+
+    def insert_job(self, standin, status="pending"):
+        job_id = str(uuid.uuid4())
+        standin.objects[f"excel-files/input/{job_id}/report.xlsx"] = (
+            "application/octet-stream", make_workbook(TEXTS))
+        standin.insert("translation_jobs", {
+            "id": job_id, "original_filename": "report.xlsx", "status": status,
+            "input_file_path": f"input/{job_id}/report.xlsx"})
+        return job_id
+
+    def test_cancel_pending_job(self, supabase_standin, api_server):
+        """A pending job is cancelled and its input removed at once"""
+        job_id = self.insert_job(supabase_standin)
+
+        response = requests.post(api_server("cancel"), json={"job_id": job_id})
+
+        assert response.status_code == 202
+        assert supabase_standin.jobs[job_id]["status"] == "cancelled"
+        assert f"excel-files/input/{job_id}/report.xlsx" not in supabase_standin.objects
+
+        # process_job no longer picks it up
+        assert load_api_module("process_job").process_translation_job(job_id) is False
+
+    def test_cancel_finished_or_unknown_job(self, supabase_standin, api_server):
+        """Finished jobs are 409, unknown ones 404"""
+        url = api_server("cancel")
+        job_id = self.insert_job(supabase_standin, status="complete")
+
+        assert requests.post(url, json={"job_id": job_id}).status_code == 409
+        assert supabase_standin.jobs[job_id]["status"] == "complete"
+        assert requests.post(f"{url}?job_id={uuid.uuid4()}").status_code == 404
+        assert requests.post(url, json={}).status_code == 400
+
+    def test_cancel_processing_job(self, supabase_standin, api_server, slow_translator):
+        """The worker stops between cells and removes the job's storage objects"""
+        process_job = load_api_module("process_job")
+        job_id = self.insert_job(supabase_standin)
+
+        worker = threading.Thread(target=process_job.process_translation_job, args=(job_id,))
+        worker.start()
+        assert wait_for(lambda: slow_translator.calls > 0)
+
+        response = requests.post(api_server("cancel"), json={"job_id": job_id})
+        assert response.status_code == 202
+
+        worker.join(timeout=10)
+        assert not worker.is_alive()
+        assert slow_translator.calls < 200
+        assert supabase_standin.jobs[job_id]["status"] == "cancelled"
+        assert not [key for key in supabase_standin.objects if job_id in key]
+
+    def follower(self, standin, leader_id, with_input):
+        """A job coalesced with leader_id, as api/translate.py (with its input) or app_supabase.py (without) creates it"""
+        job_id = self.insert_job(standin)
+        fields = {"coalesced_with": leader_id}
+        if not with_input:
+            standin.objects.pop(f"excel-files/input/{job_id}/report.xlsx")
+            fields["input_file_path"] = None
+        standin.update("translation_jobs", [("id", f"eq.{job_id}")], fields)
+        return job_id
+
+    def test_api_cancel_fails_followers(self, supabase_standin, api_server):
+        """Followers from either backend fail with the cancelled job, and never reach process_job"""
+        leader_id = self.insert_job(supabase_standin, status="processing")
+        followers = [self.follower(supabase_standin, leader_id, with_input) for with_input in (True, False)]
+
+        assert requests.post(api_server("cancel"), json={"job_id": leader_id}).status_code == 202
+
+        for follower_id in followers:
+            assert supabase_standin.jobs[follower_id]["status"] == "error"
+            assert "cancelled" in supabase_standin.jobs[follower_id]["error_message"]
+            assert load_api_module("process_job").process_translation_job(follower_id) is False
+        assert not [key for key in supabase_standin.objects if followers[0] in key]
+
+    def test_app_supabase_cancel_fails_followers(self, supabase_standin):
+        """app_supabase.py treats followers api/translate.py created the same way"""
+        import importlib
+        # A fresh import binds app_supabase's client to this stand-in
+        sys.modules.pop("app_supabase", None)
+        app_supabase = importlib.import_module("app_supabase")
+        leader_id = self.insert_job(supabase_standin, status="processing")
+        followers = [self.follower(supabase_standin, leader_id, with_input) for with_input in (True, False)]
+
+        assert app_supabase.app.test_client().post(f"/cancel/{leader_id}").status_code == 202
+
+        assert [supabase_standin.jobs[job_id]["status"] for job_id in followers] == ["error", "error"]
+        assert not [key for key in supabase_standin.objects if followers[0] in key]
+
+    def test_follower_without_input_of_cancelled_leader(self, supabase_standin):
+        """Dispatched after its leader was cancelled, a follower without an input fails instead of downloading"""
+        leader_id = self.insert_job(supabase_standin, status="cancelled")
+        follower_id = self.follower(supabase_standin, leader_id, with_input=False)
+
+        assert load_api_module("process_job").process_translation_job(follower_id) is True
+        assert supabase_standin.jobs[follower_id]["status"] == "error"
+        assert not [entry for entry in supabase_standin.request_log if "/storage/" in str(entry)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
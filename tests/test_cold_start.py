@@ -0,0 +1,98 @@
+"""
+Cold-start guard for the api/ serverless functions
+
+Each handler is imported in a fresh interpreter under `python -X importtime`.
+The test fails if an endpoint pulls in a heavy library it does not need at
+import time, or if its total import time exceeds its budget.
+
+Budgets are in milliseconds; scale them all on slow machines with
+COLD_START_BUDGET_FACTOR (e.g. COLD_START_BUDGET_FACTOR=2).
+"""
+import pytest
+import os
+import re
+import sys
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Import-time budget per endpoint (ms, on top of a bare interpreter)
+ENDPOINT_BUDGETS_MS = {
+    "status": 300,
+    "download": 300,
+    "upload_url": 300,
+    "translate": 300,
+    "process_job": 300,
+    "cancel": 300,
+    "estimate": 300,
+    "stats": 300,
+    "recover_jobs": 300,
+}
+
+# Libraries no endpoint may import when it is loaded
+HEAVY_MODULES = ["supabase", "postgrest", "httpx", "pydantic", "openpyxl", "xlrd", "deep_translator"]
+
+BUDGET_FACTOR = float(os.environ.get("COLD_START_BUDGET_FACTOR", 1))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+
+def measure_import(endpoint=None, runs=3):
+    """
+    Import an api/ module the way Vercel does, in a fresh interpreter
+
+    Returns (milliseconds, imported module names); the time is the sum of
+    the self times reported by -X importtime, best of `runs`.
+    """
+    code = f"import sys, importlib.util; sys.path.insert(0, {ROOT!r})"
+    if endpoint:
+        path = os.path.join(ROOT, "api", f"{endpoint}.py")
+        code += (f"; spec = importlib.util.spec_from_file_location('api_{endpoint}', {path!r})"
+                 "; spec.loader.exec_module(importlib.util.module_from_spec(spec))")
+    env = dict(os.environ, SUPABASE_URL="http://127.0.0.1:9", SUPABASE_SERVICE_KEY="service-key")
+
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                                capture_output=True, text=True, env=env, cwd=ROOT)
+        assert result.returncode == 0, result.stderr[-2000:]
+        total_us = 0
+        modules = set()
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                total_us += int(match.group(1))
+                modules.add(match.group(3))
+        if best is None or total_us < best[0]:
+            best = (total_us, modules)
+    return best[0] / 1000, best[1]
+
+
+@pytest.fixture(scope="module")
+def baseline_ms():
+    """Import time of the interpreter and loader alone"""
+    return measure_import()[0]
+
+
+@pytest.mark.performance
+class TestColdStart:
+    """Import cost of each serverless function"""
+
+    @pytest.mark.parametrize("endpoint", sorted(ENDPOINT_BUDGETS_MS))
+    def test_no_heavy_imports(self, endpoint):
+        """Heavy libraries are imported lazily, if at all"""
+        _, modules = measure_import(endpoint, runs=1)
+        heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+        assert not heavy, f"api/{endpoint}.py imports {heavy} at load time"
+
+    @pytest.mark.parametrize("endpoint", sorted(ENDPOINT_BUDGETS_MS))
+    def test_import_time_budget(self, endpoint, baseline_ms):
+        """Total import time stays within the endpoint's budget"""
+        elapsed_ms, _ = measure_import(endpoint)
+        budget_ms = ENDPOINT_BUDGETS_MS[endpoint] * BUDGET_FACTOR
+        print(f"api/{endpoint}.py: {elapsed_ms - baseline_ms:.1f}ms (budget {budget_ms:.0f}ms)")
+        assert elapsed_ms - baseline_ms <= budget_ms
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,107 @@
+"""
+Tests for the shared HTTP transport and a per-call latency microbenchmark
+against the local Supabase stand-in
+"""
+import pytest
+import os
+import sys
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from http_session import get_session, reset_session, create_session, CONNECT_TIMEOUT, READ_TIMEOUT
+from supabase_rest import select_jobs, auth_headers, get_supabase_client
+from supabase_standin import SupabaseStandIn
+
+
+@pytest.fixture
+def fresh_session():
+    """Start each test with no pooled connections"""
+    reset_session()
+    yield get_session()
+    reset_session()
+
+
+class TestSharedSession:
+    """Test the process-wide pooled session"""
+
+    def test_session_is_shared(self, fresh_session):
+        """Every caller gets the same session object"""
+        assert get_session() is fresh_session
+
+    def test_default_timeout(self, fresh_session):
+        """Requests made without a timeout still get one"""
+        adapter = fresh_session.get_adapter("https://example.supabase.co")
+        assert adapter.timeout == (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    def test_calls_reuse_one_connection(self, supabase_standin, fresh_session):
+        """Sequential REST calls travel over a single keep-alive connection"""
+        for _ in range(20):
+            select_jobs("id")
+        assert supabase_standin.connections == 1
+
+    def test_reset_session_drops_connections(self, supabase_standin, fresh_session):
+        """After a reset the next call opens a new connection"""
+        select_jobs("id")
+        reset_session()
+        select_jobs("id")
+        assert supabase_standin.connections == 2
+
+    def test_supabase_client_is_shared(self, supabase_standin):
+        """Handlers and the Flask app share one supabase-py client per project"""
+        assert get_supabase_client() is get_supabase_client()
+
+
+# Simulated TCP+TLS handshake to a remote Supabase project (seconds)
+HANDSHAKE_DELAY = 0.01
+
+
+@pytest.fixture
+def remote_standin(monkeypatch):
+    """Supabase stand-in that charges HANDSHAKE_DELAY for every new connection"""
+    standin = SupabaseStandIn(connect_delay=HANDSHAKE_DELAY).start()
+    monkeypatch.setenv("SUPABASE_URL", standin.url)
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "service-key")
+    yield standin
+    standin.stop()
+
+
+@pytest.mark.performance
+class TestPerCallLatency:
+    """Per-call latency of a PostgREST select, pooled vs. a new connection per call"""
+
+    def test_pooled_session(self, remote_standin, fresh_session, benchmark):
+        """Benchmark: calls through the shared session"""
+        benchmark.group = "supabase-rest-call"
+        benchmark(select_jobs, "id")
+        # One handshake however many rounds ran (just one under --benchmark-disable)
+        assert remote_standin.connections == 1
+
+    def test_connection_per_call(self, remote_standin, benchmark):
+        """Benchmark: bare requests.get, as the handlers used to do"""
+        benchmark.group = "supabase-rest-call"
+        url = f"{remote_standin.url}/rest/v1/translation_jobs"
+        calls = []
+
+        def call():
+            calls.append(1)
+            response = requests.get(url, params={"select": "id"}, headers=auth_headers())
+            assert response.status_code == 200
+
+        benchmark(call)
+        # A handshake for every call
+        assert remote_standin.connections == len(calls)
+
+    def test_small_pool_still_serves_threads(self, supabase_standin):
+        """More concurrent callers than pool slots only costs extra connections"""
+        from concurrent.futures import ThreadPoolExecutor
+        session = create_session(pool_maxsize=2)
+        url = f"{supabase_standin.url}/rest/v1/translation_jobs"
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(lambda _: session.get(url, params={"select": "id"}, headers=auth_headers()).status_code, range(32)))
+        session.close()
+        assert codes == [200] * 32
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
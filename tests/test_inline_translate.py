@@ -0,0 +1,123 @@
+"""
+Tests for workload estimation (workbook_estimate.py) and the inline fast path
+of api/translate.py for tiny workbooks
+"""
+import pytest
+import io
+import os
+import sys
+import zipfile
+import requests
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import workbook_estimate
+from workbook_estimate import estimate_string_count, is_inline_candidate
+from conftest import make_workbook
+
+
+def make_sheet_workbook(sheet_xml):
+    """Minimal .xlsx container holding one sheet, as Excel writes it"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("xl/sharedStrings.xml", '<sst xmlns="x" count="1" uniqueCount="1"><si><t>a</t></si></sst>')
+        archive.writestr("xl/worksheets/sheet1.xml", f'<worksheet xmlns="x"><sheetData>{sheet_xml}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+
+class TestEstimateStringCount:
+    """Test the cheap workload estimate"""
+
+    def test_inline_strings(self):
+        """String cells written inline are counted; numbers are not"""
+        content = make_workbook(["Bonjour", "Merci", 5, "Au revoir"])
+        assert estimate_string_count(io.BytesIO(content)) == 3
+
+    def test_every_shared_string_reference_counts(self):
+        """A shared string is translated once per cell that uses it, so each reference counts"""
+        cells = "".join(f'<row r="{i}"><c r="A{i}" t="s"><v>0</v></c><c r="B{i}"><v>{i}</v></c></row>'
+                        for i in range(1, 41))
+        assert estimate_string_count(io.BytesIO(make_sheet_workbook(cells))) == 40
+
+    def test_formula_literals(self):
+        """Formula literals count, shared formulas once per cell; blank and short ones do not"""
+        cells = ('<c r="A1"><f>IF(B1="","Vide",&quot;Plein&quot;)</f><v></v></c>'
+                 '<c r="A2" t="str"><f t="shared" ref="A2:A4" si="0">IF(B2&gt;0,"Positif","x")</f><v>x</v></c>'
+                 '<c r="A3" t="str"><f t="shared" si="0"/><v>x</v></c>'
+                 '<c r="A4" t="str"><f t="shared" si="0"/><v>x</v></c>')
+        assert estimate_string_count(io.BytesIO(make_sheet_workbook(cells))) == 5
+
+    def test_counted_across_chunk_boundaries(self, monkeypatch):
+        """Cells and formulas split between chunks are counted exactly once"""
+        monkeypatch.setattr(workbook_estimate, "SCAN_CHUNK_SIZE", 7)
+        cells = "".join(f'<c r="A{i}" t="s"><v>{i}</v></c><c r="B{i}"><f>CONCAT("Texte", A{i})</f></c>'
+                        for i in range(1, 26))
+        assert estimate_string_count(io.BytesIO(make_sheet_workbook(cells))) == 50
+
+    def test_not_a_workbook(self):
+        """Anything that is not an .xlsx container has no estimate"""
+        assert estimate_string_count(io.BytesIO(b"not a workbook")) is None
+
+    def test_inline_candidate_limits(self, monkeypatch):
+        """Only small .xlsx files under the string threshold qualify"""
+        content = make_workbook(["Bonjour", "Merci"])
+        assert is_inline_candidate("a.xlsx", len(content), io.BytesIO(content)) == (True, 2)
+        assert is_inline_candidate("a.xls", len(content), io.BytesIO(content))[0] is False
+
+        monkeypatch.setattr(workbook_estimate, "INLINE_MAX_STRINGS", 1)
+        assert is_inline_candidate("a.xlsx", len(content), io.BytesIO(content)) == (False, 2)
+
+    def test_repeated_strings_are_not_inline(self):
+        """A large workbook repeating one shared string is a large job, not an inline one"""
+        content = make_sheet_workbook("".join(f'<c r="A{i}" t="s"><v>0</v></c>' for i in range(1, 50001)))
+        assert len(content) < workbook_estimate.INLINE_MAX_BYTES
+        assert is_inline_candidate("a.xlsx", len(content), io.BytesIO(content)) == (False, 50000)
+
+
+class TestInlineTranslate:
+    """Test /api/translate?inline=1"""
+
+    @pytest.fixture
+    def translate_url(self, supabase_standin, api_server, monkeypatch, offline_translator):
+        offline_translator()
+        monkeypatch.delenv("JOB_DISPATCH_URL", raising=False)
+        return api_server("translate")
+
+    def post(self, url, content, inline=True):
+        query = "filename=report.xlsx&source_lang=fr&target_lang=en" + ("&inline=1" if inline else "")
+        return requests.post(f"{url}?{query}", data=content, headers={"Content-Type": "application/octet-stream"})
+
+    def test_tiny_workbook_translated_in_response(self, translate_url, supabase_standin):
+        """The translated workbook is the response; no storage, no job"""
+        response = self.post(translate_url, make_workbook(["Bonjour", "Merci"]))
+
+        assert response.status_code == 200
+        assert "translated_report.xlsx" in response.headers["Content-Disposition"]
+        assert response.headers["X-Estimated-Strings"] == "2"
+        ws = load_workbook(io.BytesIO(response.content)).active
+        assert [ws["A1"].value, ws["A2"].value] == ["BONJOUR", "MERCI"]
+        assert supabase_standin.objects == {}
+        assert supabase_standin.jobs == {}
+
+    def test_large_workbook_is_queued(self, translate_url, supabase_standin, monkeypatch):
+        """Above the threshold the usual job is created from the same upload"""
+        monkeypatch.setattr(workbook_estimate, "INLINE_MAX_STRINGS", 1)
+        content = make_workbook(["Bonjour", "Merci"])
+
+        response = self.post(translate_url, content)
+
+        assert response.status_code == 202
+        job = supabase_standin.jobs[response.json()["task_id"]]
+        assert supabase_standin.objects[f"excel-files/{job['input_file_path']}"][1] == content
+
+    def test_inline_is_opt_in(self, translate_url, supabase_standin):
+        """Clients that did not ask for inline results always get a job"""
+        response = self.post(translate_url, make_workbook(["Bonjour"]), inline=False)
+        assert response.status_code == 202
+        assert len(supabase_standin.jobs) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
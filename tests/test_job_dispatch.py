@@ -0,0 +1,226 @@
+"""
+Tests for server-side job dispatch (job_dispatch.py) and the process_job
+entry point it calls
+"""
+import pytest
+import os
+import sys
+import time
+import threading
+import requests
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from conftest import load_api_module
+from job_dispatch import dispatch_job, job_id_from_payload, recover_stalled_jobs
+
+
+def wait_for_status(standin, job_id, statuses, timeout=10):
+    """Wait until a job reaches one of the given statuses"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if standin.jobs[job_id]["status"] in statuses:
+            return standin.jobs[job_id]
+        time.sleep(0.02)
+    raise AssertionError(f"job stayed {standin.jobs[job_id]['status']}")
+
+
+@pytest.fixture
+def process_job_module(supabase_standin):
+    """api/process_job.py loaded against the stand-in"""
+    return load_api_module("process_job")
+
+
+@pytest.fixture
+def serve_module():
+    """Serve an already loaded api/ module; returns its base URL"""
+    servers = []
+
+    def serve(module):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), module.handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield serve
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestPayloads:
+    """Test the request bodies process_job understands"""
+
+    def test_invoke_payload(self):
+        """The dispatcher sends {"job_id": ...}"""
+        assert job_id_from_payload({"job_id": "abc"}) == "abc"
+
+    def test_database_webhook_payload(self):
+        """Supabase Database Webhooks send the inserted row"""
+        payload = {"type": "INSERT", "table": "translation_jobs", "record": {"id": "abc"}, "old_record": None}
+        assert job_id_from_payload(payload) == "abc"
+
+    def test_other_payloads(self):
+        """Updates and junk carry no job to start"""
+        assert job_id_from_payload({"type": "UPDATE", "record": {"id": "abc"}}) is None
+        assert job_id_from_payload(["abc"]) is None
+
+
+class TestDispatch:
+    """Test translate -> process_job dispatch"""
+
+    def test_translate_dispatches_new_job(self, supabase_standin, api_server, monkeypatch):
+        """Creating a job starts processing without any further client call"""
+        monkeypatch.setenv("JOB_DISPATCH_URL", api_server("process_job"))
+        translate_url = api_server("translate")
+
+        # Not a real workbook, so processing ends in an error - but it runs
+        response = requests.post(f"{translate_url}?filename=a.xlsx", data=b"not a workbook",
+                                 headers={"Content-Type": "application/octet-stream"})
+        assert response.status_code == 202
+
+        job = wait_for_status(supabase_standin, response.json()["task_id"], ("error",))
+        assert job["error_message"]
+
+    def test_process_job_answers_once_claimed(self, supabase_standin, process_job_module, serve_module):
+        """process_job answers 202 as soon as it owns the job and translates it afterwards"""
+        release, finished = threading.Event(), threading.Event()
+
+        def job(job_id, on_claimed=None):
+            on_claimed()
+            release.wait(5)
+            finished.set()
+            return True
+        process_job_module.process_translation_job = job
+        url = serve_module(process_job_module)
+
+        response = requests.post(url, json={"job_id": "abc"}, timeout=2)
+        assert response.status_code == 202
+        assert response.json()["processed"] is True
+        assert not finished.is_set()
+        release.set()
+        assert finished.wait(2)
+
+    def test_read_timeout_is_not_success(self, supabase_standin, process_job_module, serve_module, monkeypatch):
+        """A process_job that never answers is retried, and the job stays pending"""
+        calls = []
+
+        def hung_job(job_id, on_claimed=None):
+            calls.append(job_id)
+            time.sleep(1)
+        process_job_module.process_translation_job = hung_job
+        monkeypatch.setenv("JOB_DISPATCH_URL", serve_module(process_job_module))
+        monkeypatch.setattr("job_dispatch.DISPATCH_TIMEOUT", 0.1)
+        job = supabase_standin.insert("translation_jobs", {"original_filename": "a.xlsx", "input_file_path": "input/x/a.xlsx"})
+
+        assert dispatch_job(job["id"]) is False
+        assert len(calls) == 2
+        assert supabase_standin.jobs[job["id"]]["status"] == "pending"
+
+    def test_claim_seen_after_timeout(self, supabase_standin, process_job_module, serve_module, monkeypatch):
+        """A job claimed by a call whose answer was lost counts as dispatched"""
+        def claiming_job(job_id, on_claimed=None):
+            supabase_standin.update("translation_jobs", [("id", f"eq.{job_id}")], {"status": "processing"})
+            time.sleep(1)
+        process_job_module.process_translation_job = claiming_job
+        monkeypatch.setenv("JOB_DISPATCH_URL", serve_module(process_job_module))
+        monkeypatch.setattr("job_dispatch.DISPATCH_TIMEOUT", 0.1)
+        job = supabase_standin.insert("translation_jobs", {"original_filename": "a.xlsx", "input_file_path": "input/x/a.xlsx"})
+
+        assert dispatch_job(job["id"]) is True
+
+    def test_dispatch_secret(self, supabase_standin, api_server, monkeypatch):
+        """With a secret configured, only the dispatcher can start jobs"""
+        monkeypatch.setenv("JOB_DISPATCH_SECRET", "s3cret")
+        url = api_server("process_job")
+        monkeypatch.setenv("JOB_DISPATCH_URL", url)
+        job = supabase_standin.insert("translation_jobs", {"original_filename": "a.xlsx", "input_file_path": "input/x/a.xlsx"})
+
+        assert requests.post(url, json={"job_id": job["id"]}).status_code == 401
+        assert dispatch_job(job["id"]) is True
+        wait_for_status(supabase_standin, job["id"], ("error",))
+
+    def test_dispatch_without_url(self, monkeypatch):
+        """Without a target the job stays pending and dispatch reports failure"""
+        monkeypatch.delenv("JOB_DISPATCH_URL", raising=False)
+        monkeypatch.delenv("VERCEL_URL", raising=False)
+        assert dispatch_job("abc") is False
+
+    def test_webhook_mode_sends_nothing(self, supabase_standin, monkeypatch):
+        """In webhook mode the database starts processing"""
+        monkeypatch.setenv("JOB_DISPATCH_MODE", "webhook")
+        monkeypatch.setenv("JOB_DISPATCH_URL", supabase_standin.url + "/nowhere")
+        assert dispatch_job("abc") is True
+        assert supabase_standin.request_log == []
+
+
+class TestClaim:
+    """Test that a job is processed at most once"""
+
+    def test_second_dispatch_leaves_running_job_alone(self, supabase_standin, process_job_module):
+        """A duplicate dispatch neither reprocesses nor fails a running job"""
+        job = supabase_standin.insert("translation_jobs", {"original_filename": "a.xlsx", "status": "processing"})
+
+        assert process_job_module.process_translation_job(job["id"]) is False
+        assert supabase_standin.jobs[job["id"]]["status"] == "processing"
+        assert supabase_standin.jobs[job["id"]]["error_message"] is None
+
+
+
+class TestRecovery:
+    """Test recover_stalled_jobs and api/recover_jobs.py"""
+
+    def insert(self, standin, minutes_ago, **fields):
+        """A job last updated `minutes_ago` minutes ago"""
+        job = standin.insert("translation_jobs", dict({"original_filename": "a.xlsx"}, **fields))
+        updated_at = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+        standin.jobs[job["id"]]["updated_at"] = updated_at.isoformat()
+        return job["id"]
+
+    def test_unclaimed_job_is_dispatched_again(self, supabase_standin, process_job_module, serve_module,
+                                               monkeypatch):
+        """A pending job nobody claimed is dispatched again; fresh and running jobs are left alone"""
+        dispatched = []
+        process_job_module.process_translation_job = lambda job_id, on_claimed=None: dispatched.append(job_id)
+        monkeypatch.setenv("JOB_DISPATCH_URL", serve_module(process_job_module))
+        lost = self.insert(supabase_standin, 5, input_file_path="input/x/a.xlsx")
+        self.insert(supabase_standin, 0, input_file_path="input/y/a.xlsx")
+        self.insert(supabase_standin, 5, status="processing", input_file_path="input/z/a.xlsx")
+        self.insert(supabase_standin, 5)
+
+        assert recover_stalled_jobs() == {"failed": [], "redispatched": [lost]}
+        assert dispatched == [lost]
+
+    def test_stalled_jobs_fail_with_their_followers(self, supabase_standin, monkeypatch):
+        """Jobs stuck pending or processing past the timeout fail, and so do the jobs waiting on them"""
+        monkeypatch.setenv("JOB_DISPATCH_MODE", "none")
+        processing = self.insert(supabase_standin, 20, status="processing", input_file_path="input/x/a.xlsx")
+        pending = self.insert(supabase_standin, 20, input_file_path="input/y/a.xlsx")
+        follower = self.insert(supabase_standin, 20, coalesced_with=processing)
+        running = self.insert(supabase_standin, 5, status="processing", input_file_path="input/z/a.xlsx")
+
+        recovered = recover_stalled_jobs()
+
+        assert sorted(recovered["failed"]) == sorted([processing, pending])
+        for job_id in (processing, pending, follower):
+            assert supabase_standin.jobs[job_id]["status"] == "error"
+        assert supabase_standin.jobs[running]["status"] == "processing"
+
+    def test_cron_endpoint(self, supabase_standin, api_server, monkeypatch):
+        """Vercel Cron's bearer secret is required once CRON_SECRET is set"""
+        monkeypatch.setenv("CRON_SECRET", "cron-s3cret")
+        monkeypatch.setenv("JOB_DISPATCH_MODE", "none")
+        url = api_server("recover_jobs")
+        stalled = self.insert(supabase_standin, 20, status="processing", input_file_path="input/x/a.xlsx")
+
+        assert requests.get(url).status_code == 401
+        response = requests.get(url, headers={"Authorization": "Bearer cron-s3cret"})
+        assert response.status_code == 200
+        assert response.json()["failed"] == [stalled]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
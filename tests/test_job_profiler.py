@@ -0,0 +1,176 @@
+"""
+Tests for on-demand job profiling (job_profiler.py) in api/translate.py,
+api/process_job.py and app.py
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import uuid
+import pstats
+import zipfile
+import hashlib
+import threading
+import tracemalloc
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import job_profiler
+from job_profiler import JobProfiler, profiling_requested
+from result_cache import compute_content_hash
+from conftest import load_api_module, make_workbook
+
+VALUES = ["Bonjour", "Merci", "Au revoir"]
+
+
+def allocate_and_sum(hold=0):
+    blocks = [bytearray(100_000) for _ in range(50)]
+    time.sleep(hold)
+    return sum(len(block) for block in blocks)
+
+
+def read_artifact(artifact, tmp_path):
+    """(pstats.Stats, report text) of a profile zip"""
+    with zipfile.ZipFile(io.BytesIO(artifact)) as archive:
+        archive.extract("translate.prof", tmp_path)
+        report = archive.read("report.txt").decode()
+    return pstats.Stats(str(tmp_path / "translate.prof")), report
+
+
+class TestJobProfiler:
+    """Test the profiler itself"""
+
+    def test_profile_and_memory(self, tmp_path, monkeypatch):
+        """The artifact holds loadable stats and a report with the memory peak and sites"""
+        monkeypatch.setattr(job_profiler, "SNAPSHOT_INTERVAL", 0.01)
+        with JobProfiler() as profiler:
+            assert allocate_and_sum(hold=0.2) == 5_000_000
+
+        assert profiler.peak >= 5_000_000
+        assert not tracemalloc.is_tracing()
+        stats, report = read_artifact(profiler.artifact(), tmp_path)
+        assert any(name == "allocate_and_sum" for _, _, name in stats.stats)
+        assert "allocate_and_sum" in report
+        assert "tracemalloc peak" in report
+
+        # The allocation snapshot was taken while the blocks were alive
+        assert profiler.snapshot_size >= 5_000_000
+        sites = report[report.index("allocation sites"):].splitlines()[1]
+        assert "test_job_profiler.py" in sites
+
+    def test_disabled(self):
+        """A disabled profiler is a no-op"""
+        with JobProfiler(enabled=False) as profiler:
+            allocate_and_sum()
+        assert profiler.artifact() is None
+        assert not tracemalloc.is_tracing()
+
+    def test_one_job_at_a_time(self):
+        """A second job asking for a profile meanwhile runs unprofiled"""
+        inside = threading.Event()
+        release = threading.Event()
+
+        def first_job():
+            with JobProfiler():
+                inside.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=first_job)
+        worker.start()
+        assert inside.wait(5)
+        with JobProfiler() as second:
+            pass
+        release.set()
+        worker.join()
+
+        assert second.artifact() is None
+        with JobProfiler() as third:
+            pass
+        assert third.artifact() is not None
+
+    def test_profiling_requested(self, monkeypatch):
+        """A job flag or JOB_PROFILING=1 turns profiling on"""
+        assert profiling_requested("1") and profiling_requested(True) and profiling_requested("true")
+        assert not profiling_requested(None) and not profiling_requested("0")
+        monkeypatch.setattr(job_profiler, "PROFILE_ALL_JOBS", True)
+        assert profiling_requested(None)
+
+
+class TestProfiledJobs:
+    """Test profiled jobs end to end"""
+
+    def test_translate_flags_job_and_skips_cache(self, supabase_standin, api_server):
+        """profile=1 is recorded on the job, which is never served from the result cache"""
+        content = make_workbook(VALUES)
+        done_id = str(uuid.uuid4())
+        supabase_standin.insert("translation_jobs", {
+            "id": done_id, "original_filename": "a.xlsx", "status": "complete",
+            "content_hash": compute_content_hash(hashlib.sha256(content).hexdigest(), "fr", "en"),
+            "output_file_path": f"output/{done_id}/translated_a.xlsx"})
+
+        response = requests.post(f"{api_server('translate')}?filename=a.xlsx&profile=1", data=content,
+                                 headers={"Content-Type": "application/octet-stream"})
+
+        job = supabase_standin.jobs[response.json()["task_id"]]
+        assert job["profile"] is True
+        assert job["status"] == "pending" and job["output_file_path"] is None
+
+    def test_process_job_stores_profile(self, supabase_standin, api_server, offline_translator):
+        """The profile is uploaded next to the output and reported by status"""
+        offline_translator()
+        job_id = str(uuid.uuid4())
+        supabase_standin.objects[f"excel-files/input/{job_id}/report.xlsx"] = (
+            "application/octet-stream", make_workbook(VALUES))
+        supabase_standin.insert("translation_jobs", {
+            "id": job_id, "original_filename": "report.xlsx", "profile": True,
+            "input_file_path": f"input/{job_id}/report.xlsx"})
+
+        assert load_api_module("process_job").process_translation_job(job_id)
+
+        job = supabase_standin.jobs[job_id]
+        assert job["status"] == "complete"
+        assert job["profile_path"] == f"output/{job_id}/profile.zip"
+        _, artifact = supabase_standin.objects[f"excel-files/{job['profile_path']}"]
+        with zipfile.ZipFile(io.BytesIO(artifact)) as archive:
+            assert "translate_excel_with_format" in archive.read("report.txt").decode()
+
+        response = requests.get(f"{api_server('status')}?job_id={job_id}")
+        assert response.json()["profile_path"] == job["profile_path"]
+
+    def test_unprofiled_job_stores_nothing(self, supabase_standin, offline_translator):
+        """Jobs that did not ask for a profile get none"""
+        offline_translator()
+        job_id = str(uuid.uuid4())
+        supabase_standin.objects[f"excel-files/input/{job_id}/report.xlsx"] = (
+            "application/octet-stream", make_workbook(VALUES))
+        supabase_standin.insert("translation_jobs", {
+            "id": job_id, "original_filename": "report.xlsx", "input_file_path": f"input/{job_id}/report.xlsx"})
+
+        assert load_api_module("process_job").process_translation_job(job_id)
+        assert supabase_standin.jobs[job_id]["profile_path"] is None
+        assert f"excel-files/output/{job_id}/profile.zip" not in supabase_standin.objects
+
+    def test_app_profile(self, tmp_path, monkeypatch, offline_translator):
+        """app.py keeps the profile in JOB_PROFILE_DIR and reports its path"""
+        import app as app_module
+        offline_translator()
+        monkeypatch.setattr(job_profiler, "PROFILE_DIR", str(tmp_path))
+        client = app_module.app.test_client()
+        task_id = client.post("/translate", data={
+            "file": (io.BytesIO(make_workbook(VALUES)), "report.xlsx"), "profile": "1"
+        }, content_type="multipart/form-data").get_json()["task_id"]
+
+        deadline = time.time() + 10
+        while app_module.job_store.get_progress(task_id)["status"] != "complete":
+            assert time.time() < deadline
+            time.sleep(0.05)
+
+        profile_path = app_module.job_store.get_progress(task_id)["profile_path"]
+        assert os.path.dirname(profile_path) == str(tmp_path)
+        assert zipfile.is_zipfile(profile_path)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
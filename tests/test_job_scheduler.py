@@ -0,0 +1,197 @@
+"""
+Tests for the size-aware job scheduler (job_scheduler.py) and its
+trace-replay benchmark (scheduler_benchmark.py)
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import zipfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from job_scheduler import JobScheduler
+from workbook_estimate import estimate_job_cost
+from scheduler_benchmark import generate_trace, percentile, replay, run_benchmark, summarize
+from conftest import make_workbook
+
+
+def run_order(scheduler, jobs):
+    """
+    Queue jobs behind a blocker on a one-worker scheduler and return the
+    order they ran in; jobs are (name, cost, client) tuples
+    """
+    release = threading.Event()
+    order = []
+    scheduler.submit(release.wait, cost=1)
+    time.sleep(0.05)
+    for name, cost, client in jobs:
+        scheduler.submit(lambda name=name: order.append(name), cost=cost, client=client, job_id=name)
+    release.set()
+    scheduler.shutdown()
+    return order
+
+
+class TestPolicies:
+    """Test the order queued jobs run in"""
+
+    def test_fifo_runs_in_arrival_order(self):
+        """fifo ignores job sizes"""
+        order = run_order(JobScheduler(workers=1, policy="fifo"), [("big", 1000, None), ("small", 10, None)])
+        assert order == ["big", "small"]
+
+    def test_sjf_runs_small_jobs_first(self):
+        """sjf runs the smallest expected job first"""
+        jobs = [("monster", 500000, None), ("medium", 5000, None), ("small", 50, None), ("tiny", 5, None)]
+        order = run_order(JobScheduler(workers=1, policy="sjf"), jobs)
+        assert order == ["tiny", "small", "medium", "monster"]
+
+    def test_sjf_aging_prevents_starvation(self):
+        """A large job that waited long enough overtakes newer small ones"""
+        scheduler = JobScheduler(workers=1, policy="sjf", aging_seconds=0.01)
+        release = threading.Event()
+        order = []
+        scheduler.submit(release.wait)
+        time.sleep(0.05)
+        scheduler.submit(lambda: order.append("big"), cost=100)
+        time.sleep(0.5)
+        scheduler.submit(lambda: order.append("small"), cost=10)
+        release.set()
+        scheduler.shutdown()
+        assert order == ["big", "small"]
+
+    def test_wfq_shares_workers_between_clients(self):
+        """A client with many queued jobs does not hold back another client"""
+        jobs = [(f"batch-{i}", 100, "batch") for i in range(5)] + [("user", 100, "user")]
+        order = run_order(JobScheduler(workers=1, policy="wfq"), jobs)
+        assert order.index("user") <= 1
+        assert [name for name in order if name.startswith("batch")] == [f"batch-{i}" for i in range(5)]
+
+    def test_unknown_policy(self):
+        """Misconfiguration fails loudly"""
+        with pytest.raises(ValueError):
+            JobScheduler(policy="random")
+
+
+class TestScheduler:
+    """Test the worker pool"""
+
+    def test_worker_limit(self):
+        """No more than `workers` jobs run at the same time"""
+        scheduler = JobScheduler(workers=2)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        for _ in range(8):
+            scheduler.submit(job)
+        scheduler.shutdown()
+        assert max(peak) == 2
+
+    def test_cancel_queued_job(self):
+        """A queued job is dropped and its on_cancel runs instead"""
+        scheduler = JobScheduler(workers=1)
+        release = threading.Event()
+        ran = []
+        cancelled = []
+        scheduler.submit(release.wait)
+        time.sleep(0.05)
+        scheduler.submit(lambda: ran.append(1), job_id="job", on_cancel=lambda: cancelled.append(1))
+
+        assert scheduler.stats()["queued"] == 1
+        assert scheduler.cancel("job")
+        assert not scheduler.cancel("job")
+        release.set()
+        scheduler.shutdown()
+        assert ran == [] and cancelled == [1]
+
+    def test_failing_job_does_not_stop_worker(self):
+        """An exception in one job does not kill its worker thread"""
+        scheduler = JobScheduler(workers=1)
+        ran = []
+        scheduler.submit(lambda: 1 / 0)
+        scheduler.submit(lambda: ran.append(1))
+        scheduler.shutdown()
+        assert ran == [1]
+
+
+class TestJobCost:
+    """Test the scheduling cost estimate"""
+
+    def test_xlsx_cost_counts_strings(self):
+        """An .xlsx job costs its estimated strings"""
+        content = make_workbook([f"Texte {i}" for i in range(1, 31)])
+        assert estimate_job_cost("a.xlsx", len(content), io.BytesIO(content)) == 30
+
+    def test_repeated_strings_are_not_cheap(self):
+        """A large workbook repeating one string is ordered after small ones with distinct strings"""
+        costs = {}
+        for name, cells in (("repeated", ['<c t="s"><v>0</v></c>'] * 20000),
+                            ("distinct", [f'<c t="s"><v>{i}</v></c>' for i in range(20)])):
+            # Shared strings, as Excel writes them
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("[Content_Types].xml", "<Types/>")
+                archive.writestr("xl/worksheets/sheet1.xml", f"<worksheet><sheetData>{''.join(cells)}</sheetData></worksheet>")
+            costs[name] = estimate_job_cost("a.xlsx", len(buffer.getvalue()), buffer)
+        assert costs == {"repeated": 20000, "distinct": 20}
+
+        order = run_order(JobScheduler(workers=1, policy="sjf"),
+                          [("repeated", costs["repeated"], None), ("distinct", costs["distinct"], None)])
+        assert order == ["distinct", "repeated"]
+
+        # Under wfq the client of the large job waits for its share before its next job
+        jobs = [(f"{name}-{i}", costs[name], name) for i in range(2) for name in ("repeated", "distinct")]
+        order = run_order(JobScheduler(workers=1, policy="wfq"), jobs)
+        assert order == ["repeated-0", "distinct-0", "distinct-1", "repeated-1"]
+
+    def test_unreadable_cost_uses_file_size(self):
+        """.xls (or broken) files fall back to their size"""
+        assert estimate_job_cost("a.xls", 50000, io.BytesIO(b"not a zip")) == 500
+        assert estimate_job_cost("a.xls", 10, io.BytesIO(b"")) == 1
+
+
+class TestSchedulerBenchmark:
+    """Test the trace replay harness"""
+
+    def test_trace_is_seeded(self):
+        """The same seed replays the same workload"""
+        assert generate_trace(jobs=50, seed=3) == generate_trace(jobs=50, seed=3)
+        assert generate_trace(jobs=50, seed=3) != generate_trace(jobs=50, seed=4)
+
+    def test_percentiles(self):
+        """Nearest-rank percentiles"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert summarize(values)["p95"] == 95
+
+    def test_replay_reports_every_job(self):
+        """Each job's latency covers at least its own run time"""
+        trace = [{"arrival": 0.0, "cost": 1000, "client": "a"}, {"arrival": 0.5, "cost": 10, "client": "b"}]
+        latencies = replay(trace, "fifo", workers=1, strings_per_second=1000, speedup=20)
+        assert len(latencies) == 2
+        assert latencies[0] >= 1.0 - 0.05
+        assert latencies[1] >= 0.5
+
+    @pytest.mark.performance
+    def test_sjf_beats_fifo_on_mixed_trace(self):
+        """Small jobs stop waiting behind large ones"""
+        trace = generate_trace(jobs=120, seed=1, mean_interarrival=1.0)
+        results = run_benchmark(trace, ["sjf", "fifo"], workers=2, speedup=1000)
+        assert results["sjf"]["p50"] < results["fifo"]["p50"]
+        assert results["sjf"]["mean"] < results["fifo"]["mean"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,245 @@
+"""
+Tests for the app.py job state store (job_store.py)
+"""
+import pytest
+import io
+import os
+import sys
+import time
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from job_store import JobStore, MemoryJobStore, SQLiteJobStore, RedisJobStore, create_job_store
+from job_reaper import JobReaper, job_temp_prefix
+from conftest import make_workbook
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    """Every backend that can run here"""
+    if request.param == "memory":
+        return MemoryJobStore(result_dir=str(tmp_path))
+    if request.param == "sqlite":
+        return SQLiteJobStore(str(tmp_path / "jobs.db"))
+    pytest.importorskip("redis")
+    if not os.environ.get("TEST_REDIS_URL"):
+        pytest.skip("TEST_REDIS_URL not set")
+    return RedisJobStore(os.environ["TEST_REDIS_URL"], prefix=f"test:{time.time()}:")
+
+
+@pytest.fixture
+def result_file(tmp_path):
+    path = tmp_path / "output.xlsx"
+    path.write_bytes(b"translated workbook")
+    return str(path)
+
+
+class TestJobStore:
+    """Behaviour every backend shares"""
+
+    def test_backends_implement_the_interface(self):
+        """A backend missing part of the interface cannot be instantiated"""
+        class PartialStore(JobStore):
+            def set_progress(self, task_id, progress):
+                pass
+
+        with pytest.raises(TypeError):
+            PartialStore()
+
+    def test_progress_roundtrip(self, store):
+        """Progress written is progress read"""
+        store.set_progress("job", {"current": 3, "total": 10, "message": "Working", "status": "processing"})
+        assert store.get_progress("job") == {"current": 3, "total": 10, "message": "Working", "status": "processing"}
+        assert store.get_progress("unknown") is None
+
+    def test_result_is_copied_into_store(self, store, result_file):
+        """The caller's file can be deleted once stored"""
+        store.put_result("job", "report.xlsx", result_file)
+        os.unlink(result_file)
+
+        filename, f = store.open_result("job")
+        with f:
+            assert filename == "report.xlsx"
+            assert f.read() == b"translated workbook"
+
+    def test_delete(self, store, result_file):
+        """Deleting forgets progress and result"""
+        store.set_progress("job", {"status": "complete"})
+        store.put_result("job", "report.xlsx", result_file)
+        store.delete("job")
+        assert store.get_progress("job") is None
+        assert store.open_result("job") is None
+
+    def test_entries(self, store, result_file):
+        """Entries describe status, age and result size of every job"""
+        store.set_progress("running", {"status": "processing"})
+        store.set_progress("done", {"status": "complete"})
+        store.put_result("done", "report.xlsx", result_file)
+
+        entries = {entry["task_id"]: entry for entry in store.entries()}
+        assert entries["running"]["status"] == "processing"
+        assert entries["running"]["result_size"] is None
+        assert entries["done"]["result_size"] == len(b"translated workbook")
+        assert entries["done"]["updated_at"] <= time.time()
+        assert entries["done"]["result_created_at"] <= time.time()
+
+
+class TestJobReaper:
+    """Test TTL eviction, the retained-bytes cap and temp dir reaping"""
+
+    def test_finished_jobs_expire_after_result_ttl(self, store, result_file):
+        """Undownloaded results go after result_ttl; running jobs stay"""
+        store.set_progress("running", {"status": "processing"})
+        store.set_progress("done", {"status": "complete"})
+        store.put_result("done", "report.xlsx", result_file)
+        reaper = JobReaper(store, result_ttl=60, stale_ttl=3600, max_retained_bytes=0, temp_prefix="none-")
+
+        assert reaper.sweep()["retained_jobs"] == 2
+        metrics = reaper.sweep(now=time.time() + 120)
+        assert store.open_result("done") is None
+        assert store.get_progress("running") is not None
+        assert metrics["retained_jobs"] == 1
+        assert metrics["retained_result_bytes"] == 0
+        assert metrics["reaped_jobs_total"] == 1
+        assert metrics["reaped_result_bytes_total"] == len(b"translated workbook")
+
+    def test_abandoned_jobs_expire_after_stale_ttl(self, store):
+        """A job stuck in processing is dropped once stale"""
+        store.set_progress("stuck", {"status": "processing"})
+        reaper = JobReaper(store, result_ttl=60, stale_ttl=600, temp_prefix="none-")
+        reaper.sweep(now=time.time() + 300)
+        assert store.get_progress("stuck") is not None
+        reaper.sweep(now=time.time() + 900)
+        assert store.get_progress("stuck") is None
+
+    def test_size_cap_evicts_oldest_results(self, store, tmp_path):
+        """Results beyond the byte cap are evicted oldest first"""
+        for task_id in ["first", "second", "third"]:
+            path = tmp_path / f"{task_id}.bin"
+            path.write_bytes(b"x" * 100)
+            store.set_progress(task_id, {"status": "complete"})
+            store.put_result(task_id, f"{task_id}.xlsx", str(path))
+            time.sleep(0.01)
+
+        metrics = JobReaper(store, max_retained_bytes=250, temp_prefix="none-").sweep()
+        assert store.open_result("first") is None
+        for task_id in ["second", "third"]:
+            _filename, f = store.open_result(task_id)
+            f.close()
+        assert metrics["retained_result_bytes"] == 200
+
+    def test_stale_temp_dirs_are_removed(self, tmp_path):
+        """Leftover job temp dirs are removed once stale and counted until then"""
+        fresh = tmp_path / "job-fresh"
+        stale = tmp_path / "job-stale"
+        unrelated = tmp_path / "other"
+        for path in [fresh, stale, unrelated]:
+            path.mkdir()
+            (path / "input.xlsx").write_bytes(b"x" * 10)
+        old = time.time() - 7200
+        os.utime(stale, (old, old))
+        os.utime(unrelated, (old, old))
+
+        reaper = JobReaper(MemoryJobStore(), stale_ttl=3600, temp_root=str(tmp_path), temp_prefix="job-")
+        metrics = reaper.sweep()
+        assert fresh.exists() and unrelated.exists()
+        assert not stale.exists()
+        assert metrics["temp_dirs"] == 1
+        assert metrics["temp_dir_bytes"] == 10
+        assert metrics["reaped_temp_dirs_total"] == 1
+
+    def test_temp_dirs_of_running_jobs_are_kept(self, tmp_path):
+        """A job running longer than stale_ttl keeps its temp dir; its leftovers go once it is done"""
+        store = MemoryJobStore()
+        store.set_progress("processing", {"status": "processing"})
+        dirs = {task_id: tmp_path / f"{job_temp_prefix(task_id, 'job-')}x1y2" for task_id in ["processing", "local", "done"]}
+        old = time.time() - 7200
+        for path in dirs.values():
+            path.mkdir()
+            os.utime(path, (old, old))
+        running = {"local"}
+
+        reaper = JobReaper(store, result_ttl=60 * 60 * 24, stale_ttl=3600, temp_root=str(tmp_path),
+                           temp_prefix="job-", active_jobs=lambda: running)
+        reaper.sweep()
+        assert dirs["processing"].exists() and dirs["local"].exists()
+        assert not dirs["done"].exists()
+
+        running.clear()
+        reaper.sweep()
+        assert not dirs["local"].exists()
+
+    def test_app_metrics_endpoint(self, tmp_path, monkeypatch):
+        """/jobs/metrics reports retained jobs and disk usage"""
+        import app as app_module
+        store = MemoryJobStore(result_dir=str(tmp_path))
+        store.set_progress("job", {"status": "processing"})
+        monkeypatch.setattr(app_module, "job_reaper", JobReaper(store, temp_root=str(tmp_path)))
+
+        response = app_module.app.test_client().get("/jobs/metrics")
+        assert response.status_code == 200
+        metrics = response.get_json()
+        assert metrics["retained_jobs"] == 1
+        assert metrics["retained_jobs_by_status"] == {"processing": 1}
+        assert "temp_dir_bytes" in metrics
+
+
+class TestSharedStore:
+    """Test that workers sharing a SQLite store see each other's jobs"""
+
+    def test_two_workers_share_state(self, tmp_path, result_file):
+        """A job written by one worker is served by another"""
+        worker_a = SQLiteJobStore(str(tmp_path / "jobs.db"))
+        worker_b = SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+        worker_a.set_progress("job", {"status": "complete"})
+        worker_a.put_result("job", "report.xlsx", result_file)
+
+        assert worker_b.get_progress("job") == {"status": "complete"}
+        filename, f = worker_b.open_result("job")
+        with f:
+            assert f.read() == b"translated workbook"
+
+    def test_create_job_store(self, tmp_path):
+        """JOB_STORE_URL selects the backend"""
+        assert isinstance(create_job_store("memory://"), MemoryJobStore)
+        assert isinstance(create_job_store(f"sqlite:///{tmp_path}/jobs.db"), SQLiteJobStore)
+        with pytest.raises(ValueError):
+            create_job_store("ftp://nowhere")
+
+
+class TestAppWithSharedStore:
+    """Test app.py serving a job from a different worker"""
+
+    def test_download_from_other_worker(self, tmp_path, monkeypatch, offline_translator):
+        """/progress and /download work on a worker that did not run the job"""
+        import app as app_module
+        offline_translator()
+        db_path = str(tmp_path / "jobs.db")
+        monkeypatch.setattr(app_module, "job_store", SQLiteJobStore(db_path))
+
+        buffer = io.BytesIO(make_workbook(["Bonjour"]))
+
+        client = app_module.app.test_client()
+        response = client.post("/translate", data={"file": (buffer, "report.xlsx")}, content_type="multipart/form-data")
+        task_id = response.get_json()["task_id"]
+
+        deadline = time.monotonic() + 10
+        while app_module.job_store.get_progress(task_id)["status"] == "processing" and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        # Another worker process: same database, fresh store object
+        monkeypatch.setattr(app_module, "job_store", SQLiteJobStore(db_path))
+        progress = client.get(f"/progress/{task_id}").get_data(as_text=True)
+        assert '"status": "complete"' in progress
+
+        response = client.get(f"/download/{task_id}", buffered=True)
+        assert response.status_code == 200
+        assert load_workbook(io.BytesIO(response.data)).active["A1"].value == "BONJOUR"
+        response.close()
+        assert app_module.job_store.open_result(task_id) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,80 @@
+"""
+Tests for the local load-test harness (load_test.py)
+"""
+import pytest
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import load_test
+import excel_translator
+import excel_translator_optimized
+from load_test import LocalStack, run_load_test
+
+
+class TestLoadTest:
+    """Test load runs against each target"""
+
+    @pytest.mark.parametrize("target", load_test.TARGETS)
+    def test_full_sessions(self, target):
+        """Every session uploads, follows progress to completion and downloads the result"""
+        report = run_load_test(target=target, jobs=4, concurrency=2, cells=(20,), translate_latency=0)
+
+        assert report["sessions_per_second"] > 0 and report["requests_per_second"] > 0
+        assert set(report["operations"]) == {"upload", "progress", "download", "session"}
+        for operation in ("upload", "progress", "download", "session"):
+            summary = report["operations"][operation]
+            assert summary["count"] == 4 and summary["errors"] == 0 and summary["error_rate"] == 0
+            assert 0 <= summary["p50"] <= summary["p95"] <= summary["p99"] <= summary["max"]
+        assert report["error_samples"] == []
+
+    def test_upload_scenario_with_repeated_files(self):
+        """Upload-only runs measure uploads alone; repeated files are served from the result cache"""
+        report = run_load_test(target="api", scenario="upload", jobs=4, concurrency=2, cells=(20,), files=1,
+                               translate_latency=0)
+        assert set(report["operations"]) == {"upload", "session"}
+        assert report["operations"]["upload"]["count"] == 4
+        assert report["operations"]["session"]["errors"] == 0
+
+    def test_failures_are_counted(self, monkeypatch):
+        """A session whose job fails is an error of its progress step, and is not downloaded"""
+        monkeypatch.setattr(load_test, "make_workbooks", lambda *args: [("broken.xlsx", b"not a workbook")])
+
+        report = run_load_test(target="app", jobs=2, concurrency=2, translate_latency=0, timeout=30)
+
+        assert report["operations"]["progress"]["error_rate"] == 1.0
+        assert report["operations"]["session"]["errors"] == 2
+        assert report["operations"]["download"]["count"] == 0
+        assert "job error" in report["error_samples"][0]
+
+
+class TestLocalStack:
+    """Test the stack set-up and tear-down"""
+
+    def test_restores_environment_and_translator(self, monkeypatch):
+        """Environment variables and GoogleTranslator are put back once the stack stops"""
+        monkeypatch.setenv("SUPABASE_URL", "https://project.example")
+        monkeypatch.delenv("JOB_DISPATCH_URL", raising=False)
+        original = excel_translator_optimized.GoogleTranslator
+
+        with LocalStack("api", env={"JOB_DISPATCH_TIMEOUT": "5"}):
+            assert os.environ["SUPABASE_URL"].startswith("http://127.0.0.1")
+            assert os.environ["JOB_DISPATCH_TIMEOUT"] == "5"
+            assert issubclass(excel_translator.GoogleTranslator, load_test.OfflineTranslator)
+
+        assert os.environ["SUPABASE_URL"] == "https://project.example"
+        assert "JOB_DISPATCH_URL" not in os.environ and "JOB_DISPATCH_TIMEOUT" not in os.environ
+        assert excel_translator_optimized.GoogleTranslator is original
+
+    def test_cli_json_report(self, capsys):
+        """--json prints only the report on stdout"""
+        assert load_test.main(["--target", "app", "--jobs", "2", "--cells", "20",
+                               "--translate-latency", "0", "--json"]) == 0
+        report = json.loads(capsys.readouterr().out)
+        assert report["operations"]["session"]["count"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
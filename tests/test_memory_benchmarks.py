@@ -0,0 +1,177 @@
+"""
+Memory-footprint benchmarks
+
+Each measurement runs in a fresh child process, so its resident memory is
+its own: the tracemalloc peak and the RSS high-water mark (plus the growth
+over the child's RSS once everything is imported) of
+
+- translate_excel_with_format (offline translator)
+- convert_xls_to_xlsx
+- the api/translate.py raw upload handler, streaming into the Supabase stand-in
+- supabase_rest.storage_download, which process_job uses to fetch the input
+
+across workbook sizes. The figures are stored in each benchmark's extra_info
+(in the pytest-benchmark JSON), with the memory_guard.py projection for
+comparison; that projection should stay above the measured RSS growth.
+
+BENCHMARK_SIZES selects the sizes, as in test_benchmarks.py;
+`python run_tests.py --memory` runs all of them and prints a table.
+"""
+import pytest
+import os
+import sys
+import resource
+import tracemalloc
+import multiprocessing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory_guard import current_rss, project_workbook_memory
+from workbook_generator import generate_workbook
+
+pytestmark = pytest.mark.performance
+
+# Cells of each workbook size; memory only separates from interpreter noise on bigger workbooks
+SIZES = {"small": 1000, "medium": 4000, "large": 100000}
+
+SELECTED_SIZES = [
+    size.strip() for size in os.environ.get("BENCHMARK_SIZES", "small,medium").split(",") if size.strip() in SIZES
+]
+
+MB = 1024 * 1024
+
+
+def translate_workbook(path):
+    import excel_translator_optimized
+    from conftest import OfflineTranslator
+    excel_translator_optimized.GoogleTranslator = OfflineTranslator
+    excel_translator_optimized.translate_excel_with_format(path, path + ".out.xlsx", "fr", "en")
+
+
+def convert_xls(path):
+    from excel_translator_optimized import convert_xls_to_xlsx
+    convert_xls_to_xlsx(path)
+
+
+def upload_raw(path):
+    """Stream the file through api/translate.py served in this process"""
+    import threading
+    import requests
+    from http.server import ThreadingHTTPServer
+    from conftest import load_api_module
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), load_api_module("translate").handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with open(path, 'rb') as f:
+            response = requests.post(
+                f"http://127.0.0.1:{server.server_port}?filename={os.path.basename(path)}", data=f,
+                headers={"Content-Type": "application/octet-stream", "Content-Length": str(os.path.getsize(path))})
+        assert response.status_code == 202, response.text
+    finally:
+        server.shutdown()
+
+
+def download_input(storage_path):
+    from supabase_rest import storage_download
+    assert storage_download(storage_path)
+
+
+def _measure(fn, arg, queue):
+    # Import everything first, so only the work itself counts
+    import excel_translator_optimized, supabase_rest, requests  # noqa: F401
+    start = current_rss()
+    fn(arg)
+    high_water = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    tracemalloc.start()
+    fn(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    queue.put({
+        "tracemalloc_peak_mb": round(peak / MB, 2),
+        "rss_high_water_mb": round(high_water / MB, 2),
+        "rss_growth_mb": round((high_water - start) / MB, 2),
+    })
+
+
+def measure(fn, arg):
+    """Memory of fn(arg), run in a fresh (spawned) process"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(fn, arg, queue))
+    process.start()
+    result = queue.get(timeout=600)
+    process.join()
+    return result
+
+
+def run(benchmark, fn, arg, projected=None):
+    memory = benchmark.pedantic(measure, args=(fn, arg), rounds=1, iterations=1)
+    benchmark.extra_info.update(memory)
+    if projected is not None:
+        benchmark.extra_info["projected_mb"] = round(projected / MB, 2)
+    return memory
+
+
+@pytest.fixture(scope="module", params=SELECTED_SIZES, ids=SELECTED_SIZES)
+def workbooks(request, tmp_path_factory):
+    """(.xlsx path, .xls path) of a seeded workbook of each size"""
+    directory = tmp_path_factory.mktemp("memory")
+    cells = SIZES[request.param]
+    options = dict(rows=cells // 10, cols=10, formula_density=0.1, styles=4, merges=5, seed=0)
+    xlsx = str(directory / f"{request.param}.xlsx")
+    generate_workbook(xlsx, **options)
+    xls = None
+    try:
+        import xlwt  # noqa: F401
+        xls = str(directory / f"{request.param}.xls")
+        generate_workbook(xls, **options)
+    except ImportError:
+        pass
+    return xlsx, xls
+
+
+class TestEngineMemory:
+    """Translation engine"""
+
+    @pytest.mark.benchmark(group="memory-translate")
+    def test_translate_memory(self, benchmark, workbooks):
+        """translate_excel_with_format end to end"""
+        xlsx, _ = workbooks
+        memory = run(benchmark, translate_workbook, xlsx, projected=project_workbook_memory(xlsx))
+        assert memory["tracemalloc_peak_mb"] > 0
+
+    @pytest.mark.benchmark(group="memory-xls-conversion")
+    def test_convert_xls_memory(self, benchmark, workbooks):
+        """.xls to .xlsx conversion"""
+        _, xls = workbooks
+        if xls is None:
+            pytest.skip("xlwt is needed to generate .xls workbooks")
+        memory = run(benchmark, convert_xls, xls, projected=project_workbook_memory(xls))
+        assert memory["tracemalloc_peak_mb"] > 0
+
+
+class TestHandlerMemory:
+    """Moving workbooks in and out of storage"""
+
+    @pytest.mark.benchmark(group="memory-upload")
+    def test_upload_memory(self, benchmark, workbooks, supabase_standin):
+        """api/translate.py streams a raw upload to storage in chunks"""
+        xlsx, _ = workbooks
+        memory = run(benchmark, upload_raw, xlsx)
+        # The handler never holds the whole file (the stand-in runs in this process)
+        assert memory["tracemalloc_peak_mb"] < max(2 * os.path.getsize(xlsx) / MB, 8)
+
+    @pytest.mark.benchmark(group="memory-storage-download")
+    def test_download_memory(self, benchmark, workbooks, supabase_standin):
+        """process_job's download of the input file"""
+        xlsx, _ = workbooks
+        with open(xlsx, 'rb') as f:
+            supabase_standin.objects["excel-files/input/bench/workbook.xlsx"] = ("application/octet-stream", f.read())
+        memory = run(benchmark, download_input, "input/bench/workbook.xlsx")
+        assert memory["tracemalloc_peak_mb"] >= os.path.getsize(xlsx) / MB
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
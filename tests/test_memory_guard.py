@@ -0,0 +1,159 @@
+"""
+Tests for the worker memory guard (memory_guard.py) in the translators and
+api/process_job.py
+"""
+import pytest
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import memory_guard
+import excel_translator
+import excel_translator_optimized
+from memory_guard import (
+    MemoryLimitExceeded, check_memory, check_workbook_fits, project_workbook_memory, worker_memory_limit
+)
+from conftest import load_api_module, make_workbook
+
+MB = 1024 * 1024
+
+VALUES = ["Bonjour 1", "Bonjour 2", "Bonjour 3"]
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    path = tmp_path / "report.xlsx"
+    path.write_bytes(make_workbook(VALUES))
+    return str(path)
+
+
+@pytest.fixture
+def detected_limit(monkeypatch):
+    """Limit detection against fake cgroup files and a clean environment"""
+    monkeypatch.setattr(memory_guard, "WORKER_MEMORY_LIMIT_MB", 0)
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", raising=False)
+    memory_guard._detected_memory_limit.cache_clear()
+    yield
+    memory_guard._detected_memory_limit.cache_clear()
+
+
+class TestWorkerLimit:
+    """Test finding out how much memory the worker has"""
+
+    def test_configured_limit(self, monkeypatch):
+        """WORKER_MEMORY_LIMIT_MB wins over detection"""
+        monkeypatch.setattr(memory_guard, "WORKER_MEMORY_LIMIT_MB", 512)
+        assert worker_memory_limit() == 512 * MB
+
+    def test_cgroup_limit(self, tmp_path, monkeypatch, detected_limit):
+        """A container's cgroup limit is used; 'max' and cgroup v1's huge number mean no limit"""
+        v2, v1 = tmp_path / "memory.max", tmp_path / "memory.limit_in_bytes"
+        monkeypatch.setattr(memory_guard, "CGROUP_LIMIT_FILES", (str(v2), str(v1)))
+        v2.write_text("max\n")
+        v1.write_text(f"{2 ** 63 - 4096}\n")
+        assert worker_memory_limit() is None
+
+        memory_guard._detected_memory_limit.cache_clear()
+        v1.write_text(f"{1024 * MB}\n")
+        assert worker_memory_limit() == 1024 * MB
+
+    def test_lambda_limit(self, tmp_path, monkeypatch, detected_limit):
+        """Without a cgroup limit, the Lambda function's memory size is used"""
+        monkeypatch.setattr(memory_guard, "CGROUP_LIMIT_FILES", (str(tmp_path / "missing"),))
+        monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "1024")
+        assert worker_memory_limit() == 1024 * MB
+
+
+class TestProjection:
+    """Test the projected memory of a workbook"""
+
+    def test_xlsx_projection(self, workbook_path, monkeypatch):
+        """Sheet XML is what openpyxl inflates, so the projection scales with it"""
+        monkeypatch.setattr(memory_guard, "MEMORY_PER_XML_BYTE", 1)
+        small = project_workbook_memory(workbook_path)
+        assert 0 < small < os.path.getsize(workbook_path) * 10
+
+        big_path = workbook_path.replace("report", "big")
+        with open(big_path, "wb") as f:
+            f.write(make_workbook([f"Bonjour {row}" for row in range(2000)]))
+        assert project_workbook_memory(big_path) > 100 * small
+
+    def test_xls_projection(self, tmp_path, monkeypatch):
+        """An .xls projects from its file size"""
+        monkeypatch.setattr(memory_guard, "MEMORY_PER_XLS_BYTE", 6)
+        path = tmp_path / "legacy.xls"
+        path.write_bytes(b"x" * 1000)
+        assert project_workbook_memory(str(path)) == 6000
+
+    def test_unreadable_workbook(self, tmp_path):
+        """A file that is not a workbook is left for the loader to reject"""
+        path = tmp_path / "broken.xlsx"
+        path.write_bytes(b"not a zip")
+        assert project_workbook_memory(str(path)) is None
+
+
+class TestGuard:
+    """Test refusing and stopping jobs"""
+
+    def test_no_limit(self, workbook_path, monkeypatch, detected_limit):
+        """Without a known limit the guard never interferes"""
+        monkeypatch.setattr(memory_guard, "CGROUP_LIMIT_FILES", ())
+        check_workbook_fits(workbook_path)
+        check_memory()
+
+    def test_workbook_too_large(self, workbook_path, monkeypatch):
+        """A workbook that does not fit is refused with advice to split it"""
+        monkeypatch.setattr(memory_guard, "WORKER_MEMORY_LIMIT_MB", 1)
+        with pytest.raises(MemoryLimitExceeded, match="Split the workbook"):
+            check_workbook_fits(workbook_path)
+
+        monkeypatch.setattr(memory_guard, "WORKER_MEMORY_LIMIT_MB", 64 * 1024)
+        check_workbook_fits(workbook_path)
+
+    @pytest.mark.parametrize("module", [excel_translator, excel_translator_optimized])
+    def test_translation_refused_before_loading(self, module, workbook_path, tmp_path, monkeypatch, offline_translator):
+        """Both translators refuse before opening the workbook and write nothing"""
+        offline_translator()
+        monkeypatch.setattr(memory_guard, "WORKER_MEMORY_LIMIT_MB", 1)
+        output = tmp_path / "out.xlsx"
+        with pytest.raises(MemoryLimitExceeded):
+            module.translate_excel_with_format(workbook_path, str(output), "fr", "en")
+        assert not output.exists()
+
+    @pytest.mark.parametrize("module", [excel_translator, excel_translator_optimized])
+    def test_translation_stopped_midway(self, module, tmp_path, monkeypatch, offline_translator):
+        """Memory crossing the limit during the cell loop stops the job"""
+        offline_translator()
+        monkeypatch.setattr(module, "MEMORY_CHECK_INTERVAL", 2)
+        monkeypatch.setattr(memory_guard, "WORKER_MEMORY_LIMIT_MB", 1024)
+        rss = iter([10 * MB] + [2048 * MB] * 100)
+        monkeypatch.setattr(memory_guard, "current_rss", lambda: next(rss))
+        # Enough headroom for the projection, then the worker "grows" past its limit
+        monkeypatch.setattr(memory_guard, "MEMORY_PER_XML_BYTE", 1)
+
+        source = tmp_path / "report.xlsx"
+        source.write_bytes(make_workbook([f"Bonjour {row}" for row in range(10)]))
+        with pytest.raises(MemoryLimitExceeded, match="Translation stopped"):
+            module.translate_excel_with_format(str(source), str(tmp_path / "out.xlsx"), "fr", "en")
+
+    def test_process_job_reports_error(self, supabase_standin, monkeypatch):
+        """A refused job ends in error with the reason, instead of dying mid-job"""
+        monkeypatch.setattr(memory_guard, "WORKER_MEMORY_LIMIT_MB", 1)
+        job_id = str(uuid.uuid4())
+        supabase_standin.objects[f"excel-files/input/{job_id}/report.xlsx"] = (
+            "application/octet-stream", make_workbook(VALUES))
+        supabase_standin.insert("translation_jobs", {
+            "id": job_id, "original_filename": "report.xlsx", "input_file_path": f"input/{job_id}/report.xlsx"})
+
+        with pytest.raises(MemoryLimitExceeded):
+            load_api_module("process_job").process_translation_job(job_id)
+
+        job = supabase_standin.jobs[job_id]
+        assert job["status"] == "error"
+        assert "Workbook too large for this worker" in job["error_message"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,162 @@
+"""
+Tests for the Prometheus metrics (metrics.py) and the /metrics endpoints of
+app.py and app_supabase.py
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import importlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+from metrics import Counter, Gauge, Histogram, render
+from rate_limit import RateLimiter
+from conftest import make_workbook
+
+VALUES = ("Bonjour", "Merci", '=IF(A1="", "Vide", A1)')
+
+
+def sample(text, line_prefix):
+    """Value of the sample whose line starts with line_prefix (0 if absent)"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestExposition:
+    """Test the metric types and the text format"""
+
+    def test_counter_and_gauge(self):
+        """Bound children add up; gauges can read a function at scrape time"""
+        registry = []
+        calls = Counter("calls_total", "Calls", ["result"], registry=registry)
+        ok = calls.labels("ok")
+        ok.inc()
+        ok.inc(2)
+        calls.labels('say "hi"\n').inc()
+        depth = Gauge("depth", "Depth", registry=registry).labels()
+        depth.set_function(lambda: 7)
+
+        text = render(registry)
+        assert "# TYPE calls_total counter" in text
+        assert sample(text, 'calls_total{result="ok"}') == 3
+        assert sample(text, 'calls_total{result="say \\"hi\\"\\n"}') == 1
+        assert sample(text, "depth") == 7
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Each bucket counts the observations at or below its bound"""
+        registry = []
+        latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1), registry=registry).labels()
+        for value in (0.05, 0.1, 0.5, 3):
+            latency.observe(value)
+
+        text = render(registry)
+        assert sample(text, 'latency_seconds_bucket{le="0.1"}') == 2
+        assert sample(text, 'latency_seconds_bucket{le="1"}') == 3
+        assert sample(text, 'latency_seconds_bucket{le="+Inf"}') == 4
+        assert sample(text, "latency_seconds_count") == 4
+        assert sample(text, "latency_seconds_sum") == pytest.approx(3.65)
+
+    def test_label_arity(self):
+        """Label values must match the label names"""
+        with pytest.raises(ValueError):
+            Counter("x_total", "X", ["a"], registry=[]).labels("1", "2")
+
+    def test_throttle_events(self, tmp_path):
+        """Calls that waited on the rate limit are counted with their wait"""
+        before = metrics.THROTTLE_EVENTS.get()
+        limiter = RateLimiter(requests_per_second=50, burst_seconds=0.02, path=str(tmp_path / "limit.db"))
+        for _ in range(3):
+            limiter.acquire()
+        assert metrics.THROTTLE_EVENTS.get() > before
+
+
+class TestMetricsEndpoints:
+    """Test /metrics of both Flask apps"""
+
+    def test_app_metrics_after_job(self, offline_translator):
+        """A finished job shows up in the job, cell, call and stage metrics"""
+        import app as app_module
+        offline_translator()
+        client = app_module.app.test_client()
+        before = client.get("/metrics").get_data(as_text=True)
+
+        task_id = client.post("/translate", data={
+            "file": (io.BytesIO(make_workbook(VALUES)), "report.xlsx"), "source_lang": "fr", "target_lang": "en"
+        }, content_type="multipart/form-data").get_json()["task_id"]
+        assert wait_for(lambda: app_module.job_store.get_progress(task_id)["status"] == "complete")
+        # The job is counted right after its status flips
+        assert wait_for(lambda: sample(client.get("/metrics").get_data(as_text=True),
+                                       'excel_translator_jobs_total{status="complete"}') >
+                        sample(before, 'excel_translator_jobs_total{status="complete"}'))
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.content_type == metrics.CONTENT_TYPE
+        after = response.get_data(as_text=True)
+
+        def delta(name):
+            return sample(after, name) - sample(before, name)
+
+        assert delta('excel_translator_jobs_total{status="complete"}') == 1
+        assert delta("excel_translator_cells_processed_total") == 3
+        assert delta('excel_translator_translation_calls_total{result="ok"}') == 3
+        assert delta("excel_translator_translation_chars_total") == len("BonjourMerciVide")
+        assert delta('excel_translator_stage_seconds_count{stage="translate"}') == 1
+        assert "excel_translator_jobs_queued 0" in after
+
+    def test_app_sse_streams(self):
+        """Open progress streams are counted until they close"""
+        import app as app_module
+        client = app_module.app.test_client()
+        task_id = "stream-test"
+        app_module.job_store.set_progress(task_id, {"current": 0, "total": 1, "message": "", "status": "processing"})
+        before = metrics.SSE_STREAMS.get()
+
+        response = client.get(f"/progress/{task_id}", buffered=False)
+        next(iter(response.response))
+        assert metrics.SSE_STREAMS.get() == before + 1
+        response.close()
+        assert metrics.SSE_STREAMS.get() == before
+
+    def test_app_supabase_cache_lookups(self, supabase_standin, offline_translator):
+        """app_supabase.py counts result cache misses and hits"""
+        offline_translator()
+        sys.modules.pop("app_supabase", None)
+        app_supabase = importlib.import_module("app_supabase")
+        try:
+            client = app_supabase.app.test_client()
+            misses, hits = metrics.CACHE_MISSES.get(), metrics.CACHE_HITS.get()
+            content = make_workbook(["Cache", "Test"])
+
+            def submit():
+                return client.post("/translate", data={
+                    "file": (io.BytesIO(content), "a.xlsx"), "source_lang": "fr", "target_lang": "en"
+                }, content_type="multipart/form-data").get_json()["task_id"]
+
+            first = submit()
+            assert wait_for(lambda: supabase_standin.jobs[first]["status"] == "complete")
+            submit()
+
+            assert metrics.CACHE_MISSES.get() == misses + 1
+            assert metrics.CACHE_HITS.get() == hits + 1
+            assert "excel_translator_result_cache_lookups_total" in client.get("/metrics").get_data(as_text=True)
+        finally:
+            sys.modules.pop("app_supabase", None)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
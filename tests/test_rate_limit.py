@@ -0,0 +1,76 @@
+"""
+Tests for the node-wide translation rate limit (rate_limit.py)
+"""
+import pytest
+import os
+import sys
+import time
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rate_limit import RateLimiter
+from translation_executor import JobTranslator, TranslationExecutor
+from conftest import OfflineTranslator
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestRateLimiter:
+    """Test the SQLite token buckets"""
+
+    def test_disabled_by_default(self, tmp_path):
+        """Without rates nothing is created and nothing waits"""
+        limiter = RateLimiter(0, 0, path=str(tmp_path / "limit.db"))
+        assert not limiter.enabled
+        assert limiter.acquire(chars=10_000) == 0.0
+        assert not (tmp_path / "limit.db").exists()
+
+    def test_requests_per_second(self, tmp_path):
+        """Once the burst is spent, requests are spaced at the configured rate"""
+        limiter = RateLimiter(requests_per_second=50, burst_seconds=0.1, path=str(tmp_path / "limit.db"))
+        started = time.monotonic()
+        for _ in range(15):
+            limiter.acquire()
+        # 5 requests of burst, then 10 more at 50/s
+        assert time.monotonic() - started >= 0.18
+        assert limiter.waited > 0
+
+    def test_chars_per_second(self, tmp_path):
+        """Long strings use up the character budget"""
+        limiter = RateLimiter(chars_per_second=1000, burst_seconds=0.1, path=str(tmp_path / "limit.db"))
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.acquire(chars=100)
+        assert time.monotonic() - started >= 0.28
+        # A call larger than the bucket waits for a full bucket instead of forever
+        assert limiter.acquire(chars=5000) < 1
+
+    def test_limit_is_shared_between_processes(self, tmp_path):
+        """Two processes using the same file share one budget"""
+        path = str(tmp_path / "limit.db")
+        script = (
+            "from rate_limit import RateLimiter\n"
+            f"limiter = RateLimiter(requests_per_second=50, burst_seconds=0.2, path={path!r})\n"
+            "for _ in range(20):\n"
+            "    limiter.acquire()\n"
+        )
+        started = time.monotonic()
+        workers = [subprocess.Popen([sys.executable, "-c", script], cwd=ROOT) for _ in range(2)]
+        for worker in workers:
+            assert worker.wait(timeout=30) == 0
+        # 40 requests, 10 of burst: 30 / 50 = 0.6s; separate limits would take 0.2s
+        assert time.monotonic() - started >= 0.55
+
+    def test_translator_calls_are_limited(self, tmp_path):
+        """JobTranslator takes every call from the limiter"""
+        limiter = RateLimiter(requests_per_second=1000, path=str(tmp_path / "limit.db"))
+        calls = []
+        limiter.acquire = lambda chars=0, requests=1: calls.append(chars) or 0.0
+        translator = JobTranslator(OfflineTranslator(), TranslationExecutor(concurrency=2), rate_limiter=limiter)
+        assert translator.translate("bonjour") == "BONJOUR"
+        assert calls == [7]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
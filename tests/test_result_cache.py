@@ -0,0 +1,132 @@
+"""
+Tests for the content-addressed result cache and in-flight job coalescing
+"""
+import pytest
+import os
+import sys
+import time
+import uuid
+import hashlib
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from result_cache import compute_content_hash, find_reusable_job, release_followers
+
+
+def upload_raw(url, content, filename="report.xlsx", source_lang="fr", target_lang="en"):
+    """POST raw file bytes to /api/translate"""
+    return requests.post(
+        f"{url}?filename={filename}&source_lang={source_lang}&target_lang={target_lang}",
+        data=content, headers={"Content-Type": "application/octet-stream"}).json()
+
+
+class TestContentHash:
+    """Test the cache key"""
+
+    def test_hash_depends_on_languages(self):
+        """The same file in another language pair is a different result"""
+        digest = hashlib.sha256(b"file").hexdigest()
+        assert compute_content_hash(digest, "fr", "en") == compute_content_hash(digest, "fr", "en")
+        assert compute_content_hash(digest, "fr", "en") != compute_content_hash(digest, "fr", "de")
+
+    def test_hash_depends_on_engine(self):
+        """Changing the engine identifier invalidates cached results"""
+        digest = hashlib.sha256(b"file").hexdigest()
+        assert compute_content_hash(digest, "fr", "en") != compute_content_hash(digest, "fr", "en", engine="other")
+
+
+class TestTranslateCoalescing:
+    """Test /api/translate reusing and attaching to identical jobs"""
+
+    def test_identical_upload_attaches_to_inflight_job(self, supabase_standin, api_server):
+        """A resubmission while the first job runs attaches to it"""
+        url = api_server("translate")
+        first = upload_raw(url, b"same bytes")
+        second = upload_raw(url, b"same bytes")
+
+        assert second["progress_job_id"] == first["task_id"]
+        assert supabase_standin.jobs[second["task_id"]]["coalesced_with"] == first["task_id"]
+
+    def test_different_language_pair_is_not_coalesced(self, supabase_standin, api_server):
+        """Same bytes into another language is a separate job"""
+        url = api_server("translate")
+        first = upload_raw(url, b"same bytes")
+        second = upload_raw(url, b"same bytes", target_lang="de")
+
+        assert "progress_job_id" not in second
+        assert supabase_standin.jobs[second["task_id"]]["coalesced_with"] is None
+        assert first["task_id"] != second["task_id"]
+
+    def test_identical_upload_reuses_completed_result(self, supabase_standin, api_server):
+        """A resubmission after completion points at the existing output"""
+        url = api_server("translate")
+        first = upload_raw(url, b"same bytes")
+        supabase_standin.update("translation_jobs", [("id", f"eq.{first['task_id']}")], {
+            "status": "complete", "output_file_path": f"output/{first['task_id']}/translated_report.xlsx"})
+
+        second = upload_raw(url, b"same bytes")
+
+        assert second["status"] == "complete"
+        job = supabase_standin.jobs[second["task_id"]]
+        assert job["status"] == "complete"
+        assert job["output_file_path"] == f"output/{first['task_id']}/translated_report.xlsx"
+        # The duplicate upload is not kept
+        assert f"excel-files/{job['input_file_path']}" not in supabase_standin.objects
+
+    def test_release_followers(self, supabase_standin, api_server):
+        """Finishing a leader completes every job attached to it"""
+        url = api_server("translate")
+        leader = upload_raw(url, b"same bytes")
+        followers = [upload_raw(url, b"same bytes") for _ in range(2)]
+
+        release_followers(leader["task_id"], {"status": "complete", "output_file_path": "output/x.xlsx"})
+
+        for follower in followers:
+            assert supabase_standin.jobs[follower["task_id"]]["status"] == "complete"
+            assert supabase_standin.jobs[follower["task_id"]]["output_file_path"] == "output/x.xlsx"
+
+
+class TestProcessJobCache:
+    """Test the cache check api/process_job.py runs for direct uploads"""
+
+    def test_direct_upload_reuses_completed_result(self, supabase_standin, api_server):
+        """A job whose bytes match a completed job is completed without translating"""
+        content = b"direct upload bytes"
+        content_hash = compute_content_hash(hashlib.sha256(content).hexdigest(), "fr", "en")
+        done_id = str(uuid.uuid4())
+        supabase_standin.insert("translation_jobs", {
+            "id": done_id, "original_filename": "a.xlsx", "status": "complete",
+            "content_hash": content_hash, "output_file_path": f"output/{done_id}/translated_a.xlsx"})
+
+        job_id = str(uuid.uuid4())
+        supabase_standin.objects[f"excel-files/input/{job_id}/a.xlsx"] = ("application/octet-stream", content)
+        supabase_standin.insert("translation_jobs", {
+            "id": job_id, "original_filename": "a.xlsx", "input_file_path": f"input/{job_id}/a.xlsx"})
+
+        response = requests.post(api_server("process_job"), json={"job_id": job_id})
+
+        # Answered once the job is claimed; the cache check follows
+        assert response.status_code == 202
+        deadline = time.monotonic() + 10
+        while supabase_standin.jobs[job_id]["status"] != "complete" and time.monotonic() < deadline:
+            time.sleep(0.02)
+        job = supabase_standin.jobs[job_id]
+        assert job["status"] == "complete"
+        assert job["content_hash"] == content_hash
+        assert job["output_file_path"] == f"output/{done_id}/translated_a.xlsx"
+
+    def test_find_reusable_job_prefers_complete(self, supabase_standin):
+        """A complete job wins over an in-flight one"""
+        supabase_standin.insert("translation_jobs", {
+            "original_filename": "a.xlsx", "status": "processing", "content_hash": "h"})
+        done = supabase_standin.insert("translation_jobs", {
+            "original_filename": "a.xlsx", "status": "complete", "content_hash": "h",
+            "output_file_path": "output/done.xlsx"})
+
+        assert find_reusable_job("h")["id"] == done["id"]
+        assert find_reusable_job("other") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
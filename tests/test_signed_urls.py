@@ -0,0 +1,135 @@
+"""
+Tests for direct-to-storage transfers through signed upload/download URLs
+"""
+import pytest
+import os
+import sys
+import uuid
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import upload_stream
+
+
+class TestSignedUpload:
+    """Test /api/upload_url followed by job creation in /api/translate"""
+
+    def test_upload_then_create_job(self, supabase_standin, api_server):
+        """A file PUT to the signed URL becomes a pending job"""
+        upload = requests.post(api_server("upload_url"), json={"filename": "budget.xlsx", "size": 14}).json()
+
+        stored = requests.put(upload["upload_url"], data=b"workbook bytes",
+                              headers={"Content-Type": upload["content_type"]})
+        assert stored.status_code == 200
+
+        response = requests.post(api_server("translate"), json={
+            "job_id": upload["job_id"],
+            "filename": upload["filename"],
+            "source_lang": "fr",
+            "target_lang": "en"
+        })
+
+        assert response.status_code == 202
+        assert response.json()["task_id"] == upload["job_id"]
+        job = supabase_standin.jobs[upload["job_id"]]
+        assert job["status"] == "pending"
+        assert job["input_file_path"] == f"input/{upload['job_id']}/budget.xlsx"
+        assert job["file_size"] == len(b"workbook bytes")
+
+    def test_create_job_without_upload(self, supabase_standin, api_server):
+        """Jobs cannot be created for uploads that never happened"""
+        response = requests.post(api_server("translate"), json={
+            "job_id": str(uuid.uuid4()),
+            "filename": "budget.xlsx"
+        })
+
+        assert response.status_code == 400
+        assert supabase_standin.jobs == {}
+
+    def test_upload_url_rejects_non_excel(self, supabase_standin, api_server):
+        """Only Excel files get an upload URL"""
+        response = requests.post(api_server("upload_url"), json={"filename": "script.sh"})
+        assert response.status_code == 400
+
+
+    def test_filename_with_url_characters(self, supabase_standin, api_server):
+        """#, ? and % in a filename stay part of the object key"""
+        upload = requests.post(api_server("upload_url"), json={"filename": "Q3 #1? 50%.xlsx"}).json()
+        assert requests.put(upload["upload_url"], data=b"workbook bytes").status_code == 200
+        assert f"excel-files/input/{upload['job_id']}/Q3 #1? 50%.xlsx" in supabase_standin.objects
+
+        response = requests.post(api_server("translate"), json={"job_id": upload["job_id"], "filename": upload["filename"]})
+        assert response.status_code == 202
+
+    def test_upload_url_rejects_oversized_files(self, supabase_standin, api_server, monkeypatch):
+        """A declared size over MAX_UPLOAD_BYTES gets no upload URL"""
+        monkeypatch.setattr(upload_stream, "MAX_UPLOAD_BYTES", 10)
+        url = api_server("upload_url")
+
+        assert requests.post(url, json={"filename": "budget.xlsx", "size": 11}).status_code == 413
+        assert requests.post(url, json={"filename": "budget.xlsx", "size": "big"}).status_code == 400
+        assert requests.post(url, json={"filename": "budget.xlsx", "size": 10}).status_code == 200
+
+    def test_oversized_upload_is_refused(self, supabase_standin, api_server, monkeypatch):
+        """A stored object over MAX_UPLOAD_BYTES, whatever was declared, creates no job and is deleted"""
+        upload = requests.post(api_server("upload_url"), json={"filename": "budget.xlsx", "size": 5}).json()
+        requests.put(upload["upload_url"], data=b"workbook bytes")
+        # Only the handler's limit is lowered; the JSON body itself is still accepted
+        with monkeypatch.context() as patch:
+            patch.setattr(upload_stream, "MAX_UPLOAD_BYTES", 10)
+            url = api_server("translate")
+
+        response = requests.post(url, json={"job_id": upload["job_id"], "filename": "budget.xlsx"})
+
+        assert response.status_code == 413
+        assert supabase_standin.jobs == {}
+        assert supabase_standin.objects == {}
+
+
+class TestSignedDownload:
+    """Test /api/download handing out signed URLs"""
+
+    def create_complete_job(self, standin):
+        job_id = str(uuid.uuid4())
+        output_path = f"output/{job_id}/translated_budget.xlsx"
+        standin.objects[f"excel-files/{output_path}"] = ("application/octet-stream", b"translated")
+        standin.insert("translation_jobs", {
+            "id": job_id,
+            "original_filename": "budget.xls",
+            "status": "complete",
+            "output_file_path": output_path
+        })
+        return job_id
+
+    def test_download_redirects_to_storage(self, supabase_standin, api_server):
+        """The function redirects; the bytes come from storage"""
+        job_id = self.create_complete_job(supabase_standin)
+
+        response = requests.get(f"{api_server('download')}?job_id={job_id}", allow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["Location"].startswith(supabase_standin.url)
+
+        followed = requests.get(response.headers["Location"])
+        assert followed.content == b"translated"
+        assert "translated_budget.xlsx" in followed.headers["Content-Disposition"]
+
+    def test_download_json_format(self, supabase_standin, api_server):
+        """format=json returns the signed URL for the client to follow"""
+        job_id = self.create_complete_job(supabase_standin)
+
+        data = requests.get(f"{api_server('download')}?job_id={job_id}&format=json").json()
+        assert data["filename"] == "translated_budget.xlsx"
+        assert requests.get(data["url"]).content == b"translated"
+
+    def test_download_incomplete_job(self, supabase_standin, api_server):
+        """Jobs that are not complete cannot be downloaded"""
+        job_id = str(uuid.uuid4())
+        supabase_standin.insert("translation_jobs", {"id": job_id, "original_filename": "a.xlsx"})
+
+        response = requests.get(f"{api_server('download')}?job_id={job_id}", allow_redirects=False)
+        assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,125 @@
+"""
+Tests for per-stage job timings (stage_timing.py) and where they are recorded:
+translate_excel_with_format, api/process_job.py, api/status.py and app.py
+"""
+import pytest
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import excel_translator
+import excel_translator_optimized
+from stage_timing import StageTimer, log_timings
+from conftest import load_api_module, make_workbook
+
+VALUES = ["Bonjour", "Merci", '=IF(A1="", "Vide", A1)', 3]
+
+TRANSLATION_STAGES = {"load_workbook", "count_cells", "translate", "write_back", "save"}
+
+
+class TestStageTimer:
+    """Test the timer itself"""
+
+    def test_stages_accumulate(self):
+        """A stage that runs several times adds up; the total covers everything"""
+        timer = StageTimer()
+        with timer.stage("translate"):
+            time.sleep(0.01)
+        with timer.stage("translate"):
+            time.sleep(0.01)
+        timer.add("save", 0.5)
+
+        timings = timer.as_dict()
+        assert list(timings) == ["translate", "save", "total"]
+        assert timings["translate"] >= 0.02
+        assert timings["save"] == 0.5
+        assert timer.seconds("missing") == 0.0
+
+    def test_stage_timed_on_error(self):
+        """A stage that raises is still recorded"""
+        timer = StageTimer()
+        with pytest.raises(ValueError):
+            with timer.stage("download"):
+                raise ValueError("boom")
+        assert "download" in timer.as_dict()
+
+    def test_log_line_is_json(self, capsys):
+        """The log line parses as a single JSON object"""
+        log_timings("job-1", "complete", {"save": 0.1, "total": 1.0})
+        line = capsys.readouterr().out.strip()
+        assert json.loads(line) == {
+            "event": "job_timings", "job_id": "job-1", "status": "complete",
+            "timings": {"save": 0.1, "total": 1.0}}
+
+
+class TestTranslationStages:
+    """Test the stages of translate_excel_with_format"""
+
+    @pytest.mark.parametrize("module", [excel_translator, excel_translator_optimized])
+    def test_stages_recorded(self, module, tmp_path, offline_translator):
+        """Both translators time every phase into the given timer"""
+        offline_translator()
+        input_path = tmp_path / "in.xlsx"
+        input_path.write_bytes(make_workbook(VALUES))
+
+        timer = StageTimer()
+        module.translate_excel_with_format(str(input_path), str(tmp_path / "out.xlsx"), "fr", "en",
+                                           timings=timer)
+
+        assert TRANSLATION_STAGES <= set(timer.timings)
+        assert all(seconds >= 0 for seconds in timer.timings.values())
+
+
+class TestPersistedTimings:
+    """Test that finished jobs carry their timings"""
+
+    def test_process_job_stores_timings(self, supabase_standin, api_server, capsys, offline_translator):
+        """process_job saves the timings on the job, logs them and status returns them"""
+        offline_translator()
+        job_id = str(uuid.uuid4())
+        supabase_standin.objects[f"excel-files/input/{job_id}/report.xlsx"] = (
+            "application/octet-stream", make_workbook(VALUES))
+        supabase_standin.insert("translation_jobs", {
+            "id": job_id, "original_filename": "report.xlsx", "status": "pending",
+            "source_language": "fr", "target_language": "en",
+            "input_file_path": f"input/{job_id}/report.xlsx"})
+
+        load_api_module("process_job").process_translation_job(job_id)
+
+        timings = supabase_standin.jobs[job_id]["timings"]
+        assert supabase_standin.jobs[job_id]["status"] == "complete"
+        assert {"download", "upload", "total"} | TRANSLATION_STAGES <= set(timings)
+
+        logged = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"job_timings"' in line]
+        assert logged == [{"event": "job_timings", "job_id": job_id, "status": "complete", "timings": timings}]
+
+        response = requests.get(f"{api_server('status')}?job_id={job_id}")
+        assert response.json()["timings"] == timings
+
+    def test_app_progress_has_timings(self, offline_translator):
+        """app.py puts the timings in the job's final progress"""
+        import app as app_module
+        offline_translator()
+        client = app_module.app.test_client()
+        task_id = client.post("/translate", data={
+            "file": (io.BytesIO(make_workbook(VALUES)), "report.xlsx"), "source_lang": "fr", "target_lang": "en"
+        }, content_type="multipart/form-data").get_json()["task_id"]
+
+        deadline = time.time() + 10
+        while app_module.job_store.get_progress(task_id)["status"] not in ("complete", "error"):
+            assert time.time() < deadline
+            time.sleep(0.05)
+
+        progress = app_module.job_store.get_progress(task_id)
+        assert progress["status"] == "complete"
+        assert {"store_result", "total"} | TRANSLATION_STAGES <= set(progress["timings"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
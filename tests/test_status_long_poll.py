@@ -0,0 +1,130 @@
+"""
+Tests for conditional requests (ETag / If-None-Match) and ?wait= long-polling
+on api/status.py
+"""
+import pytest
+import os
+import sys
+import time
+import threading
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def status_url(supabase_standin, api_server, monkeypatch):
+    """api/status.py served locally with a short long-poll interval"""
+    monkeypatch.setenv("STATUS_WAIT_INTERVAL", "0.05")
+    return api_server("status")
+
+
+@pytest.fixture
+def job(supabase_standin):
+    """A pending job"""
+    return supabase_standin.insert("translation_jobs", {"original_filename": "a.xlsx"})
+
+
+def set_status(standin, job_id, status):
+    standin.update("translation_jobs", [("id", f"eq.{job_id}")], {"status": status})
+
+
+class TestConditionalStatus:
+    """Test ETag and If-None-Match handling"""
+
+    def test_response_has_etag(self, status_url, job):
+        """A plain request returns the job with an ETag"""
+        response = requests.get(f"{status_url}?job_id={job['id']}")
+        assert response.status_code == 200
+        assert response.headers["ETag"].startswith('"')
+        assert response.json()["status"] == "pending"
+
+    def test_unchanged_job_returns_304(self, status_url, job):
+        """Repeating the request with the ETag gets an empty 304"""
+        etag = requests.get(f"{status_url}?job_id={job['id']}").headers["ETag"]
+        response = requests.get(f"{status_url}?job_id={job['id']}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    def test_changed_job_returns_200(self, status_url, job, supabase_standin):
+        """Once updated_at moves the full response is sent with a new ETag"""
+        etag = requests.get(f"{status_url}?job_id={job['id']}").headers["ETag"]
+        set_status(supabase_standin, job['id'], "processing")
+
+        response = requests.get(f"{status_url}?job_id={job['id']}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()["status"] == "processing"
+
+    def test_invalid_wait(self, status_url, job):
+        """A non-numeric wait is rejected"""
+        response = requests.get(f"{status_url}?job_id={job['id']}&wait=soon")
+        assert response.status_code == 400
+
+
+class TestLongPoll:
+    """Test ?wait= holding the request until the job changes"""
+
+    def test_wait_returns_when_job_changes(self, status_url, job, supabase_standin):
+        """A held request is answered as soon as the job changes"""
+        etag = requests.get(f"{status_url}?job_id={job['id']}").headers["ETag"]
+        threading.Timer(0.3, set_status, (supabase_standin, job['id'], "complete")).start()
+
+        started = time.monotonic()
+        response = requests.get(f"{status_url}?job_id={job['id']}&wait=5", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "complete"
+        assert 0.25 <= time.monotonic() - started < 3
+
+    def test_wait_times_out_with_304(self, status_url, job):
+        """An unchanged job is answered with 304 once the wait runs out"""
+        etag = requests.get(f"{status_url}?job_id={job['id']}").headers["ETag"]
+
+        started = time.monotonic()
+        response = requests.get(f"{status_url}?job_id={job['id']}&wait=0.5", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert 0.4 <= time.monotonic() - started < 3
+
+    def test_held_request_reads_only_versions(self, job, api_server, monkeypatch):
+        """While nothing changes, each check selects id and updated_at alone"""
+        import supabase_rest
+        selects = []
+        select_jobs = supabase_rest.select_jobs
+        monkeypatch.setenv("STATUS_WAIT_INTERVAL", "0.05")
+        monkeypatch.setattr(supabase_rest, "select_jobs",
+                            lambda columns="*", **kwargs: selects.append(columns) or select_jobs(columns, **kwargs))
+        url = api_server("status")
+        etag = requests.get(f"{url}?job_id={job['id']}").headers["ETag"]
+        selects.clear()
+
+        response = requests.get(f"{url}?job_id={job['id']}&wait=0.5", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        # One full read for the request, then version checks only
+        assert len(selects) > 2
+        assert selects[1:] == ["id, updated_at"] * (len(selects) - 1)
+
+    def test_finished_job_is_not_held(self, status_url, job, supabase_standin):
+        """Jobs that cannot change any more are answered immediately"""
+        set_status(supabase_standin, job['id'], "complete")
+        etag = requests.get(f"{status_url}?job_id={job['id']}").headers["ETag"]
+
+        started = time.monotonic()
+        response = requests.get(f"{status_url}?job_id={job['id']}&wait=5", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert time.monotonic() - started < 1
+
+    def test_wait_without_etag_returns_immediately(self, status_url, job):
+        """Without If-None-Match there is nothing to wait for"""
+        started = time.monotonic()
+        response = requests.get(f"{status_url}?job_id={job['id']}&wait=5")
+        assert response.status_code == 200
+        assert time.monotonic() - started < 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
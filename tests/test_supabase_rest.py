@@ -0,0 +1,41 @@
+"""
+Tests for the Supabase REST helpers (run against the local Supabase stand-in)
+"""
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from supabase_rest import broadcast_job_progress, job_progress_topic
+
+
+class TestBroadcastJobProgress:
+    """Test progress broadcast over Realtime"""
+
+    def test_broadcast_posts_to_realtime_endpoint(self, supabase_standin):
+        """Progress is sent to the Realtime broadcast REST endpoint"""
+        broadcast_job_progress("job-1", 5, 20, "Translating")
+
+        assert ("POST", "/realtime/v1/api/broadcast") in supabase_standin.request_log
+        message = supabase_standin.broadcasts[0]
+        assert message["topic"] == job_progress_topic("job-1")
+        assert message["event"] == "progress"
+        assert message["payload"]["current"] == 5
+        assert message["payload"]["total"] == 20
+        assert message["payload"]["percentage"] == 25
+        assert message["payload"]["status"] == "processing"
+
+    def test_broadcast_zero_total(self, supabase_standin):
+        """Zero total cells reports 0% instead of dividing by zero"""
+        broadcast_job_progress("job-1", 0, 0, "Starting")
+        assert supabase_standin.broadcasts[0]["payload"]["percentage"] == 0
+
+    def test_broadcast_does_not_touch_jobs_table(self, supabase_standin):
+        """Progress ticks never write to translation_jobs"""
+        broadcast_job_progress("job-1", 1, 2, "Translating")
+        assert not any(path.startswith("/rest/v1/") for _, path in supabase_standin.request_log)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,179 @@
+"""
+Tests for the process-wide translation executor (translation_executor.py)
+"""
+import pytest
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import excel_translator
+import excel_translator_optimized
+import translation_executor
+from translation_executor import JobTranslator, TranslationExecutor, get_translation_executor
+from conftest import OfflineTranslator, make_translator, make_workbook
+
+
+def blocked_executor(concurrency=1, quantum=10):
+    """An executor whose only worker is held until the returned event is set"""
+    executor = TranslationExecutor(concurrency=concurrency, quantum=quantum)
+    release = threading.Event()
+    executor.submit("blocker", release.wait)
+    time.sleep(0.05)
+    return executor, release
+
+
+class TestTranslationExecutor:
+    """Test the global cap and the fair queues"""
+
+    def test_concurrency_cap(self):
+        """No more than `concurrency` calls run at once, across all jobs"""
+        executor = TranslationExecutor(concurrency=3)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+        futures = [executor.submit(f"job-{i % 5}", call) for i in range(40)]
+        for future in futures:
+            future.result(timeout=10)
+        assert max(peak) == 3
+
+    def test_jobs_take_turns(self):
+        """A job arriving behind a long queue is served on the next turn"""
+        executor, release = blocked_executor(quantum=10)
+        order = []
+        big = [executor.submit("big", order.append, f"big-{i}", cost=10) for i in range(20)]
+        small = [executor.submit("small", order.append, f"small-{i}", cost=10) for i in range(2)]
+        release.set()
+        for future in big + small:
+            future.result(timeout=10)
+
+        assert order[:4] == ["big-0", "small-0", "big-1", "small-1"]
+        assert [name for name in order if name.startswith("big")] == [f"big-{i}" for i in range(20)]
+
+    def test_quantum_is_weighted_by_cost(self):
+        """A job of long strings gets fewer calls per turn than one of short strings"""
+        executor, release = blocked_executor(quantum=100)
+        order = []
+        long_calls = [executor.submit("long", order.append, "long", cost=100) for _ in range(3)]
+        short_calls = [executor.submit("short", order.append, "short", cost=25) for _ in range(8)]
+        release.set()
+        for future in long_calls + short_calls:
+            future.result(timeout=10)
+
+        assert order[:5] == ["long", "short", "short", "short", "short"]
+
+    def test_cancelled_call_is_skipped(self):
+        """A call cancelled while queued never runs"""
+        executor, release = blocked_executor()
+        ran = []
+        future = executor.submit("job", ran.append, 1)
+        assert executor.stats()["queued"] == 1
+        assert future.cancel()
+        release.set()
+        executor.submit("job", ran.append, 2).result(timeout=10)
+        assert ran == [2]
+
+    def test_exception_reaches_caller(self):
+        """A failing call fails its own future and leaves the worker running"""
+        executor = TranslationExecutor(concurrency=1)
+        with pytest.raises(ZeroDivisionError):
+            executor.call("job", lambda: 1 / 0)
+        assert executor.call("job", lambda: "ok") == "ok"
+
+
+class TestJobTranslator:
+    """Test the per-job translator wrapper"""
+
+    def test_translate(self):
+        """translate() returns the wrapped translator's result"""
+        translator = JobTranslator(OfflineTranslator(), TranslationExecutor(concurrency=2))
+        assert translator.translate("bonjour") == "BONJOUR"
+
+    def test_default_executor_is_shared(self):
+        """Every job uses the process-wide executor by default"""
+        assert JobTranslator(OfflineTranslator()).executor is get_translation_executor()
+        assert get_translation_executor() is get_translation_executor()
+
+    def test_batch_keeps_order(self):
+        """translate_texts_batch returns results in input order"""
+        texts = [f"texte {i}" for i in range(30)]
+        results = excel_translator_optimized.translate_texts_batch(texts, make_translator(delay=0.001)(), max_workers=4)
+        assert results == [text.upper() for text in texts]
+
+
+
+class RecordingTranslator(OfflineTranslator):
+    """Offline translator recording the order calls start in and how many overlap"""
+    delay = 0.005
+    lock = threading.Lock()
+    started = []
+    running = {}  # {job prefix: calls in flight}
+    peaks = {}  # {job prefix or "all": most calls in flight at once}
+
+    def translate(self, text):
+        job = text.split()[0]
+        cls = type(self)
+        with cls.lock:
+            cls.started.append(job)
+            cls.running[job] = cls.running.get(job, 0) + 1
+            for key, count in ((job, cls.running[job]), ("all", sum(cls.running.values()))):
+                cls.peaks[key] = max(cls.peaks.get(key, 0), count)
+        try:
+            return super().translate(text)
+        finally:
+            with cls.lock:
+                cls.running[job] -= 1
+
+
+class TestWorkbookJobs:
+    """Test translate_excel_with_format feeding the shared executor"""
+
+    @pytest.fixture
+    def recorder(self, monkeypatch):
+        """RecordingTranslator installed in both engines, on a fresh executor capped at 3 calls"""
+        translator = type("RecordingTranslator", (RecordingTranslator,),
+                          {"started": [], "running": {}, "peaks": {}, "lock": threading.Lock()})
+        for module in (excel_translator, excel_translator_optimized):
+            monkeypatch.setattr(module, "GoogleTranslator", translator)
+        monkeypatch.setattr(translation_executor, "_executor", TranslationExecutor(concurrency=3, quantum=50))
+        return translator
+
+    def translate(self, module, tmp_path, prefix):
+        path = tmp_path / f"{prefix}.xlsx"
+        path.write_bytes(make_workbook([f"{prefix} {i}" for i in range(60)]))
+        module.translate_excel_with_format(str(path), str(tmp_path / f"{prefix}-out.xlsx"), "fr", "en")
+
+    @pytest.mark.parametrize("module", [excel_translator, excel_translator_optimized])
+    def test_job_fills_the_cap(self, module, tmp_path, recorder):
+        """One workbook keeps several calls in flight, up to the executor's cap"""
+        self.translate(module, tmp_path, "alpha")
+        assert recorder.peaks["alpha"] == 3
+
+    def test_concurrent_jobs_interleave(self, tmp_path, recorder):
+        """Two workbooks translated at once share the cap and take turns"""
+        jobs = [threading.Thread(target=self.translate, args=(excel_translator_optimized, tmp_path, prefix))
+                for prefix in ("alpha", "beta")]
+        for job in jobs:
+            job.start()
+        for job in jobs:
+            job.join(timeout=30)
+
+        assert sorted(recorder.started) == ["alpha"] * 60 + ["beta"] * 60
+        assert recorder.peaks["all"] <= 3
+        assert recorder.peaks["alpha"] > 1 and recorder.peaks["beta"] > 1
+        switches = sum(1 for previous, job in zip(recorder.started, recorder.started[1:]) if previous != job)
+        assert switches >= 10
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,154 @@
+"""
+Tests for per-job translation accounting (translation_stats.py), the job
+records carrying it and the /stats endpoints
+"""
+import pytest
+import io
+import os
+import sys
+import time
+import uuid
+import hashlib
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import translation_stats
+import excel_translator
+import excel_translator_optimized
+from translation_stats import TranslationStats, aggregate_stats, reused_stats, percentile
+from translation_executor import JobTranslator
+from result_cache import compute_content_hash
+from conftest import load_api_module, make_translator, make_workbook
+
+# 3 text cells; the formula has one literal to translate ("Vide") and one skipped ("")
+VALUES = ("Bonjour", "Merci", "boom", '=IF(A1="", "Vide", A1)')
+
+
+EXPECTED = {
+    "provider_calls": 4,
+    "chars_sent": len("BonjourMerciboomVide"),
+    "failed_calls": 1,
+    "strings_skipped": 1,
+    "result_cache": "miss",
+}
+
+
+class TestCounters:
+    """Test the counters and their aggregation"""
+
+    def test_job_translator_counts_calls(self):
+        """Every provider call is counted with its characters, failures separately"""
+        stats = TranslationStats()
+        translator = JobTranslator(make_translator(fail_on=["boom"])(), stats=stats)
+        assert translator.translate("Bonjour") == "BONJOUR"
+        with pytest.raises(RuntimeError):
+            translator.translate("boom")
+
+        assert stats.as_dict() == {
+            "provider_calls": 2, "chars_sent": 11, "failed_calls": 1, "strings_skipped": 0, "result_cache": "miss"}
+
+    @pytest.mark.parametrize("module", [excel_translator, excel_translator_optimized])
+    def test_translation_counts(self, module, tmp_path, offline_translator):
+        """A translation counts calls, characters, failures and skipped literals, and reports them"""
+        offline_translator(fail_on=["boom"])
+        source = tmp_path / "report.xlsx"
+        source.write_bytes(make_workbook(VALUES))
+        messages = []
+        stats = TranslationStats()
+
+        module.translate_excel_with_format(str(source), str(tmp_path / "out.xlsx"), "fr", "en",
+                                           lambda current, total, message: messages.append(message),
+                                           stats=stats)
+
+        assert stats.as_dict() == EXPECTED
+        assert messages[-1] == "Translation complete! (4 calls, 20 characters, 1 failed, 1 skipped)"
+
+    def test_reused_stats(self):
+        """A reused job costs nothing and saves what its source spent, through chains of reuse"""
+        source = dict(EXPECTED)
+        hit = reused_stats(source)
+        assert hit["provider_calls"] == 0 and hit["result_cache"] == "hit"
+        assert (hit["calls_saved"], hit["chars_saved"]) == (4, 20)
+        assert reused_stats(hit, "coalesced")["calls_saved"] == 4
+        assert reused_stats(None)["calls_saved"] == 0
+
+    def test_aggregate(self):
+        """Totals, nearest-rank percentiles and outcome counts over the window"""
+        records = [dict(reused_stats(None), provider_calls=calls, chars_sent=calls * 10, status="complete",
+                        result_cache="miss") for calls in range(1, 101)]
+        records.append(dict(reused_stats({"provider_calls": 50}), status="complete"))
+
+        summary = aggregate_stats(records)
+        assert summary["jobs"] == 101
+        assert summary["totals"]["provider_calls"] == 5050
+        assert summary["per_job"]["provider_calls"]["p50"] == 50
+        assert summary["per_job"]["provider_calls"]["p99"] == 99
+        assert summary["per_job"]["provider_calls"]["max"] == 100
+        assert summary["result_cache"] == {"miss": 100, "hit": 1}
+        assert summary["totals"]["calls_saved"] == 50
+        assert summary["by_status"] == {"complete": 101}
+        assert aggregate_stats([])["jobs"] == 0
+        assert percentile([3, 1, 2], 50) == 2
+
+
+class TestJobStats:
+    """Test stats on job records and /stats"""
+
+    def test_app_job_and_stats(self, monkeypatch, offline_translator):
+        """app.py keeps the stats in the job's final progress and aggregates them"""
+        import app as app_module
+        offline_translator(fail_on=["boom"])
+        monkeypatch.setattr(translation_stats, "_recent", translation_stats.deque(maxlen=10))
+        client = app_module.app.test_client()
+
+        task_id = client.post("/translate", data={
+            "file": (io.BytesIO(make_workbook(VALUES)), "report.xlsx"), "source_lang": "fr", "target_lang": "en"
+        }, content_type="multipart/form-data").get_json()["task_id"]
+        deadline = time.time() + 10
+        while not client.get("/stats").get_json()["jobs"]:
+            assert time.time() < deadline
+            time.sleep(0.05)
+
+        progress = app_module.job_store.get_progress(task_id)
+        assert progress["translation_stats"] == EXPECTED
+        assert "4 calls, 20 characters" in progress["message"]
+
+        summary = client.get("/stats").get_json()
+        assert summary["totals"]["provider_calls"] == 4
+        assert summary["per_job"]["chars_sent"]["p50"] == 20
+        assert summary["by_status"] == {"complete": 1}
+
+    def test_process_job_and_api_stats(self, supabase_standin, api_server, offline_translator):
+        """Translated and reused jobs carry stats, which /api/stats aggregates"""
+        offline_translator(fail_on=["boom"])
+        content = make_workbook(VALUES)
+        job_id = str(uuid.uuid4())
+        supabase_standin.objects[f"excel-files/input/{job_id}/report.xlsx"] = ("application/octet-stream", content)
+        supabase_standin.insert("translation_jobs", {
+            "id": job_id, "original_filename": "report.xlsx", "input_file_path": f"input/{job_id}/report.xlsx",
+            "content_hash": compute_content_hash(hashlib.sha256(content).hexdigest(), "fr", "en")})
+
+        assert load_api_module("process_job").process_translation_job(job_id)
+        job = supabase_standin.jobs[job_id]
+        assert job["translation_stats"] == EXPECTED
+        assert "4 calls" in job["progress_message"]
+        assert requests.get(f"{api_server('status')}?job_id={job_id}").json()["translation_stats"] == EXPECTED
+
+        # The same file again is served from the result cache
+        response = requests.post(f"{api_server('translate')}?filename=report.xlsx", data=content,
+                                 headers={"Content-Type": "application/octet-stream"})
+        reused = supabase_standin.jobs[response.json()["task_id"]]
+        assert reused["translation_stats"]["result_cache"] == "hit"
+        assert reused["translation_stats"]["calls_saved"] == 4
+
+        summary = requests.get(api_server("stats")).json()
+        assert summary["jobs"] == 2
+        assert summary["totals"]["provider_calls"] == 4
+        assert summary["totals"]["calls_saved"] == 4
+        assert summary["result_cache"] == {"miss": 1, "hit": 1}
+        assert summary["failure_rate"] == 0.25
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
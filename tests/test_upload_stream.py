@@ -0,0 +1,156 @@
+"""
+Tests for streaming uploads: multipart parsing and the api/translate.py handler
+"""
+import pytest
+import os
+import sys
+import io
+import base64
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import upload_stream
+from upload_stream import BodyReader, MultipartReader, UploadError
+
+BOUNDARY = "----testboundary"
+
+
+def build_multipart(fields, filename, content):
+    """Encode form fields and one file part as multipart/form-data"""
+    body = b""
+    for name, value in fields:
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                 f"{value}\r\n").encode()
+    body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+             f"Content-Type: application/octet-stream\r\n\r\n").encode()
+    body += content + f"\r\n--{BOUNDARY}--\r\n".encode()
+    return body
+
+
+class TestMultipartReader:
+    """Test the incremental multipart parser"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 64 * 1024])
+    def test_parts_across_chunk_boundaries(self, monkeypatch, chunk_size):
+        """Parts are parsed correctly whatever the read size"""
+        monkeypatch.setattr(upload_stream, "CHUNK_SIZE", chunk_size)
+        content = bytes(range(256)) * 50 + b"\r\n--" + b"almost a boundary"
+        body = build_multipart([("source_lang", "fr")], "data.xlsx", content)
+
+        reader = MultipartReader(BodyReader(io.BytesIO(body), len(body)),
+                                 f"multipart/form-data; boundary={BOUNDARY}")
+        parts = [(part.name, part.filename, b"".join(part)) for part in reader.parts()]
+
+        assert parts == [("source_lang", None, b"fr"), ("file", "data.xlsx", content)]
+
+    def test_missing_boundary(self):
+        """A multipart content type without boundary is rejected"""
+        with pytest.raises(UploadError):
+            MultipartReader(io.BytesIO(b""), "multipart/form-data")
+
+    def test_truncated_body(self):
+        """A body that ends inside a part is rejected"""
+        body = build_multipart([], "data.xlsx", b"content")[:-20]
+        reader = MultipartReader(BodyReader(io.BytesIO(body), len(body)),
+                                 f"multipart/form-data; boundary={BOUNDARY}")
+        with pytest.raises(UploadError):
+            for part in reader.parts():
+                part.drain()
+
+
+class TestBodyReader:
+    """Test the Content-Length bounded body reader"""
+
+    def test_rejects_oversized_body(self):
+        """Bodies over the configured limit are rejected before reading"""
+        with pytest.raises(UploadError) as excinfo:
+            BodyReader(io.BytesIO(b""), 11, max_bytes=10)
+        assert excinfo.value.code == 413
+
+    def test_reads_in_bounded_chunks(self, monkeypatch):
+        """No single read returns more than CHUNK_SIZE bytes"""
+        monkeypatch.setattr(upload_stream, "CHUNK_SIZE", 4)
+        reader = BodyReader(io.BytesIO(b"0123456789"), 10)
+        chunks = list(reader)
+        assert b"".join(chunks) == b"0123456789"
+        assert max(len(chunk) for chunk in chunks) == 4
+
+
+class TestTranslateUpload:
+    """Test api/translate.py against the Supabase stand-in"""
+
+    def test_raw_body_upload(self, supabase_standin, api_server):
+        """Raw bytes with query parameters create a job"""
+        url = api_server("translate")
+        response = requests.post(
+            f"{url}?filename=report%20fr.xlsx&source_lang=fr&target_lang=de",
+            data=b"PK raw workbook", headers={"Content-Type": "application/octet-stream"})
+
+        assert response.status_code == 202
+        job_id = response.json()["task_id"]
+        job = supabase_standin.jobs[job_id]
+        assert job["original_filename"] == "report fr.xlsx"
+        assert job["target_lang"] == "de"
+        assert job["file_size"] == len(b"PK raw workbook")
+        assert supabase_standin.objects[f"excel-files/{job['input_file_path']}"][1] == b"PK raw workbook"
+
+    def test_multipart_upload(self, supabase_standin, api_server):
+        """Multipart form uploads are streamed to storage"""
+        url = api_server("translate")
+        content = os.urandom(300 * 1024)
+        response = requests.post(url, files={"file": ("big.xlsx", content)},
+                                 data={"source_lang": "es", "target_lang": "en"})
+
+        assert response.status_code == 202
+        job = supabase_standin.jobs[response.json()["task_id"]]
+        assert job["source_lang"] == "es"
+        assert job["file_size"] == len(content)
+        assert supabase_standin.objects[f"excel-files/{job['input_file_path']}"][1] == content
+
+    def test_legacy_base64_upload(self, supabase_standin, api_server):
+        """JSON with a base64 encoded file keeps working"""
+        url = api_server("translate")
+        response = requests.post(url, json={
+            "filename": "old.xls",
+            "file": base64.b64encode(b"legacy").decode(),
+            "target_lang": "en"
+        })
+
+        assert response.status_code == 202
+        job = supabase_standin.jobs[response.json()["task_id"]]
+        assert job["original_filename"] == "old.xls"
+        assert supabase_standin.objects[f"excel-files/{job['input_file_path']}"][0] == "application/vnd.ms-excel"
+
+    def test_rejects_oversized_form_field(self, supabase_standin, api_server):
+        """Non-file form fields are capped at a few KB"""
+        url = api_server("translate")
+        response = requests.post(url, files={"file": ("big.xlsx", b"PK workbook")},
+                                 data={"source_lang": "x" * (upload_stream.MAX_FIELD_BYTES + 1)})
+
+        assert response.status_code == 413
+        assert "source_lang" in response.json()["error"]
+        assert supabase_standin.jobs == {}
+
+    def test_rejects_oversized_json(self, supabase_standin, api_server, monkeypatch):
+        """JSON bodies over MAX_JSON_BYTES are refused before they are read"""
+        monkeypatch.setattr(upload_stream, "MAX_JSON_BYTES", 1024)
+        url = api_server("translate")
+        response = requests.post(url, json={"filename": "old.xls", "file": base64.b64encode(b"x" * 2048).decode()})
+
+        assert response.status_code == 413
+        assert supabase_standin.objects == {}
+
+    def test_rejects_unsupported_extension(self, supabase_standin, api_server):
+        """Non-Excel files are rejected before anything is stored"""
+        url = api_server("translate")
+        response = requests.post(f"{url}?filename=notes.txt", data=b"text",
+                                 headers={"Content-Type": "application/octet-stream"})
+
+        assert response.status_code == 400
+        assert supabase_standin.objects == {}
+        assert supabase_standin.jobs == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
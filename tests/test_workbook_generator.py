@@ -0,0 +1,125 @@
+"""
+Tests for the synthetic workbook generator (workbook_generator.py)
+"""
+import pytest
+import os
+import sys
+import json
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from workbook_generator import WorkbookGenerator, generate_workbook, main
+
+
+def cell_values(path):
+    wb = load_workbook(path)
+    return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+
+class TestShape:
+    """Test the tunable shape"""
+
+    def test_same_seed_same_cells(self, tmp_path):
+        """A seed reproduces the workbook; another seed does not"""
+        options = dict(rows=200, cols=8, sheets=2, formula_density=0.2, styles=3, merges=4)
+        generate_workbook(str(tmp_path / "a.xlsx"), seed=7, **options)
+        generate_workbook(str(tmp_path / "b.xlsx"), seed=7, **options)
+        generate_workbook(str(tmp_path / "c.xlsx"), seed=8, **options)
+
+        assert cell_values(tmp_path / "a.xlsx") == cell_values(tmp_path / "b.xlsx")
+        assert cell_values(tmp_path / "a.xlsx") != cell_values(tmp_path / "c.xlsx")
+
+    def test_rows_cols_and_sheets(self, tmp_path):
+        """Every sheet has the requested dimensions"""
+        path = str(tmp_path / "shape.xlsx")
+        generate_workbook(path, rows=50, cols=12, sheets=3, sparsity=0)
+        wb = load_workbook(path)
+        assert len(wb.worksheets) == 3
+        assert all((ws.max_row, ws.max_column) == (50, 12) for ws in wb.worksheets)
+
+    def test_sparsity_and_duplicates(self):
+        """Empty cells and repeated strings follow their ratios"""
+        generator = WorkbookGenerator(rows=1000, cols=10, sparsity=0.5, duplicate_ratio=0.9, formula_density=0)
+        rows, _ = generator.sheet_rows(0)
+        values = [value for row in rows for value, _ in row]
+
+        empty = sum(value is None for value in values) / len(values)
+        assert 0.45 < empty < 0.55
+        strings = [value for value in values if isinstance(value, str)]
+        assert len(set(strings)) < 0.25 * len(strings)
+
+    def test_string_length(self):
+        """String lengths centre on string_length"""
+        generator = WorkbookGenerator(rows=500, cols=4, sparsity=0, numeric_ratio=0, duplicate_ratio=0,
+                                      formula_density=0, string_length=60, length_spread=0.2)
+        rows, _ = generator.sheet_rows(0)
+        lengths = sorted(len(value) for row in rows for value, _ in row)
+        assert 45 < lengths[len(lengths) // 2] < 75
+
+    def test_formula_density_and_fill_down(self, tmp_path):
+        """Fill-down columns repeat one formula on every row"""
+        path = str(tmp_path / "formulas.xlsx")
+        summary = generate_workbook(path, rows=400, cols=10, formula_density=0.2, fill_down=1.0)
+        assert summary["formulas"] == 2 * 400
+
+        ws = load_workbook(path).active
+        formula_columns = [
+            column for column in ws.iter_cols(values_only=True)
+            if all(isinstance(value, str) and value.startswith("=") for value in column)
+        ]
+        assert len(formula_columns) == 2
+
+    def test_styles_and_merges(self, tmp_path):
+        """Styled cells and non-overlapping merged ranges are written"""
+        path = str(tmp_path / "styled.xlsx")
+        summary = generate_workbook(path, rows=300, cols=6, styles=5, styled_ratio=1.0, merges=10)
+        ws = load_workbook(path).active
+
+        ranges = list(ws.merged_cells.ranges)
+        assert summary["merged_ranges"] == len(ranges) == 10
+        cells = [set(cell_range.cells) for cell_range in ranges]
+        assert sum(len(c) for c in cells) == len(set().union(*cells))
+
+        fonts = {(cell.font.b, cell.font.i, cell.font.color.rgb if cell.font.color else None)
+                 for row in ws.iter_rows(max_row=50) for cell in row if cell.value is not None}
+        assert len(fonts) > 1
+
+
+class TestXls:
+    """Test legacy .xls output"""
+
+    def test_xls_is_readable(self, tmp_path):
+        """xlrd reads the generated sheets, values and merges"""
+        pytest.importorskip("xlwt")
+        import xlrd
+        path = str(tmp_path / "legacy.xls")
+        generate_workbook(path, rows=100, cols=5, sheets=2, merges=3, styles=2, formula_density=0.1)
+
+        book = xlrd.open_workbook(path, formatting_info=True)
+        assert book.nsheets == 2
+        sheet = book.sheet_by_index(0)
+        assert (sheet.nrows, sheet.ncols) == (100, 5)
+        assert len(sheet.merged_cells) == 3
+
+    def test_xls_limits(self, tmp_path):
+        """Shapes .xls cannot hold are refused"""
+        pytest.importorskip("xlwt")
+        with pytest.raises(ValueError):
+            generate_workbook(str(tmp_path / "big.xls"), rows=70000, cols=2)
+
+
+class TestCli:
+    """Test the command line"""
+
+    def test_main_writes_workbook(self, tmp_path, capsys):
+        """The CLI writes the file and prints its summary as JSON"""
+        path = str(tmp_path / "cli.xlsx")
+        assert main([path, "--rows", "20", "--cols", "3", "--seed", "4"]) == 0
+        summary = json.loads(capsys.readouterr().out)
+        assert summary["path"] == path and summary["rows"] == 20
+        assert os.path.exists(path)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
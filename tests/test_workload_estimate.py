@@ -0,0 +1,143 @@
+"""
+Tests for the pre-flight workload estimate (workbook_estimate.estimate_workload)
+and the /estimate endpoints of app.py, app_supabase.py and api/estimate.py
+"""
+import pytest
+import io
+import os
+import sys
+import uuid
+import hashlib
+import importlib
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rate_limit
+import workbook_estimate
+from workbook_estimate import estimate_workload
+from result_cache import compute_content_hash
+from conftest import make_workbook
+
+VALUES = [
+    "Bonjour", "Merci", "Bonjour", 42, None,
+    '=IF(A1>0, "Dépensé ce mois", "charttype")',
+    '=SPARKLINE(A1:A3, "Économisé")',
+]
+
+
+class TestEstimateWorkload:
+    """Test the counts and the projected duration"""
+
+    def test_counts_match_translation(self):
+        """Only the strings a translation would send are counted"""
+        workload = estimate_workload("a.xlsx", io.BytesIO(make_workbook(VALUES, sheets=2)))
+
+        assert workload["sheets"] == 2
+        assert workload["text_cells"] == 6
+        assert workload["formula_cells"] == 4
+        # "charttype" and the SPARKLINE argument are left untranslated
+        assert workload["formula_literals"] == 2
+        assert workload["translation_calls"] == 8
+        assert workload["unique_strings"] == 3
+        assert workload["duplicate_strings"] == 5
+        assert workload["total_chars"] == 2 * len("BonjourMerciBonjourDépensé ce mois")
+        assert workload["unique_chars"] == len("BonjourMerciDépensé ce mois")
+        assert workload["api_calls"] == 8
+
+    def test_projected_duration(self, monkeypatch):
+        """Calls take SECONDS_PER_CALL each, but never beat the rate limit"""
+        content = make_workbook([f"Texte {i}" for i in range(100)])
+        monkeypatch.setattr(workbook_estimate, "SECONDS_PER_CALL", 0.1)
+        assert estimate_workload("a.xlsx", io.BytesIO(content))["projected_seconds"] == 10.0
+
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_RPS", 2)
+        assert estimate_workload("a.xlsx", io.BytesIO(content))["projected_seconds"] == 50.0
+
+    def test_cached_result_needs_no_calls(self):
+        """A reusable identical translation turns every call into a cache hit"""
+        workload = estimate_workload("a.xlsx", io.BytesIO(make_workbook(VALUES)), cached=True)
+        assert workload["expected_cache_hits"] == workload["translation_calls"] == 4
+        assert workload["api_calls"] == 0
+        assert workload["projected_seconds"] == 0
+
+    def test_unreadable_workbook(self):
+        """Broken uploads have no estimate"""
+        assert estimate_workload("a.xlsx", io.BytesIO(b"not a workbook")) is None
+        assert estimate_workload("a.xls", io.BytesIO(b"not a workbook")) is None
+
+
+class TestEstimateEndpoints:
+    """Test the /estimate endpoints"""
+
+    def test_app_estimate(self):
+        """app.py estimates an upload without starting a job"""
+        import app as app_module
+        response = app_module.app.test_client().post("/estimate", data={
+            "file": (io.BytesIO(make_workbook(VALUES)), "report.xlsx")
+        }, content_type="multipart/form-data")
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["filename"] == "report.xlsx"
+        assert data["translation_calls"] == 4
+        assert app_module.app.test_client().post("/estimate").status_code == 400
+
+    def test_app_supabase_estimate_sees_cached_result(self, supabase_standin):
+        """app_supabase.py reports an identical completed translation as cache hits"""
+        content = make_workbook(VALUES)
+        done_id = str(uuid.uuid4())
+        supabase_standin.insert("translation_jobs", {
+            "id": done_id, "original_filename": "a.xlsx", "status": "complete",
+            "content_hash": compute_content_hash(hashlib.sha256(content).hexdigest(), "fr", "en"),
+            "output_file_path": f"output/{done_id}/translated_a.xlsx"})
+        sys.modules.pop("app_supabase", None)
+        app_supabase = importlib.import_module("app_supabase")
+        try:
+            client = app_supabase.app.test_client()
+            data = client.post("/estimate", data={
+                "file": (io.BytesIO(content), "a.xlsx"), "source_lang": "fr", "target_lang": "en"
+            }, content_type="multipart/form-data").get_json()
+            assert data["cached_result"] is True
+            assert data["api_calls"] == 0
+
+            data = client.post("/estimate", data={
+                "file": (io.BytesIO(content), "a.xlsx"), "source_lang": "fr", "target_lang": "de"
+            }, content_type="multipart/form-data").get_json()
+            assert data["cached_result"] is False
+            assert data["api_calls"] == 4
+        finally:
+            sys.modules.pop("app_supabase", None)
+
+    def test_api_estimate_raw_upload(self, supabase_standin, api_server):
+        """api/estimate.py estimates raw bytes and stores nothing"""
+        url = api_server("estimate")
+        response = requests.post(f"{url}?filename=report.xlsx&source_lang=fr&target_lang=en",
+                                 data=make_workbook(VALUES), headers={"Content-Type": "application/octet-stream"})
+
+        assert response.status_code == 200
+        assert response.json()["unique_strings"] == 3
+        assert response.json()["cached_result"] is False
+        assert supabase_standin.objects == {} and supabase_standin.jobs == {}
+
+        response = requests.post(f"{url}?filename=report.xlsx", data=b"not a workbook",
+                                 headers={"Content-Type": "application/octet-stream"})
+        assert response.status_code == 422
+
+    def test_api_estimate_signed_upload(self, supabase_standin, api_server):
+        """A file uploaded through a signed URL is estimated before its job exists"""
+        job_id = str(uuid.uuid4())
+        supabase_standin.objects[f"excel-files/input/{job_id}/report.xlsx"] = (
+            "application/octet-stream", make_workbook(VALUES))
+        url = api_server("estimate")
+
+        response = requests.post(url, json={"job_id": job_id, "filename": "report.xlsx"})
+        assert response.status_code == 200
+        assert response.json()["translation_calls"] == 4
+
+        response = requests.post(url, json={"job_id": str(uuid.uuid4()), "filename": "report.xlsx"})
+        assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,248 @@
+"""
+Process-wide Translation Executor
+Every outbound translation call of this process runs on one shared pool of
+TRANSLATION_CONCURRENCY threads, so the total number of requests in flight
+to the provider stays bounded however many jobs run at the same time.
+
+Each job (one translate_excel_with_format call) has its own queue, served
+by deficit round robin: on its turn a job may spend TRANSLATION_QUANTUM
+characters of calls, so a job with thousands of queued strings cannot
+starve the others and every running job keeps making steady progress.
+translate_excel_with_format hands each job's string cells to the executor
+in batches of TRANSLATE_BATCH_CELLS (see translate_texts_batch), so a job
+keeps up to TRANSLATE_BATCH_WORKERS calls queued there at once.
+"""
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from cancellation import TranslationCancelled
+from rate_limit import get_rate_limiter
+from metrics import TRANSLATION_CALLS_OK, TRANSLATION_CALLS_FAILED, TRANSLATION_CHARS
+
+# Translation calls in flight at once, across all jobs of this process
+TRANSLATION_CONCURRENCY = int(os.environ.get("TRANSLATION_CONCURRENCY", 8))
+
+# Characters a job may send per round-robin turn
+TRANSLATION_QUANTUM = int(os.environ.get("TRANSLATION_QUANTUM", 500))
+
+# String cells translate_excel_with_format translates together per batch
+TRANSLATE_BATCH_CELLS = int(os.environ.get("TRANSLATE_BATCH_CELLS", 20))
+
+# Calls of one batch in flight at once (the executor's cap still applies)
+TRANSLATE_BATCH_WORKERS = int(os.environ.get("TRANSLATE_BATCH_WORKERS", 5))
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class _Call:
+    __slots__ = ("future", "fn", "args", "cost")
+
+    def __init__(self, future, fn, args, cost):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.cost = cost
+
+
+class TranslationExecutor:
+    """
+    Thread pool with a global concurrency cap and per-job fair queues
+
+    Args:
+        concurrency: Calls run at the same time (default: TRANSLATION_CONCURRENCY)
+        quantum: Cost a job may spend per turn (default: TRANSLATION_QUANTUM)
+    """
+
+    def __init__(self, concurrency=None, quantum=None):
+        self.concurrency = concurrency or TRANSLATION_CONCURRENCY
+        self.quantum = quantum or TRANSLATION_QUANTUM
+        self.condition = threading.Condition()
+        self.queues = {}  # {job: deque of _Call}
+        self.deficit = {}  # {job: cost the job may still spend this turn}
+        self.active = deque()  # jobs with queued calls, in round-robin order
+        self.threads = []
+        self.running = 0
+
+    def submit(self, job, fn, *args, cost=1):
+        """
+        Queue fn(*args) on behalf of `job`
+
+        Args:
+            job: Hashable key of the job the call belongs to
+            fn: The translation call
+            cost: Size of the call, e.g. its characters
+
+        Returns a concurrent.futures.Future; cancelling it drops the call if
+        it has not started.
+        """
+        call = _Call(Future(), fn, args, max(cost, 1))
+        with self.condition:
+            if job not in self.queues:
+                self.queues[job] = deque()
+                self.deficit[job] = self.quantum
+                self.active.append(job)
+            self.queues[job].append(call)
+            if len(self.threads) < self.concurrency:
+                thread = threading.Thread(target=self._work, name=f"translate-{len(self.threads)}", daemon=True)
+                self.threads.append(thread)
+                thread.start()
+            self.condition.notify()
+        return call.future
+
+    def call(self, job, fn, *args, cost=1):
+        """Run fn(*args) on the pool and wait for its result"""
+        return self.submit(job, fn, *args, cost=cost).result()
+
+    def _next_call(self):
+        """Deficit round robin over the jobs with queued calls"""
+        while True:
+            job = self.active[0]
+            queue = self.queues[job]
+            if self.deficit[job] >= queue[0].cost:
+                call = queue.popleft()
+                self.deficit[job] -= call.cost
+                if not queue:
+                    # An idle job keeps no credit
+                    self.active.popleft()
+                    del self.queues[job]
+                    del self.deficit[job]
+                return call
+            # Turn over: the job gets its next quantum when it comes round again
+            self.deficit[job] += self.quantum
+            self.active.rotate(-1)
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.active:
+                    self.condition.wait()
+                call = self._next_call()
+            if not call.future.set_running_or_notify_cancel():
+                continue
+            with self.condition:
+                self.running += 1
+            try:
+                call.future.set_result(call.fn(*call.args))
+            except BaseException as e:
+                call.future.set_exception(e)
+            finally:
+                with self.condition:
+                    self.running -= 1
+
+    def stats(self):
+        """Concurrency cap, calls running and queued, and jobs waiting"""
+        with self.condition:
+            return {
+                "concurrency": self.concurrency,
+                "running": self.running,
+                "queued": sum(len(queue) for queue in self.queues.values()),
+                "jobs": len(self.active)
+            }
+
+
+class JobTranslator:
+    """
+    Translator whose calls go through the shared executor as one job
+
+    Wraps a translator (e.g. GoogleTranslator); translate() blocks until the
+    executor has run the call on the job's behalf. Every call first takes its
+    request and characters from the node-wide rate limit (rate_limit.py), and
+    is counted in the job's TranslationStats (translation_stats.py) if given.
+    """
+
+    def __init__(self, translator, executor=None, rate_limiter=None, stats=None):
+        self.translator = translator
+        self.executor = executor or get_translation_executor()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.stats = stats
+
+    def submit(self, text):
+        """Queue the translation of one string; returns a Future"""
+        return self.executor.submit(self, self._translate, text, cost=len(text))
+
+    def _translate(self, text):
+        self.rate_limiter.acquire(chars=len(text))
+        TRANSLATION_CHARS.inc(len(text))
+        if self.stats is not None:
+            self.stats.add("provider_calls")
+            self.stats.add("chars_sent", len(text))
+        try:
+            result = self.translator.translate(text)
+        except Exception:
+            TRANSLATION_CALLS_FAILED.inc()
+            if self.stats is not None:
+                self.stats.add("failed_calls")
+            raise
+        TRANSLATION_CALLS_OK.inc()
+        return result
+
+    def translate(self, text):
+        return self.submit(text).result()
+
+
+def translate_texts_batch(texts, translator, max_workers=TRANSLATE_BATCH_WORKERS, cancel_token=None):
+    """
+    Translate multiple texts in parallel
+
+    Calls run on the process-wide translation executor, which caps concurrent
+    requests across all jobs and shares them fairly between them.
+
+    Args:
+        texts: List of text strings to translate
+        translator: GoogleTranslator or JobTranslator instance
+        max_workers: Number of this batch's translations in flight at once
+        cancel_token: Optional CancellationToken; once cancelled, queued
+            translations are dropped, running ones are not waited for and
+            TranslationCancelled is raised
+
+    Returns:
+        List of translated texts in same order
+    """
+    if not texts:
+        return []
+
+    if not isinstance(translator, JobTranslator):
+        translator = JobTranslator(translator)
+
+    results = [None] * len(texts)
+    pending = deque()
+
+    def collect():
+        index, future = pending.popleft()
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            logger.warning(f"Translation failed for text {index}: {e}")
+            results[index] = texts[index]  # Keep original on error
+
+    try:
+        for i, text in enumerate(texts):
+            pending.append((i, translator.submit(text)))
+            if len(pending) >= max_workers:
+                collect()
+        while pending:
+            collect()
+    except TranslationCancelled:
+        # Drop queued requests instead of waiting for their responses
+        for _, future in pending:
+            future.cancel()
+        raise
+
+    return results
+
+
+def get_translation_executor():
+    """The process-wide executor (created on first use)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = TranslationExecutor()
+    return _executor
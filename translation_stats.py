@@ -0,0 +1,134 @@
+"""
+Per-job Translation Accounting
+What each job cost at the translation provider, so quota use can be
+predicted and the effect of skipping and result reuse measured:
+
+- provider_calls    translation requests sent
+- chars_sent        characters in those requests
+- failed_calls      requests that raised (the text was kept as it was)
+- strings_skipped   formula literals should_translate_string left alone
+- result_cache      "miss" (translated), "hit" (reused a finished identical
+                    job) or "coalesced" (waited on an identical job in flight)
+- calls_saved,      for reused jobs: the provider calls and characters the
+  chars_saved       source job spent on their behalf
+
+Stats are stored with the job (translation_jobs.translation_stats, or the
+job's final progress in app.py), summarised in its final progress message and
+aggregated over the last STATS_WINDOW finished jobs by /stats: from an
+in-process window in app.py, from translation_jobs in the Supabase apps.
+"""
+import os
+import math
+import threading
+from collections import deque
+
+# Finished jobs /stats aggregates over
+STATS_WINDOW = int(os.environ.get("STATS_WINDOW", 200))
+
+COUNTERS = ("provider_calls", "chars_sent", "failed_calls", "strings_skipped")
+
+PERCENTILES = (50, 90, 99)
+
+_recent = deque(maxlen=STATS_WINDOW)
+_recent_lock = threading.Lock()
+
+
+class TranslationStats:
+    """Counters of one job; calls finish on the executor's threads, so updates are locked"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+    def add(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def get(self, name):
+        with self.lock:
+            return self.counts[name]
+
+    def as_dict(self):
+        with self.lock:
+            return dict(self.counts, result_cache="miss")
+
+
+def reused_stats(source_stats, result_cache="hit"):
+    """Stats of a job served by another job's work (whose stats may be None)"""
+    source = source_stats or {}
+    stats = dict.fromkeys(COUNTERS, 0)
+    stats["result_cache"] = result_cache
+    stats["calls_saved"] = source.get("provider_calls", 0) + source.get("calls_saved", 0)
+    stats["chars_saved"] = source.get("chars_sent", 0) + source.get("chars_saved", 0)
+    return stats
+
+
+def summarize_stats(stats):
+    """One-line summary for progress messages, e.g. '120 calls, 4,310 characters, 0 failed, 3 skipped'"""
+    return (f"{stats['provider_calls']:,} calls, {stats['chars_sent']:,} characters, "
+            f"{stats['failed_calls']:,} failed, {stats['strings_skipped']:,} skipped")
+
+
+def record_job_stats(status, stats):
+    """Remember a finished job's stats for /stats (in-process window, used by app.py)"""
+    with _recent_lock:
+        _recent.append(dict(stats, status=status))
+
+
+def recent_job_stats():
+    """Stats of the last STATS_WINDOW jobs recorded in this process, oldest first"""
+    with _recent_lock:
+        return list(_recent)
+
+
+def stored_job_stats():
+    """Stats of the last STATS_WINDOW finished jobs in translation_jobs (Supabase deployments)"""
+    # Imported here so the translation engine does not depend on the REST helpers
+    from supabase_rest import select_jobs
+    rows = select_jobs(
+        "status, translation_stats",
+        order="created_at.desc",
+        limit=STATS_WINDOW,
+        status="in.(complete,error,cancelled)",
+        translation_stats="not.is.null",
+    )
+    return [dict(row["translation_stats"], status=row["status"]) for row in reversed(rows)]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def aggregate_stats(records):
+    """
+    /stats response for a list of job stats (each may carry its status)
+
+    Per counter: total and per-job mean/p50/p90/p99/max. Also jobs per status
+    and per result_cache outcome, the share of calls that failed, and the
+    calls/characters saved by reusing results.
+    """
+    records = [record for record in records if record]
+    summary = {"jobs": len(records), "window": STATS_WINDOW, "totals": {}, "per_job": {}}
+    for name in COUNTERS + ("calls_saved", "chars_saved"):
+        values = [record.get(name, 0) for record in records]
+        summary["totals"][name] = sum(values)
+        if values:
+            summary["per_job"][name] = {
+                "mean": round(sum(values) / len(values), 2),
+                **{f"p{p}": percentile(values, p) for p in PERCENTILES},
+                "max": max(values)
+            }
+
+    summary["by_status"] = {}
+    summary["result_cache"] = {}
+    for record in records:
+        status = record.get("status", "unknown")
+        outcome = record.get("result_cache", "miss")
+        summary["by_status"][status] = summary["by_status"].get(status, 0) + 1
+        summary["result_cache"][outcome] = summary["result_cache"].get(outcome, 0) + 1
+
+    calls = summary["totals"]["provider_calls"]
+    summary["failure_rate"] = round(summary["totals"]["failed_calls"] / calls, 4) if calls else 0.0
+    return summary
@@ -0,0 +1,260 @@
+"""
+Streaming upload helpers
+Read request bodies (raw or multipart/form-data) in fixed-size chunks so an
+upload can be piped to storage without holding the whole file in memory
+"""
+import os
+import hashlib
+
+# Size of each read from the request body
+CHUNK_SIZE = 64 * 1024
+
+# Largest upload accepted by the streaming endpoints (default: 200MB)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+
+# Largest non-file multipart field (source_lang, target_lang, profile, ...)
+MAX_FIELD_BYTES = 4 * 1024
+
+# Largest JSON body: a signed-upload completion, or a legacy base64 encoded file
+MAX_JSON_BYTES = int(os.environ.get("MAX_JSON_BYTES", 10 * 1024 * 1024))
+
+CONTENT_TYPES = {
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class UploadError(Exception):
+    """Client error while reading an upload; carries the HTTP status code"""
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def content_type_for(filename):
+    """MIME type to store an Excel file under, based on its extension"""
+    return CONTENT_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+
+def validate_filename(filename):
+    """Reject uploads that are not .xls/.xlsx files"""
+    if not filename:
+        raise UploadError(400, "Missing filename or file content")
+    if not (filename.endswith('.xls') or filename.endswith('.xlsx')):
+        raise UploadError(400, "Only .xls and .xlsx files are supported")
+    # Never let a client-supplied name escape the job's storage folder
+    return os.path.basename(filename.replace("\\", "/"))
+
+
+class BodyReader:
+    """
+    File-like view of a request body limited to its Content-Length
+
+    Passing this to requests as `data` streams the body upstream in
+    CHUNK_SIZE reads with a known Content-Length instead of buffering it.
+    The SHA-256 of everything read is kept in `sha256`.
+    """
+    def __init__(self, stream, length, max_bytes=None):
+        self.stream = stream
+        self.length = length
+        self.remaining = length
+        self.max_bytes = max_bytes if max_bytes is not None else MAX_UPLOAD_BYTES
+        self.bytes_read = 0
+        self.sha256 = hashlib.sha256()
+        if length > self.max_bytes:
+            raise UploadError(413, f"File too large (limit is {self.max_bytes // (1024 * 1024)}MB)")
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            # Whole remaining body - only used by the small/legacy paths
+            return b"".join(iter(lambda: self.read(CHUNK_SIZE), b""))
+        if self.remaining <= 0:
+            return b""
+        data = self.stream.read(min(size, self.remaining))
+        if not data:
+            raise UploadError(400, "Request body ended before Content-Length bytes were received")
+        self.remaining -= len(data)
+        self.bytes_read += len(data)
+        self.sha256.update(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+
+
+def parse_header_params(value):
+    """Split a header like 'form-data; name="file"; filename="a.xlsx"' into (value, params)"""
+    parts = value.split(";")
+    params = {}
+    for param in parts[1:]:
+        if "=" in param:
+            key, val = param.strip().split("=", 1)
+            val = val.strip()
+            if len(val) >= 2 and val[0] == val[-1] == '"':
+                val = val[1:-1]
+            params[key.lower()] = val
+    return parts[0].strip().lower(), params
+
+
+class MultipartPart:
+    """
+    One part of a multipart body; its content is read incrementally
+
+    The SHA-256 of the part content is kept in `sha256`.
+    """
+    def __init__(self, parser, headers):
+        self.parser = parser
+        self.headers = headers
+        disposition, params = parse_header_params(headers.get("content-disposition", ""))
+        self.name = params.get("name")
+        self.filename = params.get("filename")
+        self.content_type = headers.get("content-type", "application/octet-stream")
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.finished = False
+
+    def read(self, size=CHUNK_SIZE):
+        if self.finished:
+            return b""
+        data = self.parser._read_part_data(size)
+        if not data:
+            self.finished = True
+        self.size += len(data)
+        self.sha256.update(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+
+    def read_value(self, max_bytes=None):
+        """
+        Whole content of a small form field, as text
+
+        Raises UploadError (413) as soon as it grows past max_bytes
+        (default MAX_FIELD_BYTES), without reading the rest.
+        """
+        max_bytes = max_bytes if max_bytes is not None else MAX_FIELD_BYTES
+        value = bytearray()
+        for data in self:
+            value += data
+            if len(value) > max_bytes:
+                raise UploadError(413, f"Form field '{self.name}' too large (limit is {max_bytes} bytes)")
+        try:
+            return value.decode('utf-8')
+        except UnicodeDecodeError:
+            raise UploadError(400, f"Form field '{self.name}' is not valid UTF-8")
+
+    def drain(self):
+        """Skip whatever is left of this part"""
+        for _ in self:
+            pass
+
+
+class MultipartReader:
+    """
+    Incremental multipart/form-data parser
+
+    Only a small window of the body is buffered at any time, so memory use
+    stays bounded no matter how large the file part is.
+    """
+    def __init__(self, stream, content_type):
+        mimetype, params = parse_header_params(content_type)
+        boundary = params.get("boundary")
+        if mimetype != "multipart/form-data" or not boundary:
+            raise UploadError(400, "Invalid multipart request: missing boundary")
+        self.stream = stream
+        self.delimiter = b"\r\n--" + boundary.encode("latin-1")
+        # The first delimiter has no leading CRLF; prepend one so every
+        # delimiter looks the same
+        self.buffer = bytearray(b"\r\n")
+        self.eof = False
+        self.in_part = False
+        self.done = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.stream.read(CHUNK_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer.extend(data)
+        return True
+
+    def _read_part_data(self, size):
+        if not self.in_part:
+            return b""
+        while True:
+            index = self.buffer.find(self.delimiter)
+            if index != -1:
+                if index == 0:
+                    self.in_part = False
+                    return b""
+                take = min(size, index)
+                data = bytes(self.buffer[:take])
+                del self.buffer[:take]
+                return data
+            # Keep enough bytes to recognise a delimiter split across reads
+            safe = len(self.buffer) - len(self.delimiter) + 1
+            if safe > 0:
+                take = min(size, safe)
+                data = bytes(self.buffer[:take])
+                del self.buffer[:take]
+                return data
+            if not self._fill():
+                raise UploadError(400, "Invalid multipart request: unexpected end of body")
+
+    def _read_until(self, marker, limit=16 * 1024):
+        while True:
+            index = self.buffer.find(marker)
+            if index != -1:
+                data = bytes(self.buffer[:index])
+                del self.buffer[:index + len(marker)]
+                return data
+            if len(self.buffer) > limit or not self._fill():
+                raise UploadError(400, "Invalid multipart request: malformed part headers")
+
+    def parts(self):
+        """Yield each part in order; unread data of a part is skipped automatically"""
+        part = None
+        self._read_until(self.delimiter)
+        while True:
+            if part is not None:
+                part.drain()
+                self._read_until(self.delimiter)
+            while len(self.buffer) < 2 and self._fill():
+                pass
+            if bytes(self.buffer[:2]) == b"--":
+                self.done = True
+                return
+            line = self._read_until(b"\r\n")
+            if line.strip():
+                raise UploadError(400, "Invalid multipart request: malformed delimiter")
+            while len(self.buffer) < 2 and self._fill():
+                pass
+            if self.buffer.startswith(b"\r\n"):
+                # Part without any headers
+                del self.buffer[:2]
+                header_block = b""
+            else:
+                header_block = self._read_until(b"\r\n\r\n")
+            headers = {}
+            for header_line in header_block.decode("utf-8", "replace").split("\r\n"):
+                if ":" in header_line:
+                    key, value = header_line.split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+            self.in_part = True
+            part = MultipartPart(self, headers)
+            yield part
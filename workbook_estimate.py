@@ -0,0 +1,251 @@
+"""
+Workbook Workload Estimation
+Cheap estimates of how much text a workbook holds, read straight from the
+.xlsx container without loading the workbook, so a request can be routed
+before any heavy work is done.
+
+An .xlsx file is a zip archive of XML parts. A translation sends one call
+per string cell, repeated values included, so the estimate counts cell
+references in the sheet XML: shared string cells (t="s", however many
+share one entry of xl/sharedStrings.xml), inline strings (t="inlineStr")
+and the quoted literals of formulas (<f> elements, shared formulas counted
+once per cell that uses them).
+
+estimate_workload() is the full pre-flight estimate: one read-only pass over
+the cell values, counting exactly the strings a translation would send, with
+the projected duration of the job.
+"""
+import os
+import re
+import time
+import zipfile
+import rate_limit
+
+# Largest upload that may be translated inline, in the request (bytes)
+INLINE_MAX_BYTES = int(os.environ.get("INLINE_MAX_BYTES", 512 * 1024))
+
+# Largest estimated number of strings that may be translated inline
+INLINE_MAX_STRINGS = int(os.environ.get("INLINE_MAX_STRINGS", 50))
+
+# Never inflate more than this much XML just to estimate (zip bomb guard)
+MAX_SCAN_BYTES = 16 * 1024 * 1024
+
+SCAN_CHUNK_SIZE = 64 * 1024
+
+# Longest cell tag or formula element kept across chunks (Excel caps formulas at 8192 characters)
+MAX_ELEMENT_BYTES = 64 * 1024
+
+# Bytes of workbook per string, for files whose strings cannot be counted (.xls)
+BYTES_PER_STRING = 100
+
+# Average seconds one translation call takes, for projected durations
+SECONDS_PER_CALL = float(os.environ.get("ESTIMATE_SECONDS_PER_CALL", 0.2))
+
+# A string cell reference, or a formula: (attributes, text or None if self-closing)
+CELL_WORK = re.compile(rb'\bt="(?:s|inlineStr)"|<(?:\w+:)?f\b([^>]*?)(?:/>|>([^<]*)</(?:\w+:)?f>)')
+# Element starts; the sheet XML before the last one is complete
+ELEMENT_START = re.compile(rb"<(?:\w+:)?[cf]\b")
+SHARED_INDEX = re.compile(rb'\bsi="(\d+)"')
+# The literals translate_formula_strings translates
+FORMULA_LITERAL = re.compile(r'"([^"]*)"')
+
+
+def _formula_literals(formula):
+    """Quoted literals of a formula a translation is likely to send (blank and 1-2 character ones are kept)"""
+    formula = formula.replace(b"&quot;", b'"').decode("utf-8", "replace")
+    return sum(1 for literal in FORMULA_LITERAL.findall(formula) if len(literal.strip()) > 2)
+
+
+def _count_cell_work(archive, name):
+    """Count the strings a sheet's cells send, streaming the sheet XML in chunks"""
+    count = 0
+    shared_formulas = {}  # si -> literals of the shared formula
+
+    def add(match):
+        attributes, formula = match.group(1), match.group(2)
+        if attributes is None:
+            return 1  # string cell
+        literals = _formula_literals(formula) if formula else 0
+        shared = SHARED_INDEX.search(attributes) if b'"shared"' in attributes else None
+        if shared:
+            if formula:
+                shared_formulas[shared.group(1)] = literals
+            else:
+                literals = shared_formulas.get(shared.group(1), 0)
+        return literals
+
+    tail = b""
+    with archive.open(name) as member:
+        while True:
+            chunk = member.read(SCAN_CHUNK_SIZE)
+            data = tail + chunk
+            if not chunk:
+                return count + sum(add(match) for match in CELL_WORK.finditer(data))
+            # Everything from the last cell or formula start on may be cut
+            # off; it is left for the next round, so each match counts once
+            cut = max(len(data) - 32, 0)
+            for match in ELEMENT_START.finditer(data, max(len(data) - MAX_ELEMENT_BYTES, 0)):
+                cut = match.start()
+            count += sum(add(match) for match in CELL_WORK.finditer(data, 0, cut))
+            tail = data[cut:]
+
+
+def estimate_string_count(source):
+    """
+    Estimated number of strings a translation of an .xlsx workbook sends
+
+    Args:
+        source: Path or binary file-like object of the workbook
+
+    Returns:
+        String cells (shared or inline, every reference counted) plus formula
+        literals, or None if the file is not a readable .xlsx or is too large
+        to estimate cheaply
+    """
+    try:
+        with zipfile.ZipFile(source) as archive:
+            members = {info.filename: info for info in archive.infolist()}
+            if "[Content_Types].xml" not in members:
+                return None
+
+            scanned = 0
+            count = 0
+            for name, info in members.items():
+                if name.startswith("xl/worksheets/") and name.endswith(".xml"):
+                    scanned += info.file_size
+                    if scanned > MAX_SCAN_BYTES:
+                        return None
+                    count += _count_cell_work(archive, name)
+
+            return count
+    except (zipfile.BadZipFile, OSError, KeyError, EOFError):
+        return None
+
+
+def is_inline_candidate(filename, file_size, source):
+    """
+    Whether a workbook is small enough to translate inline, in the request
+
+    Returns (eligible, estimated_strings)
+    """
+    if not filename.lower().endswith(".xlsx") or file_size > INLINE_MAX_BYTES:
+        return False, None
+    strings = estimate_string_count(source)
+    return strings is not None and strings <= INLINE_MAX_STRINGS, strings
+
+
+def estimate_job_cost(filename, file_size, source):
+    """
+    Expected size of a translation job, in strings sent (at least 1)
+
+    Every string cell reference counts, so a workbook repeating one string
+    costs as much as its cells. Used by the job scheduler (job_scheduler.py) to order queued jobs; falls
+    back to the file size when the workbook cannot be scanned.
+    """
+    strings = None
+    if filename.lower().endswith(".xlsx"):
+        strings = estimate_string_count(source)
+    if strings is None:
+        strings = file_size // BYTES_PER_STRING
+    return max(strings, 1)
+
+
+def _workbook_values(filename, source):
+    """Sheet count and an iterator over every cell value, read without styles"""
+    if filename.lower().endswith(".xls"):
+        import xlrd
+        if isinstance(source, (str, os.PathLike)):
+            book = xlrd.open_workbook(source, on_demand=True)
+        else:
+            book = xlrd.open_workbook(file_contents=source.read(), on_demand=True)
+
+        def values():
+            for index in range(book.nsheets):
+                sheet = book.sheet_by_index(index)
+                for row in range(sheet.nrows):
+                    yield from sheet.row_values(row)
+        return book.nsheets, values()
+
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True)
+
+    def values():
+        try:
+            for ws in wb.worksheets:
+                for row in ws.iter_rows(values_only=True):
+                    yield from row
+        finally:
+            wb.close()
+    return len(wb.sheetnames), values()
+
+
+def estimate_workload(filename, source, cached=False):
+    """
+    Pre-flight estimate of a translation job, before any translation call
+
+    Args:
+        filename: Original filename (.xlsx or .xls)
+        source: Path or binary file-like object of the workbook
+        cached: Whether an identical completed translation can be reused
+            (see result_cache.py); the job then needs no translation calls
+
+    Returns:
+        Dict of cell, string and character counts, the translation calls the
+        job will make and its projected duration, or None if the workbook
+        cannot be read
+    """
+    # Only estimates need the cell filter of the translation engine
+    from excel_translator_optimized import should_translate_string
+
+    started = time.monotonic()
+    strings = []  # every string a translation sends, in order
+    text_cells = 0
+    formula_cells = 0
+    formula_literals = 0
+    try:
+        sheets, values = _workbook_values(filename, source)
+        for value in values:
+            if not value or not isinstance(value, str):
+                continue
+            if value.startswith("="):
+                formula_cells += 1
+                for literal in FORMULA_LITERAL.findall(value):
+                    if should_translate_string(literal, value):
+                        formula_literals += 1
+                        strings.append(literal)
+            else:
+                text_cells += 1
+                strings.append(value)
+    except Exception as e:
+        print(f"Could not estimate {filename}: {e}")
+        return None
+
+    unique = set(strings)
+    total_chars = sum(len(text) for text in strings)
+    cache_hits = len(strings) if cached else 0
+    api_calls = len(strings) - cache_hits
+    api_chars = 0 if cached else total_chars
+
+    # Calls of one job run one after another, and never faster than the rate limit
+    projected = api_calls * SECONDS_PER_CALL
+    if rate_limit.RATE_LIMIT_RPS > 0:
+        projected = max(projected, api_calls / rate_limit.RATE_LIMIT_RPS)
+    if rate_limit.RATE_LIMIT_CPS > 0:
+        projected = max(projected, api_chars / rate_limit.RATE_LIMIT_CPS)
+
+    return {
+        "sheets": sheets,
+        "text_cells": text_cells,
+        "formula_cells": formula_cells,
+        "formula_literals": formula_literals,
+        "translation_calls": len(strings),
+        "unique_strings": len(unique),
+        "duplicate_strings": len(strings) - len(unique),
+        "total_chars": total_chars,
+        "unique_chars": sum(len(text) for text in unique),
+        "expected_cache_hits": cache_hits,
+        "api_calls": api_calls,
+        "api_chars": api_chars,
+        "projected_seconds": round(projected, 1),
+        "scan_seconds": round(time.monotonic() - started, 3)
+    }
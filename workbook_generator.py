@@ -0,0 +1,354 @@
+"""
+Synthetic Workbook Generator
+Builds reproducible workbooks of any size and shape for benchmarks, load
+tests and profiling: the same seed and options always give the same cells.
+
+Tunable shape:
+- rows, columns and sheet count, and the share of empty cells (sparsity)
+- duplicate-string ratio: the share of strings drawn from a small pool of
+  repeated phrases instead of being unique
+- string length distribution (log-normal around --string-length)
+- formula density, with a share of it as fill-down columns (the same formula,
+  and the same string literals, on every row - as spreadsheets usually have)
+- style variety, merged ranges, and .xlsx or legacy .xls output
+
+.xlsx files are streamed (openpyxl write-only mode), so millions of cells are
+written in bounded memory. .xls files (xlwt) hold at most 65536 rows and 256
+columns per sheet.
+
+Usage:
+    python workbook_generator.py big.xlsx --rows 100000 --cols 20
+    python workbook_generator.py legacy.xls --rows 5000 --sheets 3 --merges 20 --styles 8
+    python workbook_generator.py dup.xlsx --rows 50000 --duplicate-ratio 0.9 --formula-density 0.2
+"""
+import sys
+import json
+import math
+import random
+import argparse
+
+XLS_MAX_ROWS = 65536
+XLS_MAX_COLS = 256
+
+WORDS = [
+    "bonjour", "merci", "total", "ventes", "chiffre", "affaires", "mensuel", "dépenses",
+    "fonctionnement", "résultat", "net", "prévisions", "trimestrielles", "budget", "alloué",
+    "écart", "commentaires", "client", "fournisseur", "facture", "montant", "date", "échéance",
+    "payé", "reste", "à", "payer", "remise", "taxe", "livraison", "commande", "produit",
+    "quantité", "prix", "unitaire", "stock", "entrepôt", "région", "nord", "sud", "est",
+    "ouest", "objectif", "atteint", "semaine", "année", "projet", "équipe", "responsable",
+    "statut", "en", "cours", "terminé", "annulé", "priorité", "haute", "basse", "note", "du", "de",
+]
+
+NUMBER_FORMATS = ["General", "0.00", "#,##0", "0%", "dd/mm/yyyy", "#,##0.00 €"]
+
+
+def random_text(rng, string_length, length_spread):
+    """Words of the vocabulary, cut to a log-normal length around string_length"""
+    target = max(1, int(rng.lognormvariate(math.log(max(string_length, 1)), length_spread)))
+    words = []
+    length = -1
+    while length < target:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    text = " ".join(words)[:target].strip()
+    return text[:1].upper() + text[1:]
+
+
+def column_letter(index):
+    """Excel column letters of a 0-based column index"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+class _SheetPlan:
+    """The seeded, per-sheet decisions cells are generated from"""
+
+    def __init__(self, rng, rows, cols, sparsity, formula_density, fill_down, merges):
+        # Fill-down columns hold one formula on every row; never column A,
+        # so the formula can refer to the cell on its left
+        fill_columns = min(int(round(cols * formula_density * fill_down)), max(cols - 1, 0))
+        self.fill_down = {
+            col: rng.randrange(len(FILL_DOWN_TEMPLATES))
+            for col in rng.sample(range(1, cols), fill_columns)
+        } if fill_columns else {}
+        # Scattered formulas make up the rest of the density, in the non-empty
+        # cells of the other columns but A
+        eligible = (cols - fill_columns - 1) * (1.0 - sparsity)
+        missing = max(formula_density * cols - fill_columns, 0.0)
+        self.scattered_density = min(missing / eligible, 1.0) if eligible > 0 else 0.0
+
+        # Merged ranges start on distinct rows three apart, so they never overlap
+        self.merges = {}
+        self.covered = set()
+        starts = range(0, max(rows - 1, 0), 3)
+        if cols > 1 and merges:
+            for row in sorted(rng.sample(starts, min(merges, len(starts)))):
+                col = rng.randrange(cols - 1)
+                last_row = min(row + rng.randint(0, 1), rows - 1)
+                last_col = min(col + rng.randint(1, 3), cols - 1)
+                self.merges[row] = (col, last_row, last_col)
+                self.covered.update(
+                    (r, c) for r in range(row, last_row + 1) for c in range(col, last_col + 1)
+                    if (r, c) != (row, col))
+
+
+FILL_DOWN_TEMPLATES = [
+    '=IF({left}{row}>0,"{a}","{b}")',
+    '={left}{row}*2',
+    '=CONCATENATE("{a}"," ",{left}{row})',
+]
+
+SCATTERED_TEMPLATES = [
+    '=IF({left}{row}>0,"{a}","{b}")',
+    '=SUM({left}1:{left}{row})',
+    '=CONCATENATE("{a}"," ",{left}{row})',
+]
+
+
+class WorkbookGenerator:
+    """
+    Seeded generator of workbook cells
+
+    Args:
+        rows, cols, sheets: Shape of every sheet
+        sparsity: Share of empty cells
+        duplicate_ratio: Share of strings taken from the repeated-phrase pool
+        string_length: Median string length, in characters
+        length_spread: Log-normal sigma of string lengths
+        numeric_ratio: Share of non-empty, non-formula cells holding numbers
+        formula_density: Share of cells holding formulas
+        fill_down: Share of formula_density laid out as fill-down columns
+        styles: Number of distinct cell styles (0: no styling)
+        styled_ratio: Share of non-empty cells given one of the styles
+        merges: Merged ranges per sheet
+        seed: Random seed; the same seed and options give the same cells
+    """
+
+    def __init__(self, rows=1000, cols=10, sheets=1, sparsity=0.1, duplicate_ratio=0.5,
+                 string_length=20, length_spread=0.5, numeric_ratio=0.2, formula_density=0.05,
+                 fill_down=0.5, styles=0, styled_ratio=0.3, merges=0, seed=0):
+        self.rows = rows
+        self.cols = cols
+        self.sheets = sheets
+        self.sparsity = sparsity
+        self.duplicate_ratio = duplicate_ratio
+        self.string_length = string_length
+        self.length_spread = length_spread
+        self.numeric_ratio = numeric_ratio
+        self.formula_density = formula_density
+        self.fill_down = fill_down
+        self.styles = styles
+        self.styled_ratio = styled_ratio
+        self.merges = merges
+        self.seed = seed
+
+        rng = random.Random(seed)
+        pool_size = min(max(int(math.sqrt(rows * cols * sheets)), 10), 10_000)
+        self.pool = [random_text(rng, string_length, length_spread) for _ in range(pool_size)]
+        self.style_specs = [
+            {
+                "bold": rng.random() < 0.5,
+                "italic": rng.random() < 0.3,
+                "color": f"{rng.randrange(0x1000000):06X}",
+                "fill": f"{rng.randrange(0x1000000):06X}" if rng.random() < 0.5 else None,
+                "border": rng.random() < 0.4,
+                "number_format": rng.choice(NUMBER_FORMATS),
+            }
+            for _ in range(styles)
+        ]
+        self.stats = {"cells": 0, "strings": 0, "numbers": 0, "formulas": 0, "formula_literals": 0, "merged_ranges": 0}
+        self.unique_strings = 0
+        self.pool_used = set()
+
+    def _string(self, rng, literal=False):
+        self.stats["formula_literals" if literal else "strings"] += 1
+        if rng.random() < self.duplicate_ratio:
+            index = rng.randrange(len(self.pool))
+            self.pool_used.add(index)
+            return self.pool[index]
+        self.unique_strings += 1
+        return f"{random_text(rng, self.string_length, self.length_spread)} {self.unique_strings}"
+
+    def sheet_rows(self, sheet_index):
+        """
+        Rows of one sheet as lists of (value, style index or None)
+
+        Also returns the sheet's merged ranges as (row, col, last_row, last_col),
+        0-based: (rows iterator, merges)
+        """
+        rng = random.Random(f"{self.seed}:{sheet_index}")
+        plan = _SheetPlan(rng, self.rows, self.cols, self.sparsity, self.formula_density, self.fill_down, self.merges)
+        fill_literals = {col: (self._string(rng, True), self._string(rng, True)) for col in plan.fill_down}
+        merges = [(row, col, last_row, last_col) for row, (col, last_row, last_col) in plan.merges.items()]
+        self.stats["merged_ranges"] += len(merges)
+
+        def rows():
+            for row in range(self.rows):
+                cells = []
+                merge = plan.merges.get(row)
+                for col in range(self.cols):
+                    cells.append(self._cell(rng, plan, fill_literals, row, col, merge))
+                yield cells
+        return rows(), merges
+
+    def _cell(self, rng, plan, fill_literals, row, col, merge):
+        if (row, col) in plan.covered:
+            return None, None
+        if merge is not None and merge[0] == col:
+            # Merged ranges are headings
+            value = self._string(rng)
+        elif col in plan.fill_down:
+            a, b = fill_literals[col]
+            value = FILL_DOWN_TEMPLATES[plan.fill_down[col]].format(
+                left=column_letter(col - 1), row=row + 1, a=a, b=b)
+            self.stats["formulas"] += 1
+        elif rng.random() < self.sparsity:
+            return None, None
+        elif col and rng.random() < plan.scattered_density:
+            # Formulas only refer to the column on their left, so none is circular
+            template = rng.choice(SCATTERED_TEMPLATES)
+            value = template.format(
+                left=column_letter(col - 1), row=row + 1, a=self._string(rng, True), b=self._string(rng, True))
+            self.stats["formulas"] += 1
+        elif rng.random() < self.numeric_ratio:
+            value = round(rng.uniform(-1000, 100_000), rng.choice([0, 2]))
+            self.stats["numbers"] += 1
+        else:
+            value = self._string(rng)
+        self.stats["cells"] += 1
+        style = rng.randrange(self.styles) if self.styles and rng.random() < self.styled_ratio else None
+        return value, style
+
+    def summary(self):
+        return dict(self.stats, unique_strings=self.unique_strings + len(self.pool_used),
+                    rows=self.rows, cols=self.cols, sheets=self.sheets, seed=self.seed)
+
+    def write(self, path):
+        """Write the workbook (.xlsx or .xls, by extension); returns summary()"""
+        if path.lower().endswith(".xls"):
+            self._write_xls(path)
+        else:
+            self._write_xlsx(path)
+        return dict(self.summary(), path=path)
+
+    def _write_xlsx(self, path):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Border, Side
+        from openpyxl.worksheet.cell_range import CellRange
+
+        thin = Side(style="thin")
+        styles = [
+            {
+                "font": Font(bold=spec["bold"], italic=spec["italic"], color=spec["color"]),
+                "fill": PatternFill(start_color=spec["fill"], end_color=spec["fill"], fill_type="solid")
+                if spec["fill"] else None,
+                "border": Border(left=thin, right=thin, top=thin, bottom=thin) if spec["border"] else None,
+                "number_format": spec["number_format"],
+            }
+            for spec in self.style_specs
+        ]
+
+        wb = Workbook(write_only=True)
+        for sheet_index in range(self.sheets):
+            ws = wb.create_sheet(f"Feuille {sheet_index + 1}")
+            rows, merges = self.sheet_rows(sheet_index)
+            for row in rows:
+                values = []
+                for value, style in row:
+                    if style is None:
+                        values.append(value)
+                        continue
+                    cell = WriteOnlyCell(ws, value=value)
+                    for attribute, setting in styles[style].items():
+                        if setting is not None:
+                            setattr(cell, attribute, setting)
+                    values.append(cell)
+                ws.append(values)
+            for row, col, last_row, last_col in merges:
+                ws.merged_cells.add(CellRange(min_row=row + 1, min_col=col + 1,
+                                              max_row=last_row + 1, max_col=last_col + 1))
+        wb.save(path)
+
+    def _write_xls(self, path):
+        try:
+            import xlwt
+        except ImportError:
+            raise ImportError(".xls output requires the xlwt package (pip install xlwt)")
+        if self.rows > XLS_MAX_ROWS or self.cols > XLS_MAX_COLS:
+            raise ValueError(f".xls sheets hold at most {XLS_MAX_ROWS} rows and {XLS_MAX_COLS} columns")
+
+        styles = []
+        for spec in self.style_specs:
+            style = f"font: bold {'on' if spec['bold'] else 'off'}, italic {'on' if spec['italic'] else 'off'}"
+            if spec["border"]:
+                style += "; borders: left thin, right thin, top thin, bottom thin"
+            styles.append(xlwt.easyxf(style, num_format_str=spec["number_format"]))
+
+        book = xlwt.Workbook(encoding="utf-8")
+        for sheet_index in range(self.sheets):
+            sheet = book.add_sheet(f"Feuille {sheet_index + 1}")
+            rows, merges = self.sheet_rows(sheet_index)
+            for row_index, row in enumerate(rows):
+                for col_index, (value, style) in enumerate(row):
+                    if value is None:
+                        continue
+                    if isinstance(value, str) and value.startswith("="):
+                        value = xlwt.Formula(value[1:])
+                    if style is None:
+                        sheet.write(row_index, col_index, value)
+                    else:
+                        sheet.write(row_index, col_index, value, styles[style])
+            for row, col, last_row, last_col in merges:
+                sheet.merge(row, last_row, col, last_col)
+        book.save(path)
+
+
+def generate_workbook(path, **options):
+    """
+    Write a synthetic workbook to path (.xlsx or .xls)
+
+    Options are those of WorkbookGenerator; returns a summary of what was
+    written (cells, string cells, unique strings, numbers, formulas, formula
+    literals, merged ranges).
+    """
+    return WorkbookGenerator(**options).write(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic workbook")
+    parser.add_argument("path", help="Output file (.xlsx or .xls)")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--sheets", type=int, default=1)
+    parser.add_argument("--sparsity", type=float, default=0.1, help="Share of empty cells")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.5, help="Share of repeated strings")
+    parser.add_argument("--string-length", type=int, default=20, help="Median string length")
+    parser.add_argument("--length-spread", type=float, default=0.5, help="Log-normal sigma of string lengths")
+    parser.add_argument("--numeric-ratio", type=float, default=0.2, help="Share of numeric cells")
+    parser.add_argument("--formula-density", type=float, default=0.05, help="Share of formula cells")
+    parser.add_argument("--fill-down", type=float, default=0.5, help="Share of formulas in fill-down columns")
+    parser.add_argument("--styles", type=int, default=0, help="Distinct cell styles")
+    parser.add_argument("--styled-ratio", type=float, default=0.3, help="Share of styled cells")
+    parser.add_argument("--merges", type=int, default=0, help="Merged ranges per sheet")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    options = vars(args)
+    path = options.pop("path")
+    try:
+        summary = generate_workbook(path, **options)
+    except (ValueError, ImportError) as e:
+        parser.error(str(e))
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())